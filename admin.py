@@ -1,11 +1,14 @@
 from django.contrib import admin
 
-from .models import BankAccount, BankTransaction
+from .models import (
+    BankAccount, BankAccountDailyBalance, BankSyncJob, BankSyncRun, BankSyncState, BankTransaction,
+    CategorizationRule, FxRate, Payee, ReconciliationAuditEntry, ReconciliationLink, TransactionFlag,
+)
 
 @admin.register(BankAccount)
 class BankAccountAdmin(admin.ModelAdmin):
-    list_display = ['name', 'bank_name', 'account_number', 'iban', 'currency', 'created_at']
-    search_fields = ['name', 'bank_name', 'account_number', 'iban']
+    list_display = ['name', 'bank_name', 'account_number', 'iban', 'currency', 'provider', 'created_at']
+    search_fields = ['name', 'bank_name', 'account_number', 'iban', 'external_id']
     readonly_fields = ['created_at', 'updated_at']
 
 @admin.register(BankTransaction)
@@ -14,3 +17,65 @@ class BankTransactionAdmin(admin.ModelAdmin):
     search_fields = ['description', 'reference']
     readonly_fields = ['created_at', 'updated_at']
 
+@admin.register(Payee)
+class PayeeAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'iban', 'created_at']
+    search_fields = ['name', 'key', 'iban']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(ReconciliationLink)
+class ReconciliationLinkAdmin(admin.ModelAdmin):
+    list_display = ['transaction', 'document_type', 'document_id', 'amount', 'score', 'created_at']
+    search_fields = ['document_id']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(ReconciliationAuditEntry)
+class ReconciliationAuditEntryAdmin(admin.ModelAdmin):
+    list_display = ['transaction', 'action', 'source', 'batch_id', 'created_by', 'created_at']
+    list_filter = ['action', 'source']
+    search_fields = ['batch_id']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(TransactionFlag)
+class TransactionFlagAdmin(admin.ModelAdmin):
+    list_display = ['transaction', 'kind', 'status', 'score', 'detail', 'created_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(FxRate)
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = ['day', 'base', 'quote', 'rate']
+    list_filter = ['base', 'quote']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(BankAccountDailyBalance)
+class BankAccountDailyBalanceAdmin(admin.ModelAdmin):
+    list_display = ['account', 'day', 'opening', 'inflow', 'outflow', 'closing', 'unreconciled_count']
+    list_filter = ['day']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(BankSyncState)
+class BankSyncStateAdmin(admin.ModelAdmin):
+    list_display = ['account', 'cursor', 'last_booking_date', 'last_balance', 'last_synced_at', 'failure_count', 'last_error']
+    list_filter = ['failure_count']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(BankSyncRun)
+class BankSyncRunAdmin(admin.ModelAdmin):
+    list_display = ['provider', 'started_at', 'duration_ms', 'accounts', 'accounts_unchanged', 'accounts_failed',
+                    'requests', 'rows_fetched', 'rows_written']
+    list_filter = ['provider']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(BankSyncJob)
+class BankSyncJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'progress', 'total', 'attempts', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(CategorizationRule)
+class CategorizationRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'priority', 'match_type', 'pattern', 'category', 'tags', 'is_active', 'created_at']
+    list_filter = ['match_type', 'is_active']
+    search_fields = ['name', 'pattern', 'category', 'tags']
+    readonly_fields = ['created_at', 'updated_at']
@@ -14,18 +14,61 @@ CONTEXT = """
 - `account_number` (CharField, optional): internal account number
 - `iban` (CharField, max 34, optional): IBAN code
 - `currency` (CharField, max 3, default `EUR`): ISO 4217 code
-- `balance` (Decimal 14,2): current account balance (updated on sync)
+- `balance` (Decimal 14,2): current account balance, kept equal to the last `balance_after`
+- `opening_balance` (Decimal 14,2): balance before the first transaction; correcting `balance` moves it
+- `provider` / `external_id` (optional): bank feed link (e.g. `psd2`, the bank's account id); synced by `manage.py bank_sync_sync`
 - `is_active` (bool, default True)
-- Related: `transactions` (BankTransaction set)
+- Related: `transactions` (BankTransaction set), `sync_state` (BankSyncState: cursor, etag, last_booking_date, boundary_ids, last_balance, last_synced_at, last_error, failure_count)
 
 **BankTransaction**
 - `account` (FK BankAccount, CASCADE, related_name `transactions`)
 - `date` (DateField): transaction date
 - `description` (CharField, max 255): transaction description from bank
+- `counterparty_name`, `counterparty_iban`, `remittance_info`: extracted from the description on save/import; `payee` (FK Payee, nullable) groups spellings of one party. Filter by `payee__key` / `counterparty_iban` (indexed) rather than `description__icontains`
 - `amount` (Decimal 14,2): positive = credit (income), negative = debit (outgoing)
-- `balance_after` (Decimal 14,2): account balance after this transaction
+- `balance_after` (Decimal 14,2): running balance after this transaction, derived (`opening_balance` + amounts in `date, seq` order); never set it directly
+- `seq` (int): per-account insertion order used as the same-day tie-break
 - `is_reconciled` (bool, default False): whether matched to an expense/invoice
 - `reference` (CharField, optional): bank reference code
+- `category` (CharField, optional): free-text category; list search supports `category:<name>` / `category:none`
+- `tags` (CharField, optional): comma-separated lowercase tags, usually set by categorization rules; search with `tag:<name>`
+
+**Payee**
+- `name`, `key` (normalised name without legal form, unique per hub), `iban`
+- Related: `transactions` (BankTransaction set); `manage.py bank_sync_backfill_payees` links rows imported before payees existed
+
+**ReconciliationLink**
+- `transaction` (FK BankTransaction, related_name `reconciliation_links`)
+- `document_type` / `document_id`: the invoice or expense the money was allocated to
+- `amount` (Decimal 14,2): allocated part of the transaction; one transfer can settle several documents and one document can be paid by several transactions
+
+**ReconciliationAuditEntry**
+- `transaction` (FK BankTransaction, related_name `reconciliation_audit`), `action` (`reconcile` / `unreconcile`), `source` (`bulk` / `assistant`)
+- `batch_id`: shared by all rows changed in one bulk request; `created_by` is the acting user
+
+**TransactionFlag** (review queue, written by detection)
+- `transaction` (FK BankTransaction, related_name `flags`), `kind` (`duplicate` / `anomaly`), `status` (`open` / `dismissed`)
+- `related`: the earlier line a duplicate repeats; `score`: description similarity or deviations from the payee's usual amount; `detail`
+- Raised by a `BankSyncJob` of `kind=detect`; list flagged rows with the search `flagged:yes`
+
+**CategorizationRule**
+- `pattern` with `match_type` `contains` / `regex`, optional `min_amount` / `max_amount`, `account`, `counterparty_iban`; all given conditions must hold
+- `category` and `tags` applied on import; lowest `priority` sets the category, every matching rule adds its tags; `is_active` to pause
+- Re-apply to existing rows with a `BankSyncJob` of `kind=categorize` (params `account_id`, `overwrite`)
+
+**BankAccountDailyBalance** (rollup, maintained automatically)
+- `account`, `day`: one row per account and booking day
+- `opening`, `inflow`, `outflow` (positive), `closing`, `transaction_count`, `unreconciled_count`
+- Use it for balance-over-time and monthly cash flow instead of aggregating `BankTransaction`
+- Hub-wide account/transaction counts and the unreconciled count and amount are cached: `bank_sync.counters.get_counters(hub_id)`
+- For totals over all of a hub's transactions (by account, payee, category, day or month) use `bank_sync.analytics.get_snapshot(hub_id)` with `analytics.group_sum` instead of iterating model instances
+- For projected balances and upcoming recurring payments (90 days) use `bank_sync.forecast.hub_forecast(hub_id)` or `forecast.account_forecast(account)`; both are cached per account
+- Balances are in each account's `currency`; never add them across currencies. For totals in the hub's base currency use `bank_sync.fx.consolidated_balances(hub_id)` / `fx.consolidated_flows(hub_id, start, end)` (rates from `FxRate`, loaded by `manage.py bank_sync_load_fx_rates`)
+
+**BankSyncJob** (background job queue)
+- `kind`: `import`, `reconcile`, `recompute`, `categorize`, `detect` or `sync`; `status`: `queued`, `running`, `done`, `failed`, `cancelled`
+- `progress` / `total` / `message`: live progress; `result` (JSON): summary once done; `error`: last traceback
+- Run by `manage.py bank_sync_worker`; a job stuck with a stale heartbeat is re-queued and resumes from `checkpoint`
 
 ### Key flows
 
@@ -33,16 +76,33 @@ CONTEXT = """
 1. Create `BankAccount` with name, IBAN, and initial balance
 
 **Import transactions:**
-1. Parse bank statement (CSV/OFX/API)
-2. Create `BankTransaction` records linked to the account
-3. Update `BankAccount.balance` to current balance
+1. Upload a CSV, CAMT.053 or OFX statement at Transactions → Import (or `manage.py bank_sync_import`)
+2. The upload is queued as a `BankSyncJob` (`kind=import`) and the page polls its progress; `manage.py bank_sync_worker` must be running
+3. Lines are validated, categorised by the hub's `CategorizationRule`s and bulk-created as `BankTransaction` records linked to the account; invalid lines are skipped and reported
+4. Running balances are recomputed from the statement's first date and `BankAccount.balance` follows the last one
+5. The daily balance rollup is refreshed for the statement's days (`manage.py bank_sync_rebuild_balances` rebuilds it and the running balances)
+
+**Sync from a bank feed:**
+1. `manage.py bank_sync_sync --hub <uuid> --provider psd2 --discover` links the bank's accounts (sets `provider` / `external_id`)
+2. `manage.py bank_sync_sync` fetches everything booked after each account's `BankSyncState.cursor` and imports it like a statement
+3. Only the delta is fetched and written (ETag 304 for unchanged accounts, high-water mark on the boundary day)
+4. Failures keep the state and are recorded in `BankSyncState.last_error`; providers are configured in `settings.BANK_SYNC_PROVIDERS`
+5. `BankSyncRun` has one row per run and hub with requests, rows fetched and rows written
 
 **Reconcile transactions:**
 - Match `BankTransaction` to an expense or invoice
+- "Run auto-reconcile" (a background job; or `manage.py bank_sync_reconcile`) matches by amount, date window and reference automatically
 - Set `is_reconciled=True` on matched transactions
+- For many rows at once use `reconcile_bank_transactions` / `unreconcile_bank_transactions` (by ids, account, date range or search); each change is logged as a `ReconciliationAuditEntry`
 - Unreconciled transactions: `BankTransaction.objects.filter(account=acc, is_reconciled=False)`
 
+**Answer questions about totals:**
+- `list_bank_accounts` and `list_bank_transactions` return one page (`limit`, at most 100) and a `next_cursor`; do not page through rows to add them up
+- For totals use `summarize_bank_transactions`: `group_by` any of `account`, `month`, `week`, `reconciled`, `payee` and `metrics` (`count`, `sum`, `inflow`, `outflow`, `min`, `max`), e.g. monthly outflow by account this year is `group_by=["month", "account"]`, `metrics=["outflow"]`, `date_from` set to 1 January
+- Quick totals by one dimension are also available as `list_bank_transactions` with `group_by` (`is_reconciled`, `month`, `account`)
+
 ### Relationships
 - BankAccount → BankTransaction (one-to-many, related_name `transactions`)
-- BankTransaction has no FK to expenses or invoicing — reconciliation is handled by external logic
+- Payee → BankTransaction (one-to-many, related_name `transactions`, SET_NULL)
+- BankTransaction has no FK to expenses or invoicing — `reconciliation.py` reads open invoices/expenses through the app registry when those modules are installed
 """
@@ -2,20 +2,56 @@
 from assistant.tools import AssistantTool, register_tool
 
 
+AI_PAGE_SIZE = 20
+AI_MAX_PAGE_SIZE = 100
+AI_MAX_GROUPS = 100
+
+_PAGE_PROPERTIES = {
+    "limit": {"type": "integer", "description": f"Rows per page (default {AI_PAGE_SIZE}, at most {AI_MAX_PAGE_SIZE})"},
+    "cursor": {"type": "string", "description": "next_cursor from the previous page"},
+}
+
+
+def _hub_id(request):
+    return request.session.get('hub_id')
+
+
+def _page(qs, sort_field, args, descending=False):
+    """One keyset page of a ``.values()`` queryset: ``(rows, next_cursor)``."""
+    from bank_sync.pagination import keyset_paginate
+    try:
+        limit = int(args.get('limit') or AI_PAGE_SIZE)
+    except (TypeError, ValueError):
+        limit = AI_PAGE_SIZE
+    page = keyset_paginate(
+        qs, sort_field, descending=descending, cursor=args.get('cursor'),
+        per_page=min(max(limit, 1), AI_MAX_PAGE_SIZE),
+    )
+    return page.object_list, page.next_cursor
+
+
 @register_tool
 class ListBankAccounts(AssistantTool):
     name = "list_bank_accounts"
-    description = "List bank accounts."
+    description = "List bank accounts (paginated), with the hub's total balance converted to its base currency."
     module_id = "bank_sync"
     required_permission = "bank_sync.view_bankaccount"
-    parameters = {"type": "object", "properties": {"is_active": {"type": "boolean"}}, "required": [], "additionalProperties": False}
+    parameters = {"type": "object", "properties": {"is_active": {"type": "boolean"}, **_PAGE_PROPERTIES}, "required": [], "additionalProperties": False}
 
     def execute(self, args, request):
+        from bank_sync.fx import consolidated_balances
         from bank_sync.models import BankAccount
-        qs = BankAccount.objects.all()
+        hub_id = _hub_id(request)
+        qs = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False)
         if 'is_active' in args:
             qs = qs.filter(is_active=args['is_active'])
-        return {"accounts": [{"id": str(a.id), "name": a.name, "bank_name": a.bank_name, "iban": a.iban, "currency": a.currency, "balance": str(a.balance), "is_active": a.is_active} for a in qs]}
+        rows, next_cursor = _page(qs.values('pk', 'name', 'bank_name', 'iban', 'currency', 'balance', 'is_active'), 'name', args)
+        position = consolidated_balances(hub_id)
+        return {
+            "accounts": [{"id": str(a['pk']), "name": a['name'], "bank_name": a['bank_name'], "iban": a['iban'], "currency": a['currency'], "balance": str(a['balance']), "is_active": a['is_active']} for a in rows],
+            "next_cursor": next_cursor,
+            "base_currency": position.base, "total_balance": str(position.total), "currencies_without_rate": position.missing,
+        }
 
 
 @register_tool
@@ -39,6 +75,7 @@ class CreateBankAccount(AssistantTool):
     def execute(self, args, request):
         from bank_sync.models import BankAccount
         a = BankAccount.objects.create(
+            hub_id=_hub_id(request),
             name=args['name'], bank_name=args['bank_name'],
             account_number=args.get('account_number', ''), iban=args.get('iban', ''),
             currency=args.get('currency', 'EUR'),
@@ -46,10 +83,91 @@ class CreateBankAccount(AssistantTool):
         return {"id": str(a.id), "name": a.name, "created": True}
 
 
+def _filter_transactions(args, request):
+    """The hub's live transactions on live accounts, narrowed by the tool filters in ``args``."""
+    from bank_sync.counterparty import compact_iban, payee_key
+    from bank_sync.models import BankTransaction
+    qs = BankTransaction.objects.filter(hub_id=_hub_id(request), is_deleted=False, account__is_deleted=False)
+    if args.get('account_id'):
+        qs = qs.filter(account_id=args['account_id'])
+    if 'is_reconciled' in args:
+        qs = qs.filter(is_reconciled=args['is_reconciled'])
+    if args.get('date_from'):
+        qs = qs.filter(date__gte=args['date_from'])
+    if args.get('date_to'):
+        qs = qs.filter(date__lte=args['date_to'])
+    if args.get('payee'):
+        qs = qs.filter(payee__key__startswith=payee_key(args['payee']))
+    if args.get('counterparty_iban'):
+        qs = qs.filter(counterparty_iban=compact_iban(args['counterparty_iban']))
+    return qs
+
+
+SUMMARY_DIMENSIONS = ('account', 'month', 'week', 'reconciled', 'payee')
+SUMMARY_METRICS = ('count', 'sum', 'inflow', 'outflow', 'min', 'max')
+SUMMARY_CACHE_SECONDS = 60
+
+
+def _summarize(qs, group_by, metrics, order_by=None, limit=AI_MAX_GROUPS):
+    """
+    ``metrics`` per combination of ``group_by`` dimensions in one ``GROUP BY``.
+    Amounts are never added across currencies: every group is also split by
+    the account's currency.
+    """
+    from decimal import Decimal
+
+    from django.db.models import Count, DecimalField, Max, Min, Q, Sum, Value
+    from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+    def signed(condition):
+        # 0 rather than NULL for groups without such rows, so ordering agrees across databases.
+        return Coalesce(Sum('amount', filter=condition), Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    aggregates = {
+        'count': Count('pk'), 'sum': Sum('amount'), 'min': Min('amount'), 'max': Max('amount'),
+        'inflow': signed(Q(amount__gt=0)), 'outflow': signed(Q(amount__lt=0)),
+    }
+    columns = {
+        'account': ('account_id', 'account__name'),
+        'month': ('month',),
+        'week': ('week',),
+        'reconciled': ('is_reconciled',),
+        'payee': ('payee_id', 'payee__name'),
+    }
+    if 'month' in group_by:
+        qs = qs.annotate(month=TruncMonth('date'))
+    if 'week' in group_by:
+        qs = qs.annotate(week=TruncWeek('date'))
+    keys = [column for dimension in group_by for column in columns[dimension]] + ['account__currency']
+    ordering = ([order_by] if order_by else []) + keys
+    groups = list(qs.values(*keys).annotate(**{m: aggregates[m] for m in metrics}).order_by(*ordering)[:limit + 1])
+    rows = []
+    for group in groups[:limit]:
+        row = {}
+        if 'account' in group_by:
+            row.update(account_id=str(group['account_id']), account=group['account__name'])
+        if 'month' in group_by:
+            row["month"] = group['month'].strftime('%Y-%m')
+        if 'week' in group_by:
+            row["week"] = group['week'].strftime('%Y-%m-%d')
+        if 'reconciled' in group_by:
+            row["is_reconciled"] = group['is_reconciled']
+        if 'payee' in group_by:
+            row.update(payee_id=str(group['payee_id']) if group['payee_id'] else None, payee=group['payee__name'])
+        row["currency"] = group['account__currency']
+        for metric in metrics:
+            row[metric] = group[metric] if metric == 'count' else f'{group[metric] or 0:.2f}'
+        rows.append(row)
+    return {"group_by": list(group_by), "groups": rows, "truncated": len(groups) > limit}
+
+
 @register_tool
 class ListBankTransactions(AssistantTool):
     name = "list_bank_transactions"
-    description = "List bank transactions with filters."
+    description = (
+        "List bank transactions with filters, newest first and paginated. "
+        "With group_by, return count and totals per account, month or reconciled status instead of rows."
+    )
     module_id = "bank_sync"
     required_permission = "bank_sync.view_banktransaction"
     parameters = {
@@ -57,27 +175,143 @@ class ListBankTransactions(AssistantTool):
         "properties": {
             "account_id": {"type": "string"}, "is_reconciled": {"type": "boolean"},
             "date_from": {"type": "string"}, "date_to": {"type": "string"},
-            "limit": {"type": "integer"},
+            "payee": {"type": "string", "description": "Counterparty name, e.g. 'Iberdrola' (matches name variants)"},
+            "counterparty_iban": {"type": "string"},
+            "group_by": {"type": "string", "enum": ["account", "month", "is_reconciled"],
+                         "description": "Return totals per group instead of rows, e.g. is_reconciled for 'how much is unreconciled'"},
+            **_PAGE_PROPERTIES,
         },
         "required": [],
         "additionalProperties": False,
     }
 
     def execute(self, args, request):
-        from bank_sync.models import BankTransaction
-        qs = BankTransaction.objects.select_related('account').all()
-        if args.get('account_id'):
-            qs = qs.filter(account_id=args['account_id'])
-        if 'is_reconciled' in args:
-            qs = qs.filter(is_reconciled=args['is_reconciled'])
-        if args.get('date_from'):
-            qs = qs.filter(date__gte=args['date_from'])
-        if args.get('date_to'):
-            qs = qs.filter(date__lte=args['date_to'])
-        limit = args.get('limit', 20)
+        qs = _filter_transactions(args, request)
+        if args.get('group_by'):
+            dimension = 'reconciled' if args['group_by'] == 'is_reconciled' else args['group_by']
+            return _summarize(qs, [dimension], ('count', 'sum', 'inflow', 'outflow'))
+        rows, next_cursor = _page(
+            qs.values('pk', 'date', 'description', 'amount', 'is_reconciled', 'account__name', 'counterparty_name'),
+            'date', args, descending=True,
+        )
         return {
             "transactions": [
-                {"id": str(t.id), "date": str(t.date), "description": t.description, "amount": str(t.amount), "is_reconciled": t.is_reconciled, "account": t.account.name}
-                for t in qs.order_by('-date')[:limit]
-            ]
+                {"id": str(t['pk']), "date": str(t['date']), "description": t['description'], "amount": str(t['amount']), "is_reconciled": t['is_reconciled'], "account": t['account__name'], "counterparty": t['counterparty_name']}
+                for t in rows
+            ],
+            "next_cursor": next_cursor,
         }
+
+
+@register_tool
+class SummarizeBankTransactions(AssistantTool):
+    name = "summarize_bank_transactions"
+    description = (
+        "Totals of bank transactions grouped by account, month, week, reconciled status and/or payee, "
+        "e.g. monthly outflow by account this year. Prefer this over listing rows to add them up."
+    )
+    module_id = "bank_sync"
+    required_permission = "bank_sync.view_banktransaction"
+    parameters = {
+        "type": "object",
+        "properties": {
+            "group_by": {"type": "array", "items": {"type": "string", "enum": list(SUMMARY_DIMENSIONS)},
+                         "description": "Dimensions to group by; none gives one total per currency"},
+            "metrics": {"type": "array", "items": {"type": "string", "enum": list(SUMMARY_METRICS)},
+                        "description": "Default count and sum; outflow is negative"},
+            "order_by": {"type": "string", "enum": [f'{sign}{m}' for m in SUMMARY_METRICS for sign in ('', '-')],
+                         "description": "Sort groups by a metric, '-' for descending; default by the groups"},
+            "account_id": {"type": "string"}, "is_reconciled": {"type": "boolean"},
+            "date_from": {"type": "string"}, "date_to": {"type": "string"},
+            "payee": {"type": "string", "description": "Counterparty name, e.g. 'Iberdrola' (matches name variants)"},
+            "counterparty_iban": {"type": "string"},
+            "limit": {"type": "integer", "description": f"Most groups returned (default and at most {AI_MAX_GROUPS})"},
+        },
+        "required": [],
+        "additionalProperties": False,
+    }
+
+    def execute(self, args, request):
+        import hashlib
+        import json
+
+        from django.conf import settings
+        from django.core.cache import caches
+
+        from bank_sync import analytics
+        group_by = list(dict.fromkeys(d for d in args.get('group_by') or () if d in SUMMARY_DIMENSIONS))
+        metrics = tuple(dict.fromkeys(m for m in args.get('metrics') or () if m in SUMMARY_METRICS)) or ('count', 'sum')
+        order_by = args.get('order_by') if (args.get('order_by') or '').lstrip('-') in metrics else None
+        try:
+            limit = min(max(int(args.get('limit') or AI_MAX_GROUPS), 1), AI_MAX_GROUPS)
+        except (TypeError, ValueError):
+            limit = AI_MAX_GROUPS
+        hub_id = _hub_id(request)
+        # Keyed by the hub's analytics version too: any transaction write makes a fresh entry.
+        query = json.dumps([group_by, metrics, order_by, limit, args], sort_keys=True, default=str)
+        key = f'bank_sync:summary:{hub_id}:{analytics.version(hub_id)}:{hashlib.md5(query.encode()).hexdigest()}'
+        cache = caches[getattr(settings, 'BANK_SYNC_ANALYTICS_CACHE', 'default')]
+        return cache.get_or_set(
+            key, lambda: _summarize(_filter_transactions(args, request), group_by, metrics, order_by, limit),
+            SUMMARY_CACHE_SECONDS,
+        )
+
+
+_BULK_RECONCILE_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "transaction_ids": {"type": "array", "items": {"type": "string"}},
+        "account_id": {"type": "string"},
+        "date_from": {"type": "string"}, "date_to": {"type": "string"},
+        "search": {"type": "string", "description": "Transaction search box syntax, e.g. 'iberdrola amount:<0'"},
+    },
+    "required": [],
+    "additionalProperties": False,
+}
+
+
+def _bulk_reconcile(args, request, action):
+    import uuid
+
+    from bank_sync.bulk import bulk_update_transactions
+    from bank_sync.search import apply_search
+
+    if not any(args.get(k) for k in ('transaction_ids', 'account_id', 'date_from', 'date_to', 'search')):
+        return {"error": "Give transaction_ids or at least one filter (account_id, date_from, date_to, search)."}
+    qs = _filter_transactions(args, request)
+    if args.get('transaction_ids'):
+        qs = qs.filter(id__in=args['transaction_ids'])
+    if args.get('search'):
+        qs = apply_search(qs, args['search'])
+    batch_id = uuid.uuid4()
+    matched = qs.count()
+    updated = bulk_update_transactions(
+        qs, action, user_id=request.session.get('local_user_id'), source='assistant', batch_id=batch_id,
+    )
+    return {"matched": matched, "updated": updated, "batch_id": str(batch_id)}
+
+
+@register_tool
+class ReconcileBankTransactions(AssistantTool):
+    name = "reconcile_bank_transactions"
+    description = "Mark bank transactions as reconciled, by id list or by filter (e.g. one account for one month)."
+    module_id = "bank_sync"
+    required_permission = "bank_sync.reconcile_transaction"
+    requires_confirmation = True
+    parameters = _BULK_RECONCILE_PARAMETERS
+
+    def execute(self, args, request):
+        return _bulk_reconcile(args, request, 'reconcile')
+
+
+@register_tool
+class UnreconcileBankTransactions(AssistantTool):
+    name = "unreconcile_bank_transactions"
+    description = "Mark bank transactions as unreconciled and remove their reconciliation links, by id list or by filter."
+    module_id = "bank_sync"
+    required_permission = "bank_sync.reconcile_transaction"
+    requires_confirmation = True
+    parameters = _BULK_RECONCILE_PARAMETERS
+
+    def execute(self, args, request):
+        return _bulk_reconcile(args, request, 'unreconcile')
@@ -0,0 +1,312 @@
+"""
+Columnar in-memory snapshot of a hub's transactions for analytics.
+
+Forecasts, duplicate detection and category totals read every transaction of
+a hub; as model instances that costs hundreds of bytes a row. A ``Snapshot``
+keeps only what analytics needs, as typed ``array`` columns sorted by day:
+
+* ``cents`` (int64) and ``days`` (int32 date ordinals);
+* ``accounts``, ``payees``, ``categories``: dictionary-encoded, one small
+  integer code per row (``uint8``/``uint16``/``int32`` depending on the
+  number of distinct values) plus a ``values`` list per column;
+* ``reconciled`` (int8);
+* ``ids`` (16-byte UUIDs), only when loaded ``with_ids`` to act on rows.
+
+With up to a few hundred accounts, payees and categories that is 16 bytes a
+row: 5M rows in about 80 MB instead of gigabytes.
+Rows are streamed with ``values_list().iterator()``, so the load never
+holds more than one database chunk of tuples.
+
+The helpers (``group_sum``, ``daily_series``, ``rolling_sum``,
+``cumulative``) take an optional row ``mask`` (see ``Snapshot.mask``) and run
+on numpy views of the columns when numpy is installed, in plain Python
+otherwise, with the same results.
+
+``get_snapshot(hub_id)`` keeps one snapshot per hub in process memory, for
+the last ``SNAPSHOT_CACHE_HUBS`` hubs used. Each carries the hub's version
+token from Django's cache (``settings.BANK_SYNC_ANALYTICS_CACHE``, default
+``default``); every write path calls ``invalidate(hub_id)``, which replaces
+the token, so all processes reload on their next read.
+"""
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .matching import to_cents
+from .models import BankTransaction
+
+SNAPSHOT_CACHE_HUBS = 8
+STREAM_CHUNK_SIZE = 5000
+
+DIMENSIONS = ('account', 'payee', 'category')
+
+_snapshots = OrderedDict()
+
+
+class _Encoder:
+    """Dictionary encoding: ``encode(value)`` returns a dense integer code."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _narrow(codes, cardinality):
+    """The smallest unsigned array type that holds ``cardinality`` codes."""
+    typecode = 'B' if cardinality <= 0x100 else 'H' if cardinality <= 0x10000 else 'i'
+    return codes if typecode == codes.typecode else array(typecode, codes)
+
+
+def _np(column):
+    return np.frombuffer(column, dtype=column.typecode)
+
+
+class Snapshot:
+    """A hub's transactions as typed columns, in ``days`` order."""
+
+    def __init__(self, cents, days, codes, values, reconciled, version=None, ids=None):
+        self.cents = cents
+        self.days = days
+        self.codes = codes  # dimension -> array of codes
+        self.values = values  # dimension -> list, code -> value
+        self.reconciled = reconciled
+        self.version = version
+        self.ids = ids
+
+    @classmethod
+    def from_rows(cls, rows, version=None, with_ids=False):
+        """
+        Build from ``(amount, date, account_id, payee_id, category, is_reconciled)``
+        tuples in date order, led by the row's UUID ``with_ids``; ``amount`` is
+        a ``Decimal`` or integer cents.
+        """
+        cents, days, reconciled = array('q'), array('i'), array('b')
+        ids = bytearray() if with_ids else None
+        encoders = {name: _Encoder() for name in DIMENSIONS}
+        codes = {name: array('i') for name in DIMENSIONS}
+        account, payee, category = (encoders[name].encode for name in DIMENSIONS)
+        account_codes, payee_codes, category_codes = (codes[name].append for name in DIMENSIONS)
+        for row in rows:
+            if with_ids:
+                ids += row[0].bytes
+                row = row[1:]
+            amount, day, account_id, payee_id, category_name, is_reconciled = row
+            cents.append(amount if isinstance(amount, int) else to_cents(amount))
+            days.append(day.toordinal())
+            account_codes(account(account_id))
+            payee_codes(payee(payee_id))
+            category_codes(category(category_name))
+            reconciled.append(1 if is_reconciled else 0)
+        codes = {name: _narrow(codes[name], len(encoders[name].values)) for name in DIMENSIONS}
+        values = {name: encoders[name].values for name in DIMENSIONS}
+        return cls(cents, days, codes, values, reconciled, version, ids)
+
+    def __len__(self):
+        return len(self.cents)
+
+    @property
+    def nbytes(self):
+        columns = [self.cents, self.days, self.reconciled, *self.codes.values()]
+        return sum(c.itemsize * len(c) for c in columns) + len(self.ids or b'')
+
+    def row_id(self, index):
+        return uuid.UUID(bytes=bytes(self.ids[index * 16:index * 16 + 16]))
+
+    def day_range(self, start=None, end=None):
+        """``(lo, hi)`` row slice of the days ``start..end`` (dates, inclusive)."""
+        lo = bisect_left(self.days, start.toordinal()) if start else 0
+        hi = bisect_right(self.days, end.toordinal()) if end else len(self.days)
+        return lo, hi
+
+    def mask(self, start=None, end=None, account_id=None, reconciled=None, sign=None):
+        """
+        Row selection for the helpers, or ``None`` for every row.
+
+        ``sign`` is ``1`` for credits, ``-1`` for debits. A numpy bool array
+        with numpy, else a ``bytearray`` of 0/1.
+        """
+        lo, hi = self.day_range(start, end)
+        account_code = None
+        if account_id is not None:
+            codes = {str(value): code for code, value in enumerate(self.values['account'])}
+            account_code = codes.get(str(account_id), -1)
+        if (lo, hi) == (0, len(self)) and account_code is None and reconciled is None and sign is None:
+            return None
+        if np is not None:
+            selected = np.zeros(len(self), dtype=bool)
+            selected[lo:hi] = True
+            if account_code is not None:
+                selected &= _np(self.codes['account']) == account_code
+            if reconciled is not None:
+                selected &= _np(self.reconciled) == (1 if reconciled else 0)
+            if sign is not None:
+                selected &= (_np(self.cents) > 0) if sign > 0 else (_np(self.cents) < 0)
+            return selected
+        selected = bytearray(len(self))
+        accounts, flags, cents = self.codes['account'], self.reconciled, self.cents
+        wanted = None if reconciled is None else (1 if reconciled else 0)
+        for i in range(lo, hi):
+            if account_code is not None and accounts[i] != account_code:
+                continue
+            if wanted is not None and flags[i] != wanted:
+                continue
+            if sign is not None and not (cents[i] > 0 if sign > 0 else cents[i] < 0):
+                continue
+            selected[i] = 1
+        return selected
+
+
+def group_sum(snapshot, by, mask=None):
+    """``{value: (count, cents)}`` per ``account``, ``payee``, ``category``, ``day`` or ``month``."""
+    if by in ('day', 'month'):
+        return _group_by_period(snapshot, by, mask)
+    codes, values = snapshot.codes[by], snapshot.values[by]
+    if np is not None:
+        keys, cents = _np(codes), _np(snapshot.cents)
+        if mask is not None:
+            keys, cents = keys[mask], cents[mask]
+        counts = np.bincount(keys, minlength=len(values))
+        # float64 weights are exact for totals below 2**53 cents.
+        sums = np.bincount(keys, weights=cents, minlength=len(values))
+        return {values[code]: (int(counts[code]), int(round(sums[code]))) for code in np.flatnonzero(counts)}
+    counts, sums = [0] * len(values), [0] * len(values)
+    for i, (code, amount) in enumerate(zip(codes, snapshot.cents)):
+        if mask is None or mask[i]:
+            counts[code] += 1
+            sums[code] += amount
+    return {values[code]: (counts[code], sums[code]) for code in range(len(values)) if counts[code]}
+
+
+def _group_by_period(snapshot, by, mask):
+    totals = {}
+    first, series = daily_series(snapshot, mask)
+    counts = daily_series(snapshot, mask, count=True)[1]
+    for offset, (count, amount) in enumerate(zip(counts, series)):
+        if not count:
+            continue
+        day = date.fromordinal(first + offset)
+        key = day if by == 'day' else f'{day:%Y-%m}'
+        previous = totals.get(key, (0, 0))
+        totals[key] = (previous[0] + count, previous[1] + amount)
+    return totals
+
+
+def daily_series(snapshot, mask=None, count=False):
+    """
+    ``(first_ordinal, array)`` of per-day cents totals (row counts with
+    ``count``), dense from the first to the last selected day.
+    """
+    if np is not None:
+        days, cents = _np(snapshot.days), _np(snapshot.cents)
+        if mask is not None:
+            days, cents = days[mask], cents[mask]
+        if not len(days):
+            return 0, array('q')
+        first = int(days[0])
+        totals = np.bincount(days - first, weights=None if count else cents)
+        return first, array('q', np.rint(totals).astype(np.int64).tobytes())
+    selected = [(d, c) for i, (d, c) in enumerate(zip(snapshot.days, snapshot.cents)) if mask is None or mask[i]]
+    if not selected:
+        return 0, array('q')
+    first = selected[0][0]
+    totals = array('q', bytes(8 * (selected[-1][0] - first + 1)))
+    for day, amount in selected:
+        totals[day - first] += 1 if count else amount
+    return first, totals
+
+
+def rolling_sum(series, window):
+    """Trailing ``window``-long sums of ``series`` (the first ones cover fewer values)."""
+    if np is not None:
+        running = np.cumsum(_np(series), dtype=np.int64)
+        if window < len(running):
+            running[window:] = running[window:] - running[:-window]
+        return array('q', running.tobytes())
+    out, total = array('q'), 0
+    for i, value in enumerate(series):
+        total += value
+        if i >= window:
+            total -= series[i - window]
+        out.append(total)
+    return out
+
+
+def cumulative(series, start=0):
+    """Running totals of ``series`` from ``start`` (e.g. a balance)."""
+    if np is not None:
+        return array('q', (np.cumsum(_np(series), dtype=np.int64) + start).tobytes())
+    out, total = array('q'), start
+    for value in series:
+        total += value
+        out.append(total)
+    return out
+
+
+# ----------------------------------------------------------------------
+# Per-hub cache
+# ----------------------------------------------------------------------
+
+def _cache():
+    return caches[getattr(settings, 'BANK_SYNC_ANALYTICS_CACHE', 'default')]
+
+
+def _version_key(hub_id):
+    return f'bank_sync:analytics:{hub_id}'
+
+
+def version(hub_id):
+    """The hub's version token; it changes on every transaction write."""
+    cache = _cache()
+    token = cache.get(_version_key(hub_id))
+    if token is None:
+        token = uuid.uuid4().hex
+        cache.add(_version_key(hub_id), token, None)
+        token = cache.get(_version_key(hub_id), token)
+    return token
+
+
+def load_snapshot(hub_id, version=None, with_ids=False):
+    """Stream a hub's live transactions (of live accounts) into a ``Snapshot``."""
+    fields = ('amount', 'date', 'account_id', 'payee_id', 'category', 'is_reconciled')
+    rows = BankTransaction.objects.filter(
+        hub_id=hub_id, is_deleted=False, account__is_deleted=False,
+    ).order_by('date', 'seq').values_list(
+        *(('id',) + fields if with_ids else fields),
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    return Snapshot.from_rows(rows, version, with_ids)
+
+
+def get_snapshot(hub_id):
+    """The hub's current ``Snapshot``, loaded again only after a write."""
+    token = version(hub_id)
+    snapshot = _snapshots.get(hub_id)
+    if snapshot is None or snapshot.version != token:
+        snapshot = load_snapshot(hub_id, token)
+        _snapshots[hub_id] = snapshot
+    _snapshots.move_to_end(hub_id)
+    while len(_snapshots) > SNAPSHOT_CACHE_HUBS:
+        _snapshots.popitem(last=False)
+    return snapshot
+
+
+def invalidate(hub_id):
+    """Mark a hub's snapshots stale in every process."""
+    if hub_id:
+        _cache().set(_version_key(hub_id), uuid.uuid4().hex, None)
@@ -9,4 +9,4 @@ class BankSyncConfig(AppConfig):
     verbose_name = _('Bank Reconciliation')
 
     def ready(self):
-        pass
+        from . import signals  # noqa: F401
@@ -0,0 +1,142 @@
+"""
+Running balance (``BankTransaction.balance_after``) recomputation.
+
+``balance_after`` is derived, never typed in: it is the account's
+``opening_balance`` plus every non-deleted amount up to and including the
+row, in ``(date, seq, id)`` order. After any mutation, ``recompute_balances``
+rewrites it from the earliest affected date forward with one set-based
+statement::
+
+    UPDATE tx SET balance_after = r.running
+    FROM (SELECT id, base + SUM(amount) OVER (ORDER BY date, seq, id) AS running
+          FROM tx WHERE account = ... AND date >= since) r
+    WHERE tx.id = r.id AND tx.balance_after <> r.running
+
+``base`` (the balance before ``since``) comes from the daily balance rollup,
+so a tail edit on a million-row account only reads and writes the tail. Rows
+whose balance is already right are not rewritten. ``BankAccount.balance`` is
+then synced to the last row and the account's cached forecast dropped.
+"""
+from django.db import connections, transaction
+from django.db.models import F, Max, Sum
+
+from . import forecast
+from .models import BankAccount, BankAccountDailyBalance, BankTransaction
+from .rollups import ZERO, as_date, refresh_daily_balances
+
+TX_TABLE = BankTransaction._meta.db_table
+
+_RUNNING = (
+    'SELECT id, ROUND(%s + SUM(amount) OVER ('
+    'ORDER BY date, seq, id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW), 2) AS running '
+    f'FROM {TX_TABLE} '
+    'WHERE hub_id = %s AND is_deleted = %s AND account_id = %s AND date >= %s'
+)
+
+UPDATE_FROM_SQL = (
+    f'UPDATE {TX_TABLE} SET balance_after = r.running FROM ({_RUNNING}) r '
+    f'WHERE {TX_TABLE}.id = r.id AND {TX_TABLE}.balance_after <> r.running'
+)
+
+UPDATE_JOIN_SQL = (
+    f'UPDATE {TX_TABLE} t JOIN ({_RUNNING}) r ON t.id = r.id '
+    'SET t.balance_after = r.running WHERE t.balance_after <> r.running'
+)
+
+
+def _uuid_param(value, connection):
+    # Raw SQL bypasses field preparation: SQLite stores UUIDs as 32-char hex.
+    return BankTransaction._meta.pk.get_db_prep_value(value, connection)
+
+
+def next_seq(account_id):
+    """``seq`` for the next row appended to an account."""
+    current = BankTransaction.all_objects.filter(account_id=account_id).aggregate(top=Max('seq'))['top']
+    return (current or 0) + 1
+
+
+def balance_before(account, since):
+    """Balance at the end of the day before ``since``."""
+    closing = BankAccountDailyBalance.objects.filter(
+        account_id=account.pk, day__lt=since,
+    ).order_by('-day').values_list('closing', flat=True).first()
+    if closing is not None:
+        return closing
+    # No rollup row before ``since``: either no earlier transactions or a
+    # rollup that was never built; the aggregate answers both correctly.
+    earlier = BankTransaction.objects.filter(
+        hub_id=account.hub_id, account_id=account.pk, date__lt=since,
+    ).aggregate(total=Sum('amount'))['total'] or ZERO
+    return account.opening_balance + earlier
+
+
+def recompute_balances(account_id, since=None):
+    """
+    Rewrite ``balance_after`` of ``account_id`` from ``since`` (a date; ``None``
+    for the whole history) and sync ``BankAccount.balance``. Returns the
+    number of rows rewritten.
+
+    Call it after ``rollups.refresh_daily_balances`` for the same change so
+    the base balance read from the rollup is current.
+    """
+    account = BankAccount.all_objects.filter(pk=account_id).first()
+    if account is None:
+        return 0
+    if since is None:
+        first = BankTransaction.objects.filter(account_id=account.pk).order_by('date').values_list('date', flat=True).first()
+        base, since = account.opening_balance, first
+    else:
+        base = balance_before(account, since)
+
+    updated = 0
+    with transaction.atomic():
+        if since is not None:
+            connection = connections[BankTransaction.objects.db]
+            sql = UPDATE_JOIN_SQL if connection.vendor == 'mysql' else UPDATE_FROM_SQL
+            params = [
+                connection.ops.adapt_decimalfield_value(base),
+                _uuid_param(account.hub_id, connection),
+                False,
+                _uuid_param(account.pk, connection),
+                connection.ops.adapt_datefield_value(since),
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                updated = cursor.rowcount
+        last = BankTransaction.objects.filter(
+            hub_id=account.hub_id, account_id=account.pk,
+        ).order_by('-date', '-seq', '-id').values_list('balance_after', flat=True).first()
+        balance = account.opening_balance if last is None else last
+        BankAccount.all_objects.filter(pk=account.pk).exclude(balance=balance).update(balance=balance)
+    forecast.invalidate(account.pk)
+    return max(updated, 0)
+
+
+def apply_changes(account_id, days):
+    """Refresh the rollup for ``days`` and recompute running balances from the earliest one."""
+    days = {as_date(d) for d in days if d}
+    days.discard(None)
+    if not account_id or not days:
+        return
+    refresh_daily_balances(account_id, days)
+    recompute_balances(account_id, since=min(days))
+
+
+def apply_affected(affected):
+    """``apply_changes`` for a ``rollups.affected_days`` mapping."""
+    for account_id, days in affected.items():
+        apply_changes(account_id, days)
+
+
+def shift_opening_balance(account_id, delta):
+    """
+    Re-derive an account's history after its ``opening_balance`` moved by
+    ``delta`` (a manual balance correction): every rollup day shifts by the
+    same amount in one UPDATE, then running balances are recomputed.
+    """
+    if not delta:
+        return
+    BankAccountDailyBalance.objects.filter(account_id=account_id).update(
+        opening=F('opening') + delta, closing=F('closing') + delta,
+    )
+    recompute_balances(account_id)
@@ -0,0 +1,77 @@
+"""
+Shared helpers for the bank_sync benchmarks.
+
+Benchmarks are plain scripts: ``python benchmarks/bench_<name>.py --help``.
+The ones that touch the database need the hub's settings, e.g.
+``DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_import.py --db``.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Make ``import bank_sync`` work when run from a checkout inside the modules dir.
+MODULES_DIR = Path(os.path.abspath(__file__)).parents[2]
+if str(MODULES_DIR) not in sys.path:
+    sys.path.insert(0, str(MODULES_DIR))
+
+
+def setup_django():
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        sys.exit('Set DJANGO_SETTINGS_MODULE to the hub settings to run database benchmarks.')
+    import django
+    django.setup()
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'p50': statistics.median(samples),
+        'p95': percentile(samples, 95),
+        'max': max(samples),
+    }
+
+
+PAYEES = [
+    'MERCADONA', 'IBERDROLA CLIENTES', 'AMAZON EU SARL', 'TELEFONICA DE ESPANA',
+    'NOMINA ACME SL', 'AYUNTAMIENTO MADRID', 'REPSOL ESTACION', 'SEGUROS MAPFRE',
+    'TRANSFERENCIA CLIENTE', 'COMISION MANTENIMIENTO',
+]
+
+
+def synthetic_lines(rows, seed=42, start=date(2026, 1, 1)):
+    """Yield ``(date, amount_str, description, reference)`` tuples."""
+    rnd = random.Random(seed)
+    for i in range(rows):
+        payee = rnd.choice(PAYEES)
+        cents = rnd.randint(-250000, 400000)
+        yield (
+            start + timedelta(days=i * 365 // max(rows, 1)),
+            f'{cents / 100:.2f}',
+            f'{payee} REF {rnd.randint(1000, 999999)}',
+            f'R{i:09d}',
+        )
+
+
+def report(title, rows):
+    print(title)
+    width = max(len(k) for k, _ in rows)
+    for key, value in rows:
+        print(f'  {key.ljust(width)}  {value}')
@@ -0,0 +1,66 @@
+"""
+Columnar analytics snapshot: size and helper speed.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_analytics.py --rows 1000000
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_analytics.py --hub <uuid>
+
+Builds a ``Snapshot`` from synthetic rows (or streams a hub's transactions
+with ``--hub``), reports its memory per row and times the group-by, daily
+series and rolling window helpers. ``--pure`` forces the plain Python path
+when numpy is installed.
+"""
+import argparse
+import random
+
+from _common import Timer, report, setup_django, synthetic_lines
+
+
+def synthetic_rows(rows, accounts=5, categories=('', 'fuel', 'rent', 'payroll', 'utilities')):
+    rnd = random.Random(3)
+    account_ids = [f'account-{n}' for n in range(accounts)]
+    for day, amount, description, _ in synthetic_lines(rows):
+        cents = round(float(amount) * 100)
+        yield cents, day, rnd.choice(account_ids), description.split(' REF ')[0], rnd.choice(categories), rnd.random() < 0.6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--hub', help='load this hub from the database instead of synthetic rows')
+    parser.add_argument('--pure', action='store_true', help='do not use numpy')
+    args = parser.parse_args()
+
+    setup_django()
+    from bank_sync import analytics
+
+    if args.pure:
+        analytics.np = None
+    with Timer() as load:
+        if args.hub:
+            snapshot = analytics.load_snapshot(args.hub)
+        else:
+            snapshot = analytics.Snapshot.from_rows(synthetic_rows(args.rows))
+    rows = max(len(snapshot), 1)
+    with Timer() as by_category:
+        analytics.group_sum(snapshot, 'category')
+    with Timer() as by_payee:
+        debits = snapshot.mask(sign=-1)
+        analytics.group_sum(snapshot, 'payee', debits)
+    with Timer() as by_month:
+        analytics.group_sum(snapshot, 'month')
+    with Timer() as window:
+        first, series = analytics.daily_series(snapshot)
+        analytics.rolling_sum(series, 30)
+    backend = 'numpy' if analytics.np is not None else 'pure Python'
+    report(f'{len(snapshot):,} rows, {len(snapshot.values["payee"]):,} payees ({backend})', [
+        ('load', f'{load.elapsed:.2f}s ({len(snapshot) / max(load.elapsed, 1e-9):,.0f} rows/s)'),
+        ('memory', f'{snapshot.nbytes / 2**20:.1f} MB ({snapshot.nbytes / rows:.1f} bytes/row)'),
+        ('group by category', f'{by_category.elapsed * 1000:.1f}ms'),
+        ('debits by payee', f'{by_payee.elapsed * 1000:.1f}ms'),
+        ('group by month', f'{by_month.elapsed * 1000:.1f}ms'),
+        ('daily series + 30-day window', f'{window.elapsed * 1000:.1f}ms over {len(series):,} days'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
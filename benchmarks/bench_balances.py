@@ -0,0 +1,81 @@
+"""
+Running balance recomputation on a large account.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_balances.py --account <uuid> --seed 1000000
+
+Seeds the account with synthetic transactions (one bulk insert, then a full
+rollup rebuild and recompute), then times ``balances.apply_changes`` after
+editing a row near the end, in the middle and at the start of the history.
+A tail edit should stay well under a second on a million rows: only the
+rows from the edited date forward are read and rewritten.
+"""
+import argparse
+from decimal import Decimal
+
+from _common import Timer, report, setup_django, synthetic_lines
+
+
+def seed(account, rows, batch_size=5000):
+    from bank_sync.balances import next_seq
+    from bank_sync.models import BankTransaction
+
+    start = next_seq(account.pk)
+    batch = []
+    for i, (booked, amount, description, reference) in enumerate(synthetic_lines(rows)):
+        batch.append(BankTransaction(
+            hub_id=account.hub_id, account_id=account.pk, date=booked, amount=Decimal(amount),
+            description=description, reference=reference, seq=start + i,
+        ))
+        if len(batch) >= batch_size:
+            BankTransaction.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        BankTransaction.objects.bulk_create(batch)
+
+
+def edit_and_apply(account, position):
+    from bank_sync.balances import apply_changes
+    from bank_sync.models import BankTransaction
+
+    qs = BankTransaction.objects.filter(account_id=account.pk).order_by('date', 'seq', 'id')
+    row = qs[max(int(qs.count() * position) - 1, 0)]
+    row.amount += Decimal('1.00')
+    row.save(update_fields=['amount'])
+    with Timer() as t:
+        apply_changes(account.pk, {row.date})
+    return row.date, t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--account', required=True, help='BankAccount UUID (use a scratch account)')
+    parser.add_argument('--seed', type=int, default=0, help='Insert this many synthetic rows first')
+    args = parser.parse_args()
+
+    setup_django()
+    from bank_sync.balances import recompute_balances
+    from bank_sync.models import BankAccount, BankTransaction
+    from bank_sync.rollups import rebuild_daily_balances
+
+    account = BankAccount.objects.get(pk=args.account)
+    lines = []
+    if args.seed:
+        with Timer() as t:
+            seed(account, args.seed)
+        lines.append(('seed insert', f'{args.seed:,} rows in {t.elapsed:.1f}s'))
+    with Timer() as t:
+        rebuild_daily_balances(account)
+    lines.append(('rollup rebuild', f'{t.elapsed:.2f}s'))
+    with Timer() as t:
+        rewritten = recompute_balances(account.pk)
+    lines.append(('full recompute', f'{rewritten:,} rows rewritten in {t.elapsed:.2f}s'))
+
+    lines.append(('rows in account', f'{BankTransaction.objects.filter(account_id=account.pk).count():,}'))
+    for label, position in (('tail edit (last row)', 1.0), ('edit at 99%', 0.99), ('edit at 50%', 0.5), ('edit at start', 0.0)):
+        day, elapsed = edit_and_apply(account, position)
+        lines.append((label, f'{elapsed * 1000:,.0f} ms (from {day})'))
+    report('running balances', lines)
+
+
+if __name__ == '__main__':
+    main()
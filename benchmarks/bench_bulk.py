@@ -0,0 +1,46 @@
+"""
+Bulk reconcile / unreconcile throughput.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_bulk.py --account <uuid> --rows 10000
+
+Seeds the account with ``--rows`` unreconciled synthetic transactions, then
+times ``bulk.bulk_update_transactions`` reconciling and unreconciling all of
+them (batched UPDATEs plus one audit row per change and the rollup refresh).
+10k rows should take well under a second each way.
+"""
+import argparse
+
+from _common import Timer, report, setup_django
+from bench_balances import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--account', required=True, help='BankAccount UUID (use a scratch account)')
+    parser.add_argument('--rows', type=int, default=10000, help='Synthetic rows to seed first (0 = use existing)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from bank_sync.bulk import bulk_update_transactions
+    from bank_sync.models import BankAccount, BankTransaction, ReconciliationAuditEntry
+
+    account = BankAccount.objects.get(pk=args.account)
+    if args.rows:
+        seed(account, args.rows)
+    qs = BankTransaction.objects.filter(account_id=account.pk, is_deleted=False)
+    total = qs.count()
+    lines = [('rows in account', f'{total:,}')]
+    audit_before = ReconciliationAuditEntry.objects.filter(transaction__account_id=account.pk).count()
+    for action in ('reconcile', 'unreconcile'):
+        with Timer() as t:
+            changed = bulk_update_transactions(qs, action, batch_size=args.batch_size)
+        rate = changed / t.elapsed if t.elapsed else 0
+        lines.append((action, f'{changed:,} rows in {t.elapsed * 1000:,.0f} ms ({rate:,.0f} rows/s)'))
+    audit = ReconciliationAuditEntry.objects.filter(transaction__account_id=account.pk).count() - audit_before
+    lines.append(('audit rows written', f'{audit:,}'))
+    report('bulk reconcile', lines)
+
+
+if __name__ == '__main__':
+    main()
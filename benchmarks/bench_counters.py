@@ -0,0 +1,61 @@
+"""
+Dashboard counters: recomputed vs cached.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_counters.py --hub <uuid>
+
+Times ``counters.compute`` (the two aggregate queries a cache miss runs)
+against ``counters.get_counters`` on a warm cache, then a read-after-write
+loop (one transaction saved between reads, applied as a signal delta) and
+reports the hit rate it reached.
+"""
+import argparse
+from decimal import Decimal
+
+from _common import Timer, report, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hub', required=True, help='hub_id to count')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from bank_sync import counters
+    from bank_sync.models import BankTransaction
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.repeat):
+            with Timer() as t:
+                fn()
+            samples.append(t.elapsed * 1000)
+        return summarize(samples)
+
+    counters.invalidate(args.hub)
+    counters.reset_stats()
+    miss = timed(lambda: counters.compute(args.hub))
+    hit = timed(lambda: counters.get_counters(args.hub))
+
+    row = BankTransaction.objects.filter(hub_id=args.hub, is_deleted=False).first()
+    counters.reset_stats()
+    if row is not None:
+        original = row.amount
+        for i in range(args.repeat):
+            row.amount = original + Decimal(i % 2)
+            row.save(update_fields=['amount'])
+            counters.get_counters(args.hub)
+        row.amount = original
+        row.save(update_fields=['amount'])
+    stats = counters.stats()
+
+    totals = counters.get_counters(args.hub)
+    lines = [('transactions', f"{totals['transactions']:,}")]
+    for label, s in (('recompute (miss)', miss), ('cached (hit)', hit)):
+        lines.append((label, f"p50 {s['p50']:.3f} ms  p95 {s['p95']:.3f} ms  max {s['max']:.3f} ms"))
+    lines.append(('hit rate, write between reads', f"{stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)"))
+    report('hub counters', lines)
+
+
+if __name__ == '__main__':
+    main()
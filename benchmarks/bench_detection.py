@@ -0,0 +1,89 @@
+"""
+Duplicate and anomaly detection passes over a large history.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_detection.py --rows 2000000
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_detection.py --hub <uuid>
+
+Builds a ``Snapshot`` from synthetic rows with re-issued lines (same account
+and amount a day later, reworded description) and price jumps injected
+(or streams a hub ``--hub``), then times the duplicate candidate sort, the
+description check of the candidates and the per-payee anomaly pass. Nothing
+is written. ``--pure`` forces the plain Python sort when numpy is installed.
+"""
+import argparse
+import random
+import uuid
+from datetime import timedelta
+
+from _common import PAYEES, Timer, report, setup_django, synthetic_lines
+
+
+def synthetic_rows(rows, accounts=5, duplicate_every=1000, anomaly_every=5000):
+    """``(row, description)`` pairs in date order; returns the injected counts too."""
+    rnd = random.Random(5)
+    account_ids = [f'account-{n}' for n in range(accounts)]
+    prices = {payee: rnd.randint(-20000, -500) for payee in PAYEES}
+    out = []
+    injected = {'duplicates': 0, 'anomalies': 0}
+    for i, (day, _, description, _) in enumerate(synthetic_lines(rows)):
+        payee = description.split(' REF ')[0]
+        cents = prices[payee] + rnd.randint(-50, 50)
+        if i and i % anomaly_every == 0:
+            cents *= 10
+            injected['anomalies'] += 1
+        row = (uuid.uuid4(), cents, day, rnd.choice(account_ids), payee, '', False)
+        out.append((row, description))
+        if i and i % duplicate_every == 0:
+            out.append(((uuid.uuid4(), cents, day + timedelta(days=1), row[3], payee, '', False),
+                        description.replace(' REF ', ' REFERENCIA ')))
+            injected['duplicates'] += 1
+    out.sort(key=lambda pair: pair[0][2])
+    return out, injected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--hub', help='load this hub from the database instead of synthetic rows')
+    parser.add_argument('--pure', action='store_true', help='do not use numpy')
+    args = parser.parse_args()
+
+    setup_django()
+    from bank_sync import analytics, detection
+    from bank_sync.normalize import normalize_text
+
+    if args.pure:
+        analytics.np = detection.np = None
+    injected = None
+    with Timer() as load:
+        if args.hub:
+            snapshot = analytics.load_snapshot(args.hub, with_ids=True)
+            texts = None
+        else:
+            rows, injected = synthetic_rows(args.rows)
+            snapshot = analytics.Snapshot.from_rows((row for row, _ in rows), with_ids=True)
+            texts = [normalize_text(description) for _, description in rows]
+    with Timer() as sort:
+        pairs = detection.duplicate_candidates(snapshot)
+    with Timer() as similarity:
+        if texts is None:
+            texts = detection._search_texts(snapshot, pairs)
+        duplicates = len(detection.confirm_duplicates(pairs, texts))
+    with Timer() as welford:
+        anomalies = detection.amount_anomalies(snapshot)
+    passes = sort.elapsed + similarity.elapsed + welford.elapsed
+    backend = 'numpy' if detection.np is not None else 'pure Python'
+    lines = [
+        ('load', f'{load.elapsed:.2f}s'),
+        ('duplicate sort', f'{sort.elapsed:.2f}s, {len(pairs):,} candidates'),
+        ('description check', f'{similarity.elapsed:.2f}s, {duplicates:,} duplicates'),
+        ('anomaly pass', f'{welford.elapsed:.2f}s, {len(anomalies):,} anomalies'),
+        ('total', f'{passes:.2f}s ({len(snapshot) / max(passes, 1e-9):,.0f} rows/s)'),
+    ]
+    if injected:
+        lines.append(('injected', f'{injected["duplicates"]:,} duplicates, {injected["anomalies"]:,} anomalies'))
+    report(f'{len(snapshot):,} rows ({backend})', lines)
+
+
+if __name__ == '__main__':
+    main()
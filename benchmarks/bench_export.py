@@ -0,0 +1,95 @@
+"""
+Export writers: throughput and peak RSS against row count.
+
+    python benchmarks/bench_export.py --rows 10000 100000 500000
+    python benchmarks/bench_export.py --rows 100000 --db --hub <uuid>
+
+Each measurement runs in a fresh subprocess so ``ru_maxrss`` (the process
+high-water mark) belongs to that run alone. ``baseline`` is the peak RSS of a
+subprocess that only imports the writers; a streaming writer should stay
+close to it whatever the row count. Without ``--db`` synthetic tuples are fed
+straight to the writers; with ``--db`` the hub's transactions are streamed
+through the same ``values_list().iterator()`` query the export view uses.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+
+from _common import Timer, report, setup_django, synthetic_lines
+
+
+def _rows(count):
+    for booked, amount, description, reference in synthetic_lines(count):
+        yield reference, description[:20], False, None, amount, booked
+
+
+def _db_rows(hub_id, limit):
+    from bank_sync.models import BankTransaction
+    from bank_sync.views import EXPORT_CHUNK_SIZE
+
+    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False).order_by('date', 'pk')[:limit]
+    columns = ['reference', 'account__name', 'is_reconciled', 'balance_after', 'amount', 'date']
+    return qs.values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def run_one(fmt, rows, hub_id):
+    from bank_sync.exports import WRITERS
+
+    if hub_id:
+        setup_django()
+        source = _db_rows(hub_id, rows)
+    else:
+        source = _rows(rows)
+    writer = WRITERS[fmt][0]
+    size = 0
+    with Timer() as t:
+        if rows:
+            for chunk in writer(['Reference', 'Account', 'Reconciled', 'Balance', 'Amount', 'Date'], source):
+                size += len(chunk)
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_kib //= 1024
+    print(json.dumps({'elapsed': t.elapsed, 'bytes': size, 'peak_kib': peak_kib}))
+
+
+def measure(fmt, rows, hub_id):
+    cmd = [sys.executable, __file__, '--child', fmt, str(rows)]
+    if hub_id:
+        cmd += ['--hub', hub_id]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    parser.add_argument('--formats', nargs='+', choices=['csv', 'excel'], default=['csv', 'excel'])
+    parser.add_argument('--db', action='store_true', help='Stream rows from the database')
+    parser.add_argument('--hub', help='hub_id for --db runs')
+    parser.add_argument('--child', nargs=2, metavar=('FORMAT', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child[0], int(args.child[1]), args.hub)
+        return
+    if args.db and not args.hub:
+        parser.error('--db needs --hub')
+    hub_id = args.hub if args.db else None
+
+    for fmt in args.formats:
+        baseline = measure(fmt, 0, None)['peak_kib']
+        lines = [('baseline RSS', f'{baseline / 1024:,.1f} MiB')]
+        for rows in args.rows:
+            result = measure(fmt, rows, hub_id)
+            lines.append((
+                f'{rows:,} rows',
+                f'{result["bytes"] / 1e6:,.1f} MB in {result["elapsed"]:.2f}s, '
+                f'{rows / result["elapsed"]:,.0f} rows/s, peak RSS {result["peak_kib"] / 1024:,.1f} MiB',
+            ))
+        report(f'{fmt} export', lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Recurring-series detection and 90-day projection speed.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_forecast.py --rows 1000000 --accounts 20
+
+Builds a ``Snapshot`` of synthetic history: monthly and weekly series mixed
+with irregular card payments over two years, spread across ``--accounts``.
+It then times what a cold dashboard pays per account: the account mask,
+``detect_recurring`` and ``project``. ``--pure`` forces the plain Python
+path when numpy is installed.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from _common import Timer, report, setup_django
+
+
+def synthetic_rows(rows, accounts, today):
+    rnd = random.Random(11)
+    start = today - timedelta(days=730)
+    out = []
+    for account in range(accounts):
+        for payee in range(12):
+            step, cents = rnd.choice([(7, -rnd.randint(500, 3000)), (30, -rnd.randint(2000, 150000)), (30, 250000)])
+            day = start + timedelta(days=rnd.randint(0, step))
+            while day <= today:
+                out.append((cents + rnd.randint(-100, 100), day, f'account-{account}', f'series-{account}-{payee}'))
+                day += timedelta(days=step)
+    while len(out) < rows:
+        out.append((-rnd.randint(100, 20000), start + timedelta(days=rnd.randint(0, 730)),
+                    f'account-{rnd.randrange(accounts)}', f'shop-{rnd.randrange(5000)}'))
+    out.sort(key=lambda row: row[1])
+    return [(cents, day, account, payee, '', False) for cents, day, account, payee in out]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--pure', action='store_true', help='do not use numpy')
+    args = parser.parse_args()
+
+    setup_django()
+    from bank_sync import analytics, forecast
+
+    if args.pure:
+        analytics.np = forecast.np = None
+    today = date(2026, 10, 1)
+    snapshot = analytics.Snapshot.from_rows(synthetic_rows(args.rows, args.accounts, today))
+    series = 0
+    with Timer() as total:
+        for account in range(args.accounts):
+            found = forecast.detect_recurring(snapshot, snapshot.mask(account_id=f'account-{account}'), today)
+            forecast.project(0, found, today)
+            series += len(found)
+    backend = 'numpy' if forecast.np is not None else 'pure Python'
+    report(f'{len(snapshot):,} rows, {args.accounts} accounts ({backend})', [
+        ('series found', f'{series:,} (of {args.accounts * 12:,} generated)'),
+        ('all accounts', f'{total.elapsed:.2f}s'),
+        ('per account', f'{total.elapsed / args.accounts * 1000:.1f}ms'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Statement import throughput (rows per second) and peak parser memory.
+
+    python benchmarks/bench_import.py --rows 50000 200000 500000
+    python benchmarks/bench_import.py --rows 200000 --db --account <uuid>
+
+Without ``--db`` only parsing and validation are measured; with ``--db`` the
+full ``import_statement`` pipeline (bulk inserts included) runs against the
+configured database.
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+from _common import Timer, report, setup_django, synthetic_lines
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write('date,description,amount,reference\n')
+        for booked, amount, description, reference in synthetic_lines(rows):
+            fh.write(f'{booked.isoformat()},{description},{amount},{reference}\n')
+
+
+def write_camt053(path, rows):
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>\n')
+        for booked, amount, description, reference in synthetic_lines(rows):
+            indicator = 'DBIT' if amount.startswith('-') else 'CRDT'
+            fh.write(
+                f'<Ntry><Amt Ccy="EUR">{amount.lstrip("-")}</Amt><CdtDbtInd>{indicator}</CdtDbtInd>'
+                f'<BookgDt><Dt>{booked.isoformat()}</Dt></BookgDt><AcctSvcrRef>{reference}</AcctSvcrRef>'
+                f'<AddtlNtryInf>{description}</AddtlNtryInf></Ntry>\n'
+            )
+        fh.write('</Stmt></BkToCstmrStmt></Document>\n')
+
+
+def write_ofx(path, rows):
+    with open(path, 'w', encoding='latin-1') as fh:
+        fh.write('OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n')
+        for booked, amount, description, reference in synthetic_lines(rows):
+            fh.write(
+                f'<STMTTRN>\n<TRNTYPE>OTHER\n<DTPOSTED>{booked:%Y%m%d}\n<TRNAMT>{amount}\n'
+                f'<FITID>{reference}\n<NAME>{description}\n</STMTTRN>\n'
+            )
+        fh.write('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+
+
+WRITERS = {'csv': write_csv, 'camt053': write_camt053, 'ofx': write_ofx}
+
+
+def _consume(path, fmt):
+    from bank_sync.parsers import clean_line, parse_statement
+
+    count = 0
+    with open(path, 'rb') as fh:
+        for line in parse_statement(fh, fmt):
+            clean_line(line)
+            count += 1
+    return count
+
+
+def bench_parse(path, fmt):
+    with Timer() as t:
+        count = _consume(path, fmt)
+    # Memory is measured on a second pass: tracemalloc slows parsing several-fold.
+    tracemalloc.start()
+    _consume(path, fmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, t.elapsed, peak
+
+
+def bench_db(path, fmt, account_id, batch_size):
+    from bank_sync.importers import import_statement
+    from bank_sync.models import BankAccount
+
+    account = BankAccount.objects.get(pk=account_id)
+    with open(path, 'rb') as fh:
+        return import_statement(account, fh, fmt, batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[50_000, 200_000])
+    parser.add_argument('--formats', nargs='+', choices=sorted(WRITERS), default=sorted(WRITERS))
+    parser.add_argument('--db', action='store_true', help='Run the full import against the database')
+    parser.add_argument('--account', help='BankAccount UUID for --db runs')
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.db:
+        if not args.account:
+            parser.error('--db needs --account')
+        setup_django()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            for rows in args.rows:
+                path = os.path.join(tmp, f'statement-{rows}.{fmt}')
+                WRITERS[fmt](path, rows)
+                count, elapsed, peak = bench_parse(path, fmt)
+                lines = [
+                    ('file size', f'{os.path.getsize(path) / 1e6:.1f} MB'),
+                    ('parse+validate', f'{count / elapsed:,.0f} rows/s'),
+                    ('peak parser memory', f'{peak / 1024:,.0f} KiB'),
+                ]
+                if args.db:
+                    result = bench_db(path, fmt, args.account, args.batch_size)
+                    lines.append(('full import', f'{result.rows_per_second:,.0f} rows/s ({result.elapsed:.1f}s)'))
+                report(f'{fmt} x {rows:,} rows', lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Auto-reconciliation matching throughput.
+
+    python benchmarks/bench_matching.py --transactions 100000 --documents 100000
+
+Runs the pure matching stages (index build, one-to-one scoring and assignment,
+then the subset-sum passes over the leftovers) on synthetic data, so it needs
+no database.
+"""
+import argparse
+import random
+
+from _common import Timer, report
+
+
+def synthetic(transactions, documents, seed=7):
+    from bank_sync.matching import Document, TransactionLine
+
+    rnd = random.Random(seed)
+    base = 739000
+    parties = [f'PARTY{n:05d} SL' for n in range(max(documents // 20, 10))]
+    docs = []
+    for i in range(documents):
+        cents = rnd.randint(1000, 500000) * rnd.choice((1, -1))
+        docs.append(Document('invoice' if cents > 0 else 'expense', str(i), cents,
+                             base + rnd.randint(0, 365), f'F{i:07d}', rnd.choice(parties)))
+    lines = []
+    for i in range(transactions):
+        roll = rnd.random()
+        if i < len(docs) and roll < 0.7:
+            doc = docs[i]
+            lines.append(TransactionLine(i, doc.cents, doc.day + rnd.randint(0, 5), f'{doc.counterparty} {doc.reference}'))
+        elif 0 < i < len(docs) and roll < 0.75:
+            # Split settlement: one transfer paying this document and the previous one.
+            first, second = docs[i - 1], docs[i]
+            docs[i] = second = second._replace(cents=abs(second.cents) * (1 if first.cents > 0 else -1),
+                                               counterparty=first.counterparty)
+            lines.append(TransactionLine(i, first.cents + second.cents, max(first.day, second.day) + 3,
+                                         f'TRANSFER {first.counterparty}'))
+        else:
+            lines.append(TransactionLine(i, rnd.randint(-500000, 500000), base + rnd.randint(0, 365),
+                                         f'TRANSFER {rnd.choice(parties)}'))
+    return lines, docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=100_000)
+    parser.add_argument('--documents', type=int, default=100_000)
+    parser.add_argument('--window', type=int, default=10)
+    args = parser.parse_args()
+
+    from bank_sync.matching import CandidateIndex, match_many_to_one, match_one_to_many, match_transactions
+
+    lines, docs = synthetic(args.transactions, args.documents)
+    with Timer() as build:
+        index = CandidateIndex(docs)
+    with Timer() as run:
+        matches = match_transactions(lines, index, window=args.window)
+    matched_tx = {m.transaction_id for m in matches}
+    matched_docs = {m.document.id for m in matches}
+    open_lines = [t for t in lines if t.id not in matched_tx]
+    open_docs = [d for d in docs if d.id not in matched_docs]
+    with Timer() as split:
+        splits = match_many_to_one(open_lines, open_docs) + match_one_to_many(open_lines, open_docs)
+    report(f'{args.transactions:,} transactions x {args.documents:,} documents', [
+        ('index build', f'{build.elapsed:.2f}s'),
+        ('matching', f'{run.elapsed:.2f}s ({args.transactions / run.elapsed:,.0f} tx/s)'),
+        ('matched', f'{len(matches):,}'),
+        ('split passes', f'{split.elapsed:.2f}s over {len(open_lines):,} x {len(open_docs):,} leftovers'),
+        ('split links', f'{len(splits):,}'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Categorization rule throughput.
+
+    python benchmarks/bench_rules.py --rows 200000 --rules 500 [--naive]
+
+Compiles a synthetic rule set (mostly ``contains`` literals, some regexes,
+some amount-only rules) into a ``RuleSet`` and runs it over synthetic
+statement lines. ``--naive`` also times testing every rule against every line,
+the cost the compiled set avoids (every rule is tested either way, since
+all matches contribute tags). Needs no database.
+"""
+import argparse
+import random
+
+from _common import PAYEES, Timer, report, synthetic_lines
+
+
+def synthetic_rules(count, seed=11):
+    from bank_sync.rules import MATCH_CONTAINS, MATCH_REGEX, Rule
+
+    rnd = random.Random(seed)
+    rules = []
+    for i in range(count):
+        roll = rnd.random()
+        if i < len(PAYEES):
+            rule = Rule(i, i, MATCH_CONTAINS, PAYEES[i].split()[0], None, None, None, '', f'cat{i}', (f'tag{i}',))
+        elif roll < 0.8:
+            rule = Rule(i, 100 + i, MATCH_CONTAINS, f'merchant {i:05d}', None, None, None, '', f'cat{i}', ())
+        elif roll < 0.95:
+            rule = Rule(i, 100 + i, MATCH_REGEX, rf'\bINV-{i:04d}-\d+', None, None, None, '', f'cat{i}', ())
+        else:
+            low = rnd.randint(-250000, 0)
+            rule = Rule(i, 100 + i, MATCH_CONTAINS, '', low, low + 5000, None, '', '', (f'band{i}',))
+        rules.append(rule)
+    return rules
+
+
+def naive_matcher(rules):
+    """Rule-by-rule matching, with literals normalised and regexes compiled up front."""
+    from bank_sync.normalize import normalize_text
+    from bank_sync.rules import MATCH_REGEX, compile_pattern
+
+    prepared = [
+        (rule, compile_pattern(rule.pattern).search if rule.match_type == MATCH_REGEX and rule.pattern else None,
+         normalize_text(rule.pattern))
+        for rule in rules
+    ]
+
+    def match(search_text, description, cents):
+        matched = []
+        for rule, regex, literal in prepared:
+            if regex is not None:
+                if not regex(description):
+                    continue
+            elif literal and literal not in search_text:
+                continue
+            if rule.min_cents is not None and cents < rule.min_cents:
+                continue
+            if rule.max_cents is not None and cents > rule.max_cents:
+                continue
+            matched.append(rule)
+        return matched
+    return match
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--rules', type=int, default=500)
+    parser.add_argument('--naive', action='store_true', help='also time rule-by-rule matching')
+    args = parser.parse_args()
+
+    from bank_sync.normalize import search_document
+    from bank_sync.rules import RuleSet, ahocorasick
+
+    rules = synthetic_rules(args.rules)
+    lines = [(search_document(description, reference), description, round(float(amount) * 100))
+             for _, amount, description, reference in synthetic_lines(args.rows)]
+    with Timer() as compiled:
+        ruleset = RuleSet(rules)
+    with Timer() as run:
+        matched = sum(1 for line in lines if ruleset.match(*line) is not None)
+    rows = [
+        ('automaton', 'pyahocorasick' if ahocorasick else 'pure Python'),
+        ('compile', f'{compiled.elapsed * 1000:.1f}ms'),
+        ('match', f'{run.elapsed:.2f}s ({args.rows / run.elapsed:,.0f} rows/s)'),
+        ('matched', f'{matched:,}'),
+    ]
+    if args.naive:
+        naive_match = naive_matcher(ruleset.rules)
+        with Timer() as naive:
+            for line in lines:
+                naive_match(*line)
+        rows.append(('rule by rule', f'{naive.elapsed:.2f}s ({args.rows / naive.elapsed:,.0f} rows/s)'))
+    report(f'{args.rows:,} rows x {args.rules:,} rules', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Transaction search latency (p50/p95) against the configured database.
+
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_search.py --hub <uuid>
+    ... --hub <uuid> --seed-account <uuid> --seed 200000 --target-p95-ms 50
+
+Runs a mix of search-box queries (prefixes, several terms, amount/date
+filters) through ``search.apply_search`` and, for comparison, the old
+``icontains`` filter, fetching the first list page each time. Exits non-zero
+when the indexed p95 is above ``--target-p95-ms``.
+"""
+import argparse
+import sys
+import time
+
+from _common import Timer, report, setup_django, summarize, synthetic_lines
+
+QUERIES = [
+    'merc', 'iberdrola', 'amazon eu', 'nomina acme', 'ref 12', 'segur',
+    'repsol amount:<0', 'transf date:2026-03', 'amount:>1000 date:2026-09', 'comision date:>=2026-06-01',
+]
+
+
+def seed(account_id, rows):
+    import io
+
+    from bank_sync.importers import import_statement
+    from bank_sync.models import BankAccount
+
+    account = BankAccount.objects.get(pk=account_id)
+    buffer = io.StringIO()
+    buffer.write('date,description,amount,reference\n')
+    stamp = int(time.time())
+    for booked, amount, description, reference in synthetic_lines(rows, seed=stamp):
+        buffer.write(f'{booked.isoformat()},{description},{amount},{reference}-{stamp}\n')
+    return import_statement(account, io.BytesIO(buffer.getvalue().encode()), 'csv')
+
+
+def run(qs_for, queries, repeat, per_page):
+    samples = []
+    for _ in range(repeat):
+        for text in queries:
+            with Timer() as t:
+                list(qs_for(text).order_by('-date', '-pk')[:per_page + 1])
+            samples.append(t.elapsed * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hub', required=True, help='hub_id to search')
+    parser.add_argument('--seed', type=int, default=0, help='Import this many synthetic rows first')
+    parser.add_argument('--seed-account', help='BankAccount UUID to seed into')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--per-page', type=int, default=12)
+    parser.add_argument('--target-p95-ms', type=float, default=50.0)
+    parser.add_argument('--skip-baseline', action='store_true', help='Do not time the icontains baseline')
+    args = parser.parse_args()
+    if args.seed and not args.seed_account:
+        parser.error('--seed needs --seed-account')
+
+    setup_django()
+    from django.db.models import Q
+
+    from bank_sync.models import BankTransaction
+    from bank_sync.search import apply_search
+
+    if args.seed:
+        result = seed(args.seed_account, args.seed)
+        print(f'seeded {result.rows_created:,} rows in {result.elapsed:.1f}s')
+
+    base = BankTransaction.objects.filter(hub_id=args.hub, is_deleted=False)
+    rows = base.count()
+
+    def indexed(text):
+        return apply_search(base, text)
+
+    def baseline(text):
+        words = [w for w in text.split() if ':' not in w]
+        qs = base
+        for word in words:
+            qs = qs.filter(Q(description__icontains=word) | Q(reference__icontains=word))
+        return qs
+
+    run(indexed, QUERIES, 1, args.per_page)  # warm up caches
+    lines = [('rows in hub', f'{rows:,}'), ('queries', f'{len(QUERIES)} x {args.repeat}')]
+    stats = summarize(run(indexed, QUERIES, args.repeat, args.per_page))
+    lines.append(('indexed', ', '.join(f'{k} {v:.1f} ms' for k, v in stats.items())))
+    if not args.skip_baseline:
+        slow = summarize(run(baseline, QUERIES, max(args.repeat // 4, 1), args.per_page))
+        lines.append(('icontains', ', '.join(f'{k} {v:.1f} ms' for k, v in slow.items())))
+    report('transaction search', lines)
+
+    if stats['p95'] > args.target_p95_ms:
+        sys.exit(f'p95 {stats["p95"]:.1f} ms is above the {args.target_p95_ms:.0f} ms target')
+
+
+if __name__ == '__main__':
+    main()
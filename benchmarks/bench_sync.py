@@ -0,0 +1,115 @@
+"""
+Bank feed sync against the local mock PSD2 bank.
+
+    python benchmarks/bench_sync.py --accounts 2000 --latency 0.02 --concurrency 8 32 128
+    DJANGO_SETTINGS_MODULE=config.settings python benchmarks/bench_sync.py --db --hub <uuid> --accounts 2000
+
+Starts ``mockbank`` in-process with ``--latency`` seconds per request. Without
+``--db`` only the network side is measured: every account is paged through
+the PSD2 provider with a per-provider semaphore of each ``--concurrency``
+value, using the same retry loop as the worker. With ``--db`` the accounts
+are discovered into ``--hub`` (use a scratch hub) and synced end to end with
+``sync.sync_accounts``; then the bank books nothing (every account should
+answer 304) and then ``--grow`` new transactions per account, to confirm a
+nightly run fetches and writes only the delta.
+"""
+import argparse
+import asyncio
+
+from _common import Timer, report, setup_django, summarize
+
+
+async def fetch_all(base_url, concurrency, failure_rate):
+    from bank_sync.providers import open_provider, with_retries
+
+    provider = open_provider('psd2', base_url, max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    retries = []
+    accounts = await with_retries(provider.fetch_accounts)
+
+    async def one(account):
+        rows, cursor, page = 0, None, None
+        async with semaphore:
+            with Timer() as t:
+                while True:
+                    fetched = await with_retries(
+                        lambda: provider.fetch_transactions(account.external_id, cursor, page),
+                        on_retry=retries.append,
+                    )
+                    rows += len(fetched.lines)
+                    cursor, page = fetched.cursor, fetched.next_page
+                    if not page:
+                        break
+        return rows, t.elapsed * 1000
+
+    try:
+        with Timer() as t:
+            results = await asyncio.gather(*[one(a) for a in accounts])
+    finally:
+        await provider.aclose()
+    connections = getattr(provider.client, 'connections_opened', None)
+    return len(accounts), sum(r for r, _ in results), [ms for _, ms in results], t.elapsed, len(retries), connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--transactions', type=int, default=200, help='Transactions per account')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock bank seconds per request')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 128])
+    parser.add_argument('--db', action='store_true', help='Sync end to end into the database')
+    parser.add_argument('--hub', help='Scratch hub_id for --db')
+    parser.add_argument('--grow', type=int, default=3, help='New transactions per account before the last --db run')
+    args = parser.parse_args()
+    if args.db and not args.hub:
+        parser.error('--db needs --hub')
+
+    from bank_sync.mockbank import MockBank, start_in_thread
+
+    bank = MockBank(accounts=args.accounts, transactions=args.transactions, page_size=args.page_size,
+                    latency=args.latency, failure_rate=args.failure_rate)
+    server = start_in_thread(bank)
+    pages = -(-args.transactions // args.page_size)
+    lines = [('mock bank', f'{args.accounts:,} accounts x {args.transactions} tx, {pages} pages, '
+                           f'{args.latency * 1000:.0f} ms/request, failure rate {args.failure_rate:.0%}')]
+    try:
+        if not args.db:
+            for concurrency in args.concurrency:
+                accounts, rows, samples, elapsed, retries, connections = asyncio.run(
+                    fetch_all(server.base_url, concurrency, args.failure_rate))
+                stats = summarize(samples)
+                lines.append((f'concurrency {concurrency}', (
+                    f'{accounts / elapsed:,.0f} accounts/s, {rows / elapsed:,.0f} rows/s, '
+                    f'{elapsed:.2f}s total, account p95 {stats["p95"]:.0f} ms, '
+                    f'{retries} retries, {connections if connections is not None else "?"} connections'
+                )))
+        else:
+            setup_django()
+            from bank_sync.models import BankAccount
+            from bank_sync.sync import discover_accounts, sync_accounts
+
+            config = {'base_url': server.base_url}
+            created = discover_accounts(args.hub, 'psd2', config)
+            accounts = BankAccount.objects.filter(hub_id=args.hub, provider='psd2', is_deleted=False)
+            lines.append(('accounts linked', f'{created:,} new, {accounts.count():,} total'))
+            concurrency = args.concurrency[-1]
+            for label, grow in (('initial sync', 0), ('nothing new', 0), (f'+{args.grow} per account', args.grow)):
+                bank.grow(grow)
+                result = sync_accounts(accounts, concurrency=concurrency, configs={'psd2': dict(config)})
+                stats = summarize([r.elapsed * 1000 for r in result.results])
+                lines.append((f'{label} (c={concurrency})', (
+                    f'{len(result.results) / result.elapsed:,.0f} accounts/s in {result.elapsed:.2f}s, '
+                    f'{result.rows_fetched:,} fetched / {result.rows_created:,} written, '
+                    f'{len(result.unchanged):,} unchanged, {result.requests:,} requests, '
+                    f'account p95 {stats["p95"]:.0f} ms, {len(result.failed)} failed'
+                )))
+    finally:
+        server.shutdown()
+    lines.append(('requests served', f'{bank.requests:,} ({bank.failures:,} failed on purpose)'))
+    report('bank feed sync', lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Set-based bulk actions on transactions.
+
+A bulk action applies to a queryset (the list's current search/filter, or a
+selection of ids) instead of a posted id list, so "select all 50k matching"
+is one request. The queryset is walked by primary key in batches of
+``BULK_BATCH_SIZE``; each batch is one ``UPDATE ... WHERE id IN (batch)`` in
+its own transaction, so no statement locks the whole table and the IN-list
+stays bounded. A filter that stops matching once a batch is updated (e.g.
+``reconciled:no`` while reconciling) is still walked to the end because the
+keyset moves past each batch.
+
+Rollups and running balances are refreshed once at the end for the days the
+action touched (see ``balances``). Reconcile and unreconcile write one
+``ReconciliationAuditEntry`` per changed row with ``bulk_create`` in the
+batch's transaction, all sharing the request's ``batch_id``. Delete soft-deletes the rows' reconciliation links with them.
+"""
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics, counters
+from .balances import apply_affected
+from .models import BankAccount, BankTransaction, ReconciliationAuditEntry, ReconciliationLink
+from .rollups import affected_days, refresh_affected
+
+BULK_BATCH_SIZE = 1000
+
+# Actions that change reconciliation state need ``bank_sync.reconcile_transaction``.
+RECONCILE_ACTIONS = ('reconcile', 'unreconcile')
+ACTIONS = ('delete', 'reconcile', 'unreconcile', 'assign_account', 'categorize')
+
+
+def batched_ids(qs, batch_size=BULK_BATCH_SIZE):
+    """Yield lists of primary keys of ``qs``, walking the pk index."""
+    ids = qs.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        batch = list((ids.filter(pk__gt=last) if last is not None else ids)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def _merge(into, affected):
+    for account_id, days in affected.items():
+        into[account_id] |= days
+
+
+def _reconcile_batch(ids, action, now, user_id, source, batch_id, deltas):
+    """
+    Flip the rows of ``ids`` whose state differs and audit them; returns the
+    count and adds the unreconciled count/amount change per hub to ``deltas``.
+    """
+    reconciled = action == 'reconcile'
+    changing = list(BankTransaction.objects.select_for_update().filter(
+        pk__in=ids, is_reconciled=not reconciled,
+    ).values_list('pk', 'hub_id', 'amount'))
+    if not changing:
+        return 0
+    changed_ids = [pk for pk, _, _ in changing]
+    sign = -1 if reconciled else 1
+    for _, hub_id, amount in changing:
+        deltas[hub_id][0] += sign
+        deltas[hub_id][1] += sign * amount
+    BankTransaction.objects.filter(pk__in=changed_ids).update(is_reconciled=reconciled, updated_at=now)
+    if not reconciled:
+        ReconciliationLink.objects.filter(transaction_id__in=changed_ids, is_deleted=False).update(
+            is_deleted=True, deleted_at=now,
+        )
+    ReconciliationAuditEntry.objects.bulk_create([
+        ReconciliationAuditEntry(hub_id=hub_id, transaction_id=pk, action=action, source=source,
+                                 batch_id=batch_id, created_by=user_id)
+        for pk, hub_id, _ in changing
+    ])
+    return len(changing)
+
+
+def bulk_update_transactions(qs, action, account=None, category='', user_id=None, source='bulk',
+                             batch_id=None, batch_size=BULK_BATCH_SIZE):
+    """
+    Apply ``action`` to every transaction in ``qs``; returns the rows changed.
+
+    ``assign_account`` moves rows to ``account`` and clears their import
+    fingerprint (it was computed for the old account). ``unreconcile`` also
+    removes the rows' reconciliation links, as the edit form does.
+    ``user_id``, ``source`` and ``batch_id`` go to the reconciliation audit
+    rows (a fresh ``batch_id`` is used when none is given).
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown bulk action: {action}')
+    if action == 'assign_account' and account is None:
+        raise ValueError('assign_account needs a target account')
+    now = timezone.now()
+    batch_id = batch_id or uuid.uuid4()
+    changed = 0
+    affected = defaultdict(set)
+    deltas = defaultdict(lambda: [0, 0])
+    hubs = set()
+    for ids in batched_ids(qs, batch_size):
+        batch = BankTransaction.objects.filter(pk__in=ids)
+        hubs.update(batch.order_by().values_list('hub_id', flat=True).distinct())
+        with transaction.atomic():
+            if action != 'categorize':
+                _merge(affected, affected_days(batch))
+            if action == 'delete':
+                changed += batch.update(is_deleted=True, deleted_at=now, updated_at=now)
+                ReconciliationLink.objects.filter(transaction_id__in=ids, is_deleted=False).update(
+                    is_deleted=True, deleted_at=now,
+                )
+            elif action in RECONCILE_ACTIONS:
+                changed += _reconcile_batch(ids, action, now, user_id, source, batch_id, deltas)
+            elif action == 'assign_account':
+                changed += batch.exclude(account_id=account.pk).update(
+                    account_id=account.pk, fingerprint='', updated_at=now,
+                )
+                _merge(affected, affected_days(batch))
+            else:
+                changed += batch.exclude(category=category).update(category=category, updated_at=now)
+
+    if action == 'delete' and changed:
+        # The unreconciled part of what was deleted is not known without another query.
+        for hub_id in set(BankAccount.all_objects.filter(pk__in=affected).values_list('hub_id', flat=True)):
+            counters.invalidate(hub_id)
+    for hub_id, (count, amount) in deltas.items():
+        counters.adjust(hub_id, unreconciled=count, unreconciled_amount=amount)
+    if changed:
+        for hub_id in hubs:
+            analytics.invalidate(hub_id)
+
+    if action in RECONCILE_ACTIONS:
+        # Amounts did not move: only the rollup's unreconciled counts change.
+        refresh_affected(affected)
+    elif affected:
+        apply_affected(affected)
+    return changed
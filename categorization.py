@@ -0,0 +1,128 @@
+"""
+Applying a hub's ``CategorizationRule`` rows to transactions.
+
+``load_rules`` compiles the hub's active rules into a ``rules.RuleSet`` (one
+pass per transaction, see ``rules``). Imports call ``categorize_rows`` on each
+chunk before ``bulk_create``, so new lines arrive categorised at no extra
+query. ``reapply_rules`` runs the rules over existing rows (the
+``categorize`` background job): rows are walked by primary key in batches,
+and each batch is written with one ``UPDATE`` per distinct (category, tags)
+outcome rather than one per row.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics
+from .bulk import BULK_BATCH_SIZE, batched_ids
+from .matching import to_cents
+from .models import BankTransaction, CategorizationRule
+from .counterparty import compact_iban
+from .rules import Rule, RuleSet
+
+
+@dataclass
+class ReapplyResult:
+    examined: int = 0
+    matched: int = 0
+    updated: int = 0
+
+
+def split_tags(value):
+    """``'Fuel, car,fuel'`` -> ``('fuel', 'car')``."""
+    tags = []
+    for tag in (value or '').split(','):
+        tag = tag.strip().lower()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tuple(tags)
+
+
+def merge_tags(existing, added):
+    return ','.join(split_tags(','.join((existing or '', *added))))[:255]
+
+
+def load_rules(hub_id):
+    """The hub's active rules compiled into a ``RuleSet``."""
+    rows = CategorizationRule.objects.filter(hub_id=hub_id, is_deleted=False, is_active=True).order_by(
+        'priority', 'created_at',
+    ).values_list(
+        'id', 'priority', 'match_type', 'pattern', 'min_amount', 'max_amount',
+        'account_id', 'counterparty_iban', 'category', 'tags',
+    )
+    return RuleSet([
+        Rule(pk, priority, match_type, pattern,
+             None if low is None else to_cents(low), None if high is None else to_cents(high),
+             account_id, compact_iban(iban), category, split_tags(tags))
+        for pk, priority, match_type, pattern, low, high, account_id, iban, category, tags in rows
+    ])
+
+
+def categorize_rows(rows, ruleset):
+    """
+    Set ``category`` (when empty) and add ``tags`` on unsaved ``BankTransaction``
+    instances; returns how many matched. ``search_text`` and the counterparty
+    columns must be filled in (see ``payees``).
+    """
+    matched = 0
+    for row in rows:
+        found = ruleset.match(row.search_text, row.description, to_cents(row.amount), row.account_id,
+                              row.counterparty_iban)
+        if found is None:
+            continue
+        matched += 1
+        if found.category and not row.category:
+            row.category = found.category[:100]
+        if found.tags:
+            row.tags = merge_tags(row.tags, found.tags)
+    return matched
+
+
+def reapply_rules(hub_id, account_id=None, overwrite=False, after=None, batch_size=BULK_BATCH_SIZE,
+                  on_progress=None, result=None):
+    """
+    Run the hub's rules over its transactions.
+
+    A matching rule's category replaces an existing one only with
+    ``overwrite``; tags are always merged. ``after`` (a primary key) resumes
+    an interrupted run; ``on_progress(result, last_pk)`` is called per batch.
+    """
+    result = result or ReapplyResult()
+    ruleset = load_rules(hub_id)
+    if not len(ruleset):
+        return result
+    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False)
+    if account_id:
+        qs = qs.filter(account_id=account_id)
+    if after:
+        qs = qs.filter(pk__gt=after)
+
+    for ids in batched_ids(qs, batch_size):
+        rows = BankTransaction.objects.filter(pk__in=ids).values_list(
+            'pk', 'search_text', 'description', 'amount', 'account_id', 'counterparty_iban', 'category', 'tags',
+        )
+        updates = defaultdict(list)
+        for pk, search_text, description, amount, row_account, iban, category, tags in rows:
+            result.examined += 1
+            found = ruleset.match(search_text, description, to_cents(amount), row_account, iban)
+            if found is None:
+                continue
+            result.matched += 1
+            new_category = found.category[:100] if found.category and (overwrite or not category) else category
+            new_tags = merge_tags(tags, found.tags)
+            if (new_category, new_tags) != (category, tags):
+                updates[(new_category, new_tags)].append(pk)
+        if updates:
+            now = timezone.now()
+            with transaction.atomic():
+                for (category, tags), pks in updates.items():
+                    result.updated += BankTransaction.objects.filter(pk__in=pks).update(
+                        category=category, tags=tags, updated_at=now,
+                    )
+        if on_progress:
+            on_progress(result, ids[-1])
+    if result.updated:
+        analytics.invalidate(hub_id)
+    return result
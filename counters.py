@@ -0,0 +1,105 @@
+"""
+Cached per-hub counters.
+
+The dashboard and the unfiltered list footers need a handful of hub-wide
+numbers (accounts, transactions, unreconciled count and amount). Instead of
+counting on every page load they are kept as one small dict per hub in
+Django's cache (``settings.BANK_SYNC_COUNTERS_CACHE``, the ``default`` alias,
+which is local memory unless the project configures otherwise):
+
+- a read that misses recomputes the dict with two aggregate queries;
+- single-row saves and deletes apply a delta through the model signals
+  (``signals``), from the state snapshotted when the row was loaded;
+- set-based writes that bypass signals (import ``bulk_create``, bulk
+  reconcile) call ``adjust`` with their delta, or ``invalidate`` when the
+  delta is not known without another query (bulk delete, auto-reconcile).
+
+A delta on a cold cache is dropped: the next read recomputes anyway. Entries
+also expire after ``COUNTERS_TIMEOUT`` seconds, which bounds any drift from
+concurrent read-modify-write on a shared cache. ``stats`` reports this
+process's hit rate.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q, Sum
+
+from .models import BankAccount, BankTransaction
+
+COUNTERS_TIMEOUT = 600
+FIELDS = ('accounts', 'transactions', 'unreconciled', 'unreconciled_amount')
+
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'BANK_SYNC_COUNTERS_CACHE', 'default')]
+
+
+def _key(hub_id):
+    return f'bank_sync:counters:{hub_id}'
+
+
+def compute(hub_id):
+    """The counters straight from the database (transactions of deleted accounts excluded)."""
+    accounts = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).count()
+    totals = BankTransaction.objects.filter(
+        hub_id=hub_id, is_deleted=False, account__is_deleted=False,
+    ).aggregate(
+        transactions=Count('id'),
+        unreconciled=Count('id', filter=Q(is_reconciled=False)),
+        unreconciled_amount=Sum('amount', filter=Q(is_reconciled=False)),
+    )
+    return {
+        'accounts': accounts,
+        'transactions': totals['transactions'],
+        'unreconciled': totals['unreconciled'],
+        'unreconciled_amount': totals['unreconciled_amount'] or Decimal('0.00'),
+    }
+
+
+def get_counters(hub_id):
+    """``{accounts, transactions, unreconciled, unreconciled_amount}`` for a hub."""
+    cache = _cache()
+    counters = cache.get(_key(hub_id))
+    if counters is not None:
+        _stats['hits'] += 1
+        return counters
+    _stats['misses'] += 1
+    counters = compute(hub_id)
+    cache.set(_key(hub_id), counters, COUNTERS_TIMEOUT)
+    return counters
+
+
+def adjust(hub_id, **deltas):
+    """Add ``deltas`` (keyword per counter) to a hub's cached counters, if cached."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not hub_id or not deltas:
+        return
+    unknown = set(deltas) - set(FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown counters: {", ".join(sorted(unknown))}')
+    cache = _cache()
+    counters = cache.get(_key(hub_id))
+    if counters is None:
+        return
+    for name, delta in deltas.items():
+        counters[name] += delta
+    cache.set(_key(hub_id), counters, COUNTERS_TIMEOUT)
+
+
+def invalidate(hub_id):
+    """Drop a hub's counters; the next read recomputes them."""
+    if hub_id:
+        _cache().delete(_key(hub_id))
+
+
+def stats():
+    """Hits, misses and hit rate of ``get_counters`` in this process."""
+    reads = _stats['hits'] + _stats['misses']
+    return {**_stats, 'hit_rate': _stats['hits'] / reads if reads else 0.0}
+
+
+def reset_stats():
+    _stats['hits'] = _stats['misses'] = 0
@@ -0,0 +1,213 @@
+"""
+Near-duplicate and unusual-amount detection over a hub's history.
+
+Exact re-imports are already rejected by the fingerprint index; this catches
+what it cannot: banks re-issuing a line with a reworded description or a
+shifted date, and amounts far from what a payee usually charges. Both passes
+run over the columnar ``analytics`` snapshot, never model instances:
+
+* duplicates: rows are ordered by (account, cents, day), so the same amount
+  on the same account within ``DUPLICATE_WINDOW_DAYS`` sits side by side and
+  is found by comparing neighbours. Only the candidates' normalised
+  descriptions are then fetched, and pairs at least
+  ``DUPLICATE_MIN_SIMILARITY`` alike (see ``description_similarity``) are
+  flagged on the later line;
+* anomalies: per payee and sign, in day order, Welford's running mean and
+  variance of the amounts so far. After ``ANOMALY_MIN_HISTORY`` rows, an
+  amount more than ``ANOMALY_Z`` spreads and ``ANOMALY_MIN_CENTS`` away
+  from the mean is flagged. The spread has a floor of ``ANOMALY_MIN_SPREAD``
+  of the mean, so a fixed-price subscription that suddenly triples counts.
+
+The ordering uses numpy's ``lexsort`` when installed. Flags are written to
+``TransactionFlag`` with ``ignore_conflicts`` against its unique
+``(transaction, kind)`` index: re-running never raises a flag twice, and a
+dismissed flag stays dismissed.
+"""
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from difflib import SequenceMatcher
+from math import sqrt
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+from .analytics import load_snapshot
+from .models import BankTransaction, TransactionFlag
+
+DUPLICATE_WINDOW_DAYS = 3
+DUPLICATE_MIN_SIMILARITY = 0.6
+DUPLICATE_MAX_EARLIER = 10  # earlier lines a line is compared with, bounds runs of identical amounts
+ANOMALY_MIN_HISTORY = 5
+ANOMALY_Z = 4.0
+ANOMALY_MIN_CENTS = 2000
+ANOMALY_MIN_SPREAD = 0.05
+FLAG_BATCH_SIZE = 1000
+MAX_SCORE = Decimal('999999.99')
+
+
+@dataclass
+class DetectionResult:
+    rows: int = 0
+    candidates: int = 0  # same account, amount and near date, before the description check
+    duplicates: int = 0
+    anomalies: int = 0
+    flagged: int = 0  # flags written by this run
+
+
+def duplicate_candidates(snapshot, window=DUPLICATE_WINDOW_DAYS, max_earlier=DUPLICATE_MAX_EARLIER):
+    """``(earlier, later)`` row pairs on one account with the same amount, at most ``window`` days apart."""
+    accounts, cents, days = snapshot.codes['account'], snapshot.cents, snapshot.days
+    if np is not None:
+        a = np.frombuffer(accounts, dtype=accounts.typecode)
+        c = np.frombuffer(cents, dtype='q')
+        d = np.frombuffer(days, dtype='i')
+        order = np.lexsort((np.arange(len(c)), d, c, a))
+        a, c, d = a[order], c[order], d[order]
+        near = np.flatnonzero((a[1:] == a[:-1]) & (c[1:] == c[:-1]) & (d[1:] - d[:-1] <= window)) + 1
+        order, near = order.tolist(), near.tolist()
+    else:
+        order = sorted(range(len(cents)), key=lambda i: (accounts[i], cents[i], days[i], i))
+        near = [
+            pos for pos in range(1, len(order))
+            if accounts[order[pos]] == accounts[order[pos - 1]] and cents[order[pos]] == cents[order[pos - 1]]
+            and days[order[pos]] - days[order[pos - 1]] <= window
+        ]
+    # Rows close to their neighbour are few; walk back from each over the rest of its window.
+    pairs = []
+    for pos in near:
+        later = order[pos]
+        back = pos - 1
+        while back >= max(0, pos - max_earlier):
+            earlier = order[back]
+            if (accounts[earlier] != accounts[later] or cents[earlier] != cents[later]
+                    or days[later] - days[earlier] > window):
+                break
+            pairs.append((earlier, later))
+            back -= 1
+    return pairs
+
+
+def amount_anomalies(snapshot, min_history=ANOMALY_MIN_HISTORY, z=ANOMALY_Z, min_cents=ANOMALY_MIN_CENTS):
+    """``(row, mean_cents, spreads)`` for amounts far from their payee's history so far."""
+    payees = snapshot.codes['payee']
+    values = snapshot.values['payee']
+    no_payee = values.index(None) if None in values else -1
+    stats = {}
+    found = []
+    for index, (payee, amount) in enumerate(zip(payees, snapshot.cents)):
+        if payee == no_payee or not amount:
+            continue
+        key = (payee, amount > 0)
+        count, mean, m2 = stats.get(key, (0, 0.0, 0.0))
+        if count >= min_history:
+            spread = max(sqrt(m2 / (count - 1)), abs(mean) * ANOMALY_MIN_SPREAD, 100.0)
+            deviation = abs(amount - mean)
+            if deviation >= min_cents and deviation > z * spread:
+                found.append((index, mean, deviation / spread))
+        count += 1
+        delta = amount - mean
+        mean += delta / count
+        stats[key] = (count, mean, m2 + delta * (amount - mean))
+    return found
+
+
+def _numbers(text):
+    return frozenset(word for word in text.split() if any(ch.isdigit() for ch in word))
+
+
+def _similarity(first, first_numbers, second, second_numbers):
+    if first_numbers and second_numbers and not first_numbers & second_numbers:
+        return 0.0
+    return SequenceMatcher(None, first, second).ratio()
+
+
+def description_similarity(first, second):
+    """
+    How alike two normalised descriptions are, 0 to 1. Lines that both carry
+    numbers but share none (different references or invoice numbers) are
+    distinct payments, however alike the rest of the wording.
+    """
+    return _similarity(first, _numbers(first), second, _numbers(second))
+
+
+def confirm_duplicates(pairs, texts, min_similarity=DUPLICATE_MIN_SIMILARITY):
+    """
+    ``{later: (similarity, earlier)}`` for the candidate pairs whose texts
+    (row index -> normalised description) are alike enough; the closest
+    earlier line when several are.
+    """
+    numbers = {}
+    best = {}
+    for earlier, later in pairs:
+        for index in (earlier, later):
+            if index not in numbers:
+                numbers[index] = _numbers(texts[index])
+        similarity = _similarity(texts[earlier], numbers[earlier], texts[later], numbers[later])
+        if similarity >= min_similarity and similarity > best.get(later, (0, None))[0]:
+            best[later] = (similarity, earlier)
+    return best
+
+
+def _search_texts(snapshot, pairs):
+    """Row index -> ``search_text`` for the rows of ``pairs``, read in batches."""
+    rows = {snapshot.row_id(index): index for pair in pairs for index in pair}
+    ids = list(rows)
+    texts = {}
+    for start in range(0, len(ids), FLAG_BATCH_SIZE):
+        batch = BankTransaction.objects.filter(pk__in=ids[start:start + FLAG_BATCH_SIZE])
+        texts.update((rows[pk], text) for pk, text in batch.values_list('pk', 'search_text'))
+    return texts
+
+
+def _score(value):
+    return min(Decimal(f'{value:.2f}'), MAX_SCORE)
+
+
+def detect_flags(hub_id, on_progress=None):
+    """
+    Run both passes over a hub and write new ``TransactionFlag`` rows.
+
+    ``on_progress(step, total, message)`` is called between stages.
+    """
+    def progress(step, message):
+        if on_progress:
+            on_progress(step, 4, message)
+
+    result = DetectionResult()
+    progress(0, 'Loading transactions')
+    snapshot = load_snapshot(hub_id, with_ids=True)
+    result.rows = len(snapshot)
+
+    progress(1, 'Looking for duplicates')
+    pairs = duplicate_candidates(snapshot)
+    result.candidates = len(pairs)
+    flags = [
+        TransactionFlag(
+            hub_id=hub_id, transaction_id=snapshot.row_id(later), related_id=snapshot.row_id(earlier),
+            kind=TransactionFlag.KIND_DUPLICATE, score=_score(similarity),
+            detail=f'Same account and amount as the line of {date.fromordinal(snapshot.days[earlier])}',
+        )
+        for later, (similarity, earlier) in confirm_duplicates(pairs, _search_texts(snapshot, pairs)).items()
+    ]
+    result.duplicates = len(flags)
+
+    progress(2, 'Looking for unusual amounts')
+    for index, mean, spreads in amount_anomalies(snapshot):
+        flags.append(TransactionFlag(
+            hub_id=hub_id, transaction_id=snapshot.row_id(index),
+            kind=TransactionFlag.KIND_ANOMALY, score=_score(spreads),
+            detail=f'Usual amount for this payee: {mean / 100:.2f}',
+        ))
+    result.anomalies = len(flags) - result.duplicates
+
+    progress(3, 'Saving flags')
+    existing = TransactionFlag.objects.filter(hub_id=hub_id, is_deleted=False)
+    before = existing.count()
+    for start in range(0, len(flags), FLAG_BATCH_SIZE):
+        TransactionFlag.objects.bulk_create(flags[start:start + FLAG_BATCH_SIZE], ignore_conflicts=True)
+    result.flagged = existing.count() - before
+    progress(4, f'{result.flagged} new flags')
+    return result
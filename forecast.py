@@ -0,0 +1,257 @@
+"""
+Cash-flow forecast from recurring transactions.
+
+``detect_recurring`` finds series in an account's history: the same payee and
+sign at a regular interval (weekly, fortnightly, monthly, quarterly, yearly)
+with a similar amount. It runs on the ``analytics`` snapshot. The account's
+rows are sorted by (payee, sign, day) in one pass (numpy ``lexsort`` when
+installed) and each group is tested on its own:
+
+* at least ``MIN_OCCURRENCES`` rows;
+* ``REGULAR_SHARE`` of the gaps within the period's tolerance of it;
+* ``REGULAR_SHARE`` of the amounts within ``AMOUNT_TOLERANCE`` of their median;
+* still running: the last row at most 1.5 periods ago.
+
+``project`` books each series' next occurrences (monthly and longer periods
+keep their day of the month) over ``HORIZON_DAYS`` and walks the balance
+forward from ``BankAccount.balance``; an occurrence already due but not yet
+booked counts today.
+
+``account_forecast`` keeps each account's result in Django's cache
+(``settings.BANK_SYNC_ANALYTICS_CACHE``) until the day changes or
+``invalidate(account_id)`` is called. ``balances.recompute_balances`` calls
+it, so only an account whose transactions changed is forecast again.
+"""
+import statistics
+from array import array
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .analytics import cumulative, get_snapshot
+from .matching import to_cents
+from .models import BankAccount, Payee
+
+HORIZON_DAYS = 90
+MIN_OCCURRENCES = 3
+REGULAR_SHARE = 0.75
+AMOUNT_TOLERANCE = 0.2
+FORECAST_CACHE_TIMEOUT = 24 * 3600
+UPCOMING_LIMIT = 8
+
+Period = namedtuple('Period', ['name', 'days', 'tolerance', 'months'])
+Upcoming = namedtuple('Upcoming', ['day', 'amount', 'name', 'account'])
+
+PERIODS = (
+    Period('weekly', 7, 1, 0),
+    Period('biweekly', 14, 2, 0),
+    Period('monthly', 30, 3, 1),
+    Period('quarterly', 91, 7, 3),
+    Period('yearly', 365, 10, 12),
+)
+
+
+@dataclass
+class RecurringSeries:
+    payee_id: object
+    period: str
+    cents: int  # median amount
+    count: int
+    last: date
+    anchor: int  # day of the month monthly and longer series fall on
+    name: str = ''
+
+
+@dataclass
+class AccountForecast:
+    account_id: object
+    start: date
+    balances: list  # cents at the end of each day, balances[0] is today
+    series: list = field(default_factory=list)
+    events: list = field(default_factory=list)  # (day, cents, name), in day order
+
+
+def _amount(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def _add_months(day, months, anchor):
+    """``day`` moved ``months`` ahead on the ``anchor`` day of the month (clamped to its end)."""
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, min(anchor, (following - timedelta(days=1)).day))
+
+
+def _advance(day, period, anchor):
+    if period.months:
+        return _add_months(day, period.months, anchor)
+    return day + timedelta(days=period.days)
+
+
+def _period_of(gaps):
+    """The ``Period`` most gaps fit, or ``None`` for an irregular series."""
+    typical = statistics.median(gaps)
+    for period in PERIODS:
+        # Calendar months run 28 to 31 days: monthly and longer periods get 3 more days of slack.
+        tolerance = period.tolerance + (3 if period.months else 0)
+        if abs(typical - period.days) <= tolerance:
+            regular = sum(1 for gap in gaps if abs(gap - period.days) <= tolerance)
+            return period if regular >= REGULAR_SHARE * len(gaps) else None
+    return None
+
+
+def _groups(snapshot, mask):
+    """Row indices of the selected rows grouped by (payee, sign), each in day order."""
+    payees, cents = snapshot.codes['payee'], snapshot.cents
+    if np is not None:
+        rows = np.arange(len(snapshot)) if mask is None else np.flatnonzero(mask)
+        payee = np.frombuffer(payees, dtype=payees.typecode)[rows]
+        sign = np.frombuffer(cents, dtype='q')[rows] > 0
+        order = np.lexsort((rows, sign, payee))
+        rows, payee, sign = rows[order], payee[order], sign[order]
+        bounds = np.flatnonzero((payee[1:] != payee[:-1]) | (sign[1:] != sign[:-1])) + 1
+        return [group.tolist() for group in np.split(rows, bounds) if len(group)]
+    rows = [i for i in range(len(snapshot)) if mask is None or mask[i]]
+    rows.sort(key=lambda i: (payees[i], cents[i] > 0, i))
+    groups = []
+    for i in rows:
+        if groups and payees[groups[-1][-1]] == payees[i] and (cents[groups[-1][-1]] > 0) == (cents[i] > 0):
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+    return groups
+
+
+def detect_recurring(snapshot, mask=None, today=None):
+    """``RecurringSeries`` among the selected rows (e.g. one account's), still running at ``today``."""
+    today = today or timezone.now().date()
+    payee_values = snapshot.values['payee']
+    found = []
+    for rows in _groups(snapshot, mask):
+        payee_id = payee_values[snapshot.codes['payee'][rows[0]]]
+        if payee_id is None or len(rows) < MIN_OCCURRENCES:
+            continue
+        days = sorted({snapshot.days[i] for i in rows})
+        if len(days) < MIN_OCCURRENCES:
+            continue
+        period = _period_of([b - a for a, b in zip(days, days[1:])])
+        if period is None:
+            continue
+        amounts = [snapshot.cents[i] for i in rows]
+        typical = int(statistics.median(amounts))
+        close = sum(1 for amount in amounts if abs(amount - typical) <= abs(typical) * AMOUNT_TOLERANCE)
+        if close < REGULAR_SHARE * len(amounts):
+            continue
+        last = date.fromordinal(days[-1])
+        if (today - last).days > 1.5 * period.days:
+            continue
+        # The 31st shows as the 30th or 28th in short months; the latest three tell.
+        anchor = max(date.fromordinal(day).day for day in days[-3:])
+        found.append(RecurringSeries(payee_id, period.name, typical, len(rows), last, anchor))
+    return found
+
+
+def project(balance_cents, series, start, horizon=HORIZON_DAYS):
+    """``(balances, events)`` for ``horizon`` days from ``start``; see ``AccountForecast``."""
+    periods = {period.name: period for period in PERIODS}
+    end = start + timedelta(days=horizon)
+    flows = array('q', bytes(8 * (horizon + 1)))
+    events = []
+    for item in series:
+        period = periods[item.period]
+        day = _advance(item.last, period, item.anchor)
+        while day <= end:
+            booked = max(day, start)
+            flows[(booked - start).days] += item.cents
+            events.append((booked, item.cents, item.name))
+            day = _advance(day, period, item.anchor)
+    events.sort(key=lambda event: event[0])
+    return list(cumulative(flows, balance_cents)), events
+
+
+# ----------------------------------------------------------------------
+# Per-account cache
+# ----------------------------------------------------------------------
+
+def _cache():
+    return caches[getattr(settings, 'BANK_SYNC_ANALYTICS_CACHE', 'default')]
+
+
+def _cache_key(account_id):
+    return f'bank_sync:forecast:{account_id}'
+
+
+def _compute(account, today):
+    snapshot = get_snapshot(account.hub_id)
+    series = detect_recurring(snapshot, snapshot.mask(account_id=account.pk), today)
+    names = dict(Payee.objects.filter(pk__in=[s.payee_id for s in series]).values_list('pk', 'name'))
+    for item in series:
+        item.name = names.get(item.payee_id, '')
+    balances, events = project(to_cents(account.balance), series, today)
+    return AccountForecast(account.pk, today, balances, series, events)
+
+
+def account_forecast(account, today=None):
+    """An ``AccountForecast`` from the cache, computed again after a change or at day change."""
+    today = today or timezone.now().date()
+    cache = _cache()
+    forecast = cache.get(_cache_key(account.pk))
+    if forecast is None or forecast.start != today:
+        forecast = _compute(account, today)
+        cache.set(_cache_key(account.pk), forecast, FORECAST_CACHE_TIMEOUT)
+    return forecast
+
+
+def invalidate(account_id):
+    _cache().delete(_cache_key(account_id))
+
+
+def hub_forecast(hub_id, today=None):
+    """
+    The hub's accounts combined for the dashboard: projected balance per
+    day, where it ends and bottoms out, and the next recurring items.
+    Balances are added up in the base currency at today's rate; accounts in
+    a currency without a rate are left out and named in ``missing``.
+    """
+    # Imported here: fx -> bulk -> balances imports this module.
+    from .fx import FxTable
+
+    today = today or timezone.now().date()
+    accounts = list(BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).order_by('name'))
+    table = FxTable(hub_id)
+    balances = [0] * (HORIZON_DAYS + 1)
+    upcoming, missing = [], set()
+    series = 0
+    for account in accounts:
+        rate = table.rate(account.currency, today)
+        if rate is None:
+            missing.add(account.currency.upper())
+            continue
+        forecast = account_forecast(account, today)
+        balances = [total + (value * rate).to_integral_value() for total, value in zip(balances, forecast.balances)]
+        upcoming.extend(Upcoming(day, _amount(cents), name, account.name) for day, cents, name in forecast.events)
+        series += len(forecast.series)
+    low = min(range(len(balances)), key=balances.__getitem__)
+    upcoming.sort(key=lambda event: event.day)
+    return {
+        'start': today,
+        'balances': [_amount(value) for value in balances],
+        'end_balance': _amount(balances[-1]),
+        'low_balance': _amount(balances[low]),
+        'low_day': today + timedelta(days=low),
+        'series': series,
+        'upcoming': upcoming[:UPCOMING_LIMIT],
+        'base': table.base,
+        'missing': sorted(missing),
+    }
@@ -20,13 +20,12 @@ class BankAccountForm(forms.ModelForm):
 class BankTransactionForm(forms.ModelForm):
     class Meta:
         model = BankTransaction
-        fields = ['account', 'date', 'description', 'amount', 'balance_after', 'is_reconciled', 'reference']
+        fields = ['account', 'date', 'description', 'amount', 'is_reconciled', 'reference']
         widgets = {
             'account': forms.Select(attrs={'class': 'select select-sm w-full'}),
             'date': forms.TextInput(attrs={'class': 'input input-sm w-full', 'type': 'date'}),
             'description': forms.TextInput(attrs={'class': 'input input-sm w-full'}),
             'amount': forms.TextInput(attrs={'class': 'input input-sm w-full', 'type': 'number'}),
-            'balance_after': forms.TextInput(attrs={'class': 'input input-sm w-full', 'type': 'number'}),
             'is_reconciled': forms.CheckboxInput(attrs={'class': 'toggle'}),
             'reference': forms.TextInput(attrs={'class': 'input input-sm w-full'}),
         }
@@ -0,0 +1,396 @@
+"""
+Exchange rates and multi-currency totals.
+
+``FxRate`` holds one rate per hub, currency pair and day, loaded from a CSV
+(``date,base,quote,rate``) or the ECB's ``eurofxref`` XML by
+``bank_sync_load_fx_rates``. ``load_rates`` writes a batch with one probe
+query, one ``bulk_update`` and one ``bulk_create``.
+
+``FxTable.rate`` converts into the hub's base currency
+(``settings.BANK_SYNC_BASE_CURRENCY``, default EUR) with the latest rate on
+or before the day: the direct pair, else the inverse of the reverse pair,
+else a cross through ``FX_PIVOT`` (the ECB publishes EUR pairs only). Point
+lookups go through an in-process LRU keyed by the hub's rate version, which
+``load_rates`` moves on, so a process never reads rates older than the last
+load. Range conversions (``rate_series``) read each pair once instead.
+
+Totals are aggregated in SQL before any conversion:
+``consolidated_balances`` sums ``BankAccount.balance`` per currency and
+``consolidated_flows`` sums the daily rollup per (currency, day), so the
+number of conversions is the number of groups, not of accounts or
+transactions. ``consolidated_history`` and ``consolidated_unreconciled``
+convert each currency at one day's rate (today's on the dashboard), so the
+balance chart ends on the consolidated balance.
+"""
+import csv
+import io
+import uuid
+import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .bulk import BULK_BATCH_SIZE
+from .models import BankAccount, BankAccountDailyBalance, BankTransaction, FxRate
+from .parsers import parse_date
+from .rollups import DayPoint, balance_history
+
+FX_PIVOT = 'EUR'
+FX_CACHE_SIZE = 4096
+ZERO = Decimal('0.00')
+ONE = Decimal(1)
+CENT = Decimal('0.01')
+RATE_PLACES = Decimal('0.00000001')
+
+RateRow = namedtuple('RateRow', ['day', 'base', 'quote', 'rate'])
+CurrencyTotal = namedtuple('CurrencyTotal', ['currency', 'accounts', 'amount', 'rate', 'converted'])
+Position = namedtuple('Position', ['base', 'day', 'total', 'currencies', 'missing'])
+MonthFlow = namedtuple('MonthFlow', ['month', 'inflow', 'outflow', 'net'])
+Flows = namedtuple('Flows', ['base', 'inflow', 'outflow', 'months', 'missing'])
+History = namedtuple('History', ['base', 'points', 'missing'])
+Converted = namedtuple('Converted', ['base', 'total', 'missing'])
+
+
+def base_currency():
+    return getattr(settings, 'BANK_SYNC_BASE_CURRENCY', 'EUR').upper()
+
+
+# ----------------------------------------------------------------------
+# Rate files
+# ----------------------------------------------------------------------
+
+def _where(line_no):
+    return f'line {line_no}: ' if line_no else ''
+
+
+def _rate(value, line_no=None):
+    try:
+        rate = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f'{_where(line_no)}unrecognised rate {value!r}')
+    if rate <= 0:
+        raise ValueError(f'{_where(line_no)}rate must be positive')
+    return rate.quantize(RATE_PLACES)
+
+
+def _currency(value, line_no=None):
+    value = (value or '').strip().upper()
+    if len(value) != 3 or not value.isalpha():
+        raise ValueError(f'{_where(line_no)}unrecognised currency {value!r}')
+    return value
+
+
+def parse_csv_rates(stream):
+    """``RateRow`` per line of a ``date,base,quote,rate`` CSV."""
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if not {'date', 'base', 'quote', 'rate'} <= {(name or '').strip().lower() for name in reader.fieldnames or []}:
+        raise ValueError('line 1: the header needs date, base, quote and rate columns')
+    for row in reader:
+        row = {(key or '').strip().lower(): value for key, value in row.items()}
+        try:
+            day = parse_date(row['date'])
+        except ValueError as e:
+            raise ValueError(f'line {reader.line_num}: {e}')
+        yield RateRow(day, _currency(row['base'], reader.line_num), _currency(row['quote'], reader.line_num),
+                      _rate(row['rate'], reader.line_num))
+
+
+def parse_ecb_rates(stream):
+    """``RateRow`` per ``<Cube currency=... rate=...>`` of an ECB eurofxref file (daily or history)."""
+    day = None
+    try:
+        for event, elem in ET.iterparse(stream, events=('start', 'end')):
+            if elem.tag.rsplit('}', 1)[-1] != 'Cube':
+                continue
+            if event == 'start':
+                if 'time' in elem.attrib:
+                    day = parse_date(elem.attrib['time'])
+                elif 'currency' in elem.attrib and day is not None:
+                    yield RateRow(day, FX_PIVOT, _currency(elem.attrib['currency']), _rate(elem.attrib['rate']))
+            elif 'time' in elem.attrib:
+                # Drop the finished day so a 25-year history is parsed in constant memory.
+                elem.clear()
+    except ET.ParseError as e:
+        raise ValueError(f'invalid XML ({e})')
+
+
+def parse_rates(stream, fmt=None):
+    """Rows of a rate file; ``fmt`` is ``csv`` or ``ecb``, sniffed from the first byte when omitted."""
+    if fmt is None:
+        stream = io.BufferedReader(stream) if not hasattr(stream, 'peek') else stream
+        fmt = 'ecb' if stream.peek(64).lstrip().startswith(b'<') else 'csv'
+    if fmt == 'ecb':
+        return parse_ecb_rates(stream)
+    if fmt == 'csv':
+        return parse_csv_rates(stream)
+    raise ValueError(f'unknown rate format {fmt!r}')
+
+
+# ----------------------------------------------------------------------
+# Loading
+# ----------------------------------------------------------------------
+
+def load_rates(hub_id, rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Insert or update ``rows`` for a hub; returns ``(created, updated)``.
+
+    Batches are committed as they are written, so cached lookups are dropped
+    even when ``rows`` (usually a parser) raises midway.
+    """
+    created = updated = 0
+    batch, written = {}, False
+    try:
+        for row in rows:
+            batch[(row.base, row.quote, row.day)] = row.rate
+            if len(batch) >= batch_size:
+                written = True
+                done = _write_batch(hub_id, batch)
+                created, updated, batch = created + done[0], updated + done[1], {}
+        if batch:
+            written = True
+            done = _write_batch(hub_id, batch)
+            created, updated = created + done[0], updated + done[1]
+    finally:
+        if written:
+            invalidate(hub_id)
+    return created, updated
+
+
+def _write_batch(hub_id, batch):
+    existing = FxRate.objects.filter(
+        hub_id=hub_id, is_deleted=False,
+        base__in={base for base, _, _ in batch}, quote__in={quote for _, quote, _ in batch},
+        day__in={day for _, _, day in batch},
+    ).only('id', 'base', 'quote', 'day', 'rate')
+    changed = []
+    for rate in existing:
+        new = batch.pop((rate.base, rate.quote, rate.day), None)
+        if new is not None and new != rate.rate:
+            rate.rate = new
+            changed.append(rate)
+    if changed:
+        FxRate.objects.bulk_update(changed, ['rate'])
+    # ignore_conflicts: a concurrent load of the same file inserts nothing twice.
+    FxRate.objects.bulk_create([
+        FxRate(hub_id=hub_id, base=base, quote=quote, day=day, rate=rate)
+        for (base, quote, day), rate in batch.items()
+    ], ignore_conflicts=True)
+    return len(batch), len(changed)
+
+
+# ----------------------------------------------------------------------
+# Lookups
+# ----------------------------------------------------------------------
+
+def _cache():
+    return caches[getattr(settings, 'BANK_SYNC_ANALYTICS_CACHE', 'default')]
+
+
+def _version_key(hub_id):
+    return f'bank_sync:fx:{hub_id}'
+
+
+def _version(hub_id):
+    cache = _cache()
+    token = cache.get(_version_key(hub_id))
+    if token is None:
+        token = uuid.uuid4().hex
+        cache.add(_version_key(hub_id), token, None)
+        token = cache.get(_version_key(hub_id), token)
+    return token
+
+
+def invalidate(hub_id):
+    """Make every process look a hub's rates up again."""
+    _cache().set(_version_key(hub_id), uuid.uuid4().hex, None)
+    _point.cache_clear()
+
+
+@lru_cache(maxsize=FX_CACHE_SIZE)
+def _point(hub_id, version, base, quote, day):
+    """The latest stored ``base``/``quote`` rate on or before ``day`` (misses are cached too)."""
+    return FxRate.objects.filter(
+        hub_id=hub_id, is_deleted=False, base=base, quote=quote, day__lte=day,
+    ).order_by('-day').values_list('rate', flat=True).first()
+
+
+def _cross(point, source, target, day):
+    """Units of ``target`` per unit of ``source`` from the ``point(base, quote, day)`` rates."""
+    if source == target:
+        return ONE
+    direct = point(source, target, day)
+    if direct is not None:
+        return direct
+    reverse = point(target, source, day)
+    if reverse is not None:
+        return ONE / reverse
+    if FX_PIVOT not in (source, target):
+        first = _cross(point, source, FX_PIVOT, day)
+        second = _cross(point, FX_PIVOT, target, day) if first is not None else None
+        if second is not None:
+            return first * second
+    return None
+
+
+class _Series:
+    """A pair's rates over a range; ``at(day)`` is the latest on or before ``day``."""
+
+    def __init__(self, points):
+        self.days = [day for day, _ in points]
+        self.rates = [rate for _, rate in points]
+
+    def at(self, day):
+        i = bisect_right(self.days, day) - 1
+        return self.rates[i] if i >= 0 else None
+
+
+class FxTable:
+    """A hub's rates into ``base`` (the hub's base currency by default)."""
+
+    def __init__(self, hub_id, base=None):
+        self.hub_id = hub_id
+        self.base = (base or base_currency()).upper()
+        self.version = _version(hub_id)
+
+    def _point(self, base, quote, day):
+        return _point(self.hub_id, self.version, base, quote, day)
+
+    def rate(self, currency, day):
+        """Units of ``base`` per unit of ``currency`` on ``day``, or ``None`` without a rate."""
+        return _cross(self._point, currency.upper(), self.base, day)
+
+    def convert(self, amount, currency, day):
+        rate = self.rate(currency, day)
+        return None if rate is None else (amount * rate).quantize(CENT)
+
+    def rate_series(self, currency, start, end):
+        """``rate(day)`` for days in ``[start, end]``, reading each pair it needs once."""
+        pairs = {}
+
+        def point(base, quote, day):
+            if (base, quote) not in pairs:
+                pairs[(base, quote)] = _Series(self._load_pair(base, quote, start, end))
+            return pairs[(base, quote)].at(day)
+
+        return lambda day: _cross(point, currency.upper(), self.base, day)
+
+    def _load_pair(self, base, quote, start, end):
+        rates = FxRate.objects.filter(hub_id=self.hub_id, is_deleted=False, base=base, quote=quote)
+        before = rates.filter(day__lt=start).order_by('-day').values_list('day', 'rate').first()
+        points = list(rates.filter(day__gte=start, day__lte=end).order_by('day').values_list('day', 'rate'))
+        return ([before] if before else []) + points
+
+
+# ----------------------------------------------------------------------
+# Consolidated totals
+# ----------------------------------------------------------------------
+
+def consolidated_balances(hub_id, day=None, base=None):
+    """
+    The hub's account balances in ``base`` at ``day``'s rates. Currencies
+    without a rate are listed in ``missing`` and left out of ``total``.
+    """
+    day = day or timezone.now().date()
+    table = FxTable(hub_id, base)
+    groups = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).values('currency').annotate(
+        amount=Sum('balance'), accounts=Count('id'),
+    ).order_by('currency')
+    currencies, missing, total = [], [], ZERO
+    for group in groups:
+        currency = group['currency'].upper()
+        rate = table.rate(currency, day)
+        converted = None if rate is None else (group['amount'] * rate).quantize(CENT)
+        if converted is None:
+            missing.append(currency)
+        else:
+            total += converted
+        currencies.append(CurrencyTotal(currency, group['accounts'], group['amount'], rate, converted))
+    return Position(table.base, day, total, currencies, missing)
+
+
+def consolidated_flows(hub_id, start, end, base=None):
+    """
+    Inflow and outflow in ``base`` over ``[start, end]``, in total and per
+    month, each day's flows at that day's rate.
+    """
+    table = FxTable(hub_id, base)
+    groups = BankAccountDailyBalance.objects.filter(
+        hub_id=hub_id, account__is_deleted=False, day__gte=start, day__lte=end,
+    ).values_list('account__currency', 'day').annotate(Sum('inflow'), Sum('outflow')).order_by()
+    series, missing, months = {}, set(), {}
+    for currency, day, inflow, outflow in groups:
+        currency = currency.upper()
+        if currency not in series:
+            series[currency] = table.rate_series(currency, start, end)
+        rate = series[currency](day)
+        if rate is None:
+            missing.add(currency)
+            continue
+        month = months.setdefault(day.replace(day=1), [ZERO, ZERO])
+        month[0] += inflow * rate
+        month[1] += outflow * rate
+    rows = [
+        MonthFlow(month, inflow.quantize(CENT), outflow.quantize(CENT), (inflow - outflow).quantize(CENT))
+        for month, (inflow, outflow) in sorted(months.items())
+    ]
+    return Flows(
+        table.base, sum((row.inflow for row in rows), ZERO), sum((row.outflow for row in rows), ZERO),
+        rows, sorted(missing),
+    )
+
+
+def _hub_currencies(hub_id):
+    currencies = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).values_list('currency', flat=True)
+    return sorted({currency.upper() for currency in currencies.order_by().distinct()})
+
+
+def consolidated_history(hub_id, start, end, base=None):
+    """
+    ``rollups.balance_history`` in ``base``: each currency's series converted
+    at ``end``'s rate, then added up. Currencies without a rate are listed in
+    ``missing`` and left out.
+    """
+    table = FxTable(hub_id, base)
+    points, missing = None, []
+    for currency in _hub_currencies(hub_id):
+        rate = table.rate(currency, end)
+        if rate is None:
+            missing.append(currency)
+            continue
+        series = [
+            DayPoint(p.day, (p.inflow * rate).quantize(CENT), (p.outflow * rate).quantize(CENT),
+                     (p.closing * rate).quantize(CENT))
+            for p in balance_history(hub_id, start, end, currency=currency)
+        ]
+        points = series if points is None else [
+            DayPoint(a.day, a.inflow + b.inflow, a.outflow + b.outflow, a.closing + b.closing)
+            for a, b in zip(points, series)
+        ]
+    if points is None:
+        points = [DayPoint(start + timedelta(days=i), ZERO, ZERO, ZERO) for i in range((end - start).days + 1)]
+    return History(table.base, points, missing)
+
+
+def consolidated_unreconciled(hub_id, day=None, base=None):
+    """The hub's unreconciled amount in ``base`` at ``day``'s rates, summed per currency first."""
+    day = day or timezone.now().date()
+    table = FxTable(hub_id, base)
+    groups = BankTransaction.objects.filter(
+        hub_id=hub_id, is_deleted=False, is_reconciled=False, account__is_deleted=False,
+    ).values_list('account__currency').annotate(Sum('amount')).order_by()
+    total, missing = ZERO, []
+    for currency, amount in groups:
+        converted = table.convert(amount, currency.upper(), day)
+        if converted is None:
+            missing.append(currency.upper())
+        else:
+            total += converted
+    return Converted(table.base, total, sorted(missing))
@@ -0,0 +1,216 @@
+"""
+Bulk statement import.
+
+Statements are parsed lazily (see ``parsers``), validated a chunk at a time and
+written with ``bulk_create`` inside one transaction per chunk. Running
+balances, the account balance and the daily rollup are brought up to date
+once, after the last chunk, from the earliest imported date (see
+``balances``), so a 500k line statement costs ``rows / batch_size`` inserts
+plus a few set-based statements regardless of file size.
+
+Imports are idempotent: every line gets a content fingerprint and lines already
+present in the account are skipped, so overlapping statement periods can be
+re-imported safely. Each chunk costs one indexed ``fingerprint IN (...)``
+probe, and the insert itself uses ``ignore_conflicts`` against the unique
+fingerprint index so concurrent imports cannot race a duplicate in. The rows
+such a race drops are found by primary key after the insert and counted as
+skipped, so counters and the summary only count what was written.
+"""
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+
+from . import analytics, counters
+from .balances import apply_changes, next_seq
+from .categorization import categorize_rows, load_rules
+from .models import BankTransaction
+from .normalize import search_document, transaction_fingerprint
+from .parsers import clean_line, parse_statement
+from .payees import PayeeResolver
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportResult:
+    rows_read: int = 0
+    rows_created: int = 0
+    rows_skipped: int = 0
+    rows_categorized: int = 0  # new rows a categorization rule matched
+    amount_total: Decimal = Decimal('0.00')
+    errors: list = field(default_factory=list)
+    error_count: int = 0
+    elapsed: float = 0.0
+    days: set = field(default_factory=set)  # booking days written, for the balance refresh
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'line {line_no}: {message}')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class OccurrenceCounter:
+    """
+    Numbers identical lines within one booking date.
+
+    Counts are kept per ``(date, line)`` for the whole statement, so repeated
+    lines get distinct numbers even when the file is not in date order.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def next(self, booked, key):
+        key = (booked, key)
+        occurrence = self.seen.get(key, 0)
+        self.seen[key] = occurrence + 1
+        return occurrence
+
+
+def _build_rows(account, chunk, result, occurrences, seq, user_id=None):
+    rows = []
+    for line in chunk:
+        try:
+            booked, amount = clean_line(line)
+        except ValueError as e:
+            result.add_error(line.line_no, str(e))
+            continue
+        description = line.description[:255]
+        reference = line.reference[:100]
+        occurrence = occurrences.next(booked, (amount, description, reference))
+        rows.append(BankTransaction(
+            hub_id=account.hub_id,
+            account_id=account.pk,
+            date=booked,
+            description=description,
+            amount=amount,
+            reference=reference,
+            fingerprint=transaction_fingerprint(account.pk, booked, amount, description, reference, occurrence),
+            search_text=search_document(description, reference),
+            seq=seq + line.line_no,
+            created_by=user_id,
+        ))
+    return rows
+
+
+def _replay(chunk, occurrences):
+    # Resumed import: advance the occurrence numbering over lines already handled.
+    for line in chunk:
+        try:
+            booked, amount = clean_line(line)
+        except ValueError:
+            continue
+        occurrences.next(booked, (amount, line.description[:255], line.reference[:100]))
+
+
+def _existing_fingerprints(account, rows):
+    # all_objects: lines the user deleted are not resurrected by a re-import.
+    return set(BankTransaction.all_objects.filter(
+        account_id=account.pk,
+        fingerprint__in=[r.fingerprint for r in rows],
+    ).values_list('fingerprint', flat=True))
+
+
+def _inserted_ids(rows):
+    # Primary keys are generated client side, so a row ignore_conflicts dropped is simply missing.
+    return set(BankTransaction.all_objects.filter(pk__in=[r.pk for r in rows]).values_list('pk', flat=True))
+
+
+def import_statement(account, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, user_id=None, on_progress=None,
+                     result=None):
+    """
+    Import a statement file into ``account``.
+
+    ``stream`` is a binary file object, ``fmt`` one of ``parsers.PARSERS``.
+    Invalid lines are skipped and reported in ``ImportResult.errors``; lines
+    already in the account are counted in ``rows_skipped``. A statement that
+    cannot be read at all raises ``StatementParseError``.
+    ``on_progress(result)`` is called after each committed chunk; ``result``
+    resumes an interrupted import (see ``import_lines``).
+    """
+    return import_lines(account, parse_statement(stream, fmt), batch_size, user_id, on_progress, result)
+
+
+def import_lines(account, lines, batch_size=DEFAULT_BATCH_SIZE, user_id=None, on_progress=None, result=None):
+    """
+    ``import_statement`` for an iterable of ``StatementLine`` (bank feeds, see
+    ``sync``).
+
+    Passing the ``result`` of an interrupted run resumes it: its first
+    ``result.rows_read`` lines are only replayed to keep the fingerprints
+    stable, and the counters carry on (see ``jobs``).
+    """
+    batch_size = max(int(batch_size), 1)
+    result = result or ImportResult()
+    skip = result.rows_read
+    occurrences = OccurrenceCounter()
+    seq = next_seq(account.pk)
+    ruleset = load_rules(account.hub_id)
+    payees = PayeeResolver(account.hub_id)
+    started = time.perf_counter() - result.elapsed
+
+    try:
+        for chunk in chunked(lines, batch_size):
+            if skip:
+                _replay(chunk[:skip], occurrences)
+                chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                if not chunk:
+                    continue
+            result.rows_read += len(chunk)
+            rows = _build_rows(account, chunk, result, occurrences, seq, user_id=user_id)
+            if rows:
+                existing = _existing_fingerprints(account, rows)
+                if existing:
+                    fresh = [r for r in rows if r.fingerprint not in existing]
+                    result.rows_skipped += len(rows) - len(fresh)
+                    rows = fresh
+            if rows:
+                payees.assign(rows)
+                if len(ruleset):
+                    result.rows_categorized += categorize_rows(rows, ruleset)
+                with transaction.atomic():
+                    BankTransaction.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+                    inserted = _inserted_ids(rows)
+                if len(inserted) < len(rows):
+                    # Another import wrote these fingerprints between the probe and the insert.
+                    lost = [r for r in rows if r.pk not in inserted]
+                    result.rows_skipped += len(lost)
+                    if len(ruleset):
+                        result.rows_categorized -= categorize_rows(lost, ruleset)
+                    rows = [r for r in rows if r.pk in inserted]
+            if rows:
+                amount = sum((r.amount for r in rows), Decimal('0.00'))
+                # bulk_create sends no signals: new rows are unreconciled.
+                counters.adjust(account.hub_id, transactions=len(rows), unreconciled=len(rows),
+                                unreconciled_amount=amount)
+                analytics.invalidate(account.hub_id)
+                result.rows_created += len(rows)
+                result.amount_total += amount
+                result.days.update(r.date for r in rows)
+            if on_progress:
+                result.elapsed = time.perf_counter() - started
+                on_progress(result)
+    finally:
+        # Also after an interrupted run, so committed chunks are never left unbalanced.
+        if result.days:
+            apply_changes(account.pk, result.days)
+    result.elapsed = time.perf_counter() - started
+    return result
+
@@ -0,0 +1,372 @@
+"""
+Background jobs on a database queue.
+
+Long operations (statement import, auto-reconcile, balance recompute, bank
+feed sync, re-applying categorization rules, duplicate and anomaly
+detection) are enqueued as ``BankSyncJob`` rows and run by
+``manage.py bank_sync_worker``; there is no broker. Views enqueue and return
+the ``job_progress`` partial, which polls ``job_status`` over HTMX until the
+job finishes.
+
+Claiming is safe with several workers: the oldest runnable job is read with
+``select_for_update(skip_locked=True)`` where the database supports it, and
+always taken with a conditional ``UPDATE ... WHERE status = 'queued'`` so two
+workers can never both win it.
+
+Handlers are registered per kind with ``@job_handler('kind')`` and receive a
+``JobContext``. ``ctx.report(progress, checkpoint=...)`` stores progress and a
+handler-defined checkpoint in one UPDATE, refreshes the heartbeat and raises
+``JobCancelled`` once a cancel was requested. A job whose worker died (stale
+heartbeat and, for a worker on this host, no such process) is re-queued and
+its handler resumes from ``ctx.checkpoint``; a job that raises is retried
+with backoff up to ``MAX_ATTEMPTS``.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from dataclasses import asdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BankAccount, BankSyncJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=5)
+HEARTBEAT_EVERY = 2.0  # seconds; progress writes in between are skipped
+UPLOAD_DIR = 'bank_sync/imports'
+
+HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class JobContext:
+    def __init__(self, job):
+        self.job = job
+        self.params = job.params
+        self.checkpoint = job.checkpoint or {}
+        self._last_write = 0.0
+
+    def report(self, progress, total=None, message='', checkpoint=None, force=False):
+        """Save progress (and a resume checkpoint); raises ``JobCancelled`` if cancelled."""
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        now = time.monotonic()
+        if not force and checkpoint is None and now - self._last_write < HEARTBEAT_EVERY:
+            return
+        self._last_write = now
+        fields = {'progress': progress, 'message': str(message)[:255], 'heartbeat_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        if checkpoint is not None:
+            fields['checkpoint'] = checkpoint
+        BankSyncJob.objects.filter(pk=self.job.pk).update(**fields)
+        if BankSyncJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+# ----------------------------------------------------------------------
+# Queue
+# ----------------------------------------------------------------------
+
+def enqueue(hub_id, kind, params=None, user_id=None):
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return BankSyncJob.objects.create(
+        hub_id=hub_id, kind=kind, params=params or {}, created_by=user_id, run_after=timezone.now(),
+    )
+
+
+def cancel(job):
+    """Cancel a queued job now; ask a running one to stop at its next progress report."""
+    updated = BankSyncJob.objects.filter(pk=job.pk, status=BankSyncJob.STATUS_QUEUED).update(
+        status=BankSyncJob.STATUS_CANCELLED, finished_at=timezone.now(),
+    )
+    if not updated:
+        BankSyncJob.objects.filter(pk=job.pk, status=BankSyncJob.STATUS_RUNNING).update(cancel_requested=True)
+
+
+def _worker_alive(worker_id):
+    """
+    Whether the ``host:pid`` worker that holds a job is still running. Only a
+    process on this host can be checked; for any other owner the stale
+    heartbeat is the only evidence, so it counts as dead.
+    """
+    host, _, pid = worker_id.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return False  # this worker is not running a job while it requeues
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def requeue_stale(now=None):
+    """Put running jobs whose worker stopped heart-beating, and is not alive on this host, back in the queue."""
+    now = now or timezone.now()
+    stale = BankSyncJob.objects.filter(status=BankSyncJob.STATUS_RUNNING, heartbeat_at__lt=now - STALE_AFTER)
+    dead = [pk for pk, owner in stale.values_list('pk', 'locked_by') if not _worker_alive(owner)]
+    if not dead:
+        return 0
+    return stale.filter(pk__in=dead).update(status=BankSyncJob.STATUS_QUEUED, locked_by='', run_after=now)
+
+
+def claim_next(worker_id, kinds=None):
+    """Take the oldest runnable job for ``worker_id``, or return None."""
+    now = timezone.now()
+    qs = BankSyncJob.objects.filter(status=BankSyncJob.STATUS_QUEUED, run_after__lte=now)
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+    if connection.features.has_select_for_update_skip_locked:
+        qs = qs.select_for_update(skip_locked=True)
+    with transaction.atomic():
+        pk = qs.order_by('run_after', 'created_at').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        claimed = BankSyncJob.objects.filter(pk=pk, status=BankSyncJob.STATUS_QUEUED).update(
+            status=BankSyncJob.STATUS_RUNNING, locked_by=worker_id, heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+    if not claimed:
+        return None
+    job = BankSyncJob.objects.get(pk=pk)
+    if job.started_at is None:
+        BankSyncJob.objects.filter(pk=pk).update(started_at=now)
+        job.started_at = now
+    return job
+
+
+def run_job(job):
+    """Run a claimed job to completion, cancellation, retry or failure."""
+    ctx = JobContext(job)
+    try:
+        result = HANDLERS[job.kind](ctx)
+    except JobCancelled:
+        _finish(job, BankSyncJob.STATUS_CANCELLED, message='Cancelled')
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('bank_sync job %s (%s) failed', job.pk, job.kind)
+        if job.attempts < MAX_ATTEMPTS:
+            BankSyncJob.objects.filter(pk=job.pk).update(
+                status=BankSyncJob.STATUS_QUEUED, locked_by='', error=error,
+                run_after=timezone.now() + RETRY_DELAY * job.attempts,
+            )
+        else:
+            _finish(job, BankSyncJob.STATUS_FAILED, error=error, message=error.strip().splitlines()[-1][:255])
+            _discard_upload(job)
+    else:
+        _finish(job, BankSyncJob.STATUS_DONE, result=result)
+    job.refresh_from_db()
+    return job
+
+
+def _finish(job, status, **fields):
+    BankSyncJob.objects.filter(pk=job.pk).update(
+        status=status, finished_at=timezone.now(), locked_by='', **fields,
+    )
+
+
+def _discard_upload(job):
+    """Delete an import's stored statement once no retry will read it."""
+    path = job.params.get('path') if job.kind == 'import' else None
+    if path:
+        default_storage.delete(path)
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_pending(worker_id=None, kinds=None, max_jobs=None):
+    """Run queued jobs until the queue is empty (or ``max_jobs``); returns the count."""
+    worker_id = worker_id or default_worker_id()
+    done = 0
+    requeue_stale()
+    while max_jobs is None or done < max_jobs:
+        job = claim_next(worker_id, kinds)
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+def run_worker(worker_id=None, kinds=None, poll_interval=1.0, max_jobs=None, stop=None):
+    """Poll the queue forever (or until ``stop()`` is true / ``max_jobs`` ran)."""
+    worker_id = worker_id or default_worker_id()
+    done = 0
+    while not (stop and stop()) and (max_jobs is None or done < max_jobs):
+        ran = run_pending(worker_id, kinds, None if max_jobs is None else max_jobs - done)
+        done += ran
+        if not ran:
+            time.sleep(poll_interval)
+    return done
+
+
+# ----------------------------------------------------------------------
+# Handlers
+# ----------------------------------------------------------------------
+
+def store_upload(upload):
+    """Persist an uploaded statement for an import job; returns the storage name."""
+    return default_storage.save(f'{UPLOAD_DIR}/{upload.name}', upload)
+
+
+def _import_summary(result):
+    summary = asdict(result)
+    summary['amount_total'] = str(result.amount_total)
+    summary['days'] = sorted(d.isoformat() for d in result.days)
+    return summary
+
+
+def _import_result(checkpoint):
+    from .importers import ImportResult
+
+    return ImportResult(**{
+        **checkpoint,
+        'amount_total': Decimal(checkpoint['amount_total']),
+        'days': {date.fromisoformat(d) for d in checkpoint['days']},
+    })
+
+
+@job_handler('import')
+def run_import(ctx):
+    """Import a stored statement; the checkpoint is the ``ImportResult`` so far."""
+    from .importers import import_statement
+    from .parsers import StatementParseError
+
+    params = ctx.params
+    account = BankAccount.objects.get(pk=params['account_id'], is_deleted=False)
+    resumed = _import_result(ctx.checkpoint) if ctx.checkpoint else None
+
+    def progress(result):
+        ctx.report(result.rows_read, message=f'{result.rows_created} imported', checkpoint=_import_summary(result))
+
+    try:
+        with default_storage.open(params['path'], 'rb') as fh:
+            result = import_statement(account, fh, params['format'], user_id=ctx.job.created_by,
+                                      on_progress=progress, result=resumed)
+    except StatementParseError as e:
+        # Not worth a retry: the file will not parse next time either.
+        default_storage.delete(params['path'])
+        return {'error': str(e)}
+    except JobCancelled:
+        default_storage.delete(params['path'])
+        raise
+    default_storage.delete(params['path'])
+    return _import_summary(result)
+
+
+@job_handler('reconcile')
+def run_reconcile(ctx):
+    """
+    Auto-reconcile a hub. Matches are saved in committed batches and only
+    unreconciled lines are examined, so a resumed run just carries on.
+    """
+    from .reconciliation import auto_reconcile
+
+    def progress(saved, total):
+        ctx.report(saved, total, message=f'{saved} of {total} matches saved')
+
+    def step(message):
+        ctx.report(0, message=message, force=True)
+
+    result = auto_reconcile(ctx.job.hub_id, account_id=ctx.params.get('account_id'),
+                            user_id=ctx.job.created_by, on_progress=progress, on_step=step)
+    return {
+        'documents': result.documents, 'examined': result.examined, 'matched': result.matched,
+        'split_matched': result.split_matched, 'links': result.links, 'elapsed': result.elapsed,
+    }
+
+
+@job_handler('recompute')
+def run_recompute(ctx):
+    """Rebuild running balances and daily rollups account by account; the checkpoint is the last done."""
+    from .balances import recompute_balances
+    from .rollups import rebuild_daily_balances
+
+    accounts = BankAccount.objects.filter(hub_id=ctx.job.hub_id, is_deleted=False)
+    if ctx.params.get('account_id'):
+        accounts = accounts.filter(pk=ctx.params['account_id'])
+    accounts = list(accounts.order_by('pk'))
+    total = len(accounts)
+    for index in range(ctx.checkpoint.get('done', 0), total):
+        rebuild_daily_balances(accounts[index])
+        recompute_balances(accounts[index].pk)
+        ctx.report(index + 1, total, message=f'{index + 1} of {total} accounts', checkpoint={'done': index + 1})
+    return {'accounts': total}
+
+
+@job_handler('categorize')
+def run_categorize(ctx):
+    """Re-apply the hub's categorization rules; the checkpoint is the last primary key done."""
+    from .categorization import ReapplyResult, reapply_rules
+
+    checkpoint = ctx.checkpoint
+    resumed = ReapplyResult(**checkpoint['result']) if checkpoint else None
+
+    def progress(result, last_pk):
+        ctx.report(result.examined, message=f'{result.updated} updated',
+                   checkpoint={'after': str(last_pk), 'result': asdict(result)})
+
+    result = reapply_rules(ctx.job.hub_id, account_id=ctx.params.get('account_id'),
+                           overwrite=bool(ctx.params.get('overwrite')), after=checkpoint.get('after'),
+                           on_progress=progress, result=resumed)
+    return asdict(result)
+
+
+@job_handler('sync')
+def run_sync_job(ctx):
+    """Sync the hub's bank feed accounts (see ``sync``)."""
+    from .sync import sync_accounts
+
+    accounts = BankAccount.objects.filter(hub_id=ctx.job.hub_id, is_deleted=False).exclude(provider='')
+    if ctx.params.get('account_id'):
+        accounts = accounts.filter(pk=ctx.params['account_id'])
+    accounts = list(accounts)
+    ctx.report(0, len(accounts), message='Syncing', force=True)
+
+    def progress(done, total):
+        # Refreshes the heartbeat between accounts, so a long sync is not taken for a dead worker.
+        ctx.report(done, total, message=f'{done} of {total} accounts synced')
+
+    report = sync_accounts(accounts, on_progress=progress)
+    return {
+        'accounts': len(report.results), 'failed': len(report.failed), 'unchanged': len(report.unchanged),
+        'rows_fetched': report.rows_fetched, 'rows_created': report.rows_created, 'elapsed': report.elapsed,
+    }
+
+
+@job_handler('detect')
+def run_detect(ctx):
+    """Flag near-duplicate and unusual transactions; re-running is safe, so there is no checkpoint."""
+    from .detection import detect_flags
+
+    def progress(step, total, message):
+        ctx.report(step, total, message=message, force=True)
+
+    return asdict(detect_flags(ctx.job.hub_id, on_progress=progress))
@@ -0,0 +1,34 @@
+"""Extract counterparties from existing transactions and link them to payees."""
+from django.core.management.base import BaseCommand
+
+from bank_sync.bulk import BULK_BATCH_SIZE
+from bank_sync.counterparty import extract_counterparty
+from bank_sync.models import BankTransaction
+from bank_sync.payees import backfill_payees
+
+
+class Command(BaseCommand):
+    help = 'Fill BankTransaction counterparty columns and Payee links from the descriptions (backfill or repair).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hub', help='Limit to one hub UUID')
+        parser.add_argument('--relink', action='store_true',
+                            help='Re-extract rows already linked to a payee (after extraction rules change)')
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        hubs = BankTransaction.objects.filter(is_deleted=False).order_by('hub_id').values_list('hub_id', flat=True)
+        if options['hub']:
+            hubs = hubs.filter(hub_id=options['hub'])
+        written = 0
+        for hub_id in hubs.distinct():
+            hub_rows = backfill_payees(hub_id, relink=options['relink'], batch_size=max(options['batch_size'], 1))
+            written += hub_rows
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {hub_id}: {hub_rows} transactions')
+        cache = extract_counterparty.cache_info()
+        lookups = cache.hits + cache.misses
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {written} transactions; {cache.misses} distinct descriptions '
+            f'({cache.hits / lookups if lookups else 0:.0%} extraction cache hits).'
+        ))
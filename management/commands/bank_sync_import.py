@@ -0,0 +1,45 @@
+"""Import a bank statement file into a BankAccount."""
+from django.core.management.base import BaseCommand, CommandError
+
+from bank_sync.importers import DEFAULT_BATCH_SIZE, import_statement
+from bank_sync.models import BankAccount
+from bank_sync.parsers import PARSERS, StatementParseError, detect_format
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV / CAMT.053 / OFX statement into a bank account.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('account_id', help='UUID of the BankAccount')
+        parser.add_argument('path', help='Statement file')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Defaults to detection from the file name')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            account = BankAccount.objects.get(pk=options['account_id'], is_deleted=False)
+        except (BankAccount.DoesNotExist, ValueError):
+            raise CommandError(f"Bank account {options['account_id']} not found")
+
+        fmt = options['format'] or detect_format(options['path'])
+        verbosity = options['verbosity']
+
+        def progress(result):
+            if verbosity > 1:
+                self.stdout.write(f'  {result.rows_read} lines read, {result.rows_created} created')
+
+        try:
+            with open(options['path'], 'rb') as fh:
+                result = import_statement(account, fh, fmt, batch_size=options['batch_size'], on_progress=progress)
+        except OSError as e:
+            raise CommandError(str(e))
+        except StatementParseError as e:
+            raise CommandError(f'Cannot read statement: {e}')
+
+        for message in result.errors:
+            self.stderr.write(message)
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows_created}/{result.rows_read} lines imported into {account} '
+            f'in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/s), '
+            f'{result.rows_skipped} already present, {result.error_count} invalid'
+        ))
@@ -0,0 +1,55 @@
+"""Load exchange rates from a CSV or ECB eurofxref file (local path or URL)."""
+import io
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bank_sync.bulk import BULK_BATCH_SIZE
+from bank_sync.fx import load_rates, parse_rates
+from bank_sync.models import BankAccount
+
+FETCH_TIMEOUT = 60
+
+
+class Command(BaseCommand):
+    help = 'Load FX rates (CSV date,base,quote,rate or ECB eurofxref XML) for multi-currency totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Rate file path or http(s) URL, e.g. the ECB eurofxref-hist.xml')
+        parser.add_argument('--format', choices=['csv', 'ecb'], help='Defaults to detection from the content')
+        parser.add_argument('--hub', help='Limit to one hub UUID (default: every hub with bank accounts)')
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    def _open(self, source):
+        if source.startswith(('http://', 'https://')):
+            try:
+                with urlopen(source, timeout=FETCH_TIMEOUT) as response:
+                    return io.BytesIO(response.read())
+            except (URLError, OSError) as e:
+                raise CommandError(f'Cannot fetch {source}: {e}')
+        try:
+            return open(source, 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+
+    def handle(self, *args, **options):
+        with self._open(options['source']) as fh:
+            try:
+                rows = list(parse_rates(fh, options['format']))
+            except ValueError as e:
+                raise CommandError(f'Cannot read rates: {e}')
+        if options['hub']:
+            hubs = [options['hub']]
+        else:
+            hubs = BankAccount.objects.filter(is_deleted=False).order_by('hub_id').values_list('hub_id', flat=True).distinct()
+        created = updated = 0
+        for hub_id in hubs:
+            hub_created, hub_updated = load_rates(hub_id, rows, batch_size=max(options['batch_size'], 1))
+            created, updated = created + hub_created, updated + hub_updated
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {hub_id}: {hub_created} created, {hub_updated} updated')
+        days = {row.day for row in rows}
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(rows)} rates over {len(days)} days read; {created} created, {updated} updated.'
+        ))
@@ -0,0 +1,32 @@
+"""Run the local mock PSD2 bank (see bank_sync.mockbank)."""
+from django.core.management.base import BaseCommand
+
+from bank_sync.mockbank import MockBank, MockBankServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a deterministic mock PSD2 bank for offline sync testing and benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--accounts', type=int, default=100)
+        parser.add_argument('--transactions', type=int, default=200, help='Transactions per account')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered 503/429')
+
+    def handle(self, *args, **options):
+        bank = MockBank(
+            accounts=options['accounts'], transactions=options['transactions'], page_size=options['page_size'],
+            latency=options['latency'], failure_rate=options['failure_rate'],
+        )
+        server = MockBankServer(bank, options['host'], options['port'])
+        self.stdout.write(f"Mock PSD2 bank with {options['accounts']} accounts on {server.base_url} (Ctrl+C to stop)")
+        self.stdout.write(f'  python manage.py bank_sync_sync --provider psd2 --base-url {server.base_url} --hub <uuid> --discover')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
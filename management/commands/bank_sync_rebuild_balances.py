@@ -0,0 +1,32 @@
+"""Recompute the daily balance rollup and running balances from the transactions."""
+from django.core.management.base import BaseCommand
+
+from bank_sync.balances import recompute_balances
+from bank_sync.models import BankAccount
+from bank_sync.rollups import rebuild_daily_balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuild BankAccountDailyBalance rows and BankTransaction.balance_after (backfill or repair).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hub', help='Limit to one hub UUID')
+        parser.add_argument('--account', help='Limit to one BankAccount UUID')
+
+    def handle(self, *args, **options):
+        accounts = BankAccount.objects.filter(is_deleted=False).order_by('hub_id', 'name')
+        if options['hub']:
+            accounts = accounts.filter(hub_id=options['hub'])
+        if options['account']:
+            accounts = accounts.filter(pk=options['account'])
+        days = rewritten = 0
+        for account in accounts.iterator():
+            account_days = rebuild_daily_balances(account)
+            account_rows = recompute_balances(account.pk)
+            days += account_days
+            rewritten += account_rows
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {account.name}: {account_days} days, {account_rows} balances rewritten')
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {days} daily balance rows; rewrote {rewritten} running balances.'
+        ))
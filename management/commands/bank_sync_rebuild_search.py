@@ -0,0 +1,21 @@
+"""Re-create the transaction search index and re-sync it with the table."""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from bank_sync.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index (pg_trgm on PostgreSQL, FTS5 on SQLite).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if install_search_index(connection):
+            self.stdout.write(self.style.SUCCESS(f'Search index rebuilt on {connection.vendor}.'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'No search index available on {connection.vendor}; search falls back to LIKE.'
+            ))
@@ -0,0 +1,42 @@
+"""Match unreconciled bank transactions to open invoices and expenses."""
+from django.core.management.base import BaseCommand
+
+from bank_sync.matching import DEFAULT_DATE_WINDOW, DEFAULT_MIN_SCORE, DEFAULT_SPLIT_WINDOW
+from bank_sync.reconciliation import DOCUMENT_SOURCES, auto_reconcile
+
+
+class Command(BaseCommand):
+    help = 'Run automatic reconciliation for a hub.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('hub_id', help='Hub UUID')
+        parser.add_argument('--account', help='Limit to one BankAccount UUID')
+        parser.add_argument('--window', type=int, default=DEFAULT_DATE_WINDOW, help='Date window in days')
+        parser.add_argument('--tolerance', type=int, default=0, help='Amount tolerance in cents')
+        parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE)
+        parser.add_argument('--split-window', type=int, default=DEFAULT_SPLIT_WINDOW,
+                            help='Date window in days for split settlements')
+        parser.add_argument('--no-splits', action='store_true', help='Only match one transaction to one document')
+        parser.add_argument('--kind', action='append', choices=sorted(DOCUMENT_SOURCES), help='Document kinds to match')
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without saving them')
+
+    def handle(self, *args, **options):
+        result = auto_reconcile(
+            options['hub_id'],
+            account_id=options['account'],
+            date_window=options['window'],
+            amount_tolerance=options['tolerance'],
+            min_score=options['min_score'],
+            kinds=options['kind'],
+            split_window=options['split_window'],
+            splits=not options['no_splits'],
+            dry_run=options['dry_run'],
+        )
+        if options['verbosity'] > 1:
+            for match in result.matches:
+                self.stdout.write(f'  {match.transaction_id} -> {match.document.kind} {match.document.id} ({match.score:.2f})')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.matched} one-to-one and {result.split_matched} split matches over {result.examined} transactions '
+            f'and {result.documents} documents ({result.links} links) '
+            f'in {result.elapsed:.2f}s' + (' (dry run)' if options['dry_run'] else '')
+        ))
@@ -0,0 +1,67 @@
+"""Sync bank-feed accounts from their providers."""
+from django.core.management.base import BaseCommand, CommandError
+
+from bank_sync.models import BankAccount
+from bank_sync.providers import PROVIDERS
+from bank_sync.sync import DEFAULT_MAX_ATTEMPTS, discover_accounts, provider_config, sync_accounts
+
+
+class Command(BaseCommand):
+    help = 'Fetch new transactions for every account linked to a bank provider (concurrently).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hub', help='Limit to one hub UUID')
+        parser.add_argument('--account', help='Limit to one BankAccount UUID')
+        parser.add_argument('--provider', choices=sorted(PROVIDERS), help='Limit to one provider')
+        parser.add_argument('--base-url', help='Override the provider base URL (e.g. a local mock bank)')
+        parser.add_argument('--concurrency', type=int, help='Requests in flight per provider')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--discover', action='store_true',
+                            help='First create accounts for provider accounts not linked yet (needs --hub and --provider)')
+
+    def handle(self, *args, **options):
+        name = options['provider']
+        configs = {}
+        if name:
+            configs[name] = provider_config(name)
+            if options['base_url']:
+                configs[name]['base_url'] = options['base_url']
+            if not configs[name].get('base_url'):
+                raise CommandError(f"No base_url for provider '{name}': set BANK_SYNC_PROVIDERS or --base-url")
+
+        if options['discover']:
+            if not (options['hub'] and name):
+                raise CommandError('--discover needs --hub and --provider')
+            created = discover_accounts(options['hub'], name, configs[name])
+            self.stdout.write(f'{created} new accounts linked to {name}')
+
+        accounts = BankAccount.objects.filter(is_deleted=False, is_active=True).exclude(provider='').exclude(external_id='')
+        if options['hub']:
+            accounts = accounts.filter(hub_id=options['hub'])
+        if options['account']:
+            accounts = accounts.filter(pk=options['account'])
+        if name:
+            accounts = accounts.filter(provider=name)
+        accounts = list(accounts.order_by('hub_id', 'name'))
+        if not accounts:
+            self.stdout.write('No bank-feed accounts to sync.')
+            return
+
+        report = sync_accounts(
+            accounts, concurrency=options['concurrency'], max_attempts=options['max_attempts'], configs=configs,
+        )
+        names = {a.pk: a.name for a in accounts}
+        for result in report.failed:
+            self.stderr.write(f'{names[result.account_id]}: {result.error}')
+        if options['verbosity'] > 1:
+            for result in report.results:
+                status = 'unchanged' if result.unchanged else f'{result.rows_created}/{result.rows_fetched} written'
+                self.stdout.write(
+                    f'  {names[result.account_id]}: {status}, {result.requests} requests, '
+                    f'{result.retries} retries, {result.elapsed:.2f}s'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced {len(report.results) - len(report.failed)}/{len(report.results)} accounts in '
+            f'{report.elapsed:.2f}s ({len(report.unchanged)} unchanged): {report.rows_fetched} rows fetched, '
+            f'{report.rows_created} written, {report.requests} requests, {report.retries} retries'
+        ))
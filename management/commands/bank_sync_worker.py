@@ -0,0 +1,27 @@
+"""Run queued bank_sync background jobs (imports, auto-reconcile, recomputes, syncs)."""
+from django.core.management.base import BaseCommand
+
+from bank_sync.jobs import HANDLERS, default_worker_id, run_pending, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Process the BankSyncJob queue. Run one per machine or several; jobs are claimed with row locks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling')
+        parser.add_argument('--kind', action='append', choices=sorted(HANDLERS),
+                            help='Only run jobs of this kind (repeatable)')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--max-jobs', type=int, help='Exit after this many jobs')
+        parser.add_argument('--worker-id', default=default_worker_id(), help='Name recorded on claimed jobs')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            done = run_pending(options['worker_id'], options['kind'], options['max_jobs'])
+        else:
+            self.stdout.write(f"Worker {options['worker_id']} polling every {options['poll']}s")
+            try:
+                done = run_worker(options['worker_id'], options['kind'], options['poll'], options['max_jobs'])
+            except KeyboardInterrupt:
+                return
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} jobs.'))
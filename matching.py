@@ -0,0 +1,281 @@
+"""
+Candidate index and scoring for automatic reconciliation.
+
+Documents (invoices, expenses...) are bucketed by signed amount in cents and
+kept sorted by date inside each bucket, so finding the candidates for a bank
+transaction is a dict lookup plus a bisect on the date window instead of a
+scan over every open document. Pure Python, no Django dependency.
+
+Split settlements (one transfer paying several invoices, or one invoice paid
+in instalments) are found with a bounded subset-sum search: candidates are
+pruned by sign, date window and counterparty, capped at
+``MAX_SUBSET_CANDIDATES``, and the remaining set is solved by meet-in-the-middle
+(two halves of at most 2^10 partial sums each), so the cost per transaction is
+bounded no matter how large the backlog is.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from itertools import combinations
+
+from .normalize import normalize_text
+
+Document = namedtuple('Document', ['kind', 'id', 'cents', 'day', 'reference', 'counterparty'])
+TransactionLine = namedtuple('TransactionLine', ['id', 'cents', 'day', 'text'])
+# ``cents`` is allocated from the transaction; ``difference`` is what the
+# document differs by within the tolerance, so ``cents + difference`` is the
+# document's share and a match settles both sides.
+Match = namedtuple('Match', ['transaction_id', 'document', 'score', 'cents', 'difference'], defaults=(0,))
+
+DEFAULT_DATE_WINDOW = 10
+DEFAULT_MIN_SCORE = 0.6
+
+AMOUNT_WEIGHT = 0.5
+DATE_WEIGHT = 0.2
+TEXT_WEIGHT = 0.3
+
+MIN_TOKEN_LENGTH = 3
+
+DEFAULT_SPLIT_WINDOW = 45
+MAX_SUBSET_CANDIDATES = 20
+MAX_SUBSET_ITEMS = 8
+SPLIT_SCORE = 0.75
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+def tokens(text):
+    return {t for t in normalize_text(text).split() if len(t) >= MIN_TOKEN_LENGTH}
+
+
+class CandidateIndex:
+    """Documents bucketed by amount (cents), each bucket sorted by day ordinal."""
+
+    def __init__(self, documents):
+        buckets = {}
+        for doc in documents:
+            buckets.setdefault(doc.cents, []).append(doc)
+        self.buckets = {}
+        self.days = {}
+        self.doc_tokens = {}
+        for cents, docs in buckets.items():
+            docs.sort(key=lambda d: d.day)
+            self.buckets[cents] = docs
+            self.days[cents] = [d.day for d in docs]
+        self.size = sum(len(d) for d in self.buckets.values())
+
+    def candidates(self, cents, day, window=DEFAULT_DATE_WINDOW, tolerance=0):
+        for bucket in range(cents - tolerance, cents + tolerance + 1):
+            days = self.days.get(bucket)
+            if not days:
+                continue
+            docs = self.buckets[bucket]
+            for i in range(bisect_left(days, day - window), bisect_right(days, day + window)):
+                yield docs[i]
+
+    def document_tokens(self, doc):
+        key = (doc.kind, doc.id)
+        cached = self.doc_tokens.get(key)
+        if cached is None:
+            cached = self.doc_tokens[key] = (
+                normalize_text(doc.reference),
+                tokens(f'{doc.reference} {doc.counterparty}'),
+            )
+        return cached
+
+
+def score(tx, tx_tokens, doc, index, window=DEFAULT_DATE_WINDOW, tolerance=0):
+    """Weighted similarity in [0, 1] between a transaction and a candidate document."""
+    amount_score = 1.0 if tx.cents == doc.cents else 1.0 - abs(tx.cents - doc.cents) / (tolerance + 1)
+    date_score = 1.0 - abs(tx.day - doc.day) / (window + 1)
+    reference, doc_tokens = index.document_tokens(doc)
+    tx_text = normalize_text(tx.text)
+    if reference and len(reference) >= MIN_TOKEN_LENGTH and reference in tx_text:
+        text_score = 1.0
+    elif doc_tokens:
+        text_score = len(tx_tokens & doc_tokens) / len(doc_tokens)
+    else:
+        text_score = 0.0
+    return AMOUNT_WEIGHT * amount_score + DATE_WEIGHT * date_score + TEXT_WEIGHT * text_score
+
+
+def match_transactions(transactions, index, window=DEFAULT_DATE_WINDOW, tolerance=0, min_score=DEFAULT_MIN_SCORE):
+    """
+    One-to-one matching of ``transactions`` against ``index``.
+
+    Every transaction only looks at its own amount bucket(s) and date window,
+    so the cost is proportional to the number of plausible pairs rather than
+    transactions x documents. Pairs are then assigned greedily by descending
+    score so each transaction and each document is used at most once.
+    """
+    pairs = []
+    for tx in transactions:
+        tx_tokens = None
+        for doc in index.candidates(tx.cents, tx.day, window, tolerance):
+            if tx_tokens is None:
+                tx_tokens = tokens(tx.text)
+            value = score(tx, tx_tokens, doc, index, window, tolerance)
+            if value >= min_score:
+                pairs.append((value, tx.id, tx.cents, doc))
+
+    pairs.sort(key=lambda p: p[0], reverse=True)
+    used_tx, used_docs, matches = set(), set(), []
+    for value, tx_id, cents, doc in pairs:
+        key = (doc.kind, doc.id)
+        if tx_id in used_tx or key in used_docs:
+            continue
+        used_tx.add(tx_id)
+        used_docs.add(key)
+        matches.append(Match(tx_id, doc, round(value, 4), cents, doc.cents - cents))
+    return matches
+
+
+# ----------------------------------------------------------------------
+# Subset-sum (split settlements)
+# ----------------------------------------------------------------------
+
+def _half_sums(values, offset, max_items):
+    """Subset sums of ``values`` with at most ``max_items`` members: {sum: indices}."""
+    sums = {0: ()}
+    for i, value in enumerate(values, start=offset):
+        for total, idx in list(sums.items()):
+            extended = total + value
+            if len(idx) < max_items and extended not in sums:
+                sums[extended] = idx + (i,)
+    return sums
+
+
+def find_subset(target, values, tolerance=0, max_items=MAX_SUBSET_ITEMS, min_items=2):
+    """
+    Indices of a subset of ``values`` (cents) summing to ``target`` +/- ``tolerance``.
+
+    Meet-in-the-middle: each half's subset sums are enumerated once and the
+    second half is searched with a bisect, so 20 candidates cost ~2 x 1024
+    sums instead of 1M subsets. Among the combinations found the one with the
+    fewest items wins; ``None`` when nothing fits. ``values`` should already be
+    pruned to a few dozen items.
+    """
+    # Only same-signed values that do not overshoot on their own can take part.
+    sign = 1 if target >= 0 else -1
+    usable = [i for i, v in enumerate(values) if v * sign > 0 and abs(v) <= abs(target) + tolerance]
+    usable = usable[:MAX_SUBSET_CANDIDATES]
+    if len(usable) < min_items:
+        return None
+    picked = [values[i] for i in usable]
+    middle = len(picked) // 2
+    left = _half_sums(picked[:middle], 0, max_items)
+    right = _half_sums(picked[middle:], middle, max_items)
+    right_sums = sorted(right)
+
+    best = None
+    for left_sum, left_idx in left.items():
+        lo = bisect_left(right_sums, target - tolerance - left_sum)
+        hi = bisect_right(right_sums, target + tolerance - left_sum)
+        for k in range(lo, hi):
+            combo = left_idx + right[right_sums[k]]
+            if min_items <= len(combo) <= max_items and (best is None or len(combo) < len(best)):
+                best = combo
+    if best is None:
+        return None
+    return tuple(sorted(usable[i] for i in best))
+
+
+class _TokenIndex:
+    """Items bucketed by counterparty/reference token, each bucket sorted by day."""
+
+    def __init__(self, items, tokens_of):
+        buckets = {}
+        for item in items:
+            for token in tokens_of(item):
+                buckets.setdefault(token, []).append(item)
+        self.buckets = {}
+        for token, bucket in buckets.items():
+            bucket.sort(key=lambda i: i.day)
+            self.buckets[token] = ([i.day for i in bucket], bucket)
+
+    def lookup(self, query_tokens, first_day, last_day, nearest_last):
+        """Items sharing a token with ``query_tokens`` dated in [first_day, last_day]."""
+        found = {}
+        for token in query_tokens:
+            entry = self.buckets.get(token)
+            if entry is None:
+                continue
+            days, bucket = entry
+            lo, hi = bisect_left(days, first_day), bisect_right(days, last_day)
+            # Keep the scan bounded for very common tokens: nearest dates only.
+            if hi - lo > MAX_SUBSET_CANDIDATES * 4:
+                if nearest_last:
+                    lo = hi - MAX_SUBSET_CANDIDATES * 4
+                else:
+                    hi = lo + MAX_SUBSET_CANDIDATES * 4
+            for item in bucket[lo:hi]:
+                found[id(item)] = item
+        return list(found.values())
+
+
+def match_many_to_one(transactions, documents, window=DEFAULT_SPLIT_WINDOW, tolerance=0):
+    """
+    One transaction settling several documents.
+
+    For each transaction the candidates are unused documents of the same sign,
+    dated up to ``window`` days before it, that share a counterparty or
+    reference token with the transaction text (looked up through a token
+    index, not a scan). Returns ``Match`` rows with the per-document allocation.
+    """
+    index = CandidateIndex(documents)
+    by_token = _TokenIndex(documents, lambda d: index.document_tokens(d)[1])
+    used, matches = set(), []
+    for tx in transactions:
+        candidates = [
+            d for d in by_token.lookup(tokens(tx.text), tx.day - window, tx.day, nearest_last=True)
+            if (d.kind, d.id) not in used and (d.cents > 0) == (tx.cents > 0)
+        ]
+        # Closest dates first so the cap keeps the most plausible documents.
+        candidates.sort(key=lambda d: tx.day - d.day)
+        candidates = candidates[:MAX_SUBSET_CANDIDATES]
+        subset = find_subset(tx.cents, [d.cents for d in candidates], tolerance)
+        if subset is None:
+            continue
+        split = []
+        for i in subset:
+            doc = candidates[i]
+            used.add((doc.kind, doc.id))
+            split.append(Match(tx.id, doc, SPLIT_SCORE, doc.cents))
+        # The last allocation absorbs the tolerance so the transaction is covered exactly.
+        gap = tx.cents - sum(m.cents for m in split)
+        split[-1] = split[-1]._replace(cents=split[-1].cents + gap, difference=-gap)
+        matches += split
+    return matches
+
+
+def match_one_to_many(transactions, documents, window=DEFAULT_SPLIT_WINDOW, tolerance=0):
+    """
+    One document paid by several transactions (instalments, partial payments).
+
+    Mirror image of ``match_many_to_one``: candidates are unused transactions
+    of the same sign dated up to ``window`` days after the document that
+    mention its counterparty or reference.
+    """
+    index = CandidateIndex(documents)
+    by_token = _TokenIndex(transactions, lambda t: tokens(t.text))
+    used, matches = set(), []
+    for doc in sorted(documents, key=lambda d: d.day):
+        candidates = [
+            t for t in by_token.lookup(index.document_tokens(doc)[1], doc.day, doc.day + window, nearest_last=False)
+            if t.id not in used and (t.cents > 0) == (doc.cents > 0)
+        ]
+        candidates.sort(key=lambda t: t.day)
+        candidates = candidates[:MAX_SUBSET_CANDIDATES]
+        subset = find_subset(doc.cents, [t.cents for t in candidates], tolerance)
+        if subset is None:
+            continue
+        split = []
+        for i in subset:
+            tx = candidates[i]
+            used.add(tx.id)
+            split.append(Match(tx.id, doc, SPLIT_SCORE, tx.cents))
+        # The last instalment absorbs the tolerance so the document is covered exactly.
+        split[-1] = split[-1]._replace(difference=doc.cents - sum(m.cents for m in split))
+        matches += split
+    return matches
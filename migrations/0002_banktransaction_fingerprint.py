@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Fingerprint'),
+        ),
+        migrations.AddConstraint(
+            model_name='banktransaction',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('is_deleted', False), models.Q(('fingerprint', ''), _negated=True)),
+                fields=('account', 'fingerprint'),
+                name='bank_sync_tx_fingerprint_uniq',
+            ),
+        ),
+    ]
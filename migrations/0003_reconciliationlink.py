@@ -0,0 +1,36 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0002_banktransaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationLink',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('document_type', models.CharField(max_length=50, verbose_name='Document Type')),
+                ('document_id', models.CharField(max_length=64, verbose_name='Document ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Allocated Amount')),
+                ('score', models.DecimalField(decimal_places=4, default='0', max_digits=5, verbose_name='Match Score')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_links', to='bank_sync.banktransaction')),
+            ],
+            options={
+                'db_table': 'bank_sync_reconciliationlink',
+                'abstract': False,
+                'indexes': [models.Index(fields=['document_type', 'document_id'], name='bank_sync_link_document_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0003_reconciliationlink'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankaccount',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'name'], name='bank_sync_acct_hub_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'account', 'date'], name='bank_sync_tx_hub_acct_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'is_reconciled', 'date'], name='bank_sync_tx_hub_rec_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'reference'], name='bank_sync_tx_hub_ref_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+from ._search_index import drop_search_index, install_search_index
+
+BATCH_SIZE = 2000
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def _normalize(value):
+    # Frozen copy of normalize.normalize_text / search_document at this migration.
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+    return _NON_ALNUM.sub(' ', value).strip()
+
+
+def search_document(description, reference):
+    return ' ' + ' '.join(filter(None, (_normalize(description), _normalize(reference))))
+
+
+def backfill_search_text(apps, schema_editor):
+    BankTransaction = apps.get_model('bank_sync', 'BankTransaction')
+    manager = BankTransaction._base_manager.using(schema_editor.connection.alias)
+    batch = []
+    for pk, description, reference in manager.values_list('pk', 'description', 'reference').iterator(chunk_size=BATCH_SIZE):
+        batch.append(BankTransaction(pk=pk, search_text=search_document(description, reference)))
+        if len(batch) >= BATCH_SIZE:
+            manager.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        manager.bulk_update(batch, ['search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0004_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransaction',
+            name='search_text',
+            field=models.CharField(blank=True, editable=False, max_length=400, verbose_name='Search Text'),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        # pg_trgm GIN index on PostgreSQL, FTS5 shadow table + triggers on SQLite.
+        migrations.RunPython(install_search_index, drop_search_index),
+    ]
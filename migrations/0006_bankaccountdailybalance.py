@@ -0,0 +1,40 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0005_banktransaction_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankAccountDailyBalance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('day', models.DateField(verbose_name='Day')),
+                ('opening', models.DecimalField(decimal_places=2, default='0', max_digits=14, verbose_name='Opening Balance')),
+                ('inflow', models.DecimalField(decimal_places=2, default='0', max_digits=14, verbose_name='Inflow')),
+                ('outflow', models.DecimalField(decimal_places=2, default='0', max_digits=14, verbose_name='Outflow')),
+                ('closing', models.DecimalField(decimal_places=2, default='0', max_digits=14, verbose_name='Closing Balance')),
+                ('transaction_count', models.PositiveIntegerField(default=0, verbose_name='Transactions')),
+                ('unreconciled_count', models.PositiveIntegerField(default=0, verbose_name='Unreconciled')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_balances', to='bank_sync.bankaccount')),
+            ],
+            options={
+                'db_table': 'bank_sync_bankaccountdailybalance',
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('account', 'day'), name='bank_sync_daily_account_day_uniq')],
+                'indexes': [models.Index(fields=['hub_id', 'day'], name='bank_sync_daily_hub_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import Sum
+
+from ._search_index import install_search_index
+
+BATCH_SIZE = 2000
+
+
+def backfill(apps, schema_editor):
+    """Opening balance = current balance minus history; seq = current (date, created_at) order."""
+    alias = schema_editor.connection.alias
+    BankAccount = apps.get_model('bank_sync', 'BankAccount')
+    BankTransaction = apps.get_model('bank_sync', 'BankTransaction')
+    transactions = BankTransaction._base_manager.using(alias)
+    for account in BankAccount._base_manager.using(alias).iterator():
+        total = transactions.filter(account_id=account.pk, is_deleted=False).aggregate(total=Sum('amount'))['total']
+        account.opening_balance = account.balance - (total or 0)
+        account.save(update_fields=['opening_balance'])
+
+        batch = []
+        rows = transactions.filter(account_id=account.pk).order_by('date', 'created_at', 'pk').values_list('pk', flat=True)
+        for seq, pk in enumerate(rows.iterator(chunk_size=BATCH_SIZE), start=1):
+            batch.append(BankTransaction(pk=pk, seq=seq))
+            if len(batch) >= BATCH_SIZE:
+                transactions.bulk_update(batch, ['seq'])
+                batch = []
+        if batch:
+            transactions.bulk_update(batch, ['seq'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0006_bankaccountdailybalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='opening_balance',
+            field=models.DecimalField(decimal_places=2, default='0', max_digits=14, verbose_name='Opening Balance'),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Sequence'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0007_running_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='provider',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Provider'),
+        ),
+        migrations.AddField(
+            model_name='bankaccount',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=100, verbose_name='External ID'),
+        ),
+        migrations.AddIndex(
+            model_name='bankaccount',
+            index=models.Index(fields=['hub_id', 'provider', 'external_id'], name='bank_sync_acct_provider_idx'),
+        ),
+        migrations.CreateModel(
+            name='BankSyncState',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('cursor', models.CharField(blank=True, max_length=255, verbose_name='Cursor')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Synced At')),
+                ('last_error', models.CharField(blank=True, max_length=500, verbose_name='Last Error')),
+                ('failure_count', models.PositiveIntegerField(default=0, verbose_name='Consecutive Failures')),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to='bank_sync.bankaccount')),
+            ],
+            options={
+                'db_table': 'bank_sync_banksyncstate',
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0008_bank_feed_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banksyncstate',
+            name='last_booking_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Last Booking Date'),
+        ),
+        migrations.AddField(
+            model_name='banksyncstate',
+            name='boundary_ids',
+            field=models.JSONField(blank=True, default=list, verbose_name='Boundary Transaction IDs'),
+        ),
+        migrations.AddField(
+            model_name='banksyncstate',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='banksyncstate',
+            name='last_balance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='Last Reported Balance'),
+        ),
+        migrations.CreateModel(
+            name='BankSyncRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('provider', models.CharField(max_length=50, verbose_name='Provider')),
+                ('started_at', models.DateTimeField(verbose_name='Started At')),
+                ('duration_ms', models.PositiveIntegerField(default=0, verbose_name='Duration (ms)')),
+                ('accounts', models.PositiveIntegerField(default=0, verbose_name='Accounts')),
+                ('accounts_failed', models.PositiveIntegerField(default=0, verbose_name='Failed Accounts')),
+                ('accounts_unchanged', models.PositiveIntegerField(default=0, verbose_name='Unchanged Accounts')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='Requests')),
+                ('retries', models.PositiveIntegerField(default=0, verbose_name='Retries')),
+                ('rows_fetched', models.PositiveIntegerField(default=0, verbose_name='Rows Fetched')),
+                ('rows_written', models.PositiveIntegerField(default=0, verbose_name='Rows Written')),
+            ],
+            options={
+                'db_table': 'bank_sync_banksyncrun',
+                'abstract': False,
+                'indexes': [models.Index(fields=['hub_id', 'started_at'], name='bank_sync_run_hub_started_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0009_sync_delta_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankSyncJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('kind', models.CharField(choices=[('import', 'Statement import'), ('reconcile', 'Auto-reconcile'), ('recompute', 'Balance recompute'), ('sync', 'Bank feed sync')], max_length=50, verbose_name='Kind')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20, verbose_name='Status')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parameters')),
+                ('checkpoint', models.JSONField(blank=True, default=dict, verbose_name='Checkpoint')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='Progress')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='Message')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Result')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Cancel Requested')),
+                ('run_after', models.DateTimeField(blank=True, null=True, verbose_name='Run After')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Heartbeat')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+            ],
+            options={
+                'db_table': 'bank_sync_banksyncjob',
+                'abstract': False,
+                'indexes': [
+                    models.Index(fields=['status', 'run_after', 'created_at'], name='bank_sync_job_claim_idx'),
+                    models.Index(fields=['hub_id', 'created_at'], name='bank_sync_job_hub_created_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+from ._search_index import install_search_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0010_banksyncjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransaction',
+            name='category',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Category'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'category'], name='bank_sync_tx_hub_cat_idx'),
+        ),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+import uuid
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0011_banktransaction_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationAuditEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('action', models.CharField(choices=[('reconcile', 'Reconciled'), ('unreconcile', 'Unreconciled')], max_length=20, verbose_name='Action')),
+                ('source', models.CharField(choices=[('bulk', 'Bulk action'), ('assistant', 'Assistant')], default='bulk', max_length=20, verbose_name='Source')),
+                ('batch_id', models.UUIDField(db_index=True, verbose_name='Batch')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_audit', to='bank_sync.banktransaction')),
+            ],
+            options={
+                'db_table': 'bank_sync_reconciliationauditentry',
+                'abstract': False,
+                'indexes': [models.Index(fields=['hub_id', 'created_at'], name='bank_sync_audit_hub_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+import uuid
+from django.db import migrations, models
+import django.db.models.deletion
+
+from ._search_index import install_search_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0012_reconciliationauditentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorizationRule',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('name', models.CharField(max_length=100, verbose_name='Name')),
+                ('priority', models.PositiveIntegerField(default=100, verbose_name='Priority')),
+                ('match_type', models.CharField(choices=[('contains', 'Description contains'), ('regex', 'Description matches regex')], default='contains', max_length=20, verbose_name='Match')),
+                ('pattern', models.CharField(blank=True, max_length=255, verbose_name='Pattern')),
+                ('min_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='Min Amount')),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='Max Amount')),
+                ('counterparty_iban', models.CharField(blank=True, max_length=34, verbose_name='Counterparty IBAN')),
+                ('category', models.CharField(blank=True, max_length=100, verbose_name='Category')),
+                ('tags', models.CharField(blank=True, max_length=255, verbose_name='Tags')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Is Active')),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='categorization_rules', to='bank_sync.bankaccount')),
+            ],
+            options={
+                'db_table': 'bank_sync_categorizationrule',
+                'abstract': False,
+                'indexes': [models.Index(fields=['hub_id', 'is_deleted', 'is_active', 'priority'], name='bank_sync_rule_hub_prio_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='tags',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Tags'),
+        ),
+        migrations.AlterField(
+            model_name='banksyncjob',
+            name='kind',
+            field=models.CharField(choices=[('import', 'Statement import'), ('reconcile', 'Auto-reconcile'), ('recompute', 'Balance recompute'), ('sync', 'Bank feed sync'), ('categorize', 'Re-apply categorization rules')], max_length=50, verbose_name='Kind'),
+        ),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+import uuid
+from django.db import migrations, models
+import django.db.models.deletion
+
+from ._search_index import install_search_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0013_categorizationrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payee',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('name', models.CharField(max_length=140, verbose_name='Name')),
+                ('key', models.CharField(max_length=140, verbose_name='Key')),
+                ('iban', models.CharField(blank=True, max_length=34, verbose_name='Iban')),
+            ],
+            options={
+                'db_table': 'bank_sync_payee',
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('hub_id', 'key'), name='bank_sync_payee_key_uniq')],
+            },
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='payee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='bank_sync.payee'),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='counterparty_name',
+            field=models.CharField(blank=True, max_length=140, verbose_name='Counterparty'),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='counterparty_iban',
+            field=models.CharField(blank=True, max_length=34, verbose_name='Counterparty IBAN'),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='remittance_info',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Remittance Info'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'payee'], name='bank_sync_tx_hub_payee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['hub_id', 'is_deleted', 'counterparty_iban'], name='bank_sync_tx_hub_iban_idx'),
+        ),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
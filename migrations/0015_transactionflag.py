@@ -0,0 +1,43 @@
+import uuid
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0014_payees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionFlag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hub_id', models.UUIDField(blank=True, db_index=True, editable=False, help_text='Hub this record belongs to (for multi-tenancy)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.UUIDField(blank=True, help_text='UUID of the user who created this record', null=True)),
+                ('updated_by', models.UUIDField(blank=True, help_text='UUID of the user who last updated this record', null=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag - record is hidden but not removed')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Timestamp when record was soft deleted', null=True)),
+                ('kind', models.CharField(choices=[('duplicate', 'Possible duplicate'), ('anomaly', 'Unusual amount')], max_length=20, verbose_name='Kind')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('dismissed', 'Dismissed')], default='open', max_length=20, verbose_name='Status')),
+                ('score', models.DecimalField(decimal_places=2, default='0', max_digits=8, verbose_name='Score')),
+                ('detail', models.CharField(blank=True, max_length=255, verbose_name='Detail')),
+                ('related', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bank_sync.banktransaction')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='bank_sync.banktransaction')),
+            ],
+            options={
+                'db_table': 'bank_sync_transactionflag',
+                'abstract': False,
+                'indexes': [models.Index(fields=['hub_id', 'is_deleted', 'status', 'created_at'], name='bank_sync_flag_hub_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('transaction', 'kind'), name='bank_sync_flag_tx_kind_uniq')],
+            },
+        ),
+        migrations.AlterField(
+            model_name='banksyncjob',
+            name='kind',
+            field=models.CharField(choices=[('import', 'Statement import'), ('reconcile', 'Auto-reconcile'), ('recompute', 'Balance recompute'), ('sync', 'Bank feed sync'), ('categorize', 'Re-apply categorization rules'), ('detect', 'Duplicate and anomaly detection')], max_length=50, verbose_name='Kind'),
+        ),
+    ]
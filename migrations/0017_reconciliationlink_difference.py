@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_sync', '0016_fxrate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reconciliationlink',
+            name='difference',
+            field=models.DecimalField(decimal_places=2, default='0', max_digits=14, verbose_name='Difference'),
+        ),
+    ]
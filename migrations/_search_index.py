@@ -0,0 +1,68 @@
+"""
+Search index DDL as of the migrations that use it, frozen so that later edits
+to ``bank_sync.search`` cannot change what an old migration does.
+
+On SQLite Django rebuilds ``bank_sync_banktransaction`` for most schema
+changes, which drops the FTS triggers, so migrations that alter that table
+end with ``RunPython(install_search_index, RunPython.noop)``.
+"""
+from django.db import DatabaseError, transaction
+
+FTS_TABLE = 'bank_sync_tx_fts'
+TRGM_INDEX = 'bank_sync_tx_search_trgm_idx'
+TX_TABLE = 'bank_sync_banktransaction'
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"search_text, content='{TX_TABLE}', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TX_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.rowid, new.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TX_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.rowid, old.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON {TX_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.rowid, old.search_text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.rowid, new.search_text); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_TRGM_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON {TX_TABLE} USING gin (search_text gin_trgm_ops)',
+]
+
+POSTGRES_DROP_SQL = [
+    f'DROP INDEX IF EXISTS {TRGM_INDEX}',
+]
+
+
+def install_search_index(apps, schema_editor):
+    """FTS5 table and triggers on SQLite, pg_trgm index on PostgreSQL; skipped where unavailable."""
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        statements = SQLITE_DROP_SQL[:3] + SQLITE_FTS_SQL
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRES_TRGM_SQL
+    else:
+        return
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    except DatabaseError:
+        pass  # search falls back to LIKE
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    statements = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRES_DROP_SQL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
@@ -0,0 +1,230 @@
+"""
+Local mock of a Berlin Group NextGenPSD2 bank for tests and benchmarks.
+
+    python -m bank_sync.mockbank --port 8765 --accounts 5000 --transactions 400
+
+Serves ``/v1/accounts``, ``/v1/accounts/<id>/balances`` and
+``/v1/accounts/<id>/transactions`` (``bookingStatus``, ``dateFrom``, paged
+through ``_links.next``) from deterministic synthetic data: transaction ``k``
+of an account is always the same, so repeated syncs see the same history.
+The first transactions page carries an ``ETag`` and honours
+``If-None-Match`` with a 304 while nothing new was booked.
+``grow(n)`` appends ``n`` new transactions per account. ``latency`` adds a
+delay per request and ``failure_rate`` answers that share of requests with
+503/429 to exercise retry and backoff.
+
+Standard library only (``http.server`` with HTTP/1.1 keep-alive); one thread
+per connection, so it is meant for local runs, not production loads.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+UNKNOWN = {'tppMessages': [{'category': 'ERROR', 'code': 'RESOURCE_UNKNOWN'}]}
+
+PAYEES = [
+    'MERCADONA', 'IBERDROLA CLIENTES', 'AMAZON EU SARL', 'NOMINA ACME SL', 'REPSOL ESTACION',
+    'TELEFONICA DE ESPANA', 'SEGUROS MAPFRE', 'TRANSFERENCIA CLIENTE', 'COMISION MANTENIMIENTO',
+]
+
+
+class MockBank:
+    def __init__(self, accounts=100, transactions=200, page_size=100, per_day=2,
+                 start=date(2026, 1, 1), opening=Decimal('1000.00'), latency=0.0, failure_rate=0.0, seed=7):
+        self.accounts = accounts
+        self.transactions = transactions
+        self.page_size = page_size
+        self.per_day = per_day
+        self.start = start
+        self.opening = opening
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._failures = random.Random(seed)
+
+    # -- data ----------------------------------------------------------
+
+    @staticmethod
+    def resource_id(index):
+        return f'acc-{index:06d}'
+
+    def account_index(self, resource_id):
+        try:
+            index = int(resource_id.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return None
+        return index if 0 <= index < self.accounts else None
+
+    def account(self, index):
+        return {
+            'resourceId': self.resource_id(index),
+            'iban': f'ES00MOCK{index:016d}',
+            'currency': 'EUR',
+            'name': f'Mock account {index}',
+            'product': 'Current account',
+        }
+
+    def transaction(self, index, k):
+        rnd = random.Random(f'{self.seed}:{index}:{k}')
+        payee = rnd.choice(PAYEES)
+        return {
+            'transactionId': f'{self.resource_id(index)}-{k:08d}',
+            'bookingDate': (self.start + timedelta(days=k // self.per_day)).isoformat(),
+            'transactionAmount': {'amount': f'{rnd.randint(-25000, 40000) / 100:.2f}', 'currency': 'EUR'},
+            'remittanceInformationUnstructured': f'{payee} REF {rnd.randint(1000, 999999)}',
+        }
+
+    def balance(self, index):
+        total = sum(Decimal(self.transaction(index, k)['transactionAmount']['amount']) for k in range(self.transactions))
+        return self.opening + total
+
+    def grow(self, count):
+        self.transactions += count
+
+    # -- requests ------------------------------------------------------
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self.failure_rate and self._failures.random() < self.failure_rate:
+                self.failures += 1
+                return True
+        return False
+
+    def etag(self, resource_id):
+        # Version of the account's booked list: changes whenever something is booked.
+        return f'"{resource_id}-{self.transactions}"'
+
+    def handle(self, path, query, if_none_match=None):
+        """Return ``(status, payload, headers)`` for a GET."""
+        parts = [p for p in path.split('/') if p]
+        if parts == ['v1', 'accounts']:
+            return 200, {'accounts': [self.account(i) for i in range(self.accounts)]}, {}
+        if len(parts) != 4 or parts[:2] != ['v1', 'accounts']:
+            return 404, UNKNOWN, {}
+        index = self.account_index(parts[2])
+        if index is None:
+            return 404, UNKNOWN, {}
+        if parts[3] == 'balances':
+            return 200, {'balances': [{
+                'balanceType': 'closingBooked',
+                'balanceAmount': {'amount': f'{self.balance(index):.2f}', 'currency': 'EUR'},
+            }]}, {}
+        if parts[3] == 'transactions':
+            if 'offset' in query:
+                return 200, {'transactions': self.transactions_page(index, parts[2], query)}, {}
+            etag = self.etag(parts[2])
+            if if_none_match == etag:
+                return 304, None, {'ETag': etag}
+            return 200, {'transactions': self.transactions_page(index, parts[2], query)}, {'ETag': etag}
+        return 404, UNKNOWN, {}
+
+    def transactions_page(self, index, resource_id, query):
+        first = 0
+        if query.get('dateFrom'):
+            try:
+                first = max((date.fromisoformat(query['dateFrom']) - self.start).days, 0) * self.per_day
+            except ValueError:
+                first = 0
+        try:
+            offset = max(int(query.get('offset', 0)), 0)
+        except ValueError:
+            offset = 0
+        begin = first + offset
+        end = min(begin + self.page_size, self.transactions)
+        report = {'booked': [self.transaction(index, k) for k in range(begin, end)], 'pending': []}
+        if end < self.transactions:
+            params = {'bookingStatus': 'booked', 'offset': offset + self.page_size}
+            if query.get('dateFrom'):
+                params['dateFrom'] = query['dateFrom']
+            report['_links'] = {'next': {'href': f'/v1/accounts/{resource_id}/transactions?{urlencode(params)}'}}
+        return report
+
+
+class MockBankHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        bank = self.server.bank
+        if bank.latency:
+            time.sleep(bank.latency)
+        if bank.should_fail():
+            status = random.choice((429, 503))
+            self._send(status, {'tppMessages': [{'category': 'ERROR', 'code': 'SERVICE_UNAVAILABLE'}]},
+                       {'Retry-After': '0'})
+            return
+        parts = urlsplit(self.path)
+        status, payload, headers = bank.handle(
+            parts.path, dict(parse_qsl(parts.query)), self.headers.get('If-None-Match'),
+        )
+        self._send(status, payload, headers)
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockBankServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, bank, host='127.0.0.1', port=0):
+        self.bank = bank
+        super().__init__((host, port), MockBankHandler)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_in_thread(bank, host='127.0.0.1', port=0):
+    """Serve ``bank`` from a daemon thread; returns the server (``shutdown()`` to stop)."""
+    server = MockBankServer(bank, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=200, help='Transactions per account')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered 503/429')
+    args = parser.parse_args(argv)
+    bank = MockBank(accounts=args.accounts, transactions=args.transactions, page_size=args.page_size,
+                    latency=args.latency, failure_rate=args.failure_rate)
+    server = MockBankServer(bank, args.host, args.port)
+    print(f'mock PSD2 bank with {args.accounts} accounts on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
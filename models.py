@@ -3,6 +3,9 @@ from django.utils.translation import gettext_lazy as _
 
 from apps.core.models.base import HubBaseModel
 
+from .counterparty import extract_counterparty
+from .normalize import search_document
+
 class BankAccount(HubBaseModel):
     name = models.CharField(max_length=255, verbose_name=_('Name'))
     bank_name = models.CharField(max_length=255, blank=True, verbose_name=_('Bank Name'))
@@ -10,10 +13,44 @@ class BankAccount(HubBaseModel):
     iban = models.CharField(max_length=34, blank=True, verbose_name=_('Iban'))
     currency = models.CharField(max_length=3, default='EUR', verbose_name=_('Currency'))
     balance = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Balance'))
+    # Balance before the first transaction; balance and balance_after are derived from it (see balances.py).
+    opening_balance = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Opening Balance'))
     is_active = models.BooleanField(default=True, verbose_name=_('Is Active'))
+    # Bank feed (see providers.py); blank for accounts fed by statement files only.
+    provider = models.CharField(max_length=50, blank=True, verbose_name=_('Provider'))
+    external_id = models.CharField(max_length=100, blank=True, verbose_name=_('External ID'))
 
     class Meta(HubBaseModel.Meta):
         db_table = 'bank_sync_bankaccount'
+        indexes = [
+            models.Index(fields=['hub_id', 'is_deleted', 'name'], name='bank_sync_acct_hub_name_idx'),
+            models.Index(fields=['hub_id', 'provider', 'external_id'], name='bank_sync_acct_provider_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.opening_balance:
+            self.opening_balance = self.balance
+        super().save(*args, **kwargs)
+
+
+class Payee(HubBaseModel):
+    name = models.CharField(max_length=140, verbose_name=_('Name'))
+    # counterparty.payee_key(name): spellings of one party ("ACME, S.L.", "Acme SL") share a payee.
+    key = models.CharField(max_length=140, verbose_name=_('Key'))
+    iban = models.CharField(max_length=34, blank=True, verbose_name=_('Iban'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_payee'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hub_id', 'key'],
+                condition=models.Q(is_deleted=False),
+                name='bank_sync_payee_key_uniq',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -23,14 +60,324 @@ class BankTransaction(HubBaseModel):
     account = models.ForeignKey('BankAccount', on_delete=models.CASCADE, related_name='transactions')
     date = models.DateField(verbose_name=_('Date'))
     description = models.CharField(max_length=255, verbose_name=_('Description'))
+    # Extracted from the description on save and import, see counterparty.py and payees.py.
+    payee = models.ForeignKey('Payee', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    counterparty_name = models.CharField(max_length=140, blank=True, verbose_name=_('Counterparty'))
+    counterparty_iban = models.CharField(max_length=34, blank=True, verbose_name=_('Counterparty IBAN'))
+    remittance_info = models.CharField(max_length=255, blank=True, verbose_name=_('Remittance Info'))
     amount = models.DecimalField(max_digits=14, decimal_places=2, verbose_name=_('Amount'))
     balance_after = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Balance After'))
+    # Order within a booking day (statement order); ties on date are broken by seq, then id.
+    seq = models.BigIntegerField(default=0, editable=False, verbose_name=_('Sequence'))
     is_reconciled = models.BooleanField(default=False, verbose_name=_('Is Reconciled'))
     reference = models.CharField(max_length=100, blank=True, verbose_name=_('Reference'))
+    category = models.CharField(max_length=100, blank=True, verbose_name=_('Category'))
+    # Comma-separated, e.g. "fuel,car"; set by categorization rules (see rules.py).
+    tags = models.CharField(max_length=255, blank=True, verbose_name=_('Tags'))
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False, verbose_name=_('Fingerprint'))
+    # Normalised description + reference; indexed per database vendor, see search.py.
+    search_text = models.CharField(max_length=400, blank=True, editable=False, verbose_name=_('Search Text'))
 
     class Meta(HubBaseModel.Meta):
         db_table = 'bank_sync_banktransaction'
+        constraints = [
+            # Imported lines are unique per account; manual entries have no fingerprint.
+            models.UniqueConstraint(
+                fields=['account', 'fingerprint'],
+                condition=models.Q(is_deleted=False) & ~models.Q(fingerprint=''),
+                name='bank_sync_tx_fingerprint_uniq',
+            ),
+        ]
+        indexes = [
+            # Hot list/filter paths: per-account history and the unreconciled queue.
+            models.Index(fields=['hub_id', 'is_deleted', 'account', 'date'], name='bank_sync_tx_hub_acct_date_idx'),
+            models.Index(fields=['hub_id', 'is_deleted', 'is_reconciled', 'date'], name='bank_sync_tx_hub_rec_date_idx'),
+            models.Index(fields=['hub_id', 'is_deleted', 'reference'], name='bank_sync_tx_hub_ref_idx'),
+            models.Index(fields=['hub_id', 'is_deleted', 'category'], name='bank_sync_tx_hub_cat_idx'),
+            models.Index(fields=['hub_id', 'is_deleted', 'payee'], name='bank_sync_tx_hub_payee_idx'),
+            models.Index(fields=['hub_id', 'is_deleted', 'counterparty_iban'], name='bank_sync_tx_hub_iban_idx'),
+        ]
 
     def __str__(self):
         return self.reference
 
+    @property
+    def tag_list(self):
+        return [tag for tag in self.tags.split(',') if tag]
+
+    def save(self, *args, **kwargs):
+        self.search_text = search_document(self.description, self.reference)
+        party = extract_counterparty(self.description)
+        self.counterparty_name, self.counterparty_iban, self.remittance_info = party.name, party.iban, party.remittance
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'description', 'reference'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_text', 'counterparty_name', 'counterparty_iban',
+                                       'remittance_info'}
+        super().save(*args, **kwargs)
+
+
+class ReconciliationLink(HubBaseModel):
+    transaction = models.ForeignKey('BankTransaction', on_delete=models.CASCADE, related_name='reconciliation_links')
+    document_type = models.CharField(max_length=50, verbose_name=_('Document Type'))
+    document_id = models.CharField(max_length=64, verbose_name=_('Document ID'))
+    amount = models.DecimalField(max_digits=14, decimal_places=2, verbose_name=_('Allocated Amount'))
+    # Document amount minus ``amount`` for a match within the amount tolerance.
+    difference = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Difference'))
+    score = models.DecimalField(max_digits=5, decimal_places=4, default='0', verbose_name=_('Match Score'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_reconciliationlink'
+        indexes = [
+            models.Index(fields=['document_type', 'document_id'], name='bank_sync_link_document_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.document_type} {self.document_id}'
+
+
+class ReconciliationAuditEntry(HubBaseModel):
+    ACTION_RECONCILE = 'reconcile'
+    ACTION_UNRECONCILE = 'unreconcile'
+    ACTION_CHOICES = [
+        (ACTION_RECONCILE, _('Reconciled')),
+        (ACTION_UNRECONCILE, _('Unreconciled')),
+    ]
+    SOURCE_CHOICES = [
+        ('bulk', _('Bulk action')),
+        ('assistant', _('Assistant')),
+    ]
+
+    transaction = models.ForeignKey('BankTransaction', on_delete=models.CASCADE, related_name='reconciliation_audit')
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES, verbose_name=_('Action'))
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='bulk', verbose_name=_('Source'))
+    # Shared by every row changed in one bulk request.
+    batch_id = models.UUIDField(db_index=True, verbose_name=_('Batch'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_reconciliationauditentry'
+        indexes = [
+            models.Index(fields=['hub_id', 'created_at'], name='bank_sync_audit_hub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.action} {self.transaction_id}'
+
+
+class TransactionFlag(HubBaseModel):
+    KIND_DUPLICATE = 'duplicate'
+    KIND_ANOMALY = 'anomaly'
+    KIND_CHOICES = [
+        (KIND_DUPLICATE, _('Possible duplicate')),
+        (KIND_ANOMALY, _('Unusual amount')),
+    ]
+    STATUS_OPEN = 'open'
+    STATUS_DISMISSED = 'dismissed'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, _('Open')),
+        (STATUS_DISMISSED, _('Dismissed')),
+    ]
+
+    transaction = models.ForeignKey('BankTransaction', on_delete=models.CASCADE, related_name='flags')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name=_('Kind'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN, verbose_name=_('Status'))
+    # The earlier line a duplicate repeats.
+    related = models.ForeignKey('BankTransaction', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # Description similarity for duplicates, deviations from the payee's mean for anomalies.
+    score = models.DecimalField(max_digits=8, decimal_places=2, default='0', verbose_name=_('Score'))
+    detail = models.CharField(max_length=255, blank=True, verbose_name=_('Detail'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_transactionflag'
+        constraints = [
+            # Detection re-runs skip rows already flagged, dismissed ones included.
+            models.UniqueConstraint(
+                fields=['transaction', 'kind'],
+                condition=models.Q(is_deleted=False),
+                name='bank_sync_flag_tx_kind_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hub_id', 'is_deleted', 'status', 'created_at'], name='bank_sync_flag_hub_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.transaction_id}'
+
+
+class CategorizationRule(HubBaseModel):
+    MATCH_CONTAINS = 'contains'
+    MATCH_REGEX = 'regex'
+    MATCH_CHOICES = [
+        (MATCH_CONTAINS, _('Description contains')),
+        (MATCH_REGEX, _('Description matches regex')),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name=_('Name'))
+    # Lower runs first; the first matching rule sets the category, every match adds its tags.
+    priority = models.PositiveIntegerField(default=100, verbose_name=_('Priority'))
+    match_type = models.CharField(max_length=20, choices=MATCH_CHOICES, default=MATCH_CONTAINS, verbose_name=_('Match'))
+    # Empty: the rule matches on its other conditions only.
+    pattern = models.CharField(max_length=255, blank=True, verbose_name=_('Pattern'))
+    min_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, verbose_name=_('Min Amount'))
+    max_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, verbose_name=_('Max Amount'))
+    account = models.ForeignKey('BankAccount', on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='categorization_rules')
+    counterparty_iban = models.CharField(max_length=34, blank=True, verbose_name=_('Counterparty IBAN'))
+    category = models.CharField(max_length=100, blank=True, verbose_name=_('Category'))
+    tags = models.CharField(max_length=255, blank=True, verbose_name=_('Tags'))
+    is_active = models.BooleanField(default=True, verbose_name=_('Is Active'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_categorizationrule'
+        indexes = [
+            models.Index(fields=['hub_id', 'is_deleted', 'is_active', 'priority'], name='bank_sync_rule_hub_prio_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class BankAccountDailyBalance(HubBaseModel):
+    account = models.ForeignKey('BankAccount', on_delete=models.CASCADE, related_name='daily_balances')
+    day = models.DateField(verbose_name=_('Day'))
+    opening = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Opening Balance'))
+    inflow = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Inflow'))
+    outflow = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Outflow'))
+    closing = models.DecimalField(max_digits=14, decimal_places=2, default='0', verbose_name=_('Closing Balance'))
+    transaction_count = models.PositiveIntegerField(default=0, verbose_name=_('Transactions'))
+    unreconciled_count = models.PositiveIntegerField(default=0, verbose_name=_('Unreconciled'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_bankaccountdailybalance'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'day'], name='bank_sync_daily_account_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hub_id', 'day'], name='bank_sync_daily_hub_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.account_id} {self.day}'
+
+
+class FxRate(HubBaseModel):
+    # One unit of ``base`` buys ``rate`` units of ``quote`` on ``day`` (ECB style: base EUR, quote USD, 1.0812).
+    day = models.DateField(verbose_name=_('Day'))
+    base = models.CharField(max_length=3, verbose_name=_('Base Currency'))
+    quote = models.CharField(max_length=3, verbose_name=_('Quote Currency'))
+    rate = models.DecimalField(max_digits=18, decimal_places=8, verbose_name=_('Rate'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_fxrate'
+        constraints = [
+            # Also serves the "latest rate on or before a day" lookup of fx.py.
+            models.UniqueConstraint(
+                fields=['hub_id', 'base', 'quote', 'day'],
+                condition=models.Q(is_deleted=False),
+                name='bank_sync_fx_pair_day_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.base}/{self.quote} {self.rate}'
+
+
+class BankSyncState(HubBaseModel):
+    account = models.OneToOneField('BankAccount', on_delete=models.CASCADE, related_name='sync_state')
+    # Opaque provider cursor; the next sync fetches what was booked after it.
+    cursor = models.CharField(max_length=255, blank=True, verbose_name=_('Cursor'))
+    last_synced_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Last Synced At'))
+    last_error = models.CharField(max_length=500, blank=True, verbose_name=_('Last Error'))
+    failure_count = models.PositiveIntegerField(default=0, verbose_name=_('Consecutive Failures'))
+    # Delta state: newest booking date imported, and the provider ids already
+    # imported on that day, so the overlapping boundary day is dropped before
+    # it reaches the database.
+    last_booking_date = models.DateField(null=True, blank=True, verbose_name=_('Last Booking Date'))
+    boundary_ids = models.JSONField(default=list, blank=True, verbose_name=_('Boundary Transaction IDs'))
+    etag = models.CharField(max_length=255, blank=True, verbose_name=_('ETag'))
+    last_balance = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, verbose_name=_('Last Reported Balance'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_banksyncstate'
+
+    def __str__(self):
+        return f'{self.account_id} @ {self.cursor or "-"}'
+
+
+class BankSyncRun(HubBaseModel):
+    provider = models.CharField(max_length=50, verbose_name=_('Provider'))
+    started_at = models.DateTimeField(verbose_name=_('Started At'))
+    duration_ms = models.PositiveIntegerField(default=0, verbose_name=_('Duration (ms)'))
+    accounts = models.PositiveIntegerField(default=0, verbose_name=_('Accounts'))
+    accounts_failed = models.PositiveIntegerField(default=0, verbose_name=_('Failed Accounts'))
+    accounts_unchanged = models.PositiveIntegerField(default=0, verbose_name=_('Unchanged Accounts'))
+    requests = models.PositiveIntegerField(default=0, verbose_name=_('Requests'))
+    retries = models.PositiveIntegerField(default=0, verbose_name=_('Retries'))
+    rows_fetched = models.PositiveIntegerField(default=0, verbose_name=_('Rows Fetched'))
+    rows_written = models.PositiveIntegerField(default=0, verbose_name=_('Rows Written'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_banksyncrun'
+        indexes = [
+            models.Index(fields=['hub_id', 'started_at'], name='bank_sync_run_hub_started_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.provider} {self.started_at:%Y-%m-%d %H:%M}'
+
+
+class BankSyncJob(HubBaseModel):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _('Queued')),
+        (STATUS_RUNNING, _('Running')),
+        (STATUS_DONE, _('Done')),
+        (STATUS_FAILED, _('Failed')),
+        (STATUS_CANCELLED, _('Cancelled')),
+    ]
+    FINISHED = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+    KIND_CHOICES = [
+        ('import', _('Statement import')),
+        ('reconcile', _('Auto-reconcile')),
+        ('recompute', _('Balance recompute')),
+        ('sync', _('Bank feed sync')),
+        ('categorize', _('Re-apply categorization rules')),
+        ('detect', _('Duplicate and anomaly detection')),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, verbose_name=_('Kind'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name=_('Status'))
+    params = models.JSONField(default=dict, blank=True, verbose_name=_('Parameters'))
+    # Handler-defined resume point, saved with every progress update (see jobs.py).
+    checkpoint = models.JSONField(default=dict, blank=True, verbose_name=_('Checkpoint'))
+    progress = models.PositiveIntegerField(default=0, verbose_name=_('Progress'))
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Total'))
+    message = models.CharField(max_length=255, blank=True, verbose_name=_('Message'))
+    result = models.JSONField(null=True, blank=True, verbose_name=_('Result'))
+    error = models.TextField(blank=True, verbose_name=_('Error'))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_('Attempts'))
+    cancel_requested = models.BooleanField(default=False, verbose_name=_('Cancel Requested'))
+    run_after = models.DateTimeField(null=True, blank=True, verbose_name=_('Run After'))
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name=_('Worker'))
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Heartbeat'))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Started At'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Finished At'))
+
+    class Meta(HubBaseModel.Meta):
+        db_table = 'bank_sync_banksyncjob'
+        indexes = [
+            # Worker claim path: oldest runnable queued job.
+            models.Index(fields=['status', 'run_after', 'created_at'], name='bank_sync_job_claim_idx'),
+            models.Index(fields=['hub_id', 'created_at'], name='bank_sync_job_hub_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} ({self.status})'
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED
@@ -30,6 +30,7 @@ PERMISSIONS = [
 'bank_sync.change_bankaccount',
 'bank_sync.view_banktransaction',
 'bank_sync.reconcile_transaction',
+'bank_sync.import_transactions',
 'bank_sync.manage_settings',
 ]
 
@@ -38,6 +39,7 @@ ROLE_PERMISSIONS = {
     "manager": [
         "add_bankaccount",
         "change_bankaccount",
+        "import_transactions",
         "reconcile_transaction",
         "view_bankaccount",
         "view_banktransaction",
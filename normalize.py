@@ -0,0 +1,44 @@
+"""
+Text normalisation and content fingerprints for bank transactions.
+"""
+import hashlib
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(value):
+    """Case-fold, strip accents and punctuation, collapse whitespace."""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+    return _NON_ALNUM.sub(' ', value).strip()
+
+
+def transaction_fingerprint(account_id, booked, amount, description, reference, occurrence=0):
+    """
+    Stable content hash identifying a statement line within an account.
+
+    ``occurrence`` distinguishes genuinely repeated lines (two identical card
+    payments on the same day): the importer numbers them 0, 1, 2... in
+    statement order, so re-importing the same period yields the same hashes.
+    """
+    key = '|'.join((
+        str(account_id),
+        booked.isoformat(),
+        f'{amount:.2f}',
+        normalize_text(description),
+        normalize_text(reference),
+        str(occurrence),
+    ))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def search_document(description, reference):
+    """
+    The ``search_text`` stored on a transaction.
+
+    Normalised words with a leading space, so a word-prefix search is a plain
+    ``LIKE '% term%'`` that a trigram index can serve.
+    """
+    return ' ' + ' '.join(filter(None, (normalize_text(description), normalize_text(reference))))
@@ -0,0 +1,156 @@
+"""
+Keyset (cursor) pagination for the module's list views.
+
+Pages are addressed by an opaque cursor holding the sort value and primary key
+of the boundary row, so every page - first or ten-thousandth - is one indexed
+range scan of ``per_page + 1`` rows. There is no ``OFFSET`` and no exact
+``COUNT(*)``: the total shown in the footer is the planner's row estimate on
+PostgreSQL and a briefly cached count elsewhere.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 500
+PER_PAGE_CHOICES = [12, 24, 48, 96, MAX_PAGE_SIZE]
+COUNT_CACHE_SECONDS = 60
+
+
+def clamp_per_page(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a ``per_page`` request value; ``0`` (the old "All") means the cap."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    if value == 0:
+        return MAX_PAGE_SIZE
+    return value if value in PER_PAGE_CHOICES else default
+
+
+def encode_cursor(value, pk, direction):
+    payload = json.dumps({'v': str(value), 'k': str(pk), 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if data['d'] not in ('next', 'prev'):
+            return None
+        return data
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _resolve_field(model, path):
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def _value(obj, path):
+    if isinstance(obj, dict):
+        return obj[path]
+    for part in path.split('__'):
+        obj = getattr(obj, part)
+    return obj
+
+
+class KeysetPage:
+    """A page of rows plus the cursors to its neighbours; iterable like a Django ``Page``."""
+
+    def __init__(self, object_list, per_page, has_next, has_previous, next_cursor, previous_cursor, total=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def keyset_paginate(qs, sort_field, descending=False, cursor=None, per_page=DEFAULT_PAGE_SIZE, total=None):
+    """
+    Return a ``KeysetPage`` of ``qs`` ordered by ``(sort_field, pk)``.
+
+    ``sort_field`` may span a relation (``account__name``); the queryset
+    should ``select_related`` it. A ``.values()`` queryset works too when it
+    includes ``pk`` and ``sort_field``. An invalid or stale cursor falls back
+    to the first page.
+    """
+    per_page = min(max(int(per_page), 1), MAX_PAGE_SIZE)
+    position = decode_cursor(cursor)
+    if position:
+        try:
+            value = _resolve_field(qs.model, sort_field).to_python(position['v'])
+            position['k'] = qs.model._meta.pk.to_python(position['k'])
+        except ValidationError:
+            position = None
+    backwards = bool(position) and position['d'] == 'prev'
+    scan_desc = descending != backwards
+
+    if scan_desc:
+        qs = qs.order_by(f'-{sort_field}', '-pk')
+    else:
+        qs = qs.order_by(sort_field, 'pk')
+    if position:
+        op = 'lt' if scan_desc else 'gt'
+        qs = qs.filter(Q(**{f'{sort_field}__{op}': value}) | Q(**{sort_field: value, f'pk__{op}': position['k']}))
+
+    rows = list(qs[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_previous = True, more
+    else:
+        has_next, has_previous = more, position is not None
+
+    first, last = (rows[0], rows[-1]) if rows else (None, None)
+    return KeysetPage(
+        rows,
+        per_page,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=encode_cursor(_value(last, sort_field), _value(last, 'pk'), 'next') if has_next and last else '',
+        previous_cursor=encode_cursor(_value(first, sort_field), _value(first, 'pk'), 'prev') if has_previous and first else '',
+        total=total,
+    )
+
+
+def approximate_count(qs):
+    """
+    Cheap row-count estimate for list footers.
+
+    PostgreSQL: the planner's estimate from ``EXPLAIN`` (no table scan).
+    Other backends: an exact count cached for ``COUNT_CACHE_SECONDS`` per
+    distinct query, so repeated sort/search keystrokes do not recount.
+    """
+    qs = qs.order_by()
+    if connections[qs.db].vendor == 'postgresql':
+        try:
+            plan = json.loads(qs.explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception:
+            pass
+    key = 'bank_sync:count:' + hashlib.md5(str(qs.query).encode()).hexdigest()
+    return cache.get_or_set(key, qs.count, COUNT_CACHE_SECONDS)
@@ -0,0 +1,274 @@
+"""
+Streaming bank statement parsers.
+
+Every parser takes a binary file object and yields ``StatementLine`` tuples one
+at a time, so memory use does not depend on the size of the statement. Values
+are yielded as raw strings; ``clean_line`` turns them into typed values so the
+importer can validate a chunk at a time and report bad lines without aborting
+the whole file. The parsers have no Django dependency and can be used (and
+benchmarked) standalone.
+"""
+import csv
+import io
+import re
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+StatementLine = namedtuple('StatementLine', ['line_no', 'date', 'amount', 'description', 'reference'])
+
+
+class StatementParseError(ValueError):
+    """Raised when a statement cannot be read at all (bad header, broken XML)."""
+
+    def __init__(self, line_no, message):
+        super().__init__(f'line {line_no}: {message}')
+        self.line_no = line_no
+
+
+# ----------------------------------------------------------------------
+# Value helpers
+# ----------------------------------------------------------------------
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y%m%d', '%m/%d/%Y')
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    if not value:
+        raise ValueError('empty date')
+    # ISO datetimes and OFX timestamps (20260131120000[0:GMT]) keep the day only.
+    if len(value) > 10 and value[:8].isdigit():
+        value = value[:8]
+    elif len(value) > 10 and value[4] == '-':
+        value = value[:10]
+    try:
+        if len(value) == 10 and value[4] == '-':
+            return date.fromisoformat(value)
+        if len(value) == 8 and value.isdigit():
+            return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'unrecognised date {value!r}')
+
+
+def parse_amount(value):
+    value = (value or '').strip().replace(' ', '').replace(' ', '')
+    if not value:
+        raise ValueError('empty amount')
+    # Accept both 1.234,56 and 1,234.56; the right-most separator is the decimal one.
+    if ',' in value and '.' in value:
+        if value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '').replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    elif ',' in value:
+        value = value.replace(',', '.')
+    try:
+        return Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'unrecognised amount {value!r}')
+
+
+def _text_stream(stream, encoding='utf-8-sig'):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+
+
+# ----------------------------------------------------------------------
+# CSV
+# ----------------------------------------------------------------------
+
+CSV_COLUMNS = {
+    'date': ('date', 'booking date', 'booking_date', 'fecha', 'fecha operacion', 'value date'),
+    'description': ('description', 'concept', 'concepto', 'details', 'memo', 'name'),
+    'amount': ('amount', 'importe', 'value'),
+    'debit': ('debit', 'cargo', 'withdrawal'),
+    'credit': ('credit', 'abono', 'deposit'),
+    'reference': ('reference', 'referencia', 'ref', 'id'),
+}
+
+
+def _resolve_columns(fieldnames):
+    normalized = {(name or '').strip().lower(): name for name in fieldnames or []}
+    columns = {}
+    for key, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[key] = normalized[alias]
+                break
+    if 'date' not in columns or not ('amount' in columns or 'debit' in columns or 'credit' in columns):
+        raise StatementParseError(1, 'CSV header needs a date column and an amount (or debit/credit) column')
+    return columns
+
+
+def parse_csv(stream, delimiter=None):
+    text = _text_stream(stream)
+    if delimiter is None:
+        sample = text.readline()
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        text = _chain_first_line(sample, text)
+    reader = csv.DictReader(text, delimiter=delimiter)
+    columns = _resolve_columns(reader.fieldnames)
+    for row in reader:
+        amount = (row.get(columns.get('amount', ''), '') or '').strip()
+        if not amount:
+            credit = (row.get(columns.get('credit', ''), '') or '').strip()
+            debit = (row.get(columns.get('debit', ''), '') or '').strip().lstrip('-')
+            amount = credit or (f'-{debit}' if debit else '')
+        yield StatementLine(
+            reader.line_num,
+            row.get(columns['date']) or '',
+            amount,
+            (row.get(columns.get('description', ''), '') or '').strip(),
+            (row.get(columns.get('reference', ''), '') or '').strip(),
+        )
+
+
+def _chain_first_line(first, rest):
+    yield first
+    yield from rest
+
+
+# ----------------------------------------------------------------------
+# ISO 20022 CAMT.053
+# ----------------------------------------------------------------------
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _flatten(elem, prefix='', out=None):
+    """Map namespace-free child paths (``BookgDt/Dt``) to their text, first occurrence wins."""
+    if out is None:
+        out = {}
+    for child in elem:
+        path = prefix + _local(child.tag)
+        if path not in out:
+            out[path] = (child.text or '').strip()
+        if len(child):
+            _flatten(child, path + '/', out)
+    return out
+
+
+def parse_camt053(stream):
+    stack = []
+    line_no = 0
+    try:
+        for event, elem in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                continue
+            stack.pop()
+            if _local(elem.tag) != 'Ntry':
+                continue
+            line_no += 1
+            values = _flatten(elem)
+            get = values.get
+            amount = get('Amt', '')
+            if get('CdtDbtInd') == 'DBIT':
+                amount = f'-{amount}'
+            booked = get('BookgDt/Dt') or get('BookgDt/DtTm') or get('ValDt/Dt', '')
+            description = get('AddtlNtryInf') \
+                or get('NtryDtls/TxDtls/RmtInf/Ustrd') \
+                or get('NtryDtls/TxDtls/RltdPties/Cdtr/Nm') \
+                or get('NtryDtls/TxDtls/RltdPties/Dbtr/Nm', '')
+            reference = get('AcctSvcrRef') \
+                or get('NtryDtls/TxDtls/Refs/EndToEndId') \
+                or get('NtryRef', '')
+            # Detach the processed entry so the tree never grows past one <Ntry>.
+            if stack:
+                stack[-1].remove(elem)
+            yield StatementLine(line_no, booked, amount, description, reference)
+    except ET.ParseError as e:
+        raise StatementParseError(line_no + 1, f'invalid XML ({e})')
+
+
+# ----------------------------------------------------------------------
+# OFX (SGML 1.x and XML 2.x)
+# ----------------------------------------------------------------------
+
+_OFX_TOKEN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _ofx_tokens(text, chunk_size=64 * 1024):
+    buffer = ''
+    while True:
+        chunk = text.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        cut = buffer.rfind('<')
+        if cut <= 0:
+            continue
+        for match in _OFX_TOKEN.finditer(buffer, 0, cut):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[cut:]
+    for match in _OFX_TOKEN.finditer(buffer):
+        yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+
+
+def parse_ofx(stream):
+    text = _text_stream(stream, encoding='latin-1')
+    line_no = 0
+    current = None
+    for closing, tag, value in _ofx_tokens(text):
+        if tag == 'STMTTRN':
+            if not closing:
+                current = {}
+                continue
+            if current is None:
+                continue
+            line_no += 1
+            yield StatementLine(
+                line_no,
+                current.get('DTPOSTED', ''),
+                current.get('TRNAMT', ''),
+                ' '.join(filter(None, (current.get('NAME'), current.get('MEMO')))),
+                current.get('FITID') or current.get('CHECKNUM') or current.get('REFNUM', ''),
+            )
+            current = None
+        elif current is not None and not closing and value:
+            current[tag] = value
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'camt053': parse_camt053,
+    'ofx': parse_ofx,
+}
+
+FORMAT_CHOICES = [
+    ('csv', 'CSV'),
+    ('camt053', 'CAMT.053 (ISO 20022)'),
+    ('ofx', 'OFX / QFX'),
+]
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+    if name.endswith('.xml') or '053' in name:
+        return 'camt053'
+    return 'csv'
+
+
+def parse_statement(stream, fmt):
+    try:
+        parser = PARSERS[fmt]
+    except KeyError:
+        raise ValueError(f'Unsupported statement format: {fmt}')
+    return parser(stream)
+
+
+def clean_line(line):
+    """Return ``(date, amount)`` for a raw line or raise ``ValueError``."""
+    return parse_date(line.date), parse_amount(line.amount)
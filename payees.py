@@ -0,0 +1,68 @@
+"""
+Linking transactions to the hub's ``Payee`` rows.
+
+``PayeeResolver.assign`` fills the counterparty columns of a batch of
+transactions from their descriptions (``counterparty.extract_counterparty``)
+and points each at the payee for its name key. Unknown keys cost one
+``key IN (...)`` probe and one ``bulk_create`` per batch; resolved keys are
+remembered for the resolver's lifetime, so an import or backfill looks each
+payee up once. ``ignore_conflicts`` against the unique ``(hub_id, key)``
+index lets concurrent imports create the same payee safely.
+"""
+from . import analytics
+from .bulk import BULK_BATCH_SIZE, batched_ids
+from .counterparty import extract_counterparty
+from .models import BankTransaction, Payee
+
+COUNTERPARTY_FIELDS = ('counterparty_name', 'counterparty_iban', 'remittance_info', 'payee')
+
+
+class PayeeResolver:
+    def __init__(self, hub_id):
+        self.hub_id = hub_id
+        self.ids = {}
+
+    def _resolve(self, parties):
+        missing = {p.key: p for p in parties if p.key not in self.ids}
+        if not missing:
+            return
+        payees = Payee.objects.filter(hub_id=self.hub_id, is_deleted=False)
+        self.ids.update(payees.filter(key__in=list(missing)).values_list('key', 'id'))
+        new = [Payee(hub_id=self.hub_id, name=p.name, key=key, iban=p.iban)
+               for key, p in missing.items() if key not in self.ids]
+        if new:
+            Payee.objects.bulk_create(new, ignore_conflicts=True)
+            self.ids.update(payees.filter(key__in=[p.key for p in new]).values_list('key', 'id'))
+
+    def assign(self, rows):
+        """Set ``counterparty_*``, ``remittance_info`` and ``payee`` on ``rows`` (not saved)."""
+        parties = []
+        for row in rows:
+            party = extract_counterparty(row.description)
+            row.counterparty_name, row.counterparty_iban, row.remittance_info = party.name, party.iban, party.remittance
+            parties.append(party)
+        self._resolve([p for p in parties if p.key])
+        for row, party in zip(rows, parties):
+            row.payee_id = self.ids.get(party.key) if party.key else None
+        return rows
+
+
+def backfill_payees(hub_id, relink=False, batch_size=BULK_BATCH_SIZE):
+    """
+    Fill the counterparty columns of a hub's existing transactions.
+
+    Only rows without a payee are visited unless ``relink``. Returns the
+    number of rows written.
+    """
+    resolver = PayeeResolver(hub_id)
+    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False)
+    if not relink:
+        qs = qs.filter(payee__isnull=True)
+    written = 0
+    for ids in batched_ids(qs, batch_size):
+        rows = list(BankTransaction.objects.filter(pk__in=ids).only('id', 'description', *COUNTERPARTY_FIELDS))
+        resolver.assign(rows)
+        written += BankTransaction.objects.bulk_update(rows, COUNTERPARTY_FIELDS)
+    if written:
+        analytics.invalidate(hub_id)
+    return written
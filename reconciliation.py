@@ -0,0 +1,302 @@
+"""
+Automatic reconciliation service.
+
+Open documents are collected from the installed document modules (invoicing,
+expenses...), indexed once by amount and date (see ``matching``) and matched
+against the hub's unreconciled bank transactions, which are streamed from the
+database in chunks. Other modules can contribute documents with
+``register_document_source``.
+
+Every match is stored as a ``ReconciliationLink`` carrying the allocated
+amount. Documents that are already partly allocated only take part with their
+remaining amount. After the one-to-one pass, the leftovers go through the
+subset-sum passes for split settlements (many documents paid by one transfer,
+one document paid in instalments).
+"""
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import analytics, counters
+from .matching import (
+    DEFAULT_DATE_WINDOW, DEFAULT_MIN_SCORE, DEFAULT_SPLIT_WINDOW, CandidateIndex, Document,
+    TransactionLine, match_many_to_one, match_one_to_many, match_transactions, to_cents,
+)
+from .models import BankTransaction, ReconciliationLink
+from .rollups import affected_days, refresh_affected
+
+UPDATE_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 5000
+MAX_REPORTED_MATCHES = 200
+
+
+# ----------------------------------------------------------------------
+# Document sources
+# ----------------------------------------------------------------------
+
+DOCUMENT_SOURCES = {}
+
+
+def register_document_source(kind, loader):
+    """``loader(hub_id)`` must return an iterable of ``matching.Document``."""
+    DOCUMENT_SOURCES[kind] = loader
+
+
+class ModelDocumentSource:
+    """
+    Reads open documents from another module's model without importing it.
+
+    The model is looked up lazily and the first existing field of each
+    candidate tuple is used, so the source degrades to nothing when the module
+    is not installed. ``sign`` is +1 for receivables (matched by credits) and
+    -1 for payables (matched by debits).
+    """
+
+    def __init__(self, kind, model_label, sign, amount, date, reference=(), counterparty=(),
+                 closed_statuses=('paid', 'cancelled', 'canceled', 'void', 'draft')):
+        self.kind = kind
+        self.model_label = model_label
+        self.sign = sign
+        self.amount = amount
+        self.date = date
+        self.reference = reference
+        self.counterparty = counterparty
+        self.closed_statuses = closed_statuses
+
+    def _field(self, model, candidates):
+        for name in candidates:
+            try:
+                model._meta.get_field(name)
+                return name
+            except FieldDoesNotExist:
+                continue
+        return None
+
+    def __call__(self, hub_id):
+        try:
+            model = apps.get_model(self.model_label)
+        except (LookupError, ValueError):
+            return
+        amount_field = self._field(model, self.amount)
+        date_field = self._field(model, self.date)
+        if not amount_field or not date_field:
+            return
+        reference_field = self._field(model, self.reference)
+        party_field = self._field(model, self.counterparty)
+
+        qs = model._default_manager.all()
+        if self._field(model, ('hub_id',)):
+            qs = qs.filter(hub_id=hub_id)
+        if self._field(model, ('is_deleted',)):
+            qs = qs.filter(is_deleted=False)
+        if self._field(model, ('status',)):
+            qs = qs.exclude(status__in=self.closed_statuses)
+        if self._field(model, ('is_paid',)):
+            qs = qs.filter(is_paid=False)
+
+        columns = ['pk', amount_field, date_field]
+        columns += [f for f in (reference_field, party_field) if f]
+        for row in qs.values_list(*columns).iterator(chunk_size=STREAM_CHUNK_SIZE):
+            values = dict(zip(columns, row))
+            amount, day = values[amount_field], values[date_field]
+            if amount is None or day is None:
+                continue
+            if hasattr(day, 'date'):
+                day = day.date()
+            yield Document(
+                self.kind,
+                str(values['pk']),
+                self.sign * to_cents(amount),
+                day.toordinal(),
+                str(values.get(reference_field) or ''),
+                str(values.get(party_field) or ''),
+            )
+
+
+register_document_source('invoice', ModelDocumentSource(
+    'invoice', 'invoicing.Invoice', +1,
+    amount=('total', 'total_amount', 'amount'),
+    date=('issue_date', 'date', 'invoice_date'),
+    reference=('number', 'invoice_number', 'reference'),
+    counterparty=('customer_name', 'client_name'),
+))
+register_document_source('expense', ModelDocumentSource(
+    'expense', 'expenses.Expense', -1,
+    amount=('amount', 'total', 'total_amount'),
+    date=('date', 'expense_date', 'issue_date'),
+    reference=('reference', 'number', 'invoice_number'),
+    counterparty=('supplier_name', 'vendor_name', 'description'),
+))
+
+
+def allocated_cents(hub_id):
+    """Cents already allocated per ``(document_type, document_id)``, tolerance differences included."""
+    rows = ReconciliationLink.objects.filter(
+        hub_id=hub_id, is_deleted=False, transaction__is_deleted=False,
+    ).values(
+        'document_type', 'document_id',
+    ).annotate(total=Sum(F('amount') + F('difference'))).values_list('document_type', 'document_id', 'total')
+    return {(kind, doc_id): to_cents(total) for kind, doc_id, total in rows}
+
+
+def load_documents(hub_id, kinds=None):
+    """Open documents with their amount reduced by what is already allocated."""
+    allocated = allocated_cents(hub_id)
+    for kind, loader in DOCUMENT_SOURCES.items():
+        if kinds and kind not in kinds:
+            continue
+        for doc in loader(hub_id):
+            taken = allocated.get((doc.kind, doc.id))
+            if taken:
+                remaining = doc.cents - taken
+                if remaining * doc.cents <= 0:
+                    continue
+                doc = doc._replace(cents=remaining)
+            yield doc
+
+
+# ----------------------------------------------------------------------
+# Service
+# ----------------------------------------------------------------------
+
+@dataclass
+class ReconcileResult:
+    documents: int = 0
+    examined: int = 0
+    matched: int = 0
+    split_matched: int = 0
+    links: int = 0
+    matches: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+def _transaction_allocated_cents(transaction_ids=None, hub_id=None):
+    """Cents already allocated per transaction, for ``transaction_ids`` or the hub's open lines."""
+    links = ReconciliationLink.objects.filter(is_deleted=False)
+    if transaction_ids is not None:
+        links = links.filter(transaction_id__in=transaction_ids)
+    else:
+        links = links.filter(hub_id=hub_id, transaction__is_reconciled=False, transaction__is_deleted=False)
+    rows = links.values('transaction_id').annotate(total=Sum('amount')).values_list('transaction_id', 'total')
+    return {pk: to_cents(total) for pk, total in rows}
+
+
+def unreconciled_lines(hub_id, account_id=None):
+    """Open lines with their amount reduced by what earlier partial matches already allocated."""
+    allocated = _transaction_allocated_cents(hub_id=hub_id)
+    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False, is_reconciled=False)
+    if account_id:
+        qs = qs.filter(account_id=account_id)
+    rows = qs.values_list('id', 'amount', 'date', 'description', 'reference').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    for pk, amount, day, description, reference in rows:
+        cents = to_cents(amount) - allocated.get(pk, 0)
+        if cents * to_cents(amount) <= 0:
+            continue
+        yield TransactionLine(pk, cents, day.toordinal(), f'{description} {reference}')
+
+
+def auto_reconcile(hub_id, account_id=None, date_window=DEFAULT_DATE_WINDOW, amount_tolerance=0,
+                   min_score=DEFAULT_MIN_SCORE, kinds=None, dry_run=False, documents=None,
+                   split_window=DEFAULT_SPLIT_WINDOW, splits=True, user_id=None, on_progress=None,
+                   on_step=None):
+    """
+    Match unreconciled transactions of a hub to open documents, record the
+    allocations as ``ReconciliationLink`` rows and mark fully allocated
+    transactions as reconciled.
+
+    ``amount_tolerance`` is in cents. ``documents`` overrides the registered
+    sources (mainly for tests and benchmarks). ``splits=False`` skips the
+    subset-sum passes. ``on_progress(saved, total)`` is called after each
+    committed batch of matches and ``on_step(message)`` before each loading
+    and matching pass, so a long run keeps its job alive.
+    """
+    step = on_step or (lambda message: None)
+    started = time.perf_counter()
+    result = ReconcileResult()
+    step('Loading documents')
+    docs = list(documents if documents is not None else load_documents(hub_id, kinds))
+    result.documents = len(docs)
+
+    if docs:
+        step('Loading transactions')
+        lines = list(unreconciled_lines(hub_id, account_id))
+        result.examined = len(lines)
+        step(f'Matching {len(lines)} transactions to {len(docs)} documents')
+        matches = match_transactions(lines, CandidateIndex(docs), date_window, amount_tolerance, min_score)
+        result.matched = len(matches)
+
+        if splits:
+            matched_tx = {m.transaction_id for m in matches}
+            matched_docs = {(m.document.kind, m.document.id) for m in matches}
+            open_lines = [t for t in lines if t.id not in matched_tx]
+            open_docs = [d for d in docs if (d.kind, d.id) not in matched_docs]
+            step('Matching split payments')
+            many = match_many_to_one(open_lines, open_docs, split_window, amount_tolerance)
+            taken_tx = {m.transaction_id for m in many}
+            taken_docs = {(m.document.kind, m.document.id) for m in many}
+            step('Matching instalments')
+            instalments = match_one_to_many(
+                [t for t in open_lines if t.id not in taken_tx],
+                [d for d in open_docs if (d.kind, d.id) not in taken_docs],
+                split_window, amount_tolerance,
+            )
+            split = many + instalments
+            result.split_matched = len({m.transaction_id for m in split})
+            matches += split
+
+        result.links = len(matches)
+        result.matches = matches[:MAX_REPORTED_MATCHES]
+        if not dry_run:
+            step(f'Saving {len(matches)} matches')
+            save_matches(hub_id, matches, user_id=user_id, on_progress=on_progress)
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def save_matches(hub_id, matches, user_id=None, on_progress=None):
+    """
+    Persist matches as links, one transaction per batch. A line is flagged
+    reconciled once its links add up to its amount; a match within the
+    tolerance allocates the whole line and keeps the gap in ``difference``.
+    """
+    touched = defaultdict(set)
+    try:
+        for start in range(0, len(matches), UPDATE_BATCH_SIZE):
+            batch = matches[start:start + UPDATE_BATCH_SIZE]
+            batch_tx = BankTransaction.objects.filter(pk__in={m.transaction_id for m in batch})
+            with transaction.atomic():
+                ReconciliationLink.objects.bulk_create([
+                    ReconciliationLink(
+                        hub_id=hub_id,
+                        transaction_id=m.transaction_id,
+                        document_type=m.document.kind,
+                        document_id=m.document.id,
+                        amount=Decimal(m.cents) / 100,
+                        difference=Decimal(m.difference) / 100,
+                        score=Decimal(str(m.score)),
+                        created_by=user_id,
+                    )
+                    for m in batch
+                ])
+                allocated = _transaction_allocated_cents(transaction_ids={m.transaction_id for m in batch})
+                settled = [
+                    pk for pk, amount in batch_tx.values_list('pk', 'amount')
+                    if allocated.get(pk) == to_cents(amount)
+                ]
+                BankTransaction.objects.filter(pk__in=settled).update(is_reconciled=True)
+            for account_id, days in affected_days(batch_tx).items():
+                touched[account_id] |= days
+            if on_progress:
+                on_progress(start + len(batch), len(matches))
+    finally:
+        # Unreconciled counts changed on these days (also when a job is cancelled midway).
+        refresh_affected(touched)
+        counters.invalidate(hub_id)
+        analytics.invalidate(hub_id)
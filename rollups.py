@@ -0,0 +1,198 @@
+"""
+Per-account daily balance rollup.
+
+``BankAccountDailyBalance`` keeps one row per account and booking day with the
+day's inflow, outflow, transaction and unreconciled counts and its opening
+and closing balance. Everything that writes transactions (import, the
+add/edit/delete views, reconciliation) calls ``refresh_daily_balances`` with
+the days it touched: those days are re-aggregated with one indexed
+``GROUP BY`` and the opening/closing chain is re-walked from the earliest
+touched day forward. The cost is proportional to the number of days, not to
+the number of transactions, and the dashboard reads the rollup only.
+
+``rebuild_daily_balances`` recomputes an account from scratch (backfill, see
+``bank_sync_rebuild_balances``). The chain starts at
+``BankAccount.opening_balance``.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.utils.dateparse import parse_date
+
+from .models import BankAccount, BankAccountDailyBalance, BankTransaction
+
+ZERO = Decimal('0.00')
+BULK_BATCH_SIZE = 1000
+
+DayPoint = namedtuple('DayPoint', ['day', 'inflow', 'outflow', 'closing'])
+MonthSummary = namedtuple('MonthSummary', ['month', 'inflow', 'outflow', 'net', 'closing'])
+
+
+def as_date(value):
+    if isinstance(value, date):
+        return value
+    return parse_date(str(value))
+
+
+def _day_totals(account_id, days=None):
+    """``{day: (inflow, outflow, count, unreconciled)}``; outflow is positive."""
+    qs = BankTransaction.objects.filter(account_id=account_id, is_deleted=False)
+    if days is not None:
+        qs = qs.filter(date__in=days)
+    rows = qs.values('date').annotate(
+        inflow=Sum('amount', filter=Q(amount__gt=0)),
+        outflow=Sum('amount', filter=Q(amount__lt=0)),
+        count=Count('id'),
+        unreconciled=Count('id', filter=Q(is_reconciled=False)),
+    ).order_by()
+    return {
+        r['date']: (r['inflow'] or ZERO, -(r['outflow'] or ZERO), r['count'], r['unreconciled'])
+        for r in rows
+    }
+
+
+def affected_days(qs):
+    """``{account_id: {day, ...}}`` covered by a ``BankTransaction`` queryset."""
+    affected = defaultdict(set)
+    for account_id, day in qs.order_by().values_list('account_id', 'date').distinct():
+        affected[account_id].add(day)
+    return affected
+
+
+def refresh_affected(affected):
+    for account_id, days in affected.items():
+        refresh_daily_balances(account_id, days)
+
+
+def refresh_daily_balances(account_id, days):
+    """Re-aggregate ``days`` of an account and re-chain balances from the earliest one."""
+    days = {as_date(d) for d in days if d}
+    days.discard(None)
+    if not account_id or not days:
+        return
+    account = BankAccount.all_objects.filter(pk=account_id).first()
+    if account is None:
+        return
+    totals = _day_totals(account_id, days)
+    start = min(days)
+
+    with transaction.atomic():
+        rollup = BankAccountDailyBalance.objects.filter(account_id=account_id)
+        balance = rollup.filter(day__lt=start).order_by('-day').values_list('closing', flat=True).first()
+        rows = {r.day: r for r in rollup.filter(day__gte=start).order_by('day')}
+        if balance is None:
+            balance = account.opening_balance
+
+        stale = [rows.pop(day).pk for day in days if day in rows and day not in totals]
+        created = set()
+        for day in days:
+            if day in totals and day not in rows:
+                rows[day] = BankAccountDailyBalance(hub_id=account.hub_id, account_id=account_id, day=day)
+                created.add(day)
+
+        changed = []
+        for day in sorted(rows):
+            row = rows[day]
+            if day in totals:
+                row.inflow, row.outflow, row.transaction_count, row.unreconciled_count = totals[day]
+            closing = balance + row.inflow - row.outflow
+            if day in days or row.opening != balance or row.closing != closing:
+                row.opening, row.closing = balance, closing
+                if day not in created:
+                    changed.append(row)
+            balance = closing
+
+        if stale:
+            BankAccountDailyBalance.all_objects.filter(pk__in=stale).delete()
+        if created:
+            BankAccountDailyBalance.objects.bulk_create([rows[d] for d in created], batch_size=BULK_BATCH_SIZE)
+        if changed:
+            BankAccountDailyBalance.objects.bulk_update(
+                changed,
+                ['opening', 'inflow', 'outflow', 'closing', 'transaction_count', 'unreconciled_count'],
+                batch_size=BULK_BATCH_SIZE,
+            )
+
+
+def rebuild_daily_balances(account):
+    """Recompute every rollup row of ``account``; returns the number of days."""
+    totals = _day_totals(account.pk)
+    balance = account.opening_balance
+    rows = []
+    for day in sorted(totals):
+        inflow, outflow, count, unreconciled = totals[day]
+        closing = balance + inflow - outflow
+        rows.append(BankAccountDailyBalance(
+            hub_id=account.hub_id, account_id=account.pk, day=day,
+            opening=balance, inflow=inflow, outflow=outflow, closing=closing,
+            transaction_count=count, unreconciled_count=unreconciled,
+        ))
+        balance = closing
+    with transaction.atomic():
+        BankAccountDailyBalance.all_objects.filter(account_id=account.pk).delete()
+        BankAccountDailyBalance.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+    return len(rows)
+
+
+# ----------------------------------------------------------------------
+# Readers
+# ----------------------------------------------------------------------
+
+def balance_history(hub_id, start, end, account_id=None, currency=None):
+    """
+    One ``DayPoint`` per calendar day in ``[start, end]`` with the hub's (or
+    one account's, or one currency's) flows and closing balance.
+
+    Accounts without activity on a day carry their last closing forward; the
+    starting balance of each account is one indexed lookup, so the whole
+    series costs O(accounts + days).
+    """
+    rollup = BankAccountDailyBalance.objects.filter(account=OuterRef('pk'))
+    accounts = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False)
+    if account_id:
+        accounts = accounts.filter(pk=account_id)
+    if currency:
+        accounts = accounts.filter(currency__iexact=currency)
+    accounts = accounts.annotate(
+        before=Subquery(rollup.filter(day__lt=start).order_by('-day').values('closing')[:1]),
+        first_opening=Subquery(rollup.filter(day__gte=start).order_by('day').values('opening')[:1]),
+    ).values_list('pk', 'before', 'first_opening')
+    balances = {pk: before if before is not None else (first or ZERO) for pk, before, first in accounts}
+    total = sum(balances.values(), ZERO)
+
+    flows = defaultdict(lambda: [ZERO, ZERO])
+    rows = BankAccountDailyBalance.objects.filter(
+        hub_id=hub_id, account_id__in=list(balances), day__gte=start, day__lte=end,
+    ).order_by('day').values_list('account_id', 'day', 'inflow', 'outflow', 'closing')
+    closings = defaultdict(list)
+    for acct, day, inflow, outflow, closing in rows:
+        flows[day][0] += inflow
+        flows[day][1] += outflow
+        closings[day].append((acct, closing))
+
+    points = []
+    day = start
+    while day <= end:
+        for acct, closing in closings.get(day, ()):
+            total += closing - balances[acct]
+            balances[acct] = closing
+        inflow, outflow = flows.get(day, (ZERO, ZERO))
+        points.append(DayPoint(day, inflow, outflow, total))
+        day += timedelta(days=1)
+    return points
+
+
+def monthly_summary(points):
+    """Fold ``DayPoint`` rows into per-month inflow/outflow/net and month-end balance."""
+    months = {}
+    for point in points:
+        key = point.day.replace(day=1)
+        inflow, outflow, _ = months.get(key, (ZERO, ZERO, ZERO))
+        months[key] = (inflow + point.inflow, outflow + point.outflow, point.closing)
+    return [
+        MonthSummary(month, inflow, outflow, inflow - outflow, closing)
+        for month, (inflow, outflow, closing) in sorted(months.items())
+    ]
@@ -0,0 +1,190 @@
+"""
+Compiled categorization rules.
+
+A hub's rules (description contains / regex, amount range, counterparty IBAN,
+account) are compiled once into a ``RuleSet`` that tests every rule against a
+transaction in one pass instead of rule by rule:
+
+* ``contains`` literals go into one Aho-Corasick automaton over the
+  normalised ``search_text``, so a line is scanned once whatever the number
+  of literals (``pyahocorasick`` when installed, else the pure-Python
+  automaton below);
+* ``regex`` rules are OR-ed into one alternation used as a prefilter on the
+  description: only lines it matches test the individual patterns;
+* rules without a text pattern are candidates for every line.
+
+Candidates are then checked against their amount range, account and
+counterparty. The first matching rule by ``(priority, position)`` gives the
+category; the tags of every matching rule are merged. Pure Python, no Django
+dependency.
+"""
+import re
+from collections import deque, namedtuple
+
+try:
+    import ahocorasick
+except ImportError:  # optional
+    ahocorasick = None
+
+from .counterparty import compact_iban
+from .normalize import normalize_text
+
+Rule = namedtuple('Rule', [
+    'id', 'priority', 'match_type', 'pattern', 'min_cents', 'max_cents',
+    'account_id', 'counterparty', 'category', 'tags',
+])
+RuleMatch = namedtuple('RuleMatch', ['category', 'tags', 'rule_ids'])
+
+MATCH_CONTAINS = 'contains'
+MATCH_REGEX = 'regex'
+
+# Backreferences change meaning once patterns share one alternation.
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def compile_pattern(pattern):
+    """The compiled regex of a rule; raises ``re.error`` for an invalid one."""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+class _Automaton:
+    """Aho-Corasick over characters: ``search(text)`` returns the values of every literal found."""
+
+    def __init__(self, literals):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for literal, value in literals:
+            state = 0
+            for ch in literal:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = self.goto[state][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            self.out[state] += (value,)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+
+    def search(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class _NativeAutomaton:
+    def __init__(self, literals):
+        self.automaton = ahocorasick.Automaton()
+        grouped = {}
+        for literal, value in literals:
+            grouped.setdefault(literal, []).append(value)
+        for literal, values in grouped.items():
+            self.automaton.add_word(literal, tuple(values))
+        self.automaton.make_automaton()
+
+    def search(self, text):
+        found = set()
+        for _, values in self.automaton.iter(text):
+            found.update(values)
+        return found
+
+
+class RuleSet:
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda r: r.priority)
+        literals, regexes, self.always = [], [], []
+        self.patterns = {}
+        for index, rule in enumerate(self.rules):
+            if rule.match_type == MATCH_REGEX and rule.pattern:
+                try:
+                    self.patterns[index] = compile_pattern(rule.pattern)
+                except re.error:
+                    continue  # rejected on save; skip rows stored before validation
+                regexes.append(index)
+            elif rule.match_type == MATCH_CONTAINS and normalize_text(rule.pattern):
+                literals.append((normalize_text(rule.pattern), index))
+            else:
+                self.always.append(index)
+
+        self.automaton = None
+        if literals:
+            self.automaton = (_NativeAutomaton if ahocorasick else _Automaton)(literals)
+
+        # One alternation as a prefilter; patterns that cannot share it are always tested.
+        self.regex_checked = [i for i in regexes if _BACKREFERENCE.search(self.rules[i].pattern)]
+        shared = [i for i in regexes if i not in self.regex_checked]
+        self.prefilter = None
+        if shared:
+            try:
+                self.prefilter = re.compile('|'.join(f'(?:{self.rules[i].pattern})' for i in shared), re.IGNORECASE)
+            except re.error:
+                # e.g. the same group name in two patterns: test them one by one.
+                self.regex_checked = regexes
+                shared = []
+        self.regex_shared = shared
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _candidates(self, search_text, description):
+        found = set(self.always)
+        if self.automaton is not None:
+            found |= self.automaton.search(search_text)
+        regexes = list(self.regex_checked)
+        if self.prefilter is not None and self.prefilter.search(description):
+            regexes += self.regex_shared
+        found.update(i for i in regexes if self.patterns[i].search(description))
+        return found
+
+    def match(self, search_text, description, cents, account_id=None, counterparty=''):
+        """
+        The ``RuleMatch`` for one transaction, or ``None``.
+
+        ``search_text`` is the normalised document (``normalize.search_document``),
+        ``cents`` the signed amount in cents, ``counterparty`` the extracted
+        IBAN (``counterparty.extract_counterparty``); without one a rule's IBAN
+        is looked for in the description.
+        """
+        candidates = self._candidates(search_text, description or '')
+        if not candidates:
+            return None
+        haystack = None
+        matched = []
+        for index in sorted(candidates):
+            rule = self.rules[index]
+            if rule.min_cents is not None and cents < rule.min_cents:
+                continue
+            if rule.max_cents is not None and cents > rule.max_cents:
+                continue
+            if rule.account_id and str(rule.account_id) != str(account_id):
+                continue
+            if rule.counterparty:
+                if haystack is None:
+                    haystack = compact_iban(counterparty or description)
+                if rule.counterparty not in haystack:
+                    continue
+            matched.append(rule)
+        if not matched:
+            return None
+        category = next((r.category for r in matched if r.category), '')
+        tags = []
+        for rule in matched:
+            tags.extend(t for t in rule.tags if t not in tags)
+        return RuleMatch(category, tuple(tags), tuple(r.id for r in matched))
@@ -0,0 +1,263 @@
+"""
+Indexed transaction search.
+
+Every transaction keeps a normalised ``search_text`` column (description and
+reference, see ``normalize.search_document``). Free-text terms are matched
+against it through an index instead of ``icontains`` scans:
+
+* PostgreSQL: a ``pg_trgm`` GIN index on ``search_text``; each term becomes a
+  ``LIKE '% term%'`` (word prefix), which the trigram index answers.
+* SQLite: an external-content FTS5 table kept in sync by triggers; terms
+  become prefix queries (``"term"*``).
+* Anything else, or SQLite without FTS5: ``LIKE`` on ``search_text``.
+
+The query string may also carry filters, e.g. ``iberdrola amount:>100
+date:2026-09``:
+
+``amount:>100``, ``amount:<=-50``, ``amount:12.50``, ``amount:100..200``
+    signed amount comparisons and inclusive ranges.
+``date:2026``, ``date:2026-09``, ``date:2026-09-15``, ``date:>=2026-09-01``,
+``date:2026-09-01..2026-09-30``
+    a year, a month, a day, open or closed ranges.
+``reconciled:yes`` / ``reconciled:no``
+``category:fuel``
+    exact category, case-insensitive; ``category:none`` for uncategorised.
+``tag:fuel``
+    rows carrying that tag (see ``categorization``).
+``payee:acme``, ``iban:ES9121000418450200051332``
+    payee name key prefix or counterparty IBAN (see ``payees``), served by
+    indexes instead of a description scan.
+``flagged:yes``
+    rows with an open duplicate or anomaly flag (see ``detection``).
+"""
+import calendar
+import re
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models.expressions import RawSQL
+
+from .counterparty import compact_iban, payee_key
+from .normalize import normalize_text
+
+SearchQuery = namedtuple('SearchQuery', ['terms', 'filters'])
+
+FTS_TABLE = 'bank_sync_tx_fts'
+TRGM_INDEX = 'bank_sync_tx_search_trgm_idx'
+TX_TABLE = 'bank_sync_banktransaction'
+FLAG_TABLE = 'bank_sync_transactionflag'
+
+_FILTER = re.compile(r'^(amount|date|reconciled|category|tag|payee|iban|flagged):(.+)$', re.IGNORECASE)
+_COMPARISON = re.compile(r'^(>=|<=|>|<|=)?(.+)$')
+_LOOKUPS = {'>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}
+
+
+# ----------------------------------------------------------------------
+# Query parsing
+# ----------------------------------------------------------------------
+
+def _parse_amount(value):
+    try:
+        return Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(value)
+
+
+def _parse_date_bounds(value):
+    """``(first_day, last_day)`` covered by a year, month or ISO day."""
+    parts = value.split('-')
+    try:
+        if len(parts) == 1 and len(parts[0]) == 4:
+            year = int(parts[0])
+            return date(year, 1, 1), date(year, 12, 31)
+        if len(parts) == 2:
+            year, month = int(parts[0]), int(parts[1])
+            return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+        day = date.fromisoformat(value)
+        return day, day
+    except ValueError:
+        raise ValueError(value)
+
+
+def _range_filters(field, value, parse):
+    if '..' in value:
+        low, _, high = value.partition('..')
+        filters = {}
+        if low:
+            filters[f'{field}__gte'] = parse(low)[0] if field == 'date' else parse(low)
+        if high:
+            filters[f'{field}__lte'] = parse(high)[1] if field == 'date' else parse(high)
+        return filters
+    op, operand = _COMPARISON.match(value).groups()
+    parsed = parse(operand)
+    if field == 'date':
+        first, last = parsed
+        if op in (None, '='):
+            return {'date__gte': first, 'date__lte': last}
+        # A month compared with > means "after the month", not after its first day.
+        bound = last if op in ('>', '<=') else first
+        return {f'date__{_LOOKUPS[op]}': bound}
+    if op in (None, '='):
+        return {field: parsed}
+    return {f'{field}__{_LOOKUPS[op]}': parsed}
+
+
+def parse_query(text):
+    """
+    Split a search box string into free-text terms and ORM filters.
+
+    Malformed filters are treated as plain words so a half-typed
+    ``amount:>`` never errors.
+    """
+    terms, filters = [], {}
+    for word in (text or '').split():
+        match = _FILTER.match(word)
+        if match:
+            key, value = match.group(1).lower(), match.group(2)
+            try:
+                if key == 'amount':
+                    filters.update(_range_filters('amount', value, _parse_amount))
+                    continue
+                if key == 'date':
+                    filters.update(_range_filters('date', value, _parse_date_bounds))
+                    continue
+                if key == 'category':
+                    if value.lower() == 'none':
+                        filters['category'] = ''
+                    else:
+                        filters['category__iexact'] = value
+                    continue
+                if key == 'tag':
+                    filters['tags__iregex'] = rf'(^|,){re.escape(value.lower())}(,|$)'
+                    continue
+                if key == 'payee':
+                    filters['payee__key__startswith'] = payee_key(value)
+                    continue
+                if key == 'iban':
+                    filters['counterparty_iban'] = compact_iban(value)
+                    continue
+                if key == 'flagged':
+                    if value.lower() not in ('yes', 'true', '1'):
+                        raise ValueError(value)
+                    filters['pk__in'] = RawSQL(
+                        f"SELECT transaction_id FROM {FLAG_TABLE} WHERE status = 'open' AND is_deleted = %s", [False],
+                    )
+                    continue
+                if value.lower() in ('yes', 'true', '1', 'no', 'false', '0'):
+                    filters['is_reconciled'] = value.lower() in ('yes', 'true', '1')
+                    continue
+            except ValueError:
+                pass
+        terms.extend(normalize_text(word).split())
+    return SearchQuery(terms, filters)
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+
+_fts_available = {}
+
+
+def sqlite_fts_available(alias):
+    """Whether the FTS5 shadow table exists on this SQLite connection (cached)."""
+    if alias not in _fts_available:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available[alias] = cursor.fetchone() is not None
+    return _fts_available[alias]
+
+
+def _fts_expression(terms):
+    return ' AND '.join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+
+
+def apply_search(qs, text):
+    """Filter a ``BankTransaction`` queryset with a search box string."""
+    query = parse_query(text)
+    if query.filters:
+        qs = qs.filter(**query.filters)
+    if not query.terms:
+        return qs
+    vendor = connections[qs.db].vendor
+    if vendor == 'sqlite' and sqlite_fts_available(qs.db):
+        return qs.filter(pk__in=RawSQL(
+            f'SELECT id FROM {TX_TABLE} WHERE rowid IN '
+            f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            [_fts_expression(query.terms)],
+        ))
+    # search_text starts with a space, so ' term' is a word-prefix match.
+    for term in query.terms:
+        qs = qs.filter(search_text__contains=f' {term}')
+    return qs
+
+
+# ----------------------------------------------------------------------
+# Index DDL (used by ``bank_sync_rebuild_search``; migrations keep a frozen copy)
+# ----------------------------------------------------------------------
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"search_text, content='{TX_TABLE}', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TX_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.rowid, new.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TX_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.rowid, old.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON {TX_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.rowid, old.search_text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.rowid, new.search_text); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_TRGM_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON {TX_TABLE} USING gin (search_text gin_trgm_ops)',
+]
+
+POSTGRES_DROP_SQL = [
+    f'DROP INDEX IF EXISTS {TRGM_INDEX}',
+]
+
+
+def install_search_index(connection):
+    """
+    Create (or re-create) the vendor's search index.
+
+    On SQLite, Django rebuilds a table for most schema changes, which drops
+    its triggers and may renumber rowids; migrations that alter
+    ``BankTransaction`` re-run the frozen copy in ``migrations/_search_index.py``
+    so the FTS table is re-synced. Keep the two in step.
+    Returns ``False`` when the backend has no usable index (FTS5 not compiled
+    in, or ``pg_trgm`` not installable) and search falls back to ``LIKE``.
+    """
+    _fts_available.pop(connection.alias, None)
+    if connection.vendor == 'sqlite':
+        statements = SQLITE_DROP_SQL[:3] + SQLITE_FTS_SQL
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRES_TRGM_SQL
+    else:
+        return False
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    except DatabaseError:
+        return False
+    return True
+
+
+def drop_search_index(connection):
+    _fts_available.pop(connection.alias, None)
+    statements = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRES_DROP_SQL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
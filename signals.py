@@ -0,0 +1,95 @@
+"""
+Signal handlers keeping ``counters`` current on single-row saves and deletes.
+
+Each loaded ``BankTransaction`` remembers the fields the counters depend on;
+``post_save`` applies the difference to the cached counters. Instances loaded
+with those fields deferred are not snapshotted, and saving one invalidates
+the hub's counters instead. A new account adds one; (un)deleting an account
+invalidates, since its transactions drop out of the totals too. Any
+transaction write also marks the hub's ``analytics`` snapshot stale.
+Connected in ``BankSyncConfig.ready``.
+"""
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import analytics, counters
+from .models import BankAccount, BankTransaction
+
+_TRANSACTION_FIELDS = ('is_deleted', 'is_reconciled', 'amount')
+
+
+def _transaction_share(is_deleted, is_reconciled, amount):
+    if is_deleted:
+        return {'transactions': 0, 'unreconciled': 0, 'unreconciled_amount': Decimal('0.00')}
+    return {
+        'transactions': 1,
+        'unreconciled': 0 if is_reconciled else 1,
+        'unreconciled_amount': Decimal('0.00') if is_reconciled else Decimal(str(amount or 0)),
+    }
+
+
+def _snapshot(instance, fields):
+    values = instance.__dict__
+    if any(f not in values for f in fields):
+        return None
+    return tuple(values[f] for f in fields)
+
+
+def _apply(hub_id, before, after):
+    counters.adjust(hub_id, **{name: after[name] - before.get(name, 0) for name in after})
+
+
+@receiver(post_init, sender=BankAccount, dispatch_uid='bank_sync_account_snapshot')
+def account_snapshot(sender, instance, **kwargs):
+    instance._counter_state = _snapshot(instance, ('is_deleted',))
+
+
+@receiver(post_init, sender=BankTransaction, dispatch_uid='bank_sync_transaction_snapshot')
+def transaction_snapshot(sender, instance, **kwargs):
+    instance._counter_state = _snapshot(instance, _TRANSACTION_FIELDS)
+
+
+@receiver(post_save, sender=BankAccount, dispatch_uid='bank_sync_account_saved')
+def account_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.adjust(instance.hub_id, accounts=0 if instance.is_deleted else 1)
+    elif instance._counter_state != (instance.is_deleted,):
+        # (Un)deleting an account also hides or shows its transactions.
+        counters.invalidate(instance.hub_id)
+        analytics.invalidate(instance.hub_id)
+    instance._counter_state = (instance.is_deleted,)
+
+
+@receiver(post_save, sender=BankTransaction, dispatch_uid='bank_sync_transaction_saved')
+def transaction_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    analytics.invalidate(instance.hub_id)
+    before = instance._counter_state
+    current = _snapshot(instance, _TRANSACTION_FIELDS)
+    if created:
+        _apply(instance.hub_id, {}, _transaction_share(*current))
+    elif before is None or current is None:
+        counters.invalidate(instance.hub_id)
+    else:
+        _apply(instance.hub_id, _transaction_share(*before), _transaction_share(*current))
+    instance._counter_state = current
+
+
+@receiver(post_delete, sender=BankAccount, dispatch_uid='bank_sync_account_deleted')
+def account_deleted(sender, instance, **kwargs):
+    counters.invalidate(instance.hub_id)
+    analytics.invalidate(instance.hub_id)
+
+
+@receiver(post_delete, sender=BankTransaction, dispatch_uid='bank_sync_transaction_deleted')
+def transaction_deleted(sender, instance, **kwargs):
+    analytics.invalidate(instance.hub_id)
+    if instance._counter_state is None:
+        counters.invalidate(instance.hub_id)
+    else:
+        _apply(instance.hub_id, _transaction_share(*instance._counter_state), _transaction_share(True, True, 0))
@@ -0,0 +1,376 @@
+"""
+Async bank feed sync.
+
+``sync_accounts(accounts)`` syncs many ``BankAccount`` rows at once on one
+event loop. Accounts are grouped by ``provider``; each provider gets one
+pooled HTTP client and an ``asyncio.Semaphore`` sized by its
+``max_concurrency`` (or ``BANK_SYNC_PROVIDERS[name]['max_concurrency']``), so
+one slow bank cannot starve the others and no bank sees more parallel
+requests than it allows.
+
+Per account the worker fetches only the delta since the last run. The
+first page is a conditional request on the stored ETag, so an account with
+nothing new costs one 304. Otherwise it pages through everything booked
+after ``BankSyncState.cursor``, retrying 429/5xx answers and connection
+errors with capped exponential backoff and full jitter (``Retry-After`` wins
+when the bank sends one). Lines at or below the high-water mark (the last
+booking date and the provider ids already imported on it) are dropped
+before they reach the database, the rest go through
+``importers.import_lines``, and cursor, ETag and high-water mark advance in
+the same transaction, so a failed sync is simply retried from the old state.
+Each run records a ``BankSyncRun`` per hub with rows fetched vs written.
+Database work runs through ``sync_to_async`` on Django's single sync thread;
+only the network side is concurrent.
+
+Providers are configured in settings::
+
+    BANK_SYNC_PROVIDERS = {
+        'psd2': {'base_url': 'https://api.bank.example', 'max_concurrency': 16, 'consent_id': '...'},
+    }
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import counters
+from .balances import shift_opening_balance
+from .importers import import_lines
+from .models import BankAccount, BankSyncRun, BankSyncState
+from .providers import DEFAULT_MAX_ATTEMPTS, ProviderError, open_provider, with_retries
+from .transport import TransportError
+
+logger = logging.getLogger(__name__)
+
+def provider_config(name):
+    return dict(getattr(settings, 'BANK_SYNC_PROVIDERS', {}).get(name, {}))
+
+
+@dataclass
+class AccountSyncResult:
+    account_id: object
+    hub_id: object = None
+    rows_fetched: int = 0
+    rows_skipped: int = 0
+    rows_created: int = 0
+    pages: int = 0
+    requests: int = 0
+    retries: int = 0
+    unchanged: bool = False
+    error: str = ''
+    elapsed: float = 0.0
+
+
+@dataclass
+class SyncReport:
+    results: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed(self):
+        return [r for r in self.results if r.error]
+
+    @property
+    def unchanged(self):
+        return [r for r in self.results if r.unchanged]
+
+    @property
+    def rows_created(self):
+        return sum(r.rows_created for r in self.results)
+
+    @property
+    def rows_fetched(self):
+        return sum(r.rows_fetched for r in self.results)
+
+    @property
+    def requests(self):
+        return sum(r.requests for r in self.results)
+
+    @property
+    def retries(self):
+        return sum(r.retries for r in self.results)
+
+
+def delta_lines(lines, last_booking_date, boundary_ids):
+    """
+    Drop fetched lines at or before the stored high-water mark: anything
+    booked before ``last_booking_date`` and, on that day, the provider ids
+    already imported. Returns ``(fresh_lines, skipped_count)``.
+    """
+    if last_booking_date is None:
+        return lines, 0
+    last_day = last_booking_date.isoformat()
+    seen = set(boundary_ids)
+    fresh = [
+        line for line in lines
+        if line.date > last_day or (line.date == last_day and line.reference not in seen)
+    ]
+    return fresh, len(lines) - len(fresh)
+
+
+def _booking_day(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def advance_high_water(lines, last_booking_date, boundary_ids):
+    """New ``(last_booking_date, boundary_ids)`` after importing ``lines``."""
+    days = {_booking_day(line.date) for line in lines}
+    days.discard(None)
+    if not days:
+        return last_booking_date, boundary_ids
+    newest = max(days)
+    if last_booking_date is not None and newest < last_booking_date:
+        return last_booking_date, boundary_ids
+    ids = {line.reference for line in lines if line.reference and _booking_day(line.date) == newest}
+    if newest == last_booking_date:
+        ids.update(boundary_ids)
+    return newest, sorted(ids)
+
+
+# ----------------------------------------------------------------------
+# Database side (sync, called through sync_to_async)
+# ----------------------------------------------------------------------
+
+def _load_state(account):
+    state, _ = BankSyncState.objects.get_or_create(account_id=account.pk, defaults={'hub_id': account.hub_id})
+    return state
+
+
+def _store(account, state, lines, cursor, etag, reported_balance):
+    """Import the delta and advance the cursor and high-water mark; returns the ``ImportResult``."""
+    with transaction.atomic():
+        result = import_lines(account, lines)
+        if reported_balance is not None and not state.cursor:
+            # First sync: anchor the derived history on the bank's balance.
+            current = BankAccount.objects.filter(pk=account.pk).values_list('balance', flat=True).get()
+            delta = reported_balance - current
+            if delta:
+                BankAccount.objects.filter(pk=account.pk).update(opening_balance=F('opening_balance') + delta)
+                shift_opening_balance(account.pk, delta)
+        state.last_booking_date, state.boundary_ids = advance_high_water(
+            lines, state.last_booking_date, state.boundary_ids,
+        )
+        state.cursor = cursor or ''
+        state.etag = etag or ''
+        if reported_balance is not None:
+            state.last_balance = reported_balance
+        state.last_synced_at = timezone.now()
+        state.last_error = ''
+        state.failure_count = 0
+        state.save(update_fields=[
+            'cursor', 'etag', 'last_booking_date', 'boundary_ids', 'last_balance',
+            'last_synced_at', 'last_error', 'failure_count', 'updated_at',
+        ])
+    return result
+
+
+def _touch(state):
+    state.last_synced_at = timezone.now()
+    state.last_error = ''
+    state.failure_count = 0
+    state.save(update_fields=['last_synced_at', 'last_error', 'failure_count', 'updated_at'])
+
+
+def _record_failure(state, message):
+    state.last_error = message[:500]
+    state.failure_count += 1
+    state.save(update_fields=['last_error', 'failure_count', 'updated_at'])
+
+
+def _record_runs(provider_name, results, started_at):
+    """One ``BankSyncRun`` per hub with fetched-vs-written totals."""
+    by_hub = defaultdict(list)
+    for result in results:
+        by_hub[result.hub_id].append(result)
+    BankSyncRun.objects.bulk_create([
+        BankSyncRun(
+            hub_id=hub_id,
+            provider=provider_name,
+            started_at=started_at,
+            duration_ms=int(max(r.elapsed for r in group) * 1000),
+            accounts=len(group),
+            accounts_failed=sum(1 for r in group if r.error),
+            accounts_unchanged=sum(1 for r in group if r.unchanged),
+            requests=sum(r.requests for r in group),
+            retries=sum(r.retries for r in group),
+            rows_fetched=sum(r.rows_fetched for r in group),
+            rows_written=sum(r.rows_created for r in group),
+        )
+        for hub_id, group in by_hub.items()
+    ])
+
+
+def _create_accounts(hub_id, provider_name, provider_accounts):
+    known = set(BankAccount.objects.filter(
+        hub_id=hub_id, provider=provider_name, is_deleted=False,
+    ).values_list('external_id', flat=True))
+    fresh = [
+        BankAccount(hub_id=hub_id, provider=provider_name, external_id=a.external_id,
+                    name=a.name[:255], iban=a.iban[:34], currency=(a.currency or 'EUR')[:3])
+        for a in provider_accounts if a.external_id not in known
+    ]
+    BankAccount.objects.bulk_create(fresh, batch_size=1000)
+    counters.adjust(hub_id, accounts=len(fresh))
+    return len(fresh)
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+
+async def sync_account(provider, account, semaphore, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    result = AccountSyncResult(account.pk, account.hub_id)
+    started = time.perf_counter()
+    state = None
+
+    def count_retry(error):
+        result.retries += 1
+        result.requests += 1
+
+    async def call(fn):
+        result.requests += 1
+        return await with_retries(fn, max_attempts, on_retry=count_retry)
+
+    try:
+        state = await sync_to_async(_load_state)(account)
+        async with semaphore:
+            lines, cursor, page, etag = [], state.cursor or None, None, ''
+            while True:
+                fetched = await call(lambda: provider.fetch_transactions(
+                    account.external_id, cursor, page, None if page else (state.etag or None),
+                ))
+                result.pages += 1
+                if fetched.not_modified:
+                    result.unchanged = True
+                    break
+                if not page:
+                    etag = fetched.etag
+                for line in fetched.lines:
+                    lines.append(line._replace(line_no=len(lines) + 1))
+                cursor, page = fetched.cursor, fetched.next_page
+                if not page:
+                    break
+            result.rows_fetched = len(lines)
+            lines, result.rows_skipped = delta_lines(lines, state.last_booking_date, state.boundary_ids)
+            reported = None
+            if not result.unchanged and (lines or not state.cursor):
+                reported = await call(lambda: provider.fetch_balance(account.external_id))
+        if result.unchanged:
+            await sync_to_async(_touch)(state)
+        else:
+            imported = await sync_to_async(_store)(account, state, lines, cursor, etag, reported)
+            result.rows_created = imported.rows_created
+    except (ProviderError, TransportError) as e:
+        result.error = str(e)
+    except Exception as e:
+        # A database error or a malformed payload fails this account only, not the run.
+        logger.exception('bank_sync sync of account %s failed', account.pk)
+        result.error = f'{type(e).__name__}: {e}'
+    if result.error and state is not None:
+        try:
+            await sync_to_async(_record_failure)(state, result.error)
+        except Exception:
+            logger.exception('bank_sync could not record the failure of account %s', account.pk)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _failed_results(accounts, error):
+    message = f'{type(error).__name__}: {error}'
+    return [AccountSyncResult(a.pk, a.hub_id, error=message) for a in accounts]
+
+
+async def _fail(accounts, error):
+    return _failed_results(accounts, error)
+
+
+async def run_sync(accounts, concurrency=None, max_attempts=DEFAULT_MAX_ATTEMPTS, configs=None,
+                   on_progress=None):
+    """
+    Sync ``accounts`` (``BankAccount`` instances with a provider) concurrently
+    and record one ``BankSyncRun`` per provider and hub.
+
+    ``on_progress(done, total)`` is called (on the sync thread) as each account
+    finishes. If it raises, the accounts in flight still finish and the runs are
+    recorded, then the exception is re-raised.
+    """
+    report = SyncReport()
+    started = time.perf_counter()
+    started_at = timezone.now()
+    groups = defaultdict(list)
+    for account in accounts:
+        if account.provider and account.external_id:
+            groups[account.provider].append(account)
+
+    total = sum(len(group) for group in groups.values())
+    finished, stopped = [], []
+
+    async def tracked(coro):
+        result = await coro
+        finished.append(result)
+        if on_progress and not stopped:
+            try:
+                await sync_to_async(on_progress)(len(finished), total)
+            except Exception as e:
+                stopped.append(e)
+        return result
+
+    providers, tasks = [], []
+    try:
+        for name, group in groups.items():
+            config = dict((configs or {}).get(name) or provider_config(name))
+            configured = config.pop('max_concurrency', None)
+            limit = concurrency or configured
+            try:
+                provider = open_provider(name, max_connections=limit, **config)
+            except Exception as e:
+                # An unknown or misconfigured provider fails its own accounts only.
+                tasks.append(_fail(group, e))
+                continue
+            providers.append(provider)
+            semaphore = asyncio.Semaphore(limit or provider.max_concurrency)
+            tasks.append(asyncio.gather(*[tracked(sync_account(provider, a, semaphore, max_attempts)) for a in group]))
+        per_provider = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for provider in providers:
+            await provider.aclose()
+    for (name, group), results in zip(groups.items(), per_provider):
+        if isinstance(results, BaseException):
+            results = _failed_results(group, results)
+        report.results.extend(results)
+        await sync_to_async(_record_runs)(name, results, started_at)
+    report.elapsed = time.perf_counter() - started
+    if stopped:
+        raise stopped[0]
+    return report
+
+
+def sync_accounts(accounts, concurrency=None, max_attempts=DEFAULT_MAX_ATTEMPTS, configs=None, on_progress=None):
+    return asyncio.run(run_sync(list(accounts), concurrency, max_attempts, configs, on_progress))
+
+
+async def _discover(hub_id, name, config):
+    provider = open_provider(name, **config)
+    try:
+        found = await with_retries(provider.fetch_accounts)
+    finally:
+        await provider.aclose()
+    return await sync_to_async(_create_accounts)(hub_id, name, found)
+
+
+def discover_accounts(hub_id, name, config=None):
+    """Create a ``BankAccount`` for every provider account not linked yet; returns the count."""
+    config = dict(config or provider_config(name))
+    config.pop('max_concurrency', None)
+    return asyncio.run(_discover(hub_id, name, config))
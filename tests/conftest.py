@@ -80,10 +80,11 @@ def bank_account(db, hub_id):
 
 
 @pytest.fixture
-def bank_transaction(db, hub_id):
+def bank_transaction(db, hub_id, bank_account):
     """Create a test BankTransaction."""
     return BankTransaction.objects.create(
         hub_id=hub_id,
+        account=bank_account,
         date=timezone.now().date(),
         description='Test Description',
         amount=Decimal('100.00'),
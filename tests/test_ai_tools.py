@@ -0,0 +1,96 @@
+"""Tests for the assistant tools."""
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from bank_sync import analytics
+from bank_sync.models import BankAccount, BankTransaction
+
+ai_tools = pytest.importorskip('bank_sync.ai_tools')
+
+
+@pytest.fixture
+def request_for(hub_id):
+    return SimpleNamespace(session={'hub_id': str(hub_id)})
+
+
+@pytest.fixture
+def rows(hub_id, bank_account):
+    other_hub = BankAccount.objects.create(hub_id=uuid.uuid4(), name='Elsewhere')
+    BankTransaction.objects.create(hub_id=other_hub.hub_id, account=other_hub, date=date(2026, 9, 1),
+                                   description='Other hub', amount=Decimal('-99.00'))
+    for i in range(5):
+        BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 8 + i % 2, 10 + i),
+            description=f'Row {i}', amount=Decimal('10.00') if i % 2 else Decimal('-4.00'), is_reconciled=i < 2,
+        )
+    BankTransaction.objects.create(hub_id=hub_id, account=bank_account, date=date(2026, 9, 20),
+                                   description='Deleted', amount=Decimal('-1.00'), is_deleted=True)
+
+
+@pytest.mark.django_db
+class TestListTools:
+    """Hub scoping, pagination and totals tests."""
+
+    def test_accounts_scoped_and_paginated(self, hub_id, request_for, bank_account):
+        """Test only the hub's live accounts are listed, a page at a time."""
+        BankAccount.objects.create(hub_id=hub_id, name='Zeta')
+        BankAccount.objects.create(hub_id=hub_id, name='Gone', is_deleted=True)
+        BankAccount.objects.create(hub_id=uuid.uuid4(), name='Elsewhere')
+        tool = ai_tools.ListBankAccounts()
+        first = tool.execute({'limit': 1}, request_for)
+        second = tool.execute({'limit': 1, 'cursor': first['next_cursor']}, request_for)
+        assert [a['name'] for a in first['accounts'] + second['accounts']] == [bank_account.name, 'Zeta']
+        assert second['next_cursor'] == ''
+
+    def test_transactions_scoped_and_paginated(self, request_for, rows):
+        """Test rows come newest first, without other hubs or deleted rows, capped per page."""
+        tool = ai_tools.ListBankTransactions()
+        first = tool.execute({'limit': 3}, request_for)
+        second = tool.execute({'limit': 3, 'cursor': first['next_cursor']}, request_for)
+        described = [t['description'] for t in first['transactions'] + second['transactions']]
+        assert described == ['Row 3', 'Row 1', 'Row 4', 'Row 2', 'Row 0']
+        assert len(tool.execute({'limit': 10 ** 6}, request_for)['transactions']) == 5
+
+    def test_totals(self, request_for, rows):
+        """Test group_by returns per-group totals instead of rows."""
+        result = ai_tools.ListBankTransactions().execute({'group_by': 'is_reconciled'}, request_for)
+        totals = {row['is_reconciled']: row for row in result['groups']}
+        assert (totals[False]['count'], totals[False]['sum']) == (3, '2.00')
+        assert (totals[True]['inflow'], totals[True]['outflow']) == ('10.00', '-4.00')
+
+        months = ai_tools.ListBankTransactions().execute({'group_by': 'month'}, request_for)['groups']
+        assert [(row['month'], row['count']) for row in months] == [('2026-08', 3), ('2026-09', 2)]
+
+    def test_summarize(self, hub_id, request_for, rows, bank_account):
+        """Test grouped metrics, metric ordering and the per-hub cache."""
+        tool = ai_tools.SummarizeBankTransactions()
+        args = {'group_by': ['month', 'account'], 'metrics': ['outflow', 'max', 'count'], 'order_by': 'outflow'}
+        result = tool.execute(args, request_for)
+        assert [(g['month'], g['account'], g['outflow'], g['max'], g['count']) for g in result['groups']] == [
+            ('2026-08', bank_account.name, '-12.00', '-4.00', 3),
+            ('2026-09', bank_account.name, '0.00', '10.00', 2),
+        ]
+        assert not result['truncated']
+
+        BankTransaction.objects.filter(hub_id=hub_id, description='Row 0').update(amount=Decimal('-40.00'))
+        assert tool.execute(args, request_for) == result
+        analytics.invalidate(hub_id)
+        assert tool.execute(args, request_for)['groups'][0]['outflow'] == '-48.00'
+
+    def test_summarize_total(self, request_for, rows):
+        """Test no dimensions give one total per currency."""
+        groups = ai_tools.SummarizeBankTransactions().execute({}, request_for)['groups']
+        assert groups == [{'currency': 'Test Currency', 'count': 5, 'sum': '8.00'}]
+
+    def test_bulk_reconcile_uses_the_shared_filters(self, hub_id, request_for, rows, bank_account):
+        """Test the reconcile tool is scoped like the list tools and skips deleted accounts."""
+        gone = BankAccount.objects.create(hub_id=hub_id, name='Closed', is_deleted=True)
+        BankTransaction.objects.create(hub_id=hub_id, account=gone, date=date(2026, 8, 12),
+                                       description='Closed account', amount=Decimal('5.00'))
+        result = ai_tools.ReconcileBankTransactions().execute({'date_from': '2026-08-01'}, request_for)
+        assert result['matched'] == 5
+        assert not BankTransaction.objects.filter(hub_id=hub_id, account=gone, is_reconciled=True).exists()
@@ -0,0 +1,76 @@
+"""Tests for the columnar analytics snapshot."""
+import io
+from datetime import date
+
+import pytest
+
+from bank_sync import analytics
+from bank_sync.bulk import bulk_update_transactions
+from bank_sync.importers import import_statement
+from bank_sync.models import BankTransaction
+
+STATEMENT = b"""date,description,amount,reference
+2026-08-30,MERCADONA REF 1,-20.00,A1
+2026-09-01,MERCADONA REF 2,-30.50,A2
+2026-09-01,NOMINA ACME SL,1000.00,A3
+2026-09-03,REPSOL ESTACION 9,-40.00,A4
+"""
+
+
+@pytest.fixture
+def imported(bank_account):
+    import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+    return bank_account
+
+
+def results(snapshot):
+    mask = snapshot.mask(start=date(2026, 9, 1), sign=-1)
+    first, series = analytics.daily_series(snapshot)
+    return (
+        analytics.group_sum(snapshot, 'account'),
+        analytics.group_sum(snapshot, 'month'),
+        {p and str(p): v for p, v in analytics.group_sum(snapshot, 'payee', mask).items()},
+        first, list(series), list(analytics.rolling_sum(series, 2)), list(analytics.cumulative(series, 100)),
+    )
+
+
+@pytest.mark.django_db
+class TestSnapshot:
+    """Snapshot and helper tests."""
+
+    def test_columns_and_helpers(self, hub_id, imported, monkeypatch):
+        """Test the columns hold the hub's rows and both backends agree."""
+        snapshot = analytics.load_snapshot(hub_id)
+        assert len(snapshot) == 4
+        assert list(snapshot.cents) == [-2000, -3050, 100000, -4000]
+        assert snapshot.codes['account'].typecode == 'B'
+        assert snapshot.nbytes == 4 * 16
+
+        found = results(snapshot)
+        assert found[0] == {imported.pk: (4, 90950)}
+        assert found[1] == {'2026-08': (1, -2000), '2026-09': (3, 92950)}
+        mercadona = str(BankTransaction.objects.get(reference='A1').payee_id)
+        assert found[2][mercadona] == (1, -3050)
+        assert found[3] == date(2026, 8, 30).toordinal()
+        assert found[4] == [-2000, 0, 96950, 0, -4000]
+        assert found[5] == [-2000, -2000, 96950, 96950, -4000]
+        assert found[6][-1] == 100 + 90950
+
+        monkeypatch.setattr(analytics, 'np', None)
+        assert results(analytics.load_snapshot(hub_id)) == found
+
+    def test_cached_until_written(self, hub_id, imported):
+        """Test the snapshot is reused until a save, import or bulk action changes the hub."""
+        first = analytics.get_snapshot(hub_id)
+        assert analytics.get_snapshot(hub_id) is first
+
+        row = BankTransaction.objects.get(reference='A4')
+        row.category = 'Fuel'
+        row.save()
+        second = analytics.get_snapshot(hub_id)
+        assert second is not first
+        assert analytics.group_sum(second, 'category')['Fuel'] == (1, -4000)
+
+        bulk_update_transactions(BankTransaction.objects.filter(reference='A1'), 'delete')
+        third = analytics.get_snapshot(hub_id)
+        assert third is not second and len(third) == 3
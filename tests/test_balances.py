@@ -0,0 +1,99 @@
+"""Tests for running balance recomputation."""
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync.balances import recompute_balances
+from bank_sync.importers import import_statement
+from bank_sync.models import BankTransaction
+
+STATEMENT = b"""date,description,amount,reference
+2026-09-01,Opening deposit,500.00,A1
+2026-09-01,Coffee,-3.50,A2
+2026-09-03,Electricity,-60.00,A3
+2026-09-07,Customer payment,250.00,A4
+"""
+
+
+def _chain(account):
+    return list(BankTransaction.objects.filter(account=account, is_deleted=False).order_by(
+        'date', 'seq', 'id',
+    ).values_list('reference', 'balance_after'))
+
+
+@pytest.mark.django_db
+class TestRunningBalances:
+    """balance_after maintenance tests."""
+
+    @pytest.fixture
+    def imported(self, bank_account):
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        bank_account.refresh_from_db()
+        return bank_account
+
+    def test_import_chains_from_opening_balance(self, imported):
+        """Test imported rows get a running balance in file order."""
+        assert _chain(imported) == [
+            ('A1', Decimal('600.00')), ('A2', Decimal('596.50')),
+            ('A3', Decimal('536.50')), ('A4', Decimal('786.50')),
+        ]
+        assert imported.balance == Decimal('786.50')
+
+    def test_recompute_is_idempotent(self, imported):
+        """Test a second full recompute rewrites nothing."""
+        assert recompute_balances(imported.pk) == 0
+
+    def test_backdated_edit_recomputes_later_rows(self, auth_client, imported):
+        """Test editing an early amount shifts every later balance."""
+        row = BankTransaction.objects.get(account=imported, reference='A2')
+        auth_client.post(reverse('bank_sync:bank_transaction_edit', args=[row.pk]), {
+            'date': '2026-09-01', 'description': 'Coffee', 'amount': '-13.50', 'reference': 'A2',
+        })
+        assert [b for _, b in _chain(imported)] == [
+            Decimal('600.00'), Decimal('586.50'), Decimal('526.50'), Decimal('776.50'),
+        ]
+        imported.refresh_from_db()
+        assert imported.balance == Decimal('776.50')
+
+    def test_moving_a_row_forward(self, auth_client, imported):
+        """Test changing a row's date reorders the running balance."""
+        row = BankTransaction.objects.get(account=imported, reference='A1')
+        auth_client.post(reverse('bank_sync:bank_transaction_edit', args=[row.pk]), {
+            'date': '2026-09-10', 'description': 'Opening deposit', 'amount': '500.00', 'reference': 'A1',
+        })
+        assert _chain(imported) == [
+            ('A2', Decimal('96.50')), ('A3', Decimal('36.50')),
+            ('A4', Decimal('286.50')), ('A1', Decimal('786.50')),
+        ]
+
+    def test_delete_recomputes(self, auth_client, imported):
+        """Test deleting a row drops it from the chain."""
+        row = BankTransaction.objects.get(account=imported, reference='A3')
+        auth_client.post(reverse('bank_sync:bank_transaction_delete', args=[row.pk]))
+        assert _chain(imported)[-1] == ('A4', Decimal('846.50'))
+        imported.refresh_from_db()
+        assert imported.balance == Decimal('846.50')
+
+    def test_add_view_appends_to_account(self, auth_client, imported):
+        """Test a manually added row gets its balance from the history, not the form."""
+        auth_client.post(reverse('bank_sync:bank_transaction_add'), {
+            'account': imported.pk, 'date': '2026-09-05', 'description': 'Refund',
+            'amount': '10.00', 'balance_after': '999999.00',
+        })
+        row = BankTransaction.objects.get(account=imported, description='Refund')
+        assert row.balance_after == Decimal('546.50')
+        assert _chain(imported)[-1] == ('A4', Decimal('796.50'))
+
+    def test_balance_correction_shifts_history(self, auth_client, imported):
+        """Test correcting the account balance moves the opening balance."""
+        auth_client.post(reverse('bank_sync:bank_account_edit', args=[imported.pk]), {
+            'name': imported.name, 'currency': imported.currency, 'balance': '800.00', 'is_active': 'on',
+        })
+        imported.refresh_from_db()
+        assert imported.opening_balance == Decimal('113.50')
+        assert _chain(imported)[0] == ('A1', Decimal('613.50'))
+        assert imported.daily_balances.order_by('day').first().opening == Decimal('113.50')
+        assert date(2026, 9, 7) == imported.daily_balances.order_by('-day').first().day
@@ -0,0 +1,120 @@
+"""Tests for filter-based bulk actions on transactions."""
+import io
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync.bulk import batched_ids, bulk_update_transactions
+from bank_sync.importers import import_statement
+from bank_sync.models import (
+    BankAccount, BankAccountDailyBalance, BankTransaction, ReconciliationAuditEntry, ReconciliationLink,
+)
+
+STATEMENT = b"""date,description,amount,reference
+2026-09-01,Fuel REPSOL,-40.00,B1
+2026-09-01,Fuel CEPSA,-35.00,B2
+2026-09-02,Groceries,-20.00,B3
+2026-09-03,Salary,1000.00,B4
+"""
+
+
+@pytest.fixture
+def imported(bank_account):
+    import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+    bank_account.refresh_from_db()
+    return bank_account
+
+
+@pytest.mark.django_db
+class TestBulkUpdate:
+    """bulk_update_transactions tests."""
+
+    def test_batches_walk_every_row(self, imported):
+        """Test the pk keyset visits each row once, also when the update stops it matching."""
+        qs = BankTransaction.objects.filter(account=imported, is_reconciled=False)
+        assert sum(len(b) for b in batched_ids(qs, batch_size=1)) == 4
+        assert bulk_update_transactions(qs, 'reconcile', batch_size=1) == 4
+        assert not BankTransaction.objects.filter(account=imported, is_reconciled=False).exists()
+        assert not BankAccountDailyBalance.objects.filter(account=imported, unreconciled_count__gt=0).exists()
+
+    def test_reconcile_writes_audit_batch(self, imported):
+        """Test each changed row gets one audit entry sharing the request's batch id."""
+        row = BankTransaction.objects.get(account=imported, reference='B1')
+        row.is_reconciled = True
+        row.save()
+        qs = BankTransaction.objects.filter(account=imported)
+        assert bulk_update_transactions(qs, 'reconcile', source='assistant', batch_size=2) == 3
+        entries = ReconciliationAuditEntry.objects.filter(transaction__account=imported)
+        assert entries.count() == 3
+        assert entries.values('batch_id').distinct().count() == 1
+        assert not entries.filter(transaction=row).exists()
+        assert set(entries.values_list('source', flat=True)) == {'assistant'}
+
+    def test_unreconcile_removes_links(self, imported):
+        """Test unreconciling drops the reconciliation links."""
+        row = BankTransaction.objects.get(account=imported, reference='B4')
+        row.is_reconciled = True
+        row.save()
+        ReconciliationLink.objects.create(hub_id=row.hub_id, transaction=row, document_type='invoice',
+                                          document_id='1', amount=row.amount)
+        bulk_update_transactions(BankTransaction.objects.filter(pk=row.pk), 'unreconcile')
+        row.refresh_from_db()
+        assert row.is_reconciled is False
+        assert not ReconciliationLink.objects.filter(transaction=row, is_deleted=False).exists()
+
+    def test_assign_account_rebalances_both(self, imported, hub_id):
+        """Test moving rows re-derives balances on the source and target accounts."""
+        other = BankAccount.objects.create(hub_id=hub_id, name='Savings')
+        moved = BankTransaction.objects.filter(account=imported, reference='B4')
+        assert bulk_update_transactions(moved, 'assign_account', account=other) == 1
+        imported.refresh_from_db()
+        other.refresh_from_db()
+        assert imported.balance == imported.opening_balance - Decimal('95.00')
+        assert other.balance == other.opening_balance + Decimal('1000.00')
+        assert BankTransaction.objects.get(reference='B4').fingerprint == ''
+
+    def test_unknown_action(self, imported):
+        """Test an unknown action is refused."""
+        with pytest.raises(ValueError):
+            bulk_update_transactions(BankTransaction.objects.all(), 'explode')
+
+
+@pytest.mark.django_db
+class TestBulkView:
+    """Bulk action endpoint tests."""
+
+    def test_filter_scope_dry_run_then_apply(self, auth_client, imported):
+        """Test a filter-scoped action counts first and changes nothing until confirmed."""
+        url = reverse('bank_sync:bank_transactions_bulk_action')
+        params = {'scope': 'filter', 'q': 'fuel', 'action': 'categorize', 'category': 'Fuel'}
+        response = auth_client.post(url, {**params, 'dry_run': '1'})
+        assert response.status_code == 200
+        assert response.context['count'] == 2
+        assert not BankTransaction.objects.filter(category='Fuel').exists()
+
+        response = auth_client.post(url, params)
+        assert response.status_code == 200
+        assert set(BankTransaction.objects.filter(category='Fuel').values_list('reference', flat=True)) == {'B1', 'B2'}
+
+    def test_reconcile_endpoint_by_account_and_month(self, auth_client, imported, admin_user):
+        """Test reconciling one account's month from the bulk endpoint."""
+        url = reverse('bank_sync:bank_transactions_bulk_reconcile')
+        response = auth_client.post(url, {'scope': 'filter', 'account': str(imported.pk), 'q': 'date:2026-09'})
+        assert response.status_code == 200
+        assert not BankTransaction.objects.filter(account=imported, is_reconciled=False).exists()
+        assert ReconciliationAuditEntry.objects.filter(created_by=admin_user.pk).count() == 4
+
+        url = reverse('bank_sync:bank_transactions_bulk_unreconcile')
+        row = BankTransaction.objects.get(account=imported, reference='B3')
+        auth_client.post(url, {'ids': str(row.pk)})
+        row.refresh_from_db()
+        assert row.is_reconciled is False
+
+    def test_filter_scope_delete(self, auth_client, imported):
+        """Test deleting every row matching a filter syntax query."""
+        url = reverse('bank_sync:bank_transactions_bulk_action')
+        auth_client.post(url, {'scope': 'filter', 'q': 'amount:<0', 'action': 'delete'})
+        assert list(BankTransaction.objects.filter(account=imported).values_list('reference', flat=True)) == ['B4']
+        imported.refresh_from_db()
+        assert imported.balance == imported.opening_balance + Decimal('1000.00')
@@ -0,0 +1,154 @@
+"""Tests for rule-based categorization."""
+import io
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync import jobs
+from bank_sync.categorization import reapply_rules
+from bank_sync.importers import import_statement
+from bank_sync.models import BankAccount, BankSyncJob, BankTransaction, CategorizationRule
+from bank_sync.normalize import search_document
+from bank_sync.rules import MATCH_CONTAINS, MATCH_REGEX, Rule, RuleSet
+from bank_sync.search import apply_search
+
+STATEMENT = b"""date,description,amount,reference
+2026-09-01,REPSOL ESTACION 1234,-40.00,C1
+2026-09-02,Transfer ES91 2100 0418 4502 0005 1332,-700.00,C2
+2026-09-03,Invoice INV-2026-0042 paid,1200.00,C3
+2026-09-04,Coffee,-2.50,C4
+"""
+
+
+def rule(pk, pattern='', match_type=MATCH_CONTAINS, priority=100, category='', tags=(), **fields):
+    values = dict(min_cents=None, max_cents=None, account_id=None, counterparty='')
+    values.update(fields)
+    return Rule(pk, priority, match_type, pattern, category=category, tags=tags, **values)
+
+
+def match(ruleset, description, cents, account_id=None):
+    return ruleset.match(search_document(description, ''), description, cents, account_id)
+
+
+class TestRuleSet:
+    """Compiled rule set tests."""
+
+    def test_priority_and_tags(self):
+        """Test the lowest priority sets the category and every match adds its tags."""
+        ruleset = RuleSet([
+            rule(1, 'fuel', priority=50, category='Fuel', tags=('car',)),
+            rule(2, 'repsol', priority=10, category='Repsol', tags=('fuel',)),
+            rule(3, r'estaci[oó]n \d+', MATCH_REGEX, priority=20, tags=('station',)),
+        ])
+        found = match(ruleset, 'Repsol Estación 12 fuel', -4000)
+        assert found.category == 'Repsol'
+        assert found.tags == ('fuel', 'station', 'car')
+        assert found.rule_ids == (2, 3, 1)
+        assert match(ruleset, 'Groceries', -4000) is None
+
+    def test_amount_account_and_iban(self):
+        """Test amount ranges, account and counterparty IBAN narrow a rule."""
+        ruleset = RuleSet([
+            rule(1, category='Small', min_cents=-1000, max_cents=0),
+            rule(2, 'rent', category='Rent', account_id='a1'),
+            rule(3, category='Landlord', counterparty='ES9121000418450200051332'),
+        ])
+        assert match(ruleset, 'Coffee', -250).category == 'Small'
+        assert match(ruleset, 'Coffee', -2500) is None
+        assert match(ruleset, 'Rent', -70000, 'a2') is None
+        assert match(ruleset, 'Rent', -70000, 'a1').category == 'Rent'
+        assert match(ruleset, 'to ES91 2100 0418 4502 0005 1332', -70000).category == 'Landlord'
+
+    def test_backreference_and_invalid_patterns(self):
+        """Test patterns that cannot share the alternation still match, and invalid ones are skipped."""
+        ruleset = RuleSet([
+            rule(1, r'(\w+) \1', MATCH_REGEX, category='Repeated'),
+            rule(2, '(', MATCH_REGEX, category='Broken'),
+        ])
+        assert match(ruleset, 'paid paid', 100).category == 'Repeated'
+        assert match(ruleset, 'paid once', 100) is None
+
+
+@pytest.mark.django_db
+class TestCategorization:
+    """Import-time and re-applied categorization tests."""
+
+    @pytest.fixture
+    def rules(self, hub_id, bank_account):
+        CategorizationRule.objects.create(hub_id=hub_id, name='Fuel', priority=10, pattern='repsol',
+                                          category='Fuel', tags='car, fuel')
+        CategorizationRule.objects.create(hub_id=hub_id, name='Invoices', match_type='regex',
+                                          pattern=r'INV-\d{4}-\d+', category='Sales')
+        CategorizationRule.objects.create(hub_id=hub_id, name='Landlord', counterparty_iban='ES91 2100 0418 4502 0005 1332',
+                                          max_amount=Decimal('0'), category='Rent')
+        CategorizationRule.objects.create(hub_id=hub_id, name='Off', pattern='coffee', category='Coffee',
+                                          is_active=False)
+
+    def categories(self, account):
+        return dict(BankTransaction.objects.filter(account=account).values_list('reference', 'category'))
+
+    def test_import_categorizes(self, rules, bank_account):
+        """Test imported lines arrive categorised and tagged."""
+        result = import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        assert result.rows_categorized == 3
+        assert self.categories(bank_account) == {'C1': 'Fuel', 'C2': 'Rent', 'C3': 'Sales', 'C4': ''}
+        assert BankTransaction.objects.get(reference='C1').tags == 'car,fuel'
+        assert list(apply_search(BankTransaction.objects.all(), 'tag:car').values_list('reference', flat=True)) == ['C1']
+
+    def test_reapply_keeps_categories_unless_overwrite(self, hub_id, bank_account):
+        """Test re-applying fills empty categories, and replaces others only with overwrite."""
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        BankTransaction.objects.filter(reference='C1').update(category='Manual')
+        CategorizationRule.objects.create(hub_id=hub_id, name='Fuel', pattern='repsol', category='Fuel', tags='car')
+        CategorizationRule.objects.create(hub_id=hub_id, name='Coffee', pattern='coffee', category='Coffee')
+
+        result = reapply_rules(hub_id, batch_size=1)
+        assert (result.examined, result.matched, result.updated) == (4, 2, 2)
+        assert self.categories(bank_account)['C1'] == 'Manual'
+        assert BankTransaction.objects.get(reference='C1').tags == 'car'
+
+        result = reapply_rules(hub_id, overwrite=True)
+        assert result.updated == 1
+        assert self.categories(bank_account) == {'C1': 'Fuel', 'C2': '', 'C3': '', 'C4': 'Coffee'}
+
+    def test_job_and_account_scope(self, rules, hub_id, bank_account):
+        """Test the categorize job only touches the requested account."""
+        other = BankAccount.objects.create(hub_id=hub_id, name='Other')
+        CategorizationRule.objects.filter(hub_id=hub_id).update(is_active=False)
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        import_statement(other, io.BytesIO(STATEMENT), 'csv')
+        CategorizationRule.objects.filter(hub_id=hub_id).exclude(name='Off').update(is_active=True)
+
+        job = jobs.enqueue(hub_id, 'categorize', {'account_id': str(other.pk)})
+        assert jobs.run_pending() == 1
+        job.refresh_from_db()
+        assert job.status == BankSyncJob.STATUS_DONE
+        assert job.result == {'examined': 4, 'matched': 3, 'updated': 3}
+        assert self.categories(other)['C1'] == 'Fuel'
+        assert self.categories(bank_account)['C1'] == ''
+
+
+@pytest.mark.django_db
+class TestCategorizationViews:
+    """Rule settings endpoint tests."""
+
+    def test_add_and_delete(self, auth_client, hub_id):
+        """Test adding a rule from settings and deleting it."""
+        response = auth_client.post(reverse('bank_sync:categorization_rule_add'), {
+            'name': 'Fuel', 'match_type': 'contains', 'pattern': 'repsol', 'category': 'Fuel', 'min_amount': '-100',
+        })
+        assert response.status_code == 200
+        obj = CategorizationRule.objects.get(hub_id=hub_id)
+        assert obj.min_amount == Decimal('-100') and obj.max_amount is None
+        auth_client.post(reverse('bank_sync:categorization_rule_delete', args=[obj.pk]))
+        assert not CategorizationRule.objects.filter(hub_id=hub_id, is_deleted=False).exists()
+
+    def test_invalid_regex_is_refused(self, auth_client, hub_id):
+        """Test a pattern that does not compile is reported and not saved."""
+        response = auth_client.post(reverse('bank_sync:categorization_rule_add'), {
+            'name': 'Broken', 'match_type': 'regex', 'pattern': '(', 'category': 'X',
+        })
+        assert response.status_code == 200
+        assert 'Invalid regular expression' in response.context['error']
+        assert not CategorizationRule.objects.filter(hub_id=hub_id).exists()
@@ -0,0 +1,78 @@
+"""Tests for the cached per-hub counters."""
+import io
+from decimal import Decimal
+
+import pytest
+
+from bank_sync import counters
+from bank_sync.bulk import bulk_update_transactions
+from bank_sync.importers import import_statement
+from bank_sync.models import BankAccount, BankTransaction
+
+STATEMENT = b"""date,description,amount,reference
+2026-09-01,Rent,-500.00,C1
+2026-09-02,Salary,1000.00,C2
+"""
+
+
+@pytest.fixture
+def warm(hub_id, bank_account):
+    """Counters cached for the hub before the test writes anything."""
+    counters.invalidate(hub_id)
+    counters.get_counters(hub_id)
+    return hub_id
+
+
+def assert_matches_database(hub_id):
+    assert counters.get_counters(hub_id) == counters.compute(hub_id)
+
+
+@pytest.mark.django_db
+class TestCounters:
+    """Cache, delta and invalidation tests."""
+
+    def test_miss_then_hit(self, hub_id, bank_account):
+        """Test the first read computes and the second is served from the cache."""
+        counters.invalidate(hub_id)
+        counters.reset_stats()
+        first = counters.get_counters(hub_id)
+        assert first['accounts'] == 1
+        assert counters.get_counters(hub_id) == first
+        assert counters.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    def test_save_applies_delta(self, warm, bank_account):
+        """Test creating, reconciling and deleting a row moves the cached counters without a recount."""
+        row = BankTransaction.objects.create(hub_id=warm, account=bank_account, date='2026-09-01',
+                                             description='Fee', amount=Decimal('-3.50'))
+        cached = counters.get_counters(warm)
+        assert cached['unreconciled_amount'] == counters.compute(warm)['unreconciled_amount']
+        row = BankTransaction.objects.get(pk=row.pk)
+        row.is_reconciled = True
+        row.save()
+        assert_matches_database(warm)
+        row.is_deleted = True
+        row.save()
+        assert_matches_database(warm)
+
+    def test_import_and_bulk_reconcile(self, warm, bank_account):
+        """Test bulk_create imports and batched reconciles, which send no signals, keep the counters exact."""
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        assert_matches_database(warm)
+        bulk_update_transactions(BankTransaction.objects.filter(account=bank_account, reference='C1'), 'reconcile')
+        assert_matches_database(warm)
+        bulk_update_transactions(BankTransaction.objects.filter(account=bank_account), 'delete')
+        assert_matches_database(warm)
+
+    def test_deleting_account_drops_its_transactions(self, warm, bank_account):
+        """Test soft-deleting an account removes it and its transactions from the totals."""
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        account = BankAccount.objects.get(pk=bank_account.pk)
+        account.is_deleted = True
+        account.save()
+        totals = counters.get_counters(warm)
+        assert totals['accounts'] == 0 and totals['transactions'] == 0
+
+    def test_unknown_counter(self, warm):
+        """Test adjusting a counter that does not exist is refused."""
+        with pytest.raises(ValueError):
+            counters.adjust(warm, payees=1)
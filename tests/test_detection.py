@@ -0,0 +1,130 @@
+"""Tests for duplicate and anomaly detection."""
+import io
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from django.urls import reverse
+
+from bank_sync import detection, jobs
+from bank_sync.analytics import Snapshot
+from bank_sync.importers import import_statement
+from bank_sync.models import BankSyncJob, BankTransaction, TransactionFlag
+from bank_sync.search import apply_search
+
+STATEMENT = b"""date,description,amount,reference
+2026-01-05,RECIBO ACME SL,-50.00,D1
+2026-02-05,RECIBO ACME SL,-52.00,D2
+2026-03-05,RECIBO ACME SL,-49.00,D3
+2026-03-10,REPSOL ESTACION REF 77,-40.00,D4
+2026-03-10,MERCADONA REF 91,-40.00,D5
+2026-03-11,REPSOL ESTACION REFERENCIA 77,-40.00,D6
+2026-04-05,RECIBO ACME SL,-51.00,D7
+2026-05-05,RECIBO ACME SL,-50.00,D8
+2026-06-05,RECIBO ACME SL,-50.50,D9
+2026-07-05,RECIBO ACME SL,-900.00,D10
+"""
+
+
+def snapshot_of(rows):
+    """``(cents, day offset, account, payee)`` tuples as a snapshot with ids."""
+    start = date(2026, 1, 1)
+    return Snapshot.from_rows([
+        (uuid.uuid4(), cents, start + timedelta(days=offset), account, payee, '', False)
+        for cents, offset, account, payee in rows
+    ], with_ids=True)
+
+
+class TestDetectionPasses:
+    """In-memory pass tests."""
+
+    @pytest.mark.parametrize('numpy', [True, False])
+    def test_duplicate_candidates(self, numpy, monkeypatch):
+        """Test same account and amount within the window pair up, in either backend."""
+        if not numpy:
+            monkeypatch.setattr(detection, 'np', None)
+        snapshot = snapshot_of([
+            (-4000, 0, 'a', 'repsol'), (-4000, 0, 'a', 'mercadona'), (-4000, 1, 'a', 'repsol'),
+            (-4000, 1, 'b', 'repsol'), (-1000, 1, 'a', 'repsol'), (-4000, 9, 'a', 'repsol'),
+        ])
+        assert sorted(detection.duplicate_candidates(snapshot)) == [(0, 1), (0, 2), (1, 2)]
+
+    def test_amount_anomalies(self):
+        """Test an amount far from the payee's history is found once there is enough of it."""
+        history = [(-5000 - 100 * (n % 3), 30 * n, 'a', 'acme') for n in range(6)]
+        snapshot = snapshot_of(history + [(-90000, 200, 'a', 'acme'), (-90000, 201, 'a', None)])
+        found = detection.amount_anomalies(snapshot)
+        assert [index for index, _, _ in found] == [6]
+        assert round(found[0][1]) == -5100
+
+        assert detection.amount_anomalies(snapshot_of(history[:4] + [(-90000, 200, 'a', 'acme')])) == []
+
+    def test_description_similarity(self):
+        """Test reworded lines match and different reference numbers do not."""
+        assert detection.description_similarity(' repsol estacion ref 77', ' repsol estacion referencia 77') > 0.8
+        assert detection.description_similarity(' mercadona ref 91', ' mercadona ref 92') == 0.0
+
+
+@pytest.mark.django_db
+class TestDetectFlags:
+    """Flag writing tests."""
+
+    @pytest.fixture
+    def imported(self, bank_account):
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        return bank_account
+
+    def flags(self, hub_id):
+        return dict(TransactionFlag.objects.filter(hub_id=hub_id).values_list('transaction__reference', 'kind'))
+
+    def test_flags_duplicates_and_anomalies(self, hub_id, imported):
+        """Test the re-issued line and the price jump are flagged, and nothing else."""
+        result = detection.detect_flags(hub_id)
+        assert (result.rows, result.candidates, result.duplicates, result.anomalies, result.flagged) == (10, 3, 1, 1, 2)
+        assert self.flags(hub_id) == {'D6': 'duplicate', 'D10': 'anomaly'}
+        duplicate = TransactionFlag.objects.get(hub_id=hub_id, kind=TransactionFlag.KIND_DUPLICATE)
+        assert duplicate.related.reference == 'D4'
+
+    def test_rerun_keeps_dismissed(self, hub_id, imported):
+        """Test running again raises nothing new, a dismissed flag included."""
+        detection.detect_flags(hub_id)
+        TransactionFlag.objects.filter(transaction__reference='D6').update(status=TransactionFlag.STATUS_DISMISSED)
+        assert detection.detect_flags(hub_id).flagged == 0
+        assert TransactionFlag.objects.get(transaction__reference='D6').status == TransactionFlag.STATUS_DISMISSED
+
+    def test_job_and_search(self, hub_id, imported):
+        """Test the detect job and the flagged:yes search filter."""
+        job = jobs.enqueue(hub_id, 'detect')
+        assert jobs.run_pending() == 1
+        job.refresh_from_db()
+        assert job.status == BankSyncJob.STATUS_DONE
+        assert job.result['flagged'] == 2
+        found = apply_search(BankTransaction.objects.filter(hub_id=hub_id), 'flagged:yes')
+        assert sorted(found.values_list('reference', flat=True)) == ['D10', 'D6']
+
+
+@pytest.mark.django_db
+class TestDetectionViews:
+    """Review badge and dismiss endpoint tests."""
+
+    def test_badge_and_dismiss(self, auth_client, hub_id, bank_account):
+        """Test a flagged row shows the badge until its flags are dismissed."""
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        detection.detect_flags(hub_id)
+        row = BankTransaction.objects.get(reference='D10')
+
+        response = auth_client.get(reverse('bank_sync:bank_transactions_list'), {'q': 'flagged:yes'})
+        assert response.status_code == 200
+        assert {item.reference for item in response.context['bank_transactions']} == {'D6', 'D10'}
+        assert all(item.has_open_flag for item in response.context['bank_transactions'])
+
+        response = auth_client.post(reverse('bank_sync:bank_transaction_flags_dismiss', args=[row.pk]))
+        assert response.status_code == 200
+        assert not list(response.context['items'])[0].has_open_flag
+        assert TransactionFlag.objects.get(transaction=row).status == TransactionFlag.STATUS_DISMISSED
+
+    def test_detect_job_endpoint(self, auth_client, hub_id):
+        """Test the settings button enqueues a detect job."""
+        response = auth_client.post(reverse('bank_sync:detect_flags_job'))
+        assert response.status_code == 200
+        assert BankSyncJob.objects.get(hub_id=hub_id).kind == 'detect'
@@ -0,0 +1,66 @@
+"""Tests for streaming exports."""
+import io
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.dom import minidom
+
+import pytest
+from django.urls import reverse
+
+from bank_sync.exports import FLUSH_ROWS, csv_stream, xlsx_stream
+from bank_sync.models import BankTransaction
+
+
+class TestWriters:
+    """CSV and XLSX writer tests."""
+
+    def test_csv_rows(self):
+        """Test CSV output has a BOM, headers and formatted cells."""
+        data = b''.join(csv_stream(['A', 'B', 'C'], [('x,y', None, True)])).decode('utf-8')
+        assert data == '﻿A,B,C\r\n"x,y",,Yes\r\n'
+
+    def test_csv_is_chunked(self):
+        """Test CSV rows are yielded in batches, not as one blob."""
+        chunks = list(csv_stream(['A'], ((i,) for i in range(FLUSH_ROWS * 3))))
+        assert len(chunks) == 4
+
+    def test_xlsx_is_a_valid_workbook(self):
+        """Test the XLSX stream is a readable zip with a well-formed sheet."""
+        rows = [('Acme & <Co>', date(2026, 9, 1), Decimal('-12.50'), False, None)] * (FLUSH_ROWS + 5)
+        data = b''.join(xlsx_stream(['Name', 'Date', 'Amount', 'Flag', 'Empty'], iter(rows)))
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        assert archive.testzip() is None
+        sheet = minidom.parseString(archive.read('xl/worksheets/sheet1.xml'))
+        assert len(sheet.getElementsByTagName('row')) == FLUSH_ROWS + 6
+        assert b'Acme &amp; &lt;Co&gt;' in archive.read('xl/worksheets/sheet1.xml')
+        # 2026-09-01 as an Excel serial date.
+        assert b'<c s="1"><v>46266</v></c>' in archive.read('xl/worksheets/sheet1.xml')
+
+
+@pytest.mark.django_db
+class TestExportViews:
+    """Export endpoint tests."""
+
+    def test_transactions_csv_streams_account_name(self, auth_client, hub_id, bank_account):
+        """Test the transaction CSV export streams rows with the account name."""
+        BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 9, 1),
+            description='Row', amount=Decimal('10.00'), reference='EXP-1',
+        )
+        url = reverse('bank_sync:bank_transactions_list')
+        response = auth_client.get(url, {'export': 'csv'})
+        assert response.status_code == 200
+        assert response.streaming
+        body = b''.join(response.streaming_content).decode('utf-8')
+        assert 'EXP-1' in body
+        assert bank_account.name in body
+
+    def test_accounts_excel_export(self, auth_client, bank_account):
+        """Test the account Excel export is an XLSX attachment."""
+        url = reverse('bank_sync:bank_accounts_list')
+        response = auth_client.get(url, {'export': 'excel'})
+        assert response.status_code == 200
+        assert response['Content-Disposition'].endswith('.xlsx"')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        assert bank_account.name.encode() in archive.read('xl/worksheets/sheet1.xml')
@@ -0,0 +1,124 @@
+"""Tests for the recurring-transaction cash-flow forecast."""
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync import forecast
+from bank_sync.analytics import Snapshot
+from bank_sync.importers import import_statement
+from bank_sync.models import BankAccount
+
+TODAY = date(2026, 10, 5)
+
+STATEMENT = b"""date,description,amount,reference
+2026-06-30,RECIBO INMOBILIARIA SOL SL,-1200.00,F1
+2026-07-24,NOMINA ACME SL,2500.00,F2
+2026-07-31,RECIBO INMOBILIARIA SOL SL,-1200.00,F3
+2026-08-12,COMPRA TARJETA MERCADONA,-85.10,F4
+2026-08-25,NOMINA ACME SL,2500.00,F5
+2026-08-31,RECIBO INMOBILIARIA SOL SL,-1200.00,F6
+2026-09-03,COMPRA TARJETA MERCADONA,-12.40,F7
+2026-09-25,NOMINA ACME SL,2500.00,F8
+2026-09-30,RECIBO INMOBILIARIA SOL SL,-1200.00,F9
+2026-10-01,COMPRA TARJETA MERCADONA,-40.00,F10
+"""
+
+
+def snapshot_of(rows):
+    """``(cents, day, payee)`` tuples of one account as a snapshot."""
+    return Snapshot.from_rows(sorted(
+        ((cents, day, 'account', payee, '', False) for cents, day, payee in rows), key=lambda row: row[1],
+    ))
+
+
+class TestRecurring:
+    """Series detection and projection tests."""
+
+    @pytest.mark.parametrize('numpy', [True, False])
+    def test_detects_regular_series_only(self, numpy, monkeypatch):
+        """Test monthly and weekly series are found; irregular, stopped and single ones are not."""
+        if not numpy:
+            monkeypatch.setattr(forecast, 'np', None)
+        rows = [(-120000, forecast._add_months(date(2026, 1, 31), n, 31), 'rent') for n in range(9)]
+        rows += [(-500 - n % 3 * 10, date(2026, 3, 2) + timedelta(days=7 * n), 'gym') for n in range(31)]
+        rows += [(-100 - n * 997 % 5000, date(2026, 2, 1) + timedelta(days=n * n), 'shop') for n in range(10)]
+        rows += [(-2000, date(2026, 1, 10) + timedelta(days=30 * n), 'stopped') for n in range(4)]
+        rows += [(-999, date(2026, 9, 1), None), (-999, date(2026, 9, 8), None), (-999, date(2026, 9, 15), None)]
+        found = {s.payee_id: s for s in forecast.detect_recurring(snapshot_of(rows), today=TODAY)}
+        assert set(found) == {'rent', 'gym'}
+        assert (found['rent'].period, found['rent'].cents, found['rent'].anchor) == ('monthly', -120000, 31)
+        assert (found['gym'].period, found['gym'].cents) == ('weekly', -510)
+
+    def test_project(self):
+        """Test occurrences are booked on their day, overdue ones today, and the balance walks forward."""
+        series = [
+            forecast.RecurringSeries('rent', 'monthly', -120000, 9, date(2026, 9, 30), 31, 'Rent'),
+            forecast.RecurringSeries('gym', 'weekly', -500, 20, date(2026, 9, 27), 27, 'Gym'),
+        ]
+        balances, events = forecast.project(1000000, series, TODAY)
+        assert len(balances) == forecast.HORIZON_DAYS + 1
+        assert events[0] == (TODAY, -500, 'Gym')
+        assert (date(2026, 10, 31), -120000, 'Rent') in events
+        assert (date(2026, 11, 30), -120000, 'Rent') in events
+        assert balances[0] == 1000000 - 500
+        assert balances[-1] == 1000000 + sum(cents for _, cents, _ in events)
+
+    def test_add_months_clamps(self):
+        """Test month steps keep the anchor day and clamp to short months."""
+        assert forecast._add_months(date(2026, 1, 31), 1, 31) == date(2026, 2, 28)
+        assert forecast._add_months(date(2026, 2, 28), 1, 31) == date(2026, 3, 31)
+        assert forecast._add_months(date(2026, 12, 15), 3, 15) == date(2027, 3, 15)
+
+
+@pytest.mark.django_db
+class TestForecastCache:
+    """Per-account caching and the dashboard widget."""
+
+    @pytest.fixture
+    def imported(self, bank_account):
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        bank_account.refresh_from_db()
+        return bank_account
+
+    def test_hub_forecast(self, hub_id, imported):
+        """Test rent and salary are projected from the account balance."""
+        BankAccount.objects.filter(pk=imported.pk).update(currency='EUR')
+        result = forecast.hub_forecast(hub_id, TODAY)
+        assert result['series'] == 2
+        assert result['balances'][0] == imported.balance
+        assert [(u.day, u.amount, u.name) for u in result['upcoming'][:2]] == [
+            (date(2026, 10, 25), Decimal('2500.00'), 'ACME SL'),
+            (date(2026, 10, 31), Decimal('-1200.00'), 'INMOBILIARIA SOL SL'),
+        ]
+        assert result['end_balance'] == imported.balance + 3 * Decimal('2500.00') - 3 * Decimal('1200.00')
+
+    def test_cached_per_account(self, hub_id, imported, monkeypatch):
+        """Test a forecast is reused until a transaction lands on its own account."""
+        other = BankAccount.objects.create(hub_id=hub_id, name='Other')
+        forecast.account_forecast(imported, TODAY)
+        forecast.account_forecast(other, TODAY)
+        computed = []
+        original = forecast._compute
+        monkeypatch.setattr(forecast, '_compute', lambda account, today: computed.append(account.pk) or original(account, today))
+
+        forecast.account_forecast(imported, TODAY)
+        forecast.account_forecast(other, TODAY)
+        assert computed == []
+
+        import_statement(other, io.BytesIO(b'date,description,amount\n2026-10-02,Deposit,10.00\n'), 'csv')
+        forecast.account_forecast(imported, TODAY)
+        forecast.account_forecast(other, TODAY)
+        assert computed == [other.pk]
+
+        forecast.account_forecast(imported, TODAY + timedelta(days=1))
+        assert computed == [other.pk, imported.pk]
+
+    def test_dashboard_widget(self, auth_client, imported):
+        """Test the dashboard renders the forecast card."""
+        response = auth_client.get(reverse('bank_sync:dashboard'))
+        assert response.status_code == 200
+        assert 'forecast' in response.context
+        assert len(response.context['forecast']['balances']) == forecast.HORIZON_DAYS + 1
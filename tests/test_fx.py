@@ -0,0 +1,144 @@
+"""Tests for FX rates and multi-currency totals."""
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from bank_sync import fx
+from bank_sync.importers import import_statement
+from bank_sync.models import BankAccount, FxRate
+
+ECB = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">
+    <gesmes:subject>Reference rates</gesmes:subject>
+    <Cube>
+        <Cube time="2026-10-16">
+            <Cube currency="USD" rate="1.25"/>
+            <Cube currency="GBP" rate="0.80"/>
+        </Cube>
+        <Cube time="2026-10-01">
+            <Cube currency="USD" rate="1.00"/>
+        </Cube>
+    </Cube>
+</gesmes:Envelope>
+"""
+
+
+class TestParseRates:
+    """Rate file parser tests."""
+
+    def test_ecb(self):
+        """Test ECB cubes become EUR-based rows, with the format sniffed."""
+        rows = list(fx.parse_rates(io.BytesIO(ECB)))
+        assert [(r.day, r.base, r.quote, r.rate) for r in rows] == [
+            (date(2026, 10, 16), 'EUR', 'USD', Decimal('1.25')),
+            (date(2026, 10, 16), 'EUR', 'GBP', Decimal('0.80')),
+            (date(2026, 10, 1), 'EUR', 'USD', Decimal('1.00')),
+        ]
+
+    def test_csv(self):
+        """Test CSV rows are normalised and a bad rate names its line."""
+        rows = list(fx.parse_rates(io.BytesIO(b'Date,Base,Quote,Rate\n2026-10-16,usd,EUR,"0,8"\n')))
+        assert rows == [fx.RateRow(date(2026, 10, 16), 'USD', 'EUR', Decimal('0.8'))]
+        with pytest.raises(ValueError, match='line 2'):
+            list(fx.parse_rates(io.BytesIO(b'date,base,quote,rate\n2026-10-16,USD,EUR,0\n'), 'csv'))
+
+
+@pytest.mark.django_db
+class TestConsolidation:
+    """Rate lookups and consolidated totals."""
+
+    @pytest.fixture
+    def rates(self, hub_id):
+        fx.load_rates(hub_id, fx.parse_rates(io.BytesIO(ECB)))
+
+    @pytest.fixture
+    def usd_account(self, hub_id):
+        return BankAccount.objects.create(hub_id=hub_id, name='Dollars', currency='USD')
+
+    def test_load_updates_in_place(self, hub_id, rates):
+        """Test loading again updates changed rates only and moves lookups on."""
+        table = fx.FxTable(hub_id, 'EUR')
+        assert table.rate('USD', date(2026, 10, 20)) == Decimal('0.8')
+        rows = [fx.RateRow(date(2026, 10, 16), 'EUR', 'USD', Decimal('2')),
+                fx.RateRow(date(2026, 10, 1), 'EUR', 'USD', Decimal('1'))]
+        assert fx.load_rates(hub_id, rows) == (0, 1)
+        assert FxRate.objects.filter(hub_id=hub_id).count() == 3
+        assert fx.FxTable(hub_id, 'EUR').rate('USD', date(2026, 10, 20)) == Decimal('0.5')
+
+    def test_failed_load_drops_cached_lookups(self, hub_id, rates):
+        """Test batches written before the rows raise are visible to the next lookup."""
+        assert fx.FxTable(hub_id, 'EUR').rate('USD', date(2026, 10, 20)) == Decimal('0.8')
+
+        def rows():
+            yield fx.RateRow(date(2026, 10, 16), 'EUR', 'USD', Decimal('2'))
+            raise ValueError('line 3: bad rate')
+
+        with pytest.raises(ValueError):
+            fx.load_rates(hub_id, rows(), batch_size=1)
+        assert fx.FxTable(hub_id, 'EUR').rate('USD', date(2026, 10, 20)) == Decimal('0.5')
+
+    def test_rates(self, hub_id, rates):
+        """Test latest-on-or-before, inverse and cross rates."""
+        table = fx.FxTable(hub_id, 'EUR')
+        assert table.rate('EUR', date(2026, 1, 1)) == 1
+        assert table.rate('USD', date(2026, 10, 10)) == Decimal('1')
+        assert table.rate('USD', date(2026, 9, 30)) is None
+        assert fx.FxTable(hub_id, 'USD').rate('GBP', date(2026, 10, 16)) == Decimal('1.5625')
+        assert table.convert(Decimal('10.00'), 'USD', date(2026, 10, 16)) == Decimal('8.00')
+
+    def test_consolidated_balances(self, hub_id, rates, bank_account, usd_account):
+        """Test balances are summed per currency and converted; a currency without a rate is named."""
+        BankAccount.objects.filter(pk=bank_account.pk).update(currency='EUR', balance=Decimal('100.00'))
+        BankAccount.objects.filter(pk=usd_account.pk).update(balance=Decimal('50.00'))
+        BankAccount.objects.create(hub_id=hub_id, name='Yen', currency='JPY', balance=Decimal('1000.00'))
+        position = fx.consolidated_balances(hub_id, date(2026, 10, 17), 'EUR')
+        assert position.total == Decimal('140.00')
+        assert position.missing == ['JPY']
+        assert [(c.currency, c.converted) for c in position.currencies] == [
+            ('EUR', Decimal('100.00')), ('JPY', None), ('USD', Decimal('40.00')),
+        ]
+
+    def test_consolidated_flows(self, hub_id, rates, usd_account):
+        """Test each day's flows are converted at that day's rate."""
+        import_statement(usd_account, io.BytesIO(
+            b'date,description,amount\n2026-10-02,Sale,100.00\n2026-10-17,Sale,100.00\n2026-10-17,Fee,-10.00\n'
+        ), 'csv')
+        flows = fx.consolidated_flows(hub_id, date(2026, 10, 1), date(2026, 10, 31), 'EUR')
+        assert (flows.inflow, flows.outflow) == (Decimal('180.00'), Decimal('8.00'))
+        assert flows.months == [fx.MonthFlow(date(2026, 10, 1), Decimal('180.00'), Decimal('8.00'), Decimal('172.00'))]
+        assert flows.missing == []
+
+    def test_consolidated_history_and_unreconciled(self, hub_id, rates, usd_account):
+        """Test the balance series and the unreconciled amount are converted before they are added up."""
+        BankAccount.objects.create(hub_id=hub_id, name='Yen', currency='JPY')
+        import_statement(usd_account, io.BytesIO(
+            b'date,description,amount\n2026-10-02,Sale,100.00\n2026-10-17,Sale,100.00\n2026-10-17,Fee,-10.00\n'
+        ), 'csv')
+        history = fx.consolidated_history(hub_id, date(2026, 10, 1), date(2026, 10, 17), 'EUR')
+        assert history.missing == ['JPY']
+        assert len(history.points) == 17
+        assert (history.points[1].inflow, history.points[1].closing) == (Decimal('80.00'), Decimal('80.00'))
+        assert history.points[-1].closing == Decimal('152.00')
+        assert fx.consolidated_unreconciled(hub_id, date(2026, 10, 17), 'EUR') == (
+            'EUR', Decimal('152.00'), [],
+        )
+
+    def test_command_and_dashboard(self, auth_client, hub_id, bank_account, usd_account, tmp_path):
+        """Test the load command and the dashboard's base-currency balance."""
+        today = timezone.now().date()
+        path = tmp_path / 'rates.csv'
+        path.write_text(f'date,base,quote,rate\n{today - timedelta(days=1)},EUR,USD,1.25\n')
+        call_command('bank_sync_load_fx_rates', str(path), '--hub', str(hub_id), stdout=io.StringIO())
+        BankAccount.objects.filter(pk=usd_account.pk).update(balance=Decimal('50.00'))
+        BankAccount.objects.filter(pk=bank_account.pk).update(currency='EUR')
+
+        response = auth_client.get(reverse('bank_sync:dashboard'))
+        assert response.status_code == 200
+        assert response.context['base_currency'] == 'EUR'
+        assert response.context['current_balance'] == bank_account.balance + Decimal('40.00')
+        assert response.context['position'].missing == []
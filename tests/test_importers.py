@@ -0,0 +1,135 @@
+"""Tests for bank_sync statement parsing and import."""
+import io
+from decimal import Decimal
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from bank_sync import importers
+from bank_sync.importers import import_statement
+from bank_sync.jobs import run_pending
+from bank_sync.models import BankTransaction
+from bank_sync.parsers import StatementParseError, clean_line, parse_camt053, parse_csv, parse_ofx
+
+
+CSV = b"""Date;Description;Debit;Credit;Reference
+31/01/2026;Electricity;12,50;;R1
+01/02/2026;Customer payment;;1.000,00;R2
+not-a-date;Broken;1;;R3
+"""
+
+CAMT = b"""<?xml version="1.0"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="EUR">25.00</Amt><CdtDbtInd>DBIT</CdtDbtInd><BookgDt><Dt>2026-02-03</Dt></BookgDt>
+<AcctSvcrRef>C1</AcctSvcrRef><AddtlNtryInf>Card payment</AddtlNtryInf></Ntry>
+</Stmt></BkToCstmrStmt></Document>
+"""
+
+OFX = b"""OFXHEADER:100
+<OFX><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260204120000<TRNAMT>40.10<FITID>O1<NAME>Refund</STMTTRN>
+</BANKTRANLIST></OFX>
+"""
+
+
+class TestParsers:
+    """Statement parser tests."""
+
+    def test_csv_debit_credit(self):
+        """Test debit/credit columns and European number format."""
+        lines = list(parse_csv(io.BytesIO(CSV)))
+        assert [clean_line(line)[1] for line in lines[:2]] == [Decimal('-12.50'), Decimal('1000.00')]
+
+    def test_csv_bad_line_is_reported_not_raised(self):
+        """Test invalid values surface at validation time."""
+        lines = list(parse_csv(io.BytesIO(CSV)))
+        with pytest.raises(ValueError):
+            clean_line(lines[2])
+
+    def test_csv_missing_columns(self):
+        """Test a header without date/amount is rejected."""
+        with pytest.raises(StatementParseError):
+            list(parse_csv(io.BytesIO(b'foo,bar\n1,2\n')))
+
+    def test_camt053(self):
+        """Test CAMT.053 entries."""
+        (line,) = parse_camt053(io.BytesIO(CAMT))
+        assert clean_line(line)[1] == Decimal('-25.00')
+        assert line.reference == 'C1'
+
+    def test_ofx(self):
+        """Test SGML OFX transactions."""
+        (line,) = parse_ofx(io.BytesIO(OFX))
+        assert str(clean_line(line)[0]) == '2026-02-04'
+        assert line.reference == 'O1'
+
+
+@pytest.mark.django_db
+class TestImportStatement:
+    """import_statement tests."""
+
+    def test_import_csv(self, bank_account):
+        """Test chunked import skips bad lines and adjusts the balance once."""
+        result = import_statement(bank_account, io.BytesIO(CSV), 'csv', batch_size=1)
+        assert result.rows_read == 3
+        assert result.rows_created == 2
+        assert result.error_count == 1
+        assert BankTransaction.objects.filter(account=bank_account).count() == 2
+        bank_account.refresh_from_db()
+        assert bank_account.balance == Decimal('100.00') + Decimal('987.50')
+
+    def test_reimport_is_idempotent(self, bank_account):
+        """Test re-importing the same statement skips every line."""
+        import_statement(bank_account, io.BytesIO(CSV), 'csv')
+        result = import_statement(bank_account, io.BytesIO(CSV), 'csv')
+        assert result.rows_created == 0
+        assert result.rows_skipped == 2
+        assert BankTransaction.objects.filter(account=bank_account).count() == 2
+        bank_account.refresh_from_db()
+        assert bank_account.balance == Decimal('1087.50')
+
+    def test_repeated_lines_apart_are_kept(self, bank_account):
+        """Test identical same-day lines separated by another date are both imported."""
+        statement = (b'date,description,amount\n2026-03-01,Coffee,-2.00\n2026-03-02,Bread,-1.00\n'
+                     b'2026-03-01,Coffee,-2.00\n')
+        assert import_statement(bank_account, io.BytesIO(statement), 'csv').rows_created == 3
+        assert import_statement(bank_account, io.BytesIO(statement), 'csv').rows_created == 0
+
+    def test_conflicting_rows_are_not_counted(self, bank_account, monkeypatch):
+        """Test rows a concurrent import already wrote are skipped, not counted as created."""
+        import_statement(bank_account, io.BytesIO(CSV), 'csv')
+        # As if the other import committed between this chunk's probe and its insert.
+        monkeypatch.setattr(importers, '_existing_fingerprints', lambda account, rows: set())
+        adjusted = []
+        monkeypatch.setattr(importers.counters, 'adjust', lambda hub_id, **deltas: adjusted.append(deltas))
+        result = import_statement(bank_account, io.BytesIO(CSV), 'csv')
+        assert (result.rows_created, result.rows_skipped, result.amount_total) == (0, 2, Decimal('0.00'))
+        assert adjusted == []
+        assert BankTransaction.objects.filter(account=bank_account).count() == 2
+
+    def test_repeated_lines_are_kept(self, bank_account):
+        """Test identical lines on the same day are distinct transactions."""
+        statement = b'date,description,amount\n2026-03-01,Coffee,-2.00\n2026-03-01,Coffee,-2.00\n'
+        assert import_statement(bank_account, io.BytesIO(statement), 'csv').rows_created == 2
+        assert import_statement(bank_account, io.BytesIO(statement), 'csv').rows_created == 0
+
+
+@pytest.mark.django_db
+class TestImportView:
+    """Import view tests."""
+
+    def test_import_form_loads(self, auth_client):
+        """Test import form loads."""
+        response = auth_client.get(reverse('bank_sync:bank_transactions_import'))
+        assert response.status_code == 200
+
+    def test_import_post(self, auth_client, bank_account):
+        """Test uploading a statement."""
+        upload = SimpleUploadedFile('statement.csv', CSV, content_type='text/csv')
+        response = auth_client.post(reverse('bank_sync:bank_transactions_import'), {
+            'account': str(bank_account.pk), 'file': upload,
+        })
+        assert response.status_code == 200
+        run_pending()
+        assert BankTransaction.objects.filter(account=bank_account).count() == 2
@@ -0,0 +1,197 @@
+"""Tests for the bank_sync background job queue."""
+import os
+import socket
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+
+from bank_sync import jobs
+from bank_sync.importers import import_lines
+from bank_sync.models import BankSyncJob, BankTransaction
+from bank_sync.parsers import StatementLine
+
+CSV = b"""Date;Description;Debit;Credit;Reference
+31/01/2026;Electricity;12,50;;R1
+01/02/2026;Customer payment;;1.000,00;R2
+"""
+
+
+@pytest.mark.django_db
+class TestQueue:
+    """Enqueue, claim and run tests."""
+
+    def test_unknown_kind(self, hub_id):
+        """Test enqueueing a kind without a handler is refused."""
+        with pytest.raises(ValueError):
+            jobs.enqueue(hub_id, 'nope')
+
+    def test_claim_runs_oldest_once(self, hub_id, bank_account):
+        """Test a claimed job is taken by one worker only and runs to done."""
+        first = jobs.enqueue(hub_id, 'recompute')
+        jobs.enqueue(hub_id, 'recompute')
+        job = jobs.claim_next('w1')
+        assert job.pk == first.pk
+        assert job.status == BankSyncJob.STATUS_RUNNING and job.attempts == 1
+        assert jobs.claim_next('w2').pk != first.pk
+        assert jobs.claim_next('w3') is None
+        job = jobs.run_job(job)
+        assert job.status == BankSyncJob.STATUS_DONE
+        assert job.result == {'accounts': 1}
+        assert job.progress == 1 and job.total == 1
+
+    def test_import_job(self, hub_id, bank_account):
+        """Test an import job reads the stored upload, reports its result and removes the file."""
+        path = jobs.store_upload(SimpleUploadedFile('statement.csv', CSV))
+        job = jobs.enqueue(hub_id, 'import', {'account_id': str(bank_account.pk), 'format': 'csv', 'path': path})
+        assert jobs.run_pending() == 1
+        job.refresh_from_db()
+        assert job.status == BankSyncJob.STATUS_DONE
+        assert job.result['rows_created'] == 2
+        assert BankTransaction.objects.filter(account=bank_account).count() == 2
+        assert not default_storage.exists(path)
+
+    def test_failure_is_retried_then_failed(self, hub_id, monkeypatch):
+        """Test a raising handler is re-queued with a delay, then failed after the last attempt."""
+        def boom(ctx):
+            raise RuntimeError('bank offline')
+        monkeypatch.setitem(jobs.HANDLERS, 'boom', boom)
+        monkeypatch.setattr(jobs, 'MAX_ATTEMPTS', 2)
+        job = jobs.enqueue(hub_id, 'boom')
+        job = jobs.run_job(jobs.claim_next('w'))
+        assert job.status == BankSyncJob.STATUS_QUEUED
+        assert job.run_after > timezone.now()
+        assert jobs.claim_next('w') is None
+        BankSyncJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = jobs.run_job(jobs.claim_next('w'))
+        assert job.status == BankSyncJob.STATUS_FAILED
+        assert 'bank offline' in job.message
+
+    def test_failed_import_removes_upload(self, hub_id, bank_account, monkeypatch):
+        """Test an import kept for retries deletes its upload once it has finally failed."""
+        from bank_sync import importers
+
+        def boom(*args, **kwargs):
+            raise RuntimeError('database offline')
+        monkeypatch.setattr(importers, 'import_statement', boom)
+        monkeypatch.setattr(jobs, 'MAX_ATTEMPTS', 2)
+        path = jobs.store_upload(SimpleUploadedFile('statement.csv', CSV))
+        job = jobs.enqueue(hub_id, 'import', {'account_id': str(bank_account.pk), 'format': 'csv', 'path': path})
+        assert jobs.run_job(jobs.claim_next('w')).status == BankSyncJob.STATUS_QUEUED
+        assert default_storage.exists(path)
+        BankSyncJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        assert jobs.run_job(jobs.claim_next('w')).status == BankSyncJob.STATUS_FAILED
+        assert not default_storage.exists(path)
+
+    def test_reconcile_heartbeats_between_passes(self, hub_id, bank_transaction, monkeypatch):
+        """Test a reconcile job reports before each matching pass, not only while saving."""
+        from bank_sync import reconciliation
+        from bank_sync.matching import Document
+
+        seen = []
+        doc = Document('invoice', '1', 999, bank_transaction.date.toordinal(), 'F-1', '')
+        monkeypatch.setattr(reconciliation, 'load_documents', lambda hub_id, kinds=None: [doc])
+
+        def many(lines, docs, *args):
+            seen.append(BankSyncJob.objects.get(pk=job.pk).message)
+            return []
+        monkeypatch.setattr(reconciliation, 'match_many_to_one', many)
+        job = jobs.enqueue(hub_id, 'reconcile')
+        job = jobs.run_job(jobs.claim_next('w'))
+        assert job.status == BankSyncJob.STATUS_DONE
+        assert seen == ['Matching split payments']
+
+    def test_stale_job_is_requeued(self, hub_id):
+        """Test a running job whose worker stopped heart-beating goes back to the queue."""
+        job = jobs.enqueue(hub_id, 'recompute')
+        jobs.claim_next('dead')
+        BankSyncJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        assert jobs.requeue_stale() == 1
+        assert jobs.claim_next('alive').pk == job.pk
+
+    def test_stale_job_of_live_worker_is_kept(self, hub_id):
+        """Test a quiet job is left alone while its worker process on this host is still running."""
+        job = jobs.enqueue(hub_id, 'recompute')
+        jobs.claim_next(f'{socket.gethostname()}:{os.getppid()}')
+        BankSyncJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        assert jobs.requeue_stale() == 0
+        assert jobs.claim_next('alive') is None
+
+
+@pytest.mark.django_db
+class TestCancelAndResume:
+    """Cancellation and checkpoint tests."""
+
+    def test_cancel_queued(self, hub_id):
+        """Test cancelling a queued job finishes it straight away."""
+        job = jobs.enqueue(hub_id, 'recompute')
+        jobs.cancel(job)
+        job.refresh_from_db()
+        assert job.status == BankSyncJob.STATUS_CANCELLED
+        assert jobs.claim_next('w') is None
+
+    def test_cancel_running(self, hub_id, monkeypatch):
+        """Test a running job stops at its next progress report."""
+        def slow(ctx):
+            jobs.cancel(ctx.job)
+            ctx.report(1, checkpoint={'done': 1})
+            raise AssertionError('not reached')
+        monkeypatch.setitem(jobs.HANDLERS, 'slow', slow)
+        jobs.enqueue(hub_id, 'slow')
+        job = jobs.run_job(jobs.claim_next('w'))
+        assert job.status == BankSyncJob.STATUS_CANCELLED
+        assert job.checkpoint == {'done': 1}
+
+    def test_handler_resumes_from_checkpoint(self, hub_id, monkeypatch):
+        """Test a re-queued job hands its last checkpoint back to the handler."""
+        seen = []
+
+        def counting(ctx):
+            seen.append(dict(ctx.checkpoint))
+            if not ctx.checkpoint:
+                ctx.report(5, checkpoint={'done': 5})
+                raise RuntimeError('worker died')
+            return {}
+        monkeypatch.setitem(jobs.HANDLERS, 'counting', counting)
+        job = jobs.enqueue(hub_id, 'counting')
+        jobs.run_job(jobs.claim_next('w'))
+        BankSyncJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run_job(jobs.claim_next('w'))
+        assert seen == [{}, {'done': 5}]
+
+    def test_import_lines_resume(self, bank_account):
+        """Test resuming an import replays the lines already read, so identical lines are not lost."""
+        lines = [StatementLine(n, '2026-03-01', '10.00', 'Same', '') for n in range(1, 5)]
+        partial = import_lines(bank_account, lines[:2], batch_size=1)
+        result = import_lines(bank_account, lines, batch_size=3, result=partial)
+        assert result.rows_read == 4 and result.rows_created == 4 and result.rows_skipped == 0
+        assert BankTransaction.objects.filter(account=bank_account).count() == 4
+        bank_account.refresh_from_db()
+        assert bank_account.balance == bank_account.opening_balance + Decimal('40.00')
+
+
+@pytest.mark.django_db
+class TestJobViews:
+    """Progress partial tests."""
+
+    def test_status_polls_until_finished(self, auth_client, hub_id):
+        """Test the progress partial polls while queued and stops once done."""
+        job = jobs.enqueue(hub_id, 'recompute')
+        response = auth_client.get(reverse('bank_sync:job_status', args=[job.pk]))
+        assert response.status_code == 200
+        assert b'hx-trigger="every 1s"' in response.content
+        jobs.run_pending()
+        response = auth_client.get(reverse('bank_sync:job_status', args=[job.pk]))
+        assert b'hx-trigger' not in response.content
+
+    def test_cancel_view(self, auth_client, hub_id):
+        """Test the cancel button cancels the job."""
+        job = jobs.enqueue(hub_id, 'recompute')
+        response = auth_client.post(reverse('bank_sync:job_cancel', args=[job.pk]))
+        assert response.status_code == 200
+        job.refresh_from_db()
+        assert job.status == BankSyncJob.STATUS_CANCELLED
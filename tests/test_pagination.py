@@ -0,0 +1,94 @@
+"""Tests for keyset pagination."""
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from bank_sync.models import BankTransaction
+from bank_sync.pagination import (
+    MAX_PAGE_SIZE, clamp_per_page, decode_cursor, encode_cursor, keyset_paginate,
+)
+
+
+class TestCursor:
+    """Cursor encoding tests."""
+
+    def test_round_trip(self):
+        """Test a cursor decodes to what was encoded."""
+        token = encode_cursor('2026-09-01', 'abc', 'next')
+        assert decode_cursor(token) == {'v': '2026-09-01', 'k': 'abc', 'd': 'next'}
+
+    def test_garbage_is_ignored(self):
+        """Test invalid cursors decode to None."""
+        assert decode_cursor('not-a-cursor') is None
+        assert decode_cursor('') is None
+
+    def test_clamp_per_page(self):
+        """Test per_page is limited to the offered choices."""
+        assert clamp_per_page('24') == 24
+        assert clamp_per_page('0') == MAX_PAGE_SIZE
+        assert clamp_per_page('100000') == 12
+        assert clamp_per_page(None) == 12
+
+
+@pytest.mark.django_db
+class TestKeysetPaginate:
+    """keyset_paginate tests."""
+
+    @pytest.fixture
+    def rows(self, hub_id, bank_account):
+        today = timezone.now().date()
+        # Repeated dates exercise the primary key tie-break.
+        for i in range(25):
+            BankTransaction.objects.create(
+                hub_id=hub_id, account=bank_account, date=today - timezone.timedelta(days=i // 3),
+                description=f'Row {i}', amount=Decimal('1.00'), reference=f'R{i:02d}',
+            )
+        return BankTransaction.objects.filter(hub_id=hub_id)
+
+    @pytest.mark.parametrize('descending', [False, True])
+    def test_forward_pages_cover_every_row_once(self, rows, descending):
+        """Test walking the next cursors visits each row exactly once."""
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(rows, 'date', descending=descending, cursor=cursor, per_page=12)
+            seen += [r.pk for r in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        assert len(seen) == 25
+        assert len(set(seen)) == 25
+
+    def test_previous_cursor_returns_the_same_page(self, rows):
+        """Test going forward then back yields the first page again."""
+        first = keyset_paginate(rows, 'date', per_page=12)
+        second = keyset_paginate(rows, 'date', cursor=first.next_cursor, per_page=12)
+        assert second.has_previous
+        back = keyset_paginate(rows, 'date', cursor=second.previous_cursor, per_page=12)
+        assert [r.pk for r in back] == [r.pk for r in first]
+        assert back.has_next
+
+    def test_values_rows(self, rows):
+        """Test a ``.values()`` projection pages like model rows."""
+        projected = rows.values('pk', 'date', 'reference')
+        first = keyset_paginate(projected, 'date', descending=True, per_page=20)
+        second = keyset_paginate(projected, 'date', descending=True, cursor=first.next_cursor, per_page=20)
+        assert len(first) == 20 and len(second) == 5
+        assert not second.has_next
+        assert {r['pk'] for r in first} | {r['pk'] for r in second} == set(rows.values_list('pk', flat=True))
+
+    def test_invalid_cursor_falls_back_to_first_page(self, rows):
+        """Test a cursor with an unparseable value is ignored."""
+        page = keyset_paginate(rows, 'date', cursor=encode_cursor('not-a-date', 'x', 'next'), per_page=12)
+        assert not page.has_previous
+        assert len(page) == 12
+
+    def test_list_view_follows_cursor(self, auth_client, rows):
+        """Test the list partial renders the page addressed by a cursor."""
+        url = reverse('bank_sync:bank_transactions_list')
+        first = keyset_paginate(rows.order_by('reference'), 'reference', per_page=12)
+        response = auth_client.get(url, {'cursor': first.next_cursor}, HTTP_HX_REQUEST='true')
+        assert response.status_code == 200
+        assert b'R12' in response.content
+        assert b'R11' not in response.content
@@ -0,0 +1,71 @@
+"""Tests for counterparty extraction and payee linking."""
+import io
+
+import pytest
+
+from bank_sync.counterparty import extract_counterparty, valid_iban
+from bank_sync.importers import import_statement
+from bank_sync.models import BankTransaction, Payee
+from bank_sync.payees import backfill_payees
+from bank_sync.search import apply_search
+
+STATEMENT = b"""date,description,amount,reference
+2026-09-01,"TRANSFERENCIA A FAVOR DE ACME, S.L. ES91 2100 0418 4502 0005 1332 FRA 2026-041",-700.00,P1
+2026-09-02,NOMINA ACME SL REF 5555,1000.00,P2
+2026-09-03,COMPRA TARJ. 1234XXXX5678 MERCADONA 12/09,-20.00,P3
+2026-09-04,Invoice INV-2026-0042,50.00,P4
+"""
+
+
+class TestExtraction:
+    """extract_counterparty tests."""
+
+    def test_name_iban_and_remittance(self):
+        """Test the type prefix is dropped and the IBAN and remittance are split off."""
+        party = extract_counterparty('TRANSFERENCIA A FAVOR DE ACME SL ES91 2100 0418 4502 0005 1332 FRA 2026-041')
+        assert party.name == 'ACME SL'
+        assert party.iban == 'ES9121000418450200051332'
+        assert party.remittance == 'FRA 2026-041'
+        assert party.key == 'acme'
+
+    def test_card_mask_and_markers(self):
+        """Test card numbers before the name are skipped and a marker word ends it."""
+        assert extract_counterparty('COMPRA TARJ. 1234XXXX5678 MERCADONA MADRID 12/09').name == 'MERCADONA MADRID'
+        assert extract_counterparty('Invoice INV-2026-0042 paid').name == ''
+        assert extract_counterparty('Transfer to John Smith - October rent').remittance == 'October rent'
+
+    def test_invalid_iban_is_ignored(self):
+        """Test only checksum-valid IBANs are extracted."""
+        assert valid_iban('ES9121000418450200051332')
+        assert not valid_iban('ES0021000418450200051332')
+        assert extract_counterparty('Pago ES00 2100 0418 4502 0005 1332').iban == ''
+
+
+@pytest.mark.django_db
+class TestPayees:
+    """Payee linking tests."""
+
+    def test_import_links_one_payee_per_name(self, hub_id, bank_account):
+        """Test spellings of one party share a payee and rows get indexed counterparty columns."""
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        rows = {t.reference: t for t in BankTransaction.objects.filter(account=bank_account)}
+        assert rows['P1'].payee_id == rows['P2'].payee_id
+        assert rows['P1'].counterparty_iban == 'ES9121000418450200051332'
+        assert rows['P3'].counterparty_name == 'MERCADONA'
+        assert rows['P4'].payee_id is None
+        assert set(Payee.objects.filter(hub_id=hub_id).values_list('key', flat=True)) == {'acme', 'mercadona'}
+
+        qs = BankTransaction.objects.filter(hub_id=hub_id)
+        assert set(apply_search(qs, 'payee:acme').values_list('reference', flat=True)) == {'P1', 'P2'}
+        assert list(apply_search(qs, 'iban:es91-2100-0418-4502-0005-1332').values_list('reference', flat=True)) == ['P1']
+
+    def test_save_and_backfill(self, hub_id, bank_account):
+        """Test saving re-extracts the columns and the backfill links rows without a payee."""
+        row = BankTransaction.objects.create(hub_id=hub_id, account=bank_account, date='2026-09-01',
+                                             description='RECIBO IBERDROLA CLIENTES SAU Mandato 77', amount='-60.00')
+        assert row.counterparty_name == 'IBERDROLA CLIENTES SAU' and row.payee_id is None
+        assert backfill_payees(hub_id, batch_size=1) == 1
+        row.refresh_from_db()
+        assert row.payee.key == 'iberdrola clientes'
+        assert backfill_payees(hub_id) == 0
+        assert backfill_payees(hub_id, relink=True) == 1
@@ -0,0 +1,172 @@
+"""Tests for bank_sync automatic reconciliation."""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync.bulk import bulk_update_transactions
+from bank_sync.jobs import run_pending
+from bank_sync.matching import (
+    CandidateIndex, Document, TransactionLine, find_subset, match_many_to_one, match_one_to_many,
+    match_transactions,
+)
+from bank_sync.models import BankTransaction, ReconciliationLink
+from bank_sync.reconciliation import allocated_cents, auto_reconcile
+
+DAY = date(2026, 3, 10).toordinal()
+
+
+class TestMatching:
+    """Candidate index and matcher tests."""
+
+    def test_candidates_respect_amount_and_window(self):
+        """Test lookups only return same-amount documents inside the window."""
+        index = CandidateIndex([
+            Document('invoice', '1', 10000, DAY, 'F-1', ''),
+            Document('invoice', '2', 10000, DAY + 30, 'F-2', ''),
+            Document('invoice', '3', 9999, DAY, 'F-3', ''),
+        ])
+        assert [d.id for d in index.candidates(10000, DAY, window=5)] == ['1']
+        assert {d.id for d in index.candidates(10000, DAY, window=5, tolerance=1)} == {'1', '3'}
+
+    def test_reference_wins(self):
+        """Test the document whose reference appears in the description is chosen."""
+        index = CandidateIndex([
+            Document('invoice', '1', 10000, DAY, 'F-2026-001', 'ACME'),
+            Document('invoice', '2', 10000, DAY, 'F-2026-002', 'ACME'),
+        ])
+        lines = [TransactionLine('t1', 10000, DAY + 1, 'TRANSFER ACME F 2026 002')]
+        (match,) = match_transactions(lines, index)
+        assert match.document.id == '2'
+
+    def test_documents_used_once(self):
+        """Test a document is never assigned to two transactions."""
+        index = CandidateIndex([Document('invoice', '1', 500, DAY, 'X-1', '')])
+        lines = [TransactionLine('a', 500, DAY, 'X-1'), TransactionLine('b', 500, DAY, 'X-1')]
+        assert len(match_transactions(lines, index)) == 1
+
+
+class TestSubsetMatching:
+    """Split settlement tests."""
+
+    def test_find_subset(self):
+        """Test meet-in-the-middle finds the combination."""
+        values = [300, 200, 500, 700, 50]
+        subset = find_subset(1000, values)
+        assert sum(values[i] for i in subset) == 1000
+        assert len(subset) == 2
+
+    def test_find_subset_tolerance(self):
+        """Test tolerance and sign pruning."""
+        assert find_subset(-1001, [-300, -200, -500, 400], tolerance=1) == (0, 1, 2)
+        assert find_subset(1000, [300, 200]) is None
+
+    def test_many_to_one(self):
+        """Test one transfer settling two invoices of the same customer."""
+        docs = [
+            Document('invoice', 'a', 1000, DAY, 'F1', 'ACME SL'),
+            Document('invoice', 'b', 2500, DAY + 1, 'F2', 'ACME SL'),
+            Document('invoice', 'c', 2500, DAY + 1, 'F3', 'OTHER CO'),
+        ]
+        matches = match_many_to_one([TransactionLine('t', 3500, DAY + 5, 'TRANSFER ACME')], docs)
+        assert {m.document.id for m in matches} == {'a', 'b'}
+
+    def test_one_to_many(self):
+        """Test one invoice paid in two instalments."""
+        lines = [TransactionLine('t1', 1200, DAY + 5, 'ACME 1/2'), TransactionLine('t2', 1300, DAY + 9, 'ACME 2/2')]
+        matches = match_one_to_many(lines, [Document('invoice', 'x', 2500, DAY, 'F9', 'ACME SL')])
+        assert sorted(m.cents for m in matches) == [1200, 1300]
+
+
+@pytest.mark.django_db
+class TestAutoReconcile:
+    """auto_reconcile service tests."""
+
+    def test_marks_matched_transactions(self, hub_id, bank_account):
+        """Test matched transactions are flagged as reconciled."""
+        tx = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 10),
+            description='Payment invoice F-77', amount=Decimal('121.00'),
+        )
+        docs = [Document('invoice', 'inv-1', 12100, DAY, 'F-77', '')]
+        result = auto_reconcile(hub_id, documents=docs)
+        assert result.matched == 1
+        tx.refresh_from_db()
+        assert tx.is_reconciled is True
+        link = ReconciliationLink.objects.get(transaction=tx)
+        assert (link.document_type, link.document_id, link.amount) == ('invoice', 'inv-1', Decimal('121.00'))
+
+    def test_split_payment_links(self, hub_id, bank_account):
+        """Test one transfer paying two invoices creates two links."""
+        tx = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 12),
+            description='ACME SL payment', amount=Decimal('35.00'),
+        )
+        docs = [
+            Document('invoice', 'a', 1000, DAY, 'F1', 'ACME SL'),
+            Document('invoice', 'b', 2500, DAY, 'F2', 'ACME SL'),
+        ]
+        result = auto_reconcile(hub_id, documents=docs)
+        assert result.split_matched == 1
+        assert ReconciliationLink.objects.filter(transaction=tx).count() == 2
+
+    def test_tolerance_matches_settle_both_sides(self, hub_id, bank_account):
+        """Test matches off by a cent reconcile their lines and leave nothing open on either side."""
+        single = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 10),
+            description='Payment invoice F-77', amount=Decimal('121.00'),
+        )
+        split = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 12),
+            description='ACME SL payment', amount=Decimal('35.01'),
+        )
+        docs = [
+            Document('invoice', 'inv-1', 12099, DAY, 'F-77', ''),
+            Document('invoice', 'a', 1000, DAY, 'F1', 'ACME SL'),
+            Document('invoice', 'b', 2500, DAY, 'F2', 'ACME SL'),
+        ]
+        result = auto_reconcile(hub_id, documents=docs, amount_tolerance=1)
+        assert (result.matched, result.split_matched) == (1, 1)
+        link = ReconciliationLink.objects.get(transaction=single)
+        assert (link.amount, link.difference) == (Decimal('121.00'), Decimal('-0.01'))
+        assert BankTransaction.objects.filter(pk__in=[single.pk, split.pk], is_reconciled=True).count() == 2
+        assert allocated_cents(hub_id) == {('invoice', 'inv-1'): 12099, ('invoice', 'a'): 1000, ('invoice', 'b'): 2500}
+
+    def test_deleted_line_frees_its_document(self, auth_client, hub_id, bank_account):
+        """Test deleting a matched line drops its links, so the document can be matched again."""
+        tx = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 10),
+            description='Payment invoice F-77', amount=Decimal('121.00'),
+        )
+        docs = [Document('invoice', 'inv-1', 12100, DAY, 'F-77', '')]
+        auto_reconcile(hub_id, documents=docs)
+        assert allocated_cents(hub_id) == {('invoice', 'inv-1'): 12100}
+
+        response = auth_client.post(reverse('bank_sync:bank_transaction_delete', args=[tx.pk]))
+        assert response.status_code == 200
+        assert not ReconciliationLink.objects.filter(transaction=tx, is_deleted=False).exists()
+        assert allocated_cents(hub_id) == {}
+
+        again = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 11),
+            description='Payment invoice F-77', amount=Decimal('121.00'),
+        )
+        assert auto_reconcile(hub_id, documents=docs).matched == 1
+        assert ReconciliationLink.objects.get(transaction=again, is_deleted=False).document_id == 'inv-1'
+
+    def test_bulk_delete_drops_links(self, hub_id, bank_account):
+        """Test a bulk delete soft-deletes the links of the deleted lines."""
+        tx = BankTransaction.objects.create(
+            hub_id=hub_id, account=bank_account, date=date(2026, 3, 10),
+            description='Payment invoice F-77', amount=Decimal('121.00'),
+        )
+        auto_reconcile(hub_id, documents=[Document('invoice', 'inv-1', 12100, DAY, 'F-77', '')])
+        bulk_update_transactions(BankTransaction.objects.filter(pk=tx.pk), 'delete')
+        assert not ReconciliationLink.objects.filter(transaction=tx, is_deleted=False).exists()
+
+    def test_view(self, auth_client):
+        """Test the auto-reconcile action responds."""
+        response = auth_client.post(reverse('bank_sync:bank_transactions_auto_reconcile'))
+        assert response.status_code == 200
+        assert run_pending() == 1
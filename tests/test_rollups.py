@@ -0,0 +1,91 @@
+"""Tests for the daily balance rollup."""
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync.importers import import_statement
+from bank_sync.models import BankAccountDailyBalance, BankTransaction
+from bank_sync.rollups import balance_history, monthly_summary, rebuild_daily_balances, refresh_daily_balances
+
+STATEMENT = b"""date,description,amount,reference
+2026-09-01,Opening deposit,500.00,A1
+2026-09-01,Coffee,-3.50,A2
+2026-09-03,Electricity,-60.00,A3
+2026-09-07,Customer payment,250.00,A4
+"""
+
+
+def _series(account):
+    return list(BankAccountDailyBalance.objects.filter(account=account).order_by('day').values_list(
+        'day', 'opening', 'inflow', 'outflow', 'closing', 'transaction_count', 'unreconciled_count',
+    ))
+
+
+@pytest.mark.django_db
+class TestRollupMaintenance:
+    """Incremental rollup maintenance tests."""
+
+    @pytest.fixture
+    def imported(self, bank_account):
+        import_statement(bank_account, io.BytesIO(STATEMENT), 'csv')
+        bank_account.refresh_from_db()
+        return bank_account
+
+    def test_import_builds_one_row_per_day(self, imported):
+        """Test import writes the touched days with a chained balance."""
+        assert _series(imported) == [
+            (date(2026, 9, 1), Decimal('100.00'), Decimal('500.00'), Decimal('3.50'), Decimal('596.50'), 2, 2),
+            (date(2026, 9, 3), Decimal('596.50'), Decimal('0.00'), Decimal('60.00'), Decimal('536.50'), 1, 1),
+            (date(2026, 9, 7), Decimal('536.50'), Decimal('250.00'), Decimal('0.00'), Decimal('786.50'), 1, 1),
+        ]
+        assert imported.balance == Decimal('786.50')
+
+    def test_backdated_change_rechains_later_days(self, imported):
+        """Test editing an early day shifts every later opening/closing."""
+        row = BankTransaction.objects.get(account=imported, reference='A2')
+        row.amount = Decimal('-13.50')
+        row.is_reconciled = True
+        row.save()
+        refresh_daily_balances(imported.pk, {row.date})
+        series = _series(imported)
+        assert series[0][3:] == (Decimal('13.50'), Decimal('586.50'), 2, 1)
+        assert series[1][1] == Decimal('586.50')
+        assert series[2][4] == Decimal('776.50')
+
+    def test_emptied_day_is_removed(self, imported):
+        """Test a day whose only transaction is deleted disappears from the rollup."""
+        BankTransaction.objects.filter(account=imported, reference='A3').update(is_deleted=True)
+        refresh_daily_balances(imported.pk, {date(2026, 9, 3)})
+        assert [r[0] for r in _series(imported)] == [date(2026, 9, 1), date(2026, 9, 7)]
+        assert _series(imported)[1][1] == Decimal('596.50')
+
+    def test_rebuild_matches_incremental(self, imported):
+        """Test a full rebuild yields the incrementally maintained rows."""
+        incremental = _series(imported)
+        assert rebuild_daily_balances(imported) == 3
+        assert _series(imported) == incremental
+
+    def test_history_carries_balance_forward(self, imported, hub_id):
+        """Test days without activity repeat the previous closing."""
+        points = balance_history(hub_id, date(2026, 8, 31), date(2026, 9, 8))
+        assert len(points) == 9
+        assert points[0].closing == Decimal('100.00')
+        assert points[4].closing == Decimal('536.50')
+        assert points[-1].closing == Decimal('786.50')
+        (month,) = [m for m in monthly_summary(points) if m.month == date(2026, 9, 1)]
+        assert month.inflow == Decimal('750.00')
+        assert month.outflow == Decimal('63.50')
+
+    def test_delete_view_refreshes_rollup(self, auth_client, imported):
+        """Test deleting a transaction through the view updates its day."""
+        row = BankTransaction.objects.get(account=imported, reference='A4')
+        auth_client.post(reverse('bank_sync:bank_transaction_delete', args=[row.pk]))
+        assert [r[0] for r in _series(imported)] == [date(2026, 9, 1), date(2026, 9, 3)]
+
+    def test_dashboard_reads_rollup(self, auth_client, imported):
+        """Test the dashboard renders with rollup data."""
+        response = auth_client.get(reverse('bank_sync:dashboard'))
+        assert response.status_code == 200
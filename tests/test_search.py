@@ -0,0 +1,106 @@
+"""Tests for indexed transaction search."""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bank_sync.models import BankTransaction
+from bank_sync.normalize import search_document
+from bank_sync.search import apply_search, parse_query
+
+
+class TestParseQuery:
+    """Search syntax tests."""
+
+    def test_terms_are_normalized(self):
+        """Test free text is case-folded and accent-stripped."""
+        assert parse_query('Nómina  ACME').terms == ['nomina', 'acme']
+
+    def test_amount_filters(self):
+        """Test amount comparisons and ranges."""
+        assert parse_query('amount:>100').filters == {'amount__gt': Decimal('100')}
+        assert parse_query('amount:<=-50,5').filters == {'amount__lte': Decimal('-50.5')}
+        assert parse_query('amount:12.50').filters == {'amount': Decimal('12.50')}
+        assert parse_query('amount:10..20').filters == {'amount__gte': Decimal('10'), 'amount__lte': Decimal('20')}
+
+    def test_date_filters(self):
+        """Test year, month, day and range date filters."""
+        assert parse_query('date:2026-09').filters == {'date__gte': date(2026, 9, 1), 'date__lte': date(2026, 9, 30)}
+        assert parse_query('date:>2026-09').filters == {'date__gt': date(2026, 9, 30)}
+        assert parse_query('date:<2026').filters == {'date__lt': date(2026, 1, 1)}
+        assert parse_query('date:2026-09-01..2026-09-15').filters == {
+            'date__gte': date(2026, 9, 1), 'date__lte': date(2026, 9, 15),
+        }
+
+    def test_category_filter(self):
+        """Test category filters, including uncategorised rows."""
+        assert parse_query('category:Fuel').filters == {'category__iexact': 'Fuel'}
+        assert parse_query('category:none').filters == {'category': ''}
+
+    def test_payee_filter_uses_payee_key(self):
+        """Test a payee filter is keyed like stored payees, legal form dropped."""
+        assert parse_query('payee:Acme,S.L.').filters == {'payee__key__startswith': 'acme'}
+
+    def test_malformed_filter_is_a_term(self):
+        """Test a half-typed filter does not raise."""
+        query = parse_query('amount:> date:2026-13')
+        assert query.filters == {}
+        assert query.terms == ['amount', 'date', '2026', '13']
+
+    def test_search_document(self):
+        """Test the stored search text has a leading space for word-prefix matching."""
+        assert search_document('Recibo IBERDROLA', 'R-01') == ' recibo iberdrola r 01'
+
+
+@pytest.mark.django_db
+class TestApplySearch:
+    """apply_search tests against the configured database."""
+
+    @pytest.fixture
+    def rows(self, hub_id, bank_account):
+        def create(description, amount, day, reference=''):
+            return BankTransaction.objects.create(
+                hub_id=hub_id, account=bank_account, date=day, description=description,
+                amount=Decimal(amount), reference=reference,
+            )
+        return {
+            'power': create('Recibo IBERDROLA clientes', '-85.20', date(2026, 9, 3), 'IB-1'),
+            'salary': create('Nómina ACME SL', '2100.00', date(2026, 9, 28), 'N-9'),
+            'grocery': create('MERCADONA compra', '-42.10', date(2026, 8, 14)),
+        }
+
+    def _search(self, hub_id, text):
+        qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False)
+        return set(apply_search(qs, text).values_list('description', flat=True))
+
+    def test_word_prefix(self, hub_id, rows):
+        """Test terms match word prefixes, accent-insensitively."""
+        assert self._search(hub_id, 'iberd') == {'Recibo IBERDROLA clientes'}
+        assert self._search(hub_id, 'nomina') == {'Nómina ACME SL'}
+        assert self._search(hub_id, 'erdrola') == set()
+
+    def test_all_terms_required(self, hub_id, rows):
+        """Test multiple terms are ANDed."""
+        assert self._search(hub_id, 'recibo merca') == set()
+
+    def test_filters_combine_with_terms(self, hub_id, rows):
+        """Test amount/date filters narrow the text match."""
+        assert self._search(hub_id, 'date:2026-09 amount:>100') == {'Nómina ACME SL'}
+        assert self._search(hub_id, 'amount:<0 date:2026-09') == {'Recibo IBERDROLA clientes'}
+
+    def test_edit_updates_index(self, hub_id, rows):
+        """Test editing a description re-indexes the row."""
+        row = rows['grocery']
+        row.description = 'LIDL compra'
+        row.save(update_fields=['description'])
+        assert self._search(hub_id, 'lidl') == {'LIDL compra'}
+        assert self._search(hub_id, 'mercadona') == set()
+
+    def test_list_view_uses_search(self, auth_client, rows):
+        """Test the list endpoint accepts the search syntax."""
+        url = reverse('bank_sync:bank_transactions_list')
+        response = auth_client.get(url, {'q': 'iber amount:<0'}, HTTP_HX_REQUEST='true', HTTP_HX_TARGET='datatable-body')
+        assert response.status_code == 200
+        assert b'IB-1' in response.content
+        assert b'N-9' not in response.content
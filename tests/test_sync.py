@@ -0,0 +1,228 @@
+"""Tests for the bank feed providers and the async sync worker."""
+import asyncio
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from bank_sync import sync
+from bank_sync.mockbank import MockBank, start_in_thread
+from bank_sync.models import BankAccount, BankSyncRun, BankSyncState, BankTransaction
+from bank_sync.providers import PSD2Provider, ProviderError, backoff_delay, open_provider, with_retries
+from bank_sync.parsers import StatementLine
+from bank_sync.sync import advance_high_water, delta_lines, discover_accounts, sync_accounts
+
+
+@pytest.fixture
+def mock_bank():
+    bank = MockBank(accounts=3, transactions=25, page_size=10)
+    server = start_in_thread(bank)
+    yield bank, server.base_url
+    server.shutdown()
+    server.server_close()
+
+
+class TestRetries:
+    """Backoff and retry policy tests."""
+
+    def test_backoff_is_capped_full_jitter(self):
+        """Test the delay grows exponentially, stays under the cap and honours Retry-After."""
+        class Top:
+            @staticmethod
+            def uniform(low, high):
+                return high
+        assert [backoff_delay(n, rng=Top) for n in (1, 2, 3)] == [0.5, 1.0, 2.0]
+        assert backoff_delay(20, rng=Top) == 30.0
+        assert backoff_delay(1, retry_after=4.0) == 4.0
+
+    def test_retryable_errors_are_retried(self):
+        """Test a retryable failure is retried until the call succeeds."""
+        calls, delays = [], []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ProviderError('busy', retryable=True, retry_after=0)
+            return 'ok'
+
+        async def sleep(delay):
+            delays.append(delay)
+
+        assert asyncio.run(with_retries(flaky, sleep=sleep)) == 'ok'
+        assert delays == [0, 0]
+
+    def test_permanent_errors_are_raised(self):
+        """Test non-retryable errors and exhausted attempts propagate."""
+        async def sleep(delay):
+            pass
+
+        async def forbidden():
+            raise ProviderError('consent expired')
+
+        async def busy():
+            raise ProviderError('busy', retryable=True)
+
+        with pytest.raises(ProviderError, match='consent'):
+            asyncio.run(with_retries(forbidden, sleep=sleep))
+        with pytest.raises(ProviderError, match='busy'):
+            asyncio.run(with_retries(busy, max_attempts=3, sleep=sleep))
+
+
+class TestHighWaterMark:
+    """Delta filtering tests."""
+
+    LINES = [
+        StatementLine(1, '2026-01-12', '1.00', 'a', 'x1'),
+        StatementLine(2, '2026-01-13', '1.00', 'b', 'x2'),
+        StatementLine(3, '2026-01-13', '1.00', 'c', 'x3'),
+        StatementLine(4, '2026-01-14', '1.00', 'd', 'x4'),
+    ]
+
+    def test_boundary_day_is_filtered(self):
+        """Test lines before the mark and ids already seen on its day are dropped."""
+        fresh, skipped = delta_lines(self.LINES, date(2026, 1, 13), ['x2'])
+        assert [line.reference for line in fresh] == ['x3', 'x4']
+        assert skipped == 2
+        assert delta_lines(self.LINES, None, []) == (self.LINES, 0)
+
+    def test_mark_advances(self):
+        """Test the mark moves to the newest day and accumulates ids on the same day."""
+        assert advance_high_water(self.LINES, None, []) == (date(2026, 1, 14), ['x4'])
+        assert advance_high_water(self.LINES[2:3], date(2026, 1, 13), ['x2']) == (date(2026, 1, 13), ['x2', 'x3'])
+        assert advance_high_water([], date(2026, 1, 13), ['x2']) == (date(2026, 1, 13), ['x2'])
+
+
+class TestPSD2Provider:
+    """PSD2 provider tests against the mock bank."""
+
+    def test_pages_and_cursor(self, mock_bank):
+        """Test paging through _links.next and the booking-date cursor."""
+        bank, base_url = mock_bank
+
+        async def run():
+            provider = open_provider('psd2', base_url, max_connections=2)
+            try:
+                accounts = await provider.fetch_accounts()
+                pages, cursor, page = [], None, None
+                while True:
+                    fetched = await provider.fetch_transactions(accounts[0].external_id, cursor, page)
+                    pages.append(fetched.lines)
+                    cursor, page = fetched.cursor, fetched.next_page
+                    if not page:
+                        break
+                balance = await provider.fetch_balance(accounts[0].external_id)
+            finally:
+                await provider.aclose()
+            return accounts, pages, cursor, balance
+
+        accounts, pages, cursor, balance = asyncio.run(run())
+        assert [a.external_id for a in accounts] == ['acc-000000', 'acc-000001', 'acc-000002']
+        assert [len(p) for p in pages] == [10, 10, 5]
+        assert cursor == '2026-01-13'
+        assert pages[2][-1].reference == 'acc-000000-00000024'
+        assert balance == bank.balance(0)
+
+    def test_next_links_are_relative_to_the_base_url(self):
+        """Test absolute and prefixed next links do not repeat the base path."""
+        provider = PSD2Provider(SimpleNamespace(base_url='https://bank.example/psd2/'))
+        expected = ('/v1/accounts/a/transactions', {'page': '2'})
+        assert provider._link('https://bank.example/psd2/v1/accounts/a/transactions?page=2') == expected
+        assert provider._link('/psd2/v1/accounts/a/transactions?page=2') == expected
+        assert provider._link('/v1/accounts/a/transactions?page=2') == expected
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSyncWorker:
+    """End-to-end sync tests against the mock bank."""
+
+    def _sync(self, hub_id, base_url, **kwargs):
+        accounts = BankAccount.objects.filter(hub_id=hub_id, provider='psd2')
+        return sync_accounts(accounts, configs={'psd2': {'base_url': base_url}}, **kwargs)
+
+    def test_discover_and_initial_sync(self, hub_id, mock_bank):
+        """Test accounts are linked once and synced with the bank's balance."""
+        bank, base_url = mock_bank
+        assert discover_accounts(hub_id, 'psd2', {'base_url': base_url}) == 3
+        assert discover_accounts(hub_id, 'psd2', {'base_url': base_url}) == 0
+
+        report = self._sync(hub_id, base_url, concurrency=2)
+        assert not report.failed
+        assert report.rows_created == 75
+        account = BankAccount.objects.get(hub_id=hub_id, external_id='acc-000001')
+        assert account.balance == bank.balance(1)
+        assert account.opening_balance == Decimal('1000.00')
+        state = account.sync_state
+        assert state.cursor == '2026-01-13'
+        assert state.last_booking_date == date(2026, 1, 13)
+        assert state.boundary_ids == ['acc-000001-00000024']
+        assert state.last_balance == bank.balance(1)
+        assert state.etag
+
+    def test_unchanged_accounts_cost_one_request(self, hub_id, mock_bank):
+        """Test a sync with nothing new gets a 304 per account and writes nothing."""
+        bank, base_url = mock_bank
+        discover_accounts(hub_id, 'psd2', {'base_url': base_url})
+        self._sync(hub_id, base_url)
+        report = self._sync(hub_id, base_url)
+        assert len(report.unchanged) == 3
+        assert report.requests == 3
+        assert report.rows_fetched == report.rows_created == 0
+        run = BankSyncRun.objects.filter(hub_id=hub_id).order_by('-created_at').first()
+        assert (run.accounts, run.accounts_unchanged, run.rows_fetched, run.rows_written) == (3, 3, 0, 0)
+
+    def test_incremental_sync(self, hub_id, mock_bank):
+        """Test a second sync only writes what the bank booked since the high-water mark."""
+        bank, base_url = mock_bank
+        discover_accounts(hub_id, 'psd2', {'base_url': base_url})
+        self._sync(hub_id, base_url)
+        bank.grow(4)
+        report = self._sync(hub_id, base_url)
+        assert report.rows_fetched == 15
+        assert sum(r.rows_skipped for r in report.results) == 3
+        assert report.rows_created == 12
+        assert BankTransaction.objects.filter(hub_id=hub_id).count() == 87
+        account = BankAccount.objects.get(hub_id=hub_id, external_id='acc-000002')
+        assert account.balance == bank.balance(2)
+        assert account.sync_state.cursor == '2026-01-15'
+
+    def test_progress_is_reported_per_account(self, hub_id, mock_bank):
+        """Test the progress callback runs once per finished account."""
+        bank, base_url = mock_bank
+        discover_accounts(hub_id, 'psd2', {'base_url': base_url})
+        seen = []
+        self._sync(hub_id, base_url, on_progress=lambda done, total: seen.append((done, total)))
+        assert seen == [(1, 3), (2, 3), (3, 3)]
+
+    def test_failure_keeps_cursor(self, hub_id, mock_bank):
+        """Test a sync that keeps failing records the error and leaves the cursor alone."""
+        bank, base_url = mock_bank
+        discover_accounts(hub_id, 'psd2', {'base_url': base_url})
+        bank.failure_rate = 1.0
+        report = self._sync(hub_id, base_url, max_attempts=2)
+        assert len(report.failed) == 3
+        state = BankSyncState.objects.filter(hub_id=hub_id).first()
+        assert state.cursor == ''
+        assert state.failure_count == 1
+        assert 'HTTP' in state.last_error
+        assert not BankTransaction.objects.filter(hub_id=hub_id).exists()
+
+    def test_unexpected_error_fails_one_account(self, hub_id, mock_bank, monkeypatch):
+        """Test an error outside the provider fails that account only and the run is still recorded."""
+        bank, base_url = mock_bank
+        discover_accounts(hub_id, 'psd2', {'base_url': base_url})
+        store = sync._store
+
+        def flaky_store(account, *args):
+            if account.external_id == 'acc-000001':
+                raise ValueError('bad payload')
+            return store(account, *args)
+
+        monkeypatch.setattr(sync, '_store', flaky_store)
+        report = self._sync(hub_id, base_url)
+        assert [r.error for r in report.failed] == ['ValueError: bad payload']
+        assert report.rows_created == 50
+        state = BankSyncState.objects.get(hub_id=hub_id, account__external_id='acc-000001')
+        assert (state.failure_count, state.cursor) == (1, '')
+        run = BankSyncRun.objects.filter(hub_id=hub_id).get()
+        assert (run.accounts, run.accounts_failed) == (3, 1)
@@ -1,6 +1,16 @@
 """Tests for bank_sync views."""
+import re
+from decimal import Decimal
+from pathlib import Path
+
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from bank_sync.models import BankAccount, BankTransaction, TransactionFlag
 
 
 @pytest.mark.django_db
@@ -121,6 +131,15 @@ class TestBankAccountViews:
         assert response.status_code == 200
         bank_account.refresh_from_db()
         assert bank_account.is_active != original
+        assert f'id="bank-account-{bank_account.pk}"'.encode() in response.content
+        assert b'datatable-footer' not in response.content
+
+    def test_bulk_selection_returns_rows(self, auth_client, bank_account):
+        """Test a bulk action on a selection answers with out-of-band row swaps only."""
+        url = reverse('bank_sync:bank_accounts_bulk_action')
+        response = auth_client.post(url, {'ids': str(bank_account.pk), 'action': 'deactivate'})
+        assert b'hx-swap-oob="outerHTML"' in response.content
+        assert b'datatable-footer' not in response.content
 
     def test_bulk_delete(self, auth_client, bank_account):
         """Test bulk delete."""
@@ -184,14 +203,14 @@ class TestBankTransactionViews:
         response = auth_client.get(url)
         assert response.status_code == 200
 
-    def test_add_post(self, auth_client):
+    def test_add_post(self, auth_client, bank_account):
         """Test creating via POST."""
         url = reverse('bank_sync:bank_transaction_add')
         data = {
+            'account': bank_account.pk,
             'date': '2025-01-15',
             'description': 'New Description',
             'amount': '100.00',
-            'balance_after': '100.00',
         }
         response = auth_client.post(url, data)
         assert response.status_code == 200
@@ -221,6 +240,33 @@ class TestBankTransactionViews:
         assert response.status_code == 200
         bank_transaction.refresh_from_db()
         assert bank_transaction.is_deleted is True
+        assert f'id="bank-transaction-{bank_transaction.pk}" hx-swap-oob="delete"'.encode() in response.content
+
+    def test_panel_edit_returns_row(self, auth_client, hub_id, bank_transaction):
+        """Test saving from the side panel answers with the edited row, flag badge included, not the list."""
+        row = bank_transaction
+        TransactionFlag.objects.create(hub_id=hub_id, transaction=row, kind=TransactionFlag.KIND_ANOMALY)
+        url = reverse('bank_sync:bank_transaction_edit', args=[row.pk])
+        response = auth_client.post(
+            url, {'date': '2025-01-15', 'description': 'Panel edit', 'amount': '5.00'},
+            HTTP_HX_REQUEST='true', HTTP_HX_TARGET=f'bank-transaction-{row.pk}',
+        )
+        assert response.status_code == 200
+        assert response.content.count(b'<tr') == 1
+        assert b'5.00' in response.content
+        assert response.context['item'].has_open_flag
+
+    def test_filter_bulk_keeps_the_view(self, auth_client, bank_transaction):
+        """Test a whole-filter bulk action re-renders the list with the posted search and sort."""
+        url = reverse('bank_sync:bank_transactions_bulk_action')
+        response = auth_client.post(url, {
+            'scope': 'filter', 'action': 'categorize', 'category': 'Rent',
+            'q': 'nothing-matches', 'sort': 'date', 'dir': 'desc', 'per_page': '48',
+        })
+        assert response.status_code == 200
+        assert response.context['sort_field'] == 'date'
+        assert response.context['per_page'] == 48
+        assert response.context['search_query'] == 'nothing-matches'
 
     def test_bulk_delete(self, auth_client, bank_transaction):
         """Test bulk delete."""
@@ -236,6 +282,30 @@ class TestBankTransactionViews:
         response = client.get(url)
         assert response.status_code == 302
 
+    def test_list_query_count_is_constant(self, auth_client, hub_id):
+        """Test rendering more rows does not add per-row account queries."""
+        url = reverse('bank_sync:bank_transactions_list')
+
+        def create(n):
+            for i in range(n):
+                account = BankAccount.objects.create(hub_id=hub_id, name=f'Account {i}')
+                BankTransaction.objects.create(
+                    hub_id=hub_id, account=account, date=timezone.now().date(),
+                    description='Row', amount=Decimal('1.00'), reference=f'R{i}',
+                )
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = auth_client.get(url, {'per_page': 96, 'sort': 'account'}, HTTP_HX_REQUEST='true')
+            assert response.status_code == 200
+            return len(ctx.captured_queries)
+
+        create(1)
+        baseline = count_queries()
+        create(40)
+        assert count_queries() == baseline
+
 
 @pytest.mark.django_db
 class TestSettings:
@@ -253,3 +323,18 @@ class TestSettings:
         response = client.get(url)
         assert response.status_code == 302
 
+
+
+class TestTemplates:
+    """Template asset tests."""
+
+    def test_icons_are_shipped(self):
+        """Test every icon a template names has its SVG in static/icons/ion."""
+        root = Path(__file__).resolve().parent.parent
+        used = {
+            name
+            for path in (root / 'templates').rglob('*.html')
+            for name in re.findall(r'{%\s*icon\s+"([\w-]+)"', path.read_text())
+        }
+        shipped = {path.stem for path in (root / 'static' / 'icons' / 'ion').glob('*.svg')}
+        assert used and used <= shipped, sorted(used - shipped)
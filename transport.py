@@ -0,0 +1,68 @@
+"""
+Pooled async HTTP for bank feed providers.
+
+``open_client(base_url, ...)`` returns a client with ``await request(method,
+path, params=None, headers=None)`` and ``await aclose()``. Paths are relative
+to ``base_url``. Connections to the provider are kept alive and reused, capped
+at ``max_connections``; the pool is ``httpx.AsyncClient`` (see
+``requirements.txt``). No Django dependency.
+"""
+import json
+from urllib.parse import urlencode
+
+import httpx
+
+DEFAULT_TIMEOUT = 30.0
+USER_AGENT = 'bank_sync/1.0'
+
+
+class TransportError(Exception):
+    """Connection failure or timeout talking to a provider (always retryable)."""
+
+
+class HttpResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers  # lower-cased names
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b'null')
+
+
+def _target(path, params):
+    target = path
+    if params:
+        query = urlencode({k: v for k, v in params.items() if v is not None})
+        if query:
+            target += ('&' if '?' in target else '?') + query
+    return target
+
+
+class HttpxPool:
+    """``httpx.AsyncClient`` returning ``HttpResponse`` and raising ``TransportError``."""
+
+    def __init__(self, base_url, max_connections=10, timeout=DEFAULT_TIMEOUT, headers=None):
+        self.base_url = base_url
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            headers={'User-Agent': USER_AGENT, 'Accept': 'application/json', **(headers or {})},
+        )
+
+    async def request(self, method, path, params=None, headers=None):
+        try:
+            response = await self.client.request(method, _target(path, params), headers=headers)
+        except httpx.TransportError as e:
+            raise TransportError(f'{method} {path}: {e or type(e).__name__}') from e
+        return HttpResponse(
+            response.status_code, {k.lower(): v for k, v in response.headers.items()}, response.content,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def open_client(base_url, max_connections=10, timeout=DEFAULT_TIMEOUT, headers=None):
+    return HttpxPool(base_url, max_connections=max_connections, timeout=timeout, headers=headers)
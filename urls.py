@@ -25,7 +25,23 @@ urlpatterns = [
     path('bank_transactions/add/', views.bank_transaction_add, name='bank_transaction_add'),
     path('bank_transactions/<uuid:pk>/edit/', views.bank_transaction_edit, name='bank_transaction_edit'),
     path('bank_transactions/<uuid:pk>/delete/', views.bank_transaction_delete, name='bank_transaction_delete'),
+    path('bank_transactions/<uuid:pk>/flags/dismiss/', views.bank_transaction_flags_dismiss, name='bank_transaction_flags_dismiss'),
     path('bank_transactions/bulk/', views.bank_transactions_bulk_action, name='bank_transactions_bulk_action'),
+    path('bank_transactions/bulk/reconcile/', views.bank_transactions_bulk_reconcile, name='bank_transactions_bulk_reconcile'),
+    path('bank_transactions/bulk/unreconcile/', views.bank_transactions_bulk_unreconcile, name='bank_transactions_bulk_unreconcile'),
+    path('bank_transactions/import/', views.bank_transactions_import, name='bank_transactions_import'),
+    path('bank_transactions/auto-reconcile/', views.bank_transactions_auto_reconcile, name='bank_transactions_auto_reconcile'),
+
+    # Background jobs
+    path('jobs/<uuid:pk>/', views.job_status, name='job_status'),
+    path('jobs/<uuid:pk>/cancel/', views.job_cancel, name='job_cancel'),
+    path('jobs/recompute-balances/', views.recompute_balances_job, name='recompute_balances_job'),
+    path('jobs/detect-flags/', views.detect_flags_job, name='detect_flags_job'),
+
+    # Categorization rules
+    path('rules/add/', views.categorization_rule_add, name='categorization_rule_add'),
+    path('rules/<uuid:pk>/delete/', views.categorization_rule_delete, name='categorization_rule_delete'),
+    path('rules/apply/', views.categorization_rules_apply, name='categorization_rules_apply'),
 
     # Settings
     path('settings/', views.settings_view, name='settings'),
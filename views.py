@@ -1,9 +1,14 @@
 """
 Bank Reconciliation Module Views
 """
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from django.http import HttpResponse
+import json
+import re
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.http import HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.shortcuts import get_object_or_404, render as django_render
 from django.utils import timezone
@@ -12,12 +17,38 @@ from django.views.decorators.http import require_POST
 
 from apps.accounts.decorators import login_required, permission_required
 from apps.core.htmx import htmx_view
-from apps.core.services import export_to_csv, export_to_excel
 from apps.modules_runtime.navigation import with_module_nav
 
-from .models import BankAccount, BankTransaction
-
-PER_PAGE_CHOICES = [12, 24, 48, 96, 0]
+from .balances import apply_changes, next_seq, shift_opening_balance
+from . import analytics, counters
+from .bulk import ACTIONS as BULK_ACTIONS, bulk_update_transactions
+from .counterparty import compact_iban
+from .exports import WRITERS as EXPORT_WRITERS
+from .forecast import hub_forecast
+from .fx import consolidated_balances, consolidated_flows, consolidated_history, consolidated_unreconciled
+from .jobs import cancel as cancel_job, enqueue, store_upload
+from .models import (
+    BankAccount, BankSyncJob, BankTransaction, CategorizationRule, ReconciliationLink, TransactionFlag,
+)
+from .pagination import PER_PAGE_CHOICES, approximate_count, clamp_per_page, keyset_paginate
+from .parsers import FORMAT_CHOICES, PARSERS, detect_format
+from .payees import PayeeResolver
+from .rules import compile_pattern
+from .rollups import monthly_summary
+from .search import apply_search
+
+EXPORT_CHUNK_SIZE = 2000
+DASHBOARD_DAYS = 180
+
+
+def _stream_export(qs, columns, headers, basename, export_format):
+    # values_list + iterator: rows are read from a server-side cursor in chunks
+    # and never materialized as model instances; relations come from the join.
+    writer, content_type, extension = EXPORT_WRITERS[export_format]
+    rows = qs.values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(writer(headers, rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{basename}.{extension}"'
+    return response
 
 
 # ======================================================================
@@ -29,12 +60,47 @@ PER_PAGE_CHOICES = [12, 24, 48, 96, 0]
 @htmx_view('bank_sync/pages/index.html', 'bank_sync/partials/dashboard_content.html')
 def dashboard(request):
     hub_id = request.session.get('hub_id')
+    today = timezone.now().date()
+    totals = counters.get_counters(hub_id)
+    forecast = hub_forecast(hub_id, today)
+    # Accounts in other currencies count at their FX rate; without one they are left out and named.
+    position = consolidated_balances(hub_id, today)
+    flows = consolidated_flows(hub_id, today - timedelta(days=29), today)
+    history = consolidated_history(hub_id, today - timedelta(days=DASHBOARD_DAYS - 1), today).points
+    unreconciled_amount = totals['unreconciled_amount']
+    if any(c.currency != position.base for c in position.currencies):
+        # The cached counter adds raw amounts, which is only right in a single-currency hub.
+        unreconciled_amount = consolidated_unreconciled(hub_id, today).total
     return {
-        'total_bank_accounts': BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).count(),
-        'total_bank_transactions': BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False).count(),
+        'total_bank_accounts': totals['accounts'],
+        'total_bank_transactions': totals['transactions'],
+        'current_balance': position.total,
+        'base_currency': position.base,
+        'position': position,
+        'inflow_30d': flows.inflow,
+        'outflow_30d': flows.outflow,
+        'unreconciled_total': totals['unreconciled'],
+        'unreconciled_amount': unreconciled_amount,
+        'monthly': monthly_summary(history),
+        'balance_sparkline': _sparkline([p.closing for p in history]),
+        'forecast': forecast,
+        'forecast_sparkline': _sparkline(forecast['balances']),
     }
 
 
+def _sparkline(values, width=600, height=80):
+    """SVG polyline points for a series, scaled to the viewBox."""
+    if len(values) < 2:
+        return ''
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1)
+    return ' '.join(
+        f'{i * step:.1f},{height - float((v - low) / span) * height:.1f}'
+        for i, v in enumerate(values)
+    )
+
+
 # ======================================================================
 # BankAccount
 # ======================================================================
@@ -49,22 +115,79 @@ BANK_ACCOUNT_SORT_FIELDS = {
     'created_at': 'created_at',
 }
 
-def _build_bank_accounts_context(hub_id, per_page=10):
-    qs = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).order_by('name')
-    paginator = Paginator(qs, per_page if per_page > 0 else max(qs.count(), 1))
-    page_obj = paginator.get_page(1)
+BANK_ACCOUNT_ROW = 'bank_sync/partials/bank_account_row.html'
+BANK_ACCOUNT_ROW_ID = 'bank-account-'
+
+def _sorted_bank_accounts(hub_id, params):
+    """The list's search and sort applied; returns the queryset and its order field."""
+    order_by = BANK_ACCOUNT_SORT_FIELDS.get(params.get('sort', 'name'), 'name')
+    qs = _filter_bank_accounts(hub_id, params.get('q', '').strip())
+    return qs.order_by(f'-{order_by}' if params.get('dir', 'asc') == 'desc' else order_by), order_by
+
+def _build_bank_accounts_context(hub_id, params):
+    """One list page for the search, sort, page size and cursor in ``params`` (GET or posted)."""
+    qs, order_by = _sorted_bank_accounts(hub_id, params)
+    sort_dir = params.get('dir', 'asc')
+    per_page = clamp_per_page(params.get('per_page'))
+    # The unfiltered total is one of the hub's cached counters.
+    search_query = params.get('q', '').strip()
+    total = approximate_count(qs) if search_query else counters.get_counters(hub_id)['accounts']
+    page_obj = keyset_paginate(
+        qs, order_by, descending=sort_dir == 'desc', cursor=params.get('cursor'), per_page=per_page,
+        total=total,
+    )
     return {
         'bank_accounts': page_obj,
         'page_obj': page_obj,
-        'search_query': '',
-        'sort_field': 'name',
-        'sort_dir': 'asc',
-        'current_view': 'table',
+        'search_query': search_query,
+        'sort_field': params.get('sort', 'name'),
+        'sort_dir': sort_dir,
+        'current_view': params.get('view', 'table'),
         'per_page': per_page,
+        'per_page_choices': PER_PAGE_CHOICES,
     }
 
-def _render_bank_accounts_list(request, hub_id, per_page=10):
-    ctx = _build_bank_accounts_context(hub_id, per_page)
+def _filter_bank_accounts(hub_id, search_query=''):
+    """Accounts matching the list's search box (shared by the list and bulk actions)."""
+    qs = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False)
+    if search_query:
+        qs = qs.filter(Q(name__icontains=search_query) | Q(bank_name__icontains=search_query) | Q(account_number__icontains=search_query) | Q(iban__icontains=search_query))
+    return qs
+
+def _bulk_scope(request, qs):
+    """The whole filtered ``qs`` for ``scope=filter``, else the posted ``ids`` within it."""
+    if request.POST.get('scope') == 'filter':
+        return qs
+    ids = [i.strip() for i in request.POST.get('ids', '').split(',') if i.strip()]
+    return qs.filter(id__in=ids)
+
+def _render_bulk_confirm(request, url_name, count, action):
+    """Dry run: how many rows the action would touch, with a button that runs it."""
+    params = {k: v for k, v in request.POST.items() if k not in ('csrfmiddlewaretoken', 'dry_run')}
+    return django_render(request, 'bank_sync/partials/bulk_confirm.html', {
+        'count': count, 'action': action, 'url_name': url_name, 'params': json.dumps(params),
+    })
+
+def _render_row_swaps(request, row_template, row_id, items=(), deleted_ids=()):
+    """Out-of-band swaps: each of ``items`` replaces its ``<tr>``, the rows of ``deleted_ids`` are removed."""
+    return django_render(request, 'bank_sync/partials/row_swaps.html', {
+        'items': items, 'deleted_ids': deleted_ids, 'row_template': row_template, 'row_id': row_id,
+    })
+
+def _saved_row_response(request, row_template, row_id, item, list_url_name):
+    """
+    After a form save: the row alone when the form targets the list (side
+    panel, ``hx-target`` on the row or the ``<tbody>``), else back to the list page.
+    """
+    if request.htmx and request.htmx.target and request.htmx.target.startswith(row_id.rstrip('-')):
+        return django_render(request, row_template, {'item': item})
+    response = HttpResponse()
+    response['HX-Redirect'] = reverse(list_url_name)
+    return response
+
+def _render_bank_accounts_list(request, hub_id):
+    # Re-rendered with the posted search/sort/page size (hx-include), so the user's view is kept.
+    ctx = _build_bank_accounts_context(hub_id, request.POST)
     return django_render(request, 'bank_sync/partials/bank_accounts_list.html', ctx)
 
 @login_required
@@ -72,48 +195,18 @@ def _render_bank_accounts_list(request, hub_id, per_page=10):
 @htmx_view('bank_sync/pages/bank_accounts.html', 'bank_sync/partials/bank_accounts_content.html')
 def bank_accounts_list(request):
     hub_id = request.session.get('hub_id')
-    search_query = request.GET.get('q', '').strip()
-    sort_field = request.GET.get('sort', 'name')
-    sort_dir = request.GET.get('dir', 'asc')
-    page_number = request.GET.get('page', 1)
-    current_view = request.GET.get('view', 'table')
-    per_page = int(request.GET.get('per_page', 12))
-    if per_page not in PER_PAGE_CHOICES:
-        per_page = 12
-
-    qs = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False)
-
-    if search_query:
-        qs = qs.filter(Q(name__icontains=search_query) | Q(bank_name__icontains=search_query) | Q(account_number__icontains=search_query) | Q(iban__icontains=search_query))
-
-    order_by = BANK_ACCOUNT_SORT_FIELDS.get(sort_field, 'name')
-    if sort_dir == 'desc':
-        order_by = f'-{order_by}'
-    qs = qs.order_by(order_by)
 
     export_format = request.GET.get('export')
-    if export_format in ('csv', 'excel'):
+    if export_format in EXPORT_WRITERS:
+        qs = _sorted_bank_accounts(hub_id, request.GET)[0]
         fields = ['name', 'is_active', 'balance', 'bank_name', 'account_number', 'iban']
         headers = ['Name', 'Is Active', 'Balance', 'Bank Name', 'Account Number', 'Iban']
-        if export_format == 'csv':
-            return export_to_csv(qs, fields=fields, headers=headers, filename='bank_accounts.csv')
-        return export_to_excel(qs, fields=fields, headers=headers, filename='bank_accounts.xlsx')
-
-    paginator = Paginator(qs, per_page if per_page > 0 else max(qs.count(), 1))
-    page_obj = paginator.get_page(page_number)
+        return _stream_export(qs, fields, headers, 'bank_accounts', export_format)
 
+    ctx = _build_bank_accounts_context(hub_id, request.GET)
     if request.htmx and request.htmx.target == 'datatable-body':
-        return django_render(request, 'bank_sync/partials/bank_accounts_list.html', {
-            'bank_accounts': page_obj, 'page_obj': page_obj,
-            'search_query': search_query, 'sort_field': sort_field,
-            'sort_dir': sort_dir, 'current_view': current_view, 'per_page': per_page,
-        })
-
-    return {
-        'bank_accounts': page_obj, 'page_obj': page_obj,
-        'search_query': search_query, 'sort_field': sort_field,
-        'sort_dir': sort_dir, 'current_view': current_view, 'per_page': per_page,
-    }
+        return django_render(request, 'bank_sync/partials/bank_accounts_list.html', ctx)
+    return ctx
 
 @login_required
 @htmx_view('bank_sync/pages/bank_account_add.html', 'bank_sync/partials/bank_account_add_content.html')
@@ -136,9 +229,7 @@ def bank_account_add(request):
         obj.balance = balance
         obj.is_active = is_active
         obj.save()
-        response = HttpResponse(status=204)
-        response['HX-Redirect'] = reverse('bank_sync:bank_accounts_list')
-        return response
+        return _saved_row_response(request, BANK_ACCOUNT_ROW, BANK_ACCOUNT_ROW_ID, obj, 'bank_sync:bank_accounts_list')
     return {}
 
 @login_required
@@ -152,10 +243,15 @@ def bank_account_edit(request, pk):
         obj.account_number = request.POST.get('account_number', '').strip()
         obj.iban = request.POST.get('iban', '').strip()
         obj.currency = request.POST.get('currency', '').strip()
-        obj.balance = request.POST.get('balance', '0') or '0'
+        balance = Decimal(request.POST.get('balance', '0') or '0')
         obj.is_active = request.POST.get('is_active') == 'on'
+        # The balance is derived from the history; a correction moves the opening balance.
+        correction = balance - obj.balance
+        obj.opening_balance += correction
+        obj.balance = balance
         obj.save()
-        return _render_bank_accounts_list(request, hub_id)
+        shift_opening_balance(obj.pk, correction)
+        return _saved_row_response(request, BANK_ACCOUNT_ROW, BANK_ACCOUNT_ROW_ID, obj, 'bank_sync:bank_accounts_list')
     return {'obj': obj}
 
 @login_required
@@ -166,7 +262,7 @@ def bank_account_delete(request, pk):
     obj.is_deleted = True
     obj.deleted_at = timezone.now()
     obj.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
-    return _render_bank_accounts_list(request, hub_id)
+    return _render_row_swaps(request, BANK_ACCOUNT_ROW, BANK_ACCOUNT_ROW_ID, deleted_ids=[obj.pk])
 
 @login_required
 @require_POST
@@ -175,22 +271,32 @@ def bank_account_toggle_status(request, pk):
     obj = get_object_or_404(BankAccount, pk=pk, hub_id=hub_id, is_deleted=False)
     obj.is_active = not obj.is_active
     obj.save(update_fields=['is_active', 'updated_at'])
-    return _render_bank_accounts_list(request, hub_id)
+    return django_render(request, BANK_ACCOUNT_ROW, {'item': obj})
 
 @login_required
 @require_POST
 def bank_accounts_bulk_action(request):
     hub_id = request.session.get('hub_id')
-    ids = [i.strip() for i in request.POST.get('ids', '').split(',') if i.strip()]
     action = request.POST.get('action', '')
-    qs = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False, id__in=ids)
+    qs = _bulk_scope(request, _filter_bank_accounts(hub_id, request.POST.get('q', '').strip()))
+    if request.POST.get('dry_run'):
+        return _render_bulk_confirm(request, 'bank_sync:bank_accounts_bulk_action', qs.count(), action)
+    # A selection is answered with its rows only; a whole filter re-renders the list.
+    ids = None if request.POST.get('scope') == 'filter' else list(qs.values_list('pk', flat=True))
     if action == 'activate':
         qs.update(is_active=True)
     elif action == 'deactivate':
         qs.update(is_active=False)
     elif action == 'delete':
         qs.update(is_deleted=True, deleted_at=timezone.now())
-    return _render_bank_accounts_list(request, hub_id)
+        counters.invalidate(hub_id)
+        analytics.invalidate(hub_id)
+    if ids is None:
+        return _render_bank_accounts_list(request, hub_id)
+    if action == 'delete':
+        return _render_row_swaps(request, BANK_ACCOUNT_ROW, BANK_ACCOUNT_ROW_ID, deleted_ids=ids)
+    rows = BankAccount.objects.filter(pk__in=ids, hub_id=hub_id, is_deleted=False).order_by()
+    return _render_row_swaps(request, BANK_ACCOUNT_ROW, BANK_ACCOUNT_ROW_ID, items=rows)
 
 
 # ======================================================================
@@ -199,7 +305,7 @@ def bank_accounts_bulk_action(request):
 
 BANK_TRANSACTION_SORT_FIELDS = {
     'reference': 'reference',
-    'account': 'account',
+    'account': 'account__name',
     'is_reconciled': 'is_reconciled',
     'balance_after': 'balance_after',
     'amount': 'amount',
@@ -207,93 +313,123 @@ BANK_TRANSACTION_SORT_FIELDS = {
     'created_at': 'created_at',
 }
 
-def _build_bank_transactions_context(hub_id, per_page=10):
-    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False).order_by('reference')
-    paginator = Paginator(qs, per_page if per_page > 0 else max(qs.count(), 1))
-    page_obj = paginator.get_page(1)
+BANK_TRANSACTION_ROW = 'bank_sync/partials/bank_transaction_row.html'
+BANK_TRANSACTION_ROW_ID = 'bank-transaction-'
+
+def _with_open_flags(qs):
+    """Annotate ``has_open_flag`` for the row's review badge."""
+    open_flags = TransactionFlag.objects.filter(
+        transaction=OuterRef('pk'), status=TransactionFlag.STATUS_OPEN, is_deleted=False,
+    )
+    return qs.annotate(has_open_flag=Exists(open_flags))
+
+def _sorted_bank_transactions(hub_id, params):
+    """The list's search and sort applied; returns the queryset and its order field."""
+    order_by = BANK_TRANSACTION_SORT_FIELDS.get(params.get('sort', 'reference'), 'reference')
+    qs = _with_open_flags(_filter_bank_transactions(hub_id, params.get('q', '').strip()).select_related('account'))
+    return qs.order_by(f'-{order_by}' if params.get('dir', 'asc') == 'desc' else order_by), order_by
+
+def _build_bank_transactions_context(hub_id, params):
+    """One list page for the search, sort, page size and cursor in ``params`` (GET or posted)."""
+    qs, order_by = _sorted_bank_transactions(hub_id, params)
+    sort_dir = params.get('dir', 'asc')
+    per_page = clamp_per_page(params.get('per_page'))
+    # The unfiltered total is one of the hub's cached counters.
+    search_query = params.get('q', '').strip()
+    total = approximate_count(qs) if search_query else counters.get_counters(hub_id)['transactions']
+    page_obj = keyset_paginate(
+        qs, order_by, descending=sort_dir == 'desc', cursor=params.get('cursor'), per_page=per_page,
+        total=total,
+    )
     return {
         'bank_transactions': page_obj,
         'page_obj': page_obj,
-        'search_query': '',
-        'sort_field': 'reference',
-        'sort_dir': 'asc',
-        'current_view': 'table',
+        'search_query': search_query,
+        'sort_field': params.get('sort', 'reference'),
+        'sort_dir': sort_dir,
+        'current_view': params.get('view', 'table'),
         'per_page': per_page,
+        'per_page_choices': PER_PAGE_CHOICES,
     }
 
-def _render_bank_transactions_list(request, hub_id, per_page=10):
-    ctx = _build_bank_transactions_context(hub_id, per_page)
+def _filter_bank_transactions(hub_id, search_query='', account_id=None):
+    """Transactions matching the list's search/filter box (shared by the list and bulk actions)."""
+    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False)
+    if account_id:
+        qs = qs.filter(account_id=account_id)
+    if search_query:
+        qs = apply_search(qs, search_query)
+    return qs
+
+def _bulk_transactions(request, hub_id):
+    qs = _filter_bank_transactions(hub_id, request.POST.get('q', '').strip(), request.POST.get('account') or None)
+    return _bulk_scope(request, qs)
+
+def _render_bank_transactions_list(request, hub_id):
+    # Re-rendered with the posted search/sort/page size (hx-include), so the user's view is kept.
+    ctx = _build_bank_transactions_context(hub_id, request.POST)
     return django_render(request, 'bank_sync/partials/bank_transactions_list.html', ctx)
 
+def _bank_transaction_rows(hub_id, ids):
+    """Rows as the list renders them (account and ``has_open_flag``), for swapping single rows in."""
+    return _with_open_flags(
+        BankTransaction.objects.filter(pk__in=ids, hub_id=hub_id, is_deleted=False).select_related('account'),
+    )
+
+def _render_bank_transaction_rows(request, hub_id, ids, deleted=False):
+    if deleted:
+        return _render_row_swaps(request, BANK_TRANSACTION_ROW, BANK_TRANSACTION_ROW_ID, deleted_ids=ids)
+    rows = _bank_transaction_rows(hub_id, ids)
+    return _render_row_swaps(request, BANK_TRANSACTION_ROW, BANK_TRANSACTION_ROW_ID, items=rows)
+
 @login_required
 @with_module_nav('bank_sync', 'accounts')
 @htmx_view('bank_sync/pages/bank_transactions.html', 'bank_sync/partials/bank_transactions_content.html')
 def bank_transactions_list(request):
     hub_id = request.session.get('hub_id')
-    search_query = request.GET.get('q', '').strip()
-    sort_field = request.GET.get('sort', 'reference')
-    sort_dir = request.GET.get('dir', 'asc')
-    page_number = request.GET.get('page', 1)
-    current_view = request.GET.get('view', 'table')
-    per_page = int(request.GET.get('per_page', 12))
-    if per_page not in PER_PAGE_CHOICES:
-        per_page = 12
-
-    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False)
-
-    if search_query:
-        qs = qs.filter(Q(description__icontains=search_query) | Q(reference__icontains=search_query))
-
-    order_by = BANK_TRANSACTION_SORT_FIELDS.get(sort_field, 'reference')
-    if sort_dir == 'desc':
-        order_by = f'-{order_by}'
-    qs = qs.order_by(order_by)
 
     export_format = request.GET.get('export')
-    if export_format in ('csv', 'excel'):
-        fields = ['reference', 'account', 'is_reconciled', 'balance_after', 'amount', 'date']
+    if export_format in EXPORT_WRITERS:
+        qs = _sorted_bank_transactions(hub_id, request.GET)[0]
+        fields = ['reference', 'account__name', 'is_reconciled', 'balance_after', 'amount', 'date']
         headers = ['Reference', 'BankAccount', 'Is Reconciled', 'Balance After', 'Amount', 'Date']
-        if export_format == 'csv':
-            return export_to_csv(qs, fields=fields, headers=headers, filename='bank_transactions.csv')
-        return export_to_excel(qs, fields=fields, headers=headers, filename='bank_transactions.xlsx')
-
-    paginator = Paginator(qs, per_page if per_page > 0 else max(qs.count(), 1))
-    page_obj = paginator.get_page(page_number)
+        return _stream_export(qs, fields, headers, 'bank_transactions', export_format)
 
+    ctx = _build_bank_transactions_context(hub_id, request.GET)
     if request.htmx and request.htmx.target == 'datatable-body':
-        return django_render(request, 'bank_sync/partials/bank_transactions_list.html', {
-            'bank_transactions': page_obj, 'page_obj': page_obj,
-            'search_query': search_query, 'sort_field': sort_field,
-            'sort_dir': sort_dir, 'current_view': current_view, 'per_page': per_page,
-        })
-
-    return {
-        'bank_transactions': page_obj, 'page_obj': page_obj,
-        'search_query': search_query, 'sort_field': sort_field,
-        'sort_dir': sort_dir, 'current_view': current_view, 'per_page': per_page,
-    }
+        return django_render(request, 'bank_sync/partials/bank_transactions_list.html', ctx)
+    ctx['accounts'] = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).order_by('name')
+    return ctx
 
 @login_required
 @htmx_view('bank_sync/pages/bank_transaction_add.html', 'bank_sync/partials/bank_transaction_add_content.html')
 def bank_transaction_add(request):
     hub_id = request.session.get('hub_id')
+    accounts = BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).order_by('name')
     if request.method == 'POST':
+        account = get_object_or_404(accounts, pk=request.POST.get('account'))
         date = request.POST.get('date') or None
         description = request.POST.get('description', '').strip()
         amount = request.POST.get('amount', '0') or '0'
-        balance_after = request.POST.get('balance_after', '0') or '0'
         is_reconciled = request.POST.get('is_reconciled') == 'on'
         reference = request.POST.get('reference', '').strip()
+        category = request.POST.get('category', '').strip()[:100]
         obj = BankTransaction(hub_id=hub_id)
+        obj.account = account
         obj.date = date
         obj.description = description
         obj.amount = amount
-        obj.balance_after = balance_after
         obj.is_reconciled = is_reconciled
         obj.reference = reference
+        obj.category = category
+        obj.seq = next_seq(account.pk)
+        PayeeResolver(hub_id).assign([obj])
         obj.save()
-        return _render_bank_transactions_list(request, hub_id)
-    return {}
+        apply_changes(account.pk, {obj.date})
+        row = _bank_transaction_rows(hub_id, [obj.pk]).get()
+        return _saved_row_response(request, BANK_TRANSACTION_ROW, BANK_TRANSACTION_ROW_ID, row,
+                                   'bank_sync:bank_transactions_list')
+    return {'accounts': accounts}
 
 @login_required
 @htmx_view('bank_sync/pages/bank_transaction_edit.html', 'bank_sync/partials/bank_transaction_edit_content.html')
@@ -301,14 +437,24 @@ def bank_transaction_edit(request, pk):
     hub_id = request.session.get('hub_id')
     obj = get_object_or_404(BankTransaction, pk=pk, hub_id=hub_id, is_deleted=False)
     if request.method == 'POST':
+        previous_day = obj.date
         obj.date = request.POST.get('date') or None
         obj.description = request.POST.get('description', '').strip()
         obj.amount = request.POST.get('amount', '0') or '0'
-        obj.balance_after = request.POST.get('balance_after', '0') or '0'
+        was_reconciled = obj.is_reconciled
         obj.is_reconciled = request.POST.get('is_reconciled') == 'on'
         obj.reference = request.POST.get('reference', '').strip()
+        obj.category = request.POST.get('category', '').strip()[:100]
+        PayeeResolver(hub_id).assign([obj])
         obj.save()
-        return _render_bank_transactions_list(request, hub_id)
+        if was_reconciled and not obj.is_reconciled:
+            ReconciliationLink.objects.filter(transaction=obj, is_deleted=False).update(
+                is_deleted=True, deleted_at=timezone.now(),
+            )
+        apply_changes(obj.account_id, {previous_day, obj.date})
+        row = _bank_transaction_rows(hub_id, [obj.pk]).get()
+        return _saved_row_response(request, BANK_TRANSACTION_ROW, BANK_TRANSACTION_ROW_ID, row,
+                                   'bank_sync:bank_transactions_list')
     return {'obj': obj}
 
 @login_required
@@ -318,19 +464,142 @@ def bank_transaction_delete(request, pk):
     obj = get_object_or_404(BankTransaction, pk=pk, hub_id=hub_id, is_deleted=False)
     obj.is_deleted = True
     obj.deleted_at = timezone.now()
-    obj.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
-    return _render_bank_transactions_list(request, hub_id)
+    with transaction.atomic():
+        obj.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+        # The allocations go with the line, so its documents can be matched again.
+        ReconciliationLink.objects.filter(transaction=obj, is_deleted=False).update(
+            is_deleted=True, deleted_at=obj.deleted_at,
+        )
+    apply_changes(obj.account_id, {obj.date})
+    return _render_row_swaps(request, BANK_TRANSACTION_ROW, BANK_TRANSACTION_ROW_ID, deleted_ids=[obj.pk])
+
+@login_required
+@require_POST
+def bank_transaction_flags_dismiss(request, pk):
+    hub_id = request.session.get('hub_id')
+    obj = get_object_or_404(BankTransaction, pk=pk, hub_id=hub_id, is_deleted=False)
+    TransactionFlag.objects.filter(transaction=obj, status=TransactionFlag.STATUS_OPEN, is_deleted=False).update(
+        status=TransactionFlag.STATUS_DISMISSED, updated_at=timezone.now(),
+    )
+    return _render_bank_transaction_rows(request, hub_id, [obj.pk])
+
+def _bulk_reconcile(request, action, url_name):
+    hub_id = request.session.get('hub_id')
+    qs = _bulk_transactions(request, hub_id)
+    if request.POST.get('dry_run'):
+        return _render_bulk_confirm(request, url_name, qs.count(), action)
+    ids = None if request.POST.get('scope') == 'filter' else list(qs.values_list('pk', flat=True))
+    bulk_update_transactions(qs, action, user_id=request.session.get('local_user_id'))
+    if ids is None:
+        return _render_bank_transactions_list(request, hub_id)
+    return _render_bank_transaction_rows(request, hub_id, ids)
+
+@login_required
+@permission_required('bank_sync.reconcile_transaction')
+@require_POST
+def bank_transactions_bulk_reconcile(request):
+    return _bulk_reconcile(request, 'reconcile', 'bank_sync:bank_transactions_bulk_reconcile')
+
+@login_required
+@permission_required('bank_sync.reconcile_transaction')
+@require_POST
+def bank_transactions_bulk_unreconcile(request):
+    return _bulk_reconcile(request, 'unreconcile', 'bank_sync:bank_transactions_bulk_unreconcile')
 
 @login_required
 @require_POST
 def bank_transactions_bulk_action(request):
     hub_id = request.session.get('hub_id')
-    ids = [i.strip() for i in request.POST.get('ids', '').split(',') if i.strip()]
     action = request.POST.get('action', '')
-    qs = BankTransaction.objects.filter(hub_id=hub_id, is_deleted=False, id__in=ids)
-    if action == 'delete':
-        qs.update(is_deleted=True, deleted_at=timezone.now())
-    return _render_bank_transactions_list(request, hub_id)
+    if action == 'reconcile':
+        return bank_transactions_bulk_reconcile(request)
+    if action == 'unreconcile':
+        return bank_transactions_bulk_unreconcile(request)
+    if action not in BULK_ACTIONS:
+        return _render_bank_transactions_list(request, hub_id)
+    qs = _bulk_transactions(request, hub_id)
+    if request.POST.get('dry_run'):
+        return _render_bulk_confirm(request, 'bank_sync:bank_transactions_bulk_action', qs.count(), action)
+    account = None
+    if action == 'assign_account':
+        account = get_object_or_404(BankAccount, pk=request.POST.get('target_account'), hub_id=hub_id, is_deleted=False)
+    # A selection is answered with its rows only; a whole filter re-renders the list.
+    ids = None if request.POST.get('scope') == 'filter' else list(qs.values_list('pk', flat=True))
+    bulk_update_transactions(qs, action, account=account, category=request.POST.get('category', '').strip()[:100])
+    if ids is None:
+        return _render_bank_transactions_list(request, hub_id)
+    return _render_bank_transaction_rows(request, hub_id, ids, deleted=action == 'delete')
+
+@login_required
+@permission_required('bank_sync.reconcile_transaction')
+@require_POST
+def bank_transactions_auto_reconcile(request):
+    hub_id = request.session.get('hub_id')
+    job = enqueue(hub_id, 'reconcile', {'account_id': request.POST.get('account') or None},
+                  user_id=request.session.get('local_user_id'))
+    return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
+
+@login_required
+@permission_required('bank_sync.import_transactions')
+@with_module_nav('bank_sync', 'transactions')
+@htmx_view('bank_sync/pages/bank_transactions_import.html', 'bank_sync/partials/bank_transactions_import_content.html')
+def bank_transactions_import(request):
+    hub_id = request.session.get('hub_id')
+    if request.method == 'POST':
+        account = get_object_or_404(BankAccount, pk=request.POST.get('account'), hub_id=hub_id, is_deleted=False)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return django_render(request, 'bank_sync/partials/import_result.html', {'error': _('Select a statement file to import.')})
+        fmt = request.POST.get('format') or detect_format(upload.name)
+        if fmt not in PARSERS:
+            return django_render(request, 'bank_sync/partials/import_result.html', {'error': _('Unsupported statement format.')})
+        job = enqueue(hub_id, 'import', {
+            'account_id': str(account.pk), 'format': fmt, 'path': store_upload(upload),
+        }, user_id=request.session.get('local_user_id'))
+        return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
+    return {
+        'accounts': BankAccount.objects.filter(hub_id=hub_id, is_deleted=False, is_active=True).order_by('name'),
+        'formats': FORMAT_CHOICES,
+    }
+
+
+# ======================================================================
+# Background jobs
+# ======================================================================
+
+@login_required
+def job_status(request, pk):
+    hub_id = request.session.get('hub_id')
+    job = get_object_or_404(BankSyncJob, pk=pk, hub_id=hub_id, is_deleted=False)
+    return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
+
+
+@login_required
+@require_POST
+def job_cancel(request, pk):
+    hub_id = request.session.get('hub_id')
+    job = get_object_or_404(BankSyncJob, pk=pk, hub_id=hub_id, is_deleted=False)
+    cancel_job(job)
+    job.refresh_from_db()
+    return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
+
+
+@login_required
+@permission_required('bank_sync.manage_settings')
+@require_POST
+def recompute_balances_job(request):
+    hub_id = request.session.get('hub_id')
+    job = enqueue(hub_id, 'recompute', user_id=request.session.get('local_user_id'))
+    return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
+
+
+@login_required
+@permission_required('bank_sync.manage_settings')
+@require_POST
+def detect_flags_job(request):
+    hub_id = request.session.get('hub_id')
+    job = enqueue(hub_id, 'detect', user_id=request.session.get('local_user_id'))
+    return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
 
 
 @login_required
@@ -338,5 +607,80 @@ def bank_transactions_bulk_action(request):
 @with_module_nav('bank_sync', 'settings')
 @htmx_view('bank_sync/pages/settings.html', 'bank_sync/partials/settings_content.html')
 def settings_view(request):
-    return {}
+    return _categorization_rules_context(request.session.get('hub_id'))
+
+
+# ======================================================================
+# Categorization rules
+# ======================================================================
+
+def _categorization_rules_context(hub_id, error=''):
+    return {
+        'rules': CategorizationRule.objects.filter(hub_id=hub_id, is_deleted=False).select_related('account').order_by(
+            'priority', 'created_at',
+        ),
+        'accounts': BankAccount.objects.filter(hub_id=hub_id, is_deleted=False).order_by('name'),
+        'match_choices': CategorizationRule.MATCH_CHOICES,
+        'error': error,
+    }
+
+def _render_categorization_rules(request, hub_id, error=''):
+    ctx = _categorization_rules_context(hub_id, error)
+    return django_render(request, 'bank_sync/partials/categorization_rules.html', ctx)
+
+def _optional_amount(value):
+    value = (value or '').strip().replace(',', '.')
+    return Decimal(value) if value else None
+
+@login_required
+@permission_required('bank_sync.manage_settings')
+@require_POST
+def categorization_rule_add(request):
+    hub_id = request.session.get('hub_id')
+    obj = CategorizationRule(hub_id=hub_id, created_by=request.session.get('local_user_id'))
+    obj.name = request.POST.get('name', '').strip()[:100]
+    obj.match_type = request.POST.get('match_type', CategorizationRule.MATCH_CONTAINS)
+    obj.pattern = request.POST.get('pattern', '').strip()[:255]
+    obj.counterparty_iban = compact_iban(request.POST.get('counterparty_iban'))[:34]
+    obj.category = request.POST.get('category', '').strip()[:100]
+    obj.tags = request.POST.get('tags', '').strip()[:255]
+    if obj.match_type not in dict(CategorizationRule.MATCH_CHOICES):
+        return _render_categorization_rules(request, hub_id, _('Unknown match type.'))
+    if not obj.name or not (obj.category or obj.tags):
+        return _render_categorization_rules(request, hub_id, _('A rule needs a name and a category or tags.'))
+    if obj.match_type == CategorizationRule.MATCH_REGEX:
+        try:
+            compile_pattern(obj.pattern)
+        except re.error as e:
+            return _render_categorization_rules(request, hub_id, _('Invalid regular expression: %s') % e)
+    try:
+        obj.priority = max(0, int(request.POST.get('priority') or 100))
+        obj.min_amount = _optional_amount(request.POST.get('min_amount'))
+        obj.max_amount = _optional_amount(request.POST.get('max_amount'))
+    except (ValueError, InvalidOperation):
+        return _render_categorization_rules(request, hub_id, _('Priority and amounts must be numbers.'))
+    if request.POST.get('account'):
+        obj.account = get_object_or_404(BankAccount, pk=request.POST.get('account'), hub_id=hub_id, is_deleted=False)
+    obj.save()
+    return _render_categorization_rules(request, hub_id)
+
+@login_required
+@permission_required('bank_sync.manage_settings')
+@require_POST
+def categorization_rule_delete(request, pk):
+    hub_id = request.session.get('hub_id')
+    obj = get_object_or_404(CategorizationRule, pk=pk, hub_id=hub_id, is_deleted=False)
+    obj.is_deleted = True
+    obj.deleted_at = timezone.now()
+    obj.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+    return _render_categorization_rules(request, hub_id)
+
+@login_required
+@permission_required('bank_sync.manage_settings')
+@require_POST
+def categorization_rules_apply(request):
+    hub_id = request.session.get('hub_id')
+    params = {'account_id': request.POST.get('account') or None, 'overwrite': request.POST.get('overwrite') == 'on'}
+    job = enqueue(hub_id, 'categorize', params, user_id=request.session.get('local_user_id'))
+    return django_render(request, 'bank_sync/partials/job_progress.html', {'job': job})
 